@@ -1,6 +1,15 @@
+from datetime import datetime, timedelta
+
 from domain.entities import User, Post, Comment
 from domain.factories import UserFactory, PostFactory, CommentFactory
-from domain.repositories import IUserRepository, IPostRepository, ICommentRepository
+from domain.repositories import (
+    IUserRepository,
+    IPostRepository,
+    ICommentRepository,
+    IContentRenderer,
+    ITrendingRepository,
+    IFeedRepository
+)
 
 
 class CreateUserUseCase:
@@ -27,14 +36,20 @@ class CreateUserUseCase:
 class CreatePostUseCase:
     """Сценарий создания новой публикации."""
     
-    def __init__(self, post_repo: IPostRepository, user_repo: IUserRepository):
+    def __init__(self, post_repo: IPostRepository, user_repo: IUserRepository,
+                 feed_repo: IFeedRepository | None = None, renderer: IContentRenderer | None = None):
         self.post_repo = post_repo
         self.user_repo = user_repo
+        self.feed_repo = feed_repo
+        self.renderer = renderer
     
     def execute(self, title: str, content: str, author_id: int) -> Post:
         """
         Создать новую публикацию.
         
+        Если задан репозиторий лент, публикация рассылается по лентам
+        подписчиков автора.
+        
         Args:
             title: Заголовок публикации
             content: Содержание публикации
@@ -51,12 +66,20 @@ class CreatePostUseCase:
             raise ValueError(f"Автор с ID {author_id} не существует")
         
         post = PostFactory.create(title, content, author_id)
-        return self.post_repo.create(post)
+        created = self.post_repo.create(post)
+        if self.feed_repo is not None:
+            self.feed_repo.fan_out(created)
+        if self.renderer is not None:
+            self.renderer.prerender(created)
+        return created
 
 
 class CreateCommentUseCase:
     """Сценарий создания нового комментария."""
     
+    # Максимальная глубина ответа; ограничивает и длину материализованного пути
+    MAX_DEPTH = 32
+    
     def __init__(self, 
                  comment_repo: ICommentRepository, 
                  post_repo: IPostRepository,
@@ -65,7 +88,7 @@ class CreateCommentUseCase:
         self.post_repo = post_repo
         self.user_repo = user_repo
     
-    def execute(self, content: str, post_id: int, author_id: int) -> Comment:
+    def execute(self, content: str, post_id: int, author_id: int, parent_id: int | None = None) -> Comment:
         """
         Создать новый комментарий.
         
@@ -73,19 +96,28 @@ class CreateCommentUseCase:
             content: Содержание комментария
             post_id: ID публикации
             author_id: ID автора
+            parent_id: ID комментария, на который это ответ
             
         Returns:
             Созданный объект комментария
             
         Raises:
-            ValueError: Если публикация или автор не существуют
+            ValueError: Если публикация, автор или родительский комментарий
+                не существуют или превышена глубина вложенности
         """
         if not self.post_repo.get_by_id(post_id):
             raise ValueError(f"Публикация с ID {post_id} не существует")
         if not self.user_repo.get_by_id(author_id):
             raise ValueError(f"Автор с ID {author_id} не существует")
+        parent = None
+        if parent_id is not None:
+            parent = self.comment_repo.get_by_id(parent_id)
+            if not parent or parent.post_id != post_id:
+                raise ValueError(f"Комментарий с ID {parent_id} не существует у публикации {post_id}")
+            if parent.depth + 1 > self.MAX_DEPTH:
+                raise ValueError(f"Превышена глубина вложенности ответов ({self.MAX_DEPTH})")
         
-        comment = CommentFactory.create(content, post_id, author_id)
+        comment = CommentFactory.create(content, post_id, author_id, parent)
         return self.comment_repo.create(comment)
 
 
@@ -168,8 +200,9 @@ class GetAllPostsUseCase:
 class DeletePostUseCase:
     """Сценарий удаления публикации."""
     
-    def __init__(self, post_repo: IPostRepository):
+    def __init__(self, post_repo: IPostRepository, renderer: IContentRenderer | None = None):
         self.post_repo = post_repo
+        self.renderer = renderer
     
     def execute(self, post_id: int) -> None:
         """
@@ -178,7 +211,9 @@ class DeletePostUseCase:
         Args:
             post_id: ID публикации для удаления
         """
-        return self.post_repo.delete(post_id)
+        self.post_repo.delete(post_id)
+        if self.renderer is not None:
+            self.renderer.invalidate(post_id)
 
 
 class GetAllCommentsUseCase:
@@ -211,6 +246,47 @@ class GetCommentByIdUseCase:
         return self.comment_repo.get_by_id(comment_id)
 
 
+class GetCommentThreadUseCase:
+    """Сценарий получения обсуждения публикации с пагинацией по комментариям верхнего уровня."""
+    
+    def __init__(self, comment_repo: ICommentRepository):
+        self.comment_repo = comment_repo
+    
+    def execute(self, post_id: int, limit: int, cursor: str | None = None,
+                max_depth: int | None = None) -> tuple[list[Comment], str | None]:
+        """
+        Получить страницу обсуждения.
+        
+        Ответы удалённых комментариев скрываются вместе с ними.
+        
+        Args:
+            post_id: ID публикации
+            limit: Количество комментариев верхнего уровня на странице
+            cursor: Курсор из предыдущей страницы (None - первая страница)
+            max_depth: Максимальная глубина ответов (None - без ограничения)
+        
+        Returns:
+            Комментарии в порядке обхода дерева и курсор следующей
+            страницы (None, если страница последняя)
+        
+        Raises:
+            ValueError: Если курсор некорректен
+        """
+        try:
+            start = int(cursor) if cursor else None
+        except ValueError:
+            raise ValueError(f"Некорректный курсор: {cursor}")
+        comments, next_start = self.comment_repo.get_thread(post_id, limit, start, max_depth)
+        visible = []
+        shown = set()
+        # Родитель идёт в порядке обхода раньше ответов
+        for comment in comments:
+            if comment.parent_id is None or comment.parent_id in shown:
+                visible.append(comment)
+                shown.add(comment.id)
+        return visible, str(next_start) if next_start is not None else None
+
+
 class DeleteCommentUseCase:
     """Сценарий удаления комментария."""
     
@@ -224,4 +300,120 @@ class DeleteCommentUseCase:
         Args:
             comment_id: ID комментария для удаления
         """
-        return self.comment_repo.delete(comment_id)
\ No newline at end of file
+        return self.comment_repo.delete(comment_id)
+
+
+class GetTrendingPostsUseCase:
+    """Сценарий получения самых обсуждаемых публикаций."""
+    
+    def __init__(self, trending_repo: ITrendingRepository):
+        self.trending_repo = trending_repo
+    
+    def execute(self, limit: int) -> list[tuple[Post, float]]:
+        """
+        Получить публикации по убыванию затухающего счёта комментариев.
+        
+        Args:
+            limit: Количество публикаций
+        
+        Returns:
+            Пары (публикация, счёт)
+        """
+        return self.trending_repo.top(limit)
+
+
+class FollowUserUseCase:
+    """Сценарий подписки пользователя на автора."""
+    
+    def __init__(self, feed_repo: IFeedRepository, user_repo: IUserRepository):
+        self.feed_repo = feed_repo
+        self.user_repo = user_repo
+    
+    def execute(self, follower_id: int, author_id: int) -> bool:
+        """
+        Подписать пользователя на автора.
+        
+        Args:
+            follower_id: ID подписчика
+            author_id: ID автора
+        
+        Returns:
+            True, если подписка создана, False - если уже была
+        
+        Raises:
+            ValueError: Если пользователь подписывается на себя или автор не существует
+        """
+        if follower_id == author_id:
+            raise ValueError("Нельзя подписаться на самого себя")
+        if not self.user_repo.get_by_id(author_id):
+            raise ValueError(f"Автор с ID {author_id} не существует")
+        return self.feed_repo.follow(follower_id, author_id)
+
+
+class UnfollowUserUseCase:
+    """Сценарий отписки пользователя от автора."""
+    
+    def __init__(self, feed_repo: IFeedRepository):
+        self.feed_repo = feed_repo
+    
+    def execute(self, follower_id: int, author_id: int) -> bool:
+        """
+        Отписать пользователя от автора.
+        
+        Returns:
+            True, если подписка была удалена
+        """
+        return self.feed_repo.unfollow(follower_id, author_id)
+
+
+class GetFeedUseCase:
+    """Сценарий получения ленты пользователя с пагинацией по курсору."""
+    
+    # Начало отсчёта для кодирования времени в курсоре
+    CURSOR_EPOCH = datetime(1970, 1, 1)
+    
+    def __init__(self, feed_repo: IFeedRepository):
+        self.feed_repo = feed_repo
+    
+    @classmethod
+    def encode_cursor(cls, created_at: datetime, post_id: int) -> str:
+        """Курсор публикации: микросекунды времени создания и ID."""
+        return f'{(created_at - cls.CURSOR_EPOCH) // timedelta(microseconds=1)}_{post_id}'
+    
+    @classmethod
+    def decode_cursor(cls, cursor: str) -> tuple[datetime, int]:
+        """
+        Разобрать курсор.
+        
+        Raises:
+            ValueError: Если курсор некорректен
+        """
+        try:
+            micros, post_id = cursor.split('_')
+            return cls.CURSOR_EPOCH + timedelta(microseconds=int(micros)), int(post_id)
+        except (ValueError, OverflowError):
+            raise ValueError(f"Некорректный курсор: {cursor}")
+    
+    def execute(self, user_id: int, limit: int, cursor: str | None = None) -> tuple[list[Post], str | None]:
+        """
+        Получить страницу ленты.
+        
+        Args:
+            user_id: ID читателя
+            limit: Размер страницы
+            cursor: Курсор из предыдущей страницы (None - первая страница)
+        
+        Returns:
+            Публикации от новых к старым и курсор следующей страницы
+            (None, если страница последняя)
+        
+        Raises:
+            ValueError: Если курсор некорректен
+        """
+        before = self.decode_cursor(cursor) if cursor else None
+        page = self.feed_repo.get_feed(user_id, limit, before)
+        next_cursor = None
+        if page and len(page) == limit:
+            last_post, created_at = page[-1]
+            next_cursor = self.encode_cursor(created_at, last_post.id)
+        return [post for post, _ in page], next_cursor
@@ -0,0 +1,124 @@
+import json
+
+import click
+
+from benchmarks.dataset import SCALES, generate_dataset
+from benchmarks.feed import run_feed
+from benchmarks.load import HttpTransport, dataset_sizes, parse_mix, run_in_process, run_load
+from benchmarks.micro import run_micro
+from benchmarks.results import compare_results, write_results
+from benchmarks.startup import run_startup
+
+
+def _print_results(results: dict) -> None:
+    click.echo(f'{"сценарий":45} {"опер.":>8} {"ошибки":>7} {"p50, мс":>10} {"p99, мс":>10} {"опер./с":>10}')
+    for name, summary in results.items():
+        click.echo(
+            f'{name:45} {summary["operations"]:8d} {summary["errors"]:7d} '
+            f'{summary["p50_ms"]:10.3f} {summary["p99_ms"]:10.3f} {summary["throughput_ops"]:10.1f}'
+        )
+
+
+@click.group()
+def cli():
+    """Бенчмарки Blog API."""
+
+
+@cli.command()
+@click.argument('path')
+@click.option('--scale', type=click.Choice(sorted(SCALES)), default='xs', show_default=True,
+              help='Размер набора: xs=1e4, s=1e5, m=1e6, l=1e7 комментариев')
+@click.option('--comments', type=int, default=None, help='Точное количество комментариев вместо --scale')
+@click.option('--seed', default=42, show_default=True)
+def dataset(path, scale, comments, seed):
+    """Сгенерировать синтетический набор данных в файл PATH."""
+    sizes = generate_dataset(path, comments or SCALES[scale], seed=seed)
+    click.echo(json.dumps(sizes, ensure_ascii=False))
+
+
+@cli.command()
+@click.argument('db_path')
+@click.option('--iterations', default=1000, show_default=True)
+@click.option('--list-iterations', default=5, show_default=True)
+@click.option('--only', multiple=True, help='Подстрока имени сценария, можно несколько раз')
+@click.option('--seed', default=1, show_default=True)
+@click.option('--output', default='bench_results/micro.json', show_default=True)
+def micro(db_path, iterations, list_iterations, only, seed, output):
+    """Микробенчмарки репозиториев и сценариев на копии DB_PATH."""
+    results = run_micro(db_path, iterations, list_iterations, seed, list(only) or None)
+    _print_results(results)
+    write_results(output, 'micro', {
+        'dataset': db_path, 'iterations': iterations, 'list_iterations': list_iterations, 'seed': seed,
+    }, results)
+
+
+@cli.command()
+@click.argument('db_path')
+@click.option('--url', default=None, help='Адрес запущенного сервера; без него - нагрузка в том же процессе')
+@click.option('--mix', default=None, help='Смесь эндпоинтов, например get_post=70,create_comment=30')
+@click.option('--workers', default=4, show_default=True)
+@click.option('--requests', 'requests_per_worker', default=1000, show_default=True, help='Запросов на клиента')
+@click.option('--seed', default=1, show_default=True)
+@click.option('--output', default='bench_results/load.json', show_default=True)
+def load(db_path, url, mix, workers, requests_per_worker, seed, output):
+    """HTTP-нагрузка смесью эндпоинтов; DB_PATH - набор данных (для границ ID)."""
+    weights = parse_mix(mix)
+    if url:
+        results = run_load(lambda: HttpTransport(url), dataset_sizes(db_path), weights,
+                           workers, requests_per_worker, seed)
+    else:
+        results = run_in_process(db_path, weights, workers, requests_per_worker, seed)
+    _print_results(results)
+    write_results(output, 'load', {
+        'dataset': db_path, 'url': url, 'mix': weights, 'workers': workers,
+        'requests_per_worker': requests_per_worker, 'seed': seed,
+    }, results)
+
+
+@cli.command()
+@click.option('--runs', default=10, show_default=True, help='Количество холодных стартов')
+@click.option('--budget-ms', default=1000.0, show_default=True, help='Допустимое p50 полного старта')
+@click.option('--output', default='bench_results/startup.json', show_default=True)
+def startup(runs, budget_ms, output):
+    """Холодный старт: импорт, create_app и первый запрос; код 1 при превышении бюджета."""
+    results = run_startup(runs)
+    _print_results(results)
+    write_results(output, 'startup', {'runs': runs, 'budget_ms': budget_ms}, results)
+    p50 = results['total']['p50_ms']
+    if p50 > budget_ms:
+        raise click.ClickException(f'p50 старта {p50:.1f} мс превышает бюджет {budget_ms:.1f} мс')
+    click.echo(f'p50 старта {p50:.1f} мс в пределах бюджета {budget_ms:.1f} мс')
+
+
+@cli.command()
+@click.option('--users', default=100_000, show_default=True)
+@click.option('--follows', default=20, show_default=True, help='Подписок на пользователя')
+@click.option('--history', default=5, show_default=True, help='Публикаций истории на пользователя')
+@click.option('--posts', default=10_000, show_default=True, help='Публикаций, разосланных по лентам перед замерами')
+@click.option('--iterations', default=1000, show_default=True)
+@click.option('--threshold', default=1000, show_default=True, help='Порог подписчиков для рассылки')
+@click.option('--seed', default=1, show_default=True)
+@click.option('--output', default='bench_results/feed.json', show_default=True)
+def feed(users, follows, history, posts, iterations, threshold, seed, output):
+    """Ленты: рассылка при создании публикации и чтение страниц против слияния при чтении."""
+    results = run_feed(users, follows, history, posts, iterations, fanout_threshold=threshold, seed=seed)
+    _print_results(results)
+    write_results(output, 'feed', {
+        'users': users, 'follows_per_user': follows, 'posts_per_user': history, 'posts': posts,
+        'iterations': iterations, 'fanout_threshold': threshold, 'seed': seed,
+    }, results)
+
+
+@cli.command()
+@click.argument('baseline', type=click.File(encoding='utf-8'))
+@click.argument('current', type=click.File(encoding='utf-8'))
+def compare(baseline, current):
+    """Сравнить два файла результатов (например, двух коммитов)."""
+    before, after = json.load(baseline), json.load(current)
+    click.echo(f'{before.get("commit")} -> {after.get("commit")}')
+    for name, metric, old, new, change in compare_results(before, after):
+        click.echo(f'{name:45} {metric:15} {old:12.3f} {new:12.3f} {change:+8.1f}%')
+
+
+if __name__ == '__main__':
+    cli()
\ No newline at end of file
@@ -0,0 +1,149 @@
+import os
+import random
+import sqlite3
+from datetime import timedelta
+
+from infrastructure.comment_tree import path_segment
+from infrastructure.database import db, utcnow
+from infrastructure.trending import DEFAULT_HALF_LIFE, decay_rate, log_weight, logaddexp
+
+# Размеры наборов данных: количество комментариев и производные от него
+SCALES = {
+    'xs': 10 ** 4,
+    's': 10 ** 5,
+    'm': 10 ** 6,
+    'l': 10 ** 7,
+}
+
+# Комментарии равномерно распределены по этому промежутку до момента генерации
+COMMENT_SPAN = 30 * 24 * 3600
+
+WORDS = ('блог', 'архитектура', 'репозиторий', 'запрос', 'индекс', 'кэш', 'поток', 'данные', 'python', 'sqlite')
+
+
+def create_schema(path: str) -> None:
+    """
+    Создать схему блога в файле SQLite.
+    
+    Args:
+        path: Путь к файлу базы данных
+    """
+    from interfaces.web.app import create_app
+    
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(path)}',
+        # Приложение нужно только ради схемы: фоновые потоки не запускаются
+        'SOFT_DELETE_PURGE_ENABLED': False,
+        'WEBHOOK_DELIVERY_ENABLED': False,
+        'BACKUP_ENABLED': False,
+    })
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+
+
+def generate_dataset(path: str, comments: int, posts_per_user: int = 5,
+                     comments_per_post: int = 20, seed: int = 42,
+                     chunk_size: int = 50_000, half_life: float = DEFAULT_HALF_LIFE) -> dict:
+    """
+    Сгенерировать воспроизводимый синтетический набор данных.
+    
+    Пользователей и публикаций выводится из числа комментариев, авторы
+    комментариев и публикации выбираются по степенному закону, чтобы
+    были «горячие» публикации и активные пользователи. Комментарии
+    получают путь, глубину и время создания, как при создании через
+    репозиторий, а рейтинг обсуждаемых заполняется их весами. Вставка
+    идёт напрямую через sqlite3 пачками по chunk_size строк.
+    
+    Args:
+        path: Путь к файлу базы данных (будет перезаписан)
+        comments: Количество комментариев
+        posts_per_user: Среднее число публикаций на пользователя
+        comments_per_post: Среднее число комментариев на публикацию
+        seed: Зерно генератора случайных чисел
+        chunk_size: Размер пачки вставки
+        half_life: Период полураспада веса комментария в рейтинге в секундах
+    
+    Returns:
+        Фактические размеры набора данных
+    """
+    rng = random.Random(seed)
+    posts = max(1, comments // comments_per_post)
+    users = max(1, posts // posts_per_user)
+    
+    if os.path.exists(path):
+        os.remove(path)
+    create_schema(path)
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=OFF')
+    try:
+        _insert_chunks(connection, 'INSERT INTO user_model (id, username, email) VALUES (?, ?, ?)', (
+            (i, f'user{i}', f'user{i}@example.com') for i in range(1, users + 1)
+        ), chunk_size)
+        _insert_chunks(connection, 'INSERT INTO post_model (id, title, content, author_id) VALUES (?, ?, ?, ?)', (
+            (i, f'Публикация {i}', _text(rng, 40), _skewed(rng, users)) for i in range(1, posts + 1)
+        ), chunk_size)
+        scores = {}
+        _insert_chunks(
+            connection,
+            'INSERT INTO comment_model (id, content, post_id, author_id, created_at, path, depth) '
+            'VALUES (?, ?, ?, ?, ?, ?, 0)',
+            _comment_rows(rng, comments, posts, users, decay_rate(half_life), scores),
+            chunk_size
+        )
+        _insert_chunks(
+            connection, 'INSERT INTO post_trending (post_id, score) VALUES (?, ?)', sorted(scores.items()), chunk_size
+        )
+        connection.execute('ANALYZE')
+        connection.commit()
+    finally:
+        connection.close()
+    return {'users': users, 'posts': posts, 'comments': comments, 'seed': seed}
+
+
+def _comment_rows(rng: random.Random, comments: int, posts: int, users: int, rate: float, scores: dict):
+    """
+    Строки комментариев; веса комментариев складываются в scores по публикациям.
+    
+    Args:
+        rng: Генератор случайных чисел
+        comments: Количество комментариев
+        posts: Количество публикаций
+        users: Количество пользователей
+        rate: Скорость затухания веса комментария
+        scores: Словарь логарифмов счёта по ID публикации
+    
+    Yields:
+        Кортежи (id, content, post_id, author_id, created_at, path)
+    """
+    now = utcnow()
+    for i in range(1, comments + 1):
+        content, post_id, author_id = _text(rng, 12), _skewed(rng, posts), _skewed(rng, users)
+        created_at = now - timedelta(seconds=rng.random() * COMMENT_SPAN)
+        scores[post_id] = logaddexp(scores.get(post_id), log_weight(created_at, rate))
+        yield i, content, post_id, author_id, created_at.isoformat(' ', 'microseconds'), path_segment(i)
+
+
+def _text(rng: random.Random, words: int) -> str:
+    """Случайный текст из words слов."""
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _skewed(rng: random.Random, upper: int) -> int:
+    """Случайный ID от 1 до upper со смещением к малым значениям."""
+    return min(upper, int(upper ** rng.random()))
+
+
+def _insert_chunks(connection, sql: str, rows, chunk_size: int) -> None:
+    """Вставить строки пачками, фиксируя каждую пачку."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            connection.executemany(sql, chunk)
+            connection.commit()
+            chunk = []
+    if chunk:
+        connection.executemany(sql, chunk)
+        connection.commit()
\ No newline at end of file
@@ -0,0 +1,165 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from application.use_cases import CreatePostUseCase, GetFeedUseCase
+from benchmarks.dataset import _insert_chunks, _skewed, create_schema
+from benchmarks.micro import _measure
+from infrastructure.database import db, FollowModel, PostModel, UserModel, utcnow
+from infrastructure.feed import DEFAULT_FANOUT_THRESHOLD, DEFAULT_MAX_ENTRIES, SQLFeedRepository
+from infrastructure.repositories import SQLUserRepository, SQLPostRepository
+
+
+def generate_social_graph(path: str, users: int, follows_per_user: int, posts_per_user: int = 5,
+                          seed: int = 1, chunk_size: int = 50_000) -> None:
+    """
+    Создать пользователей, подписки и историю публикаций.
+    
+    Авторы подписок и публикаций выбираются по степенному закону:
+    несколько первых пользователей собирают большую часть подписчиков
+    и публикаций и становятся популярными авторами. История вставляется
+    напрямую и в ленты не рассылается.
+    
+    Args:
+        path: Путь к файлу базы данных (будет перезаписан)
+        users: Количество пользователей
+        follows_per_user: Подписок на пользователя
+        posts_per_user: Публикаций истории на пользователя
+        seed: Зерно генератора случайных чисел
+        chunk_size: Размер пачки вставки
+    """
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    create_schema(path)
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=OFF')
+    try:
+        _insert_chunks(connection, 'INSERT INTO user_model (id, username, email) VALUES (?, ?, ?)', (
+            (i, f'user{i}', f'user{i}@example.com') for i in range(1, users + 1)
+        ), chunk_size)
+        _insert_chunks(connection, 'INSERT OR IGNORE INTO follow (follower_id, author_id) VALUES (?, ?)', (
+            (follower_id, author_id)
+            for follower_id in range(1, users + 1)
+            for author_id in {_skewed(rng, users) for _ in range(follows_per_user)}
+            if author_id != follower_id
+        ), chunk_size)
+        history = users * posts_per_user
+        started = utcnow() - timedelta(seconds=history)
+        _insert_chunks(connection, (
+            'INSERT INTO post_model (id, title, content, author_id, created_at) VALUES (?, ?, ?, ?, ?)'
+        ), (
+            (i, f'Публикация {i}', 'Текст', _skewed(rng, users),
+             (started + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S.%f'))
+            for i in range(1, history + 1)
+        ), chunk_size)
+        connection.execute(
+            'UPDATE user_model SET follower_count = '
+            '(SELECT count(*) FROM follow WHERE follow.author_id = user_model.id)'
+        )
+        connection.execute('ANALYZE')
+        connection.commit()
+    finally:
+        connection.close()
+
+
+def run_feed(users: int = 100_000, follows_per_user: int = 20, posts_per_user: int = 5,
+             posts: int = 10_000, iterations: int = 1000, page_size: int = 20,
+             fanout_threshold: int = DEFAULT_FANOUT_THRESHOLD, max_entries: int = DEFAULT_MAX_ENTRIES, seed: int = 1) -> dict:
+    """
+    Бенчмарк лент: рассылка при создании публикации и чтение страниц.
+    
+    Ленты наполняются posts публикациями случайных авторов через
+    CreatePostUseCase, затем замеряются создание публикации обычным и
+    популярным автором, первая и следующая страница ленты и, для
+    сравнения, чтение ленты без рассылки - слиянием публикаций всех
+    авторов, на которых подписан пользователь.
+    
+    Args:
+        users: Количество пользователей
+        follows_per_user: Подписок на пользователя
+        posts_per_user: Публикаций истории на пользователя
+        posts: Публикаций для наполнения лент
+        iterations: Итераций каждого сценария
+        page_size: Размер страницы ленты
+        fanout_threshold: Порог подписчиков для рассылки
+        max_entries: Размер ленты пользователя
+        seed: Зерно генератора случайных чисел
+    
+    Returns:
+        Сводки по сценариям
+    """
+    from interfaces.web.app import create_app
+    
+    workdir = tempfile.mkdtemp(prefix='blog-feed-')
+    path = os.path.join(workdir, 'feed.db')
+    rng = random.Random(seed)
+    results = {}
+    try:
+        generate_social_graph(path, users, follows_per_user, posts_per_user, seed)
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+        })
+        with app.app_context():
+            user_repo, post_repo = SQLUserRepository(), SQLPostRepository()
+            feed_repo = SQLFeedRepository(fanout_threshold, max_entries)
+            create_post = CreatePostUseCase(post_repo, user_repo, feed_repo)
+            get_feed = GetFeedUseCase(feed_repo)
+            popular = db.session.execute(
+                select(UserModel.id).where(UserModel.follower_count >= fanout_threshold)
+            ).scalars().all() or [1]
+            popular_ids = set(popular)
+            for _ in range(posts):
+                create_post.execute('Лента', 'Текст', rng.randint(1, users))
+            
+            cursors = []
+            
+            def ordinary_author(i):
+                author_id = rng.randint(1, users)
+                while author_id in popular_ids:
+                    author_id = rng.randint(1, users)
+                create_post.execute('Бенчмарк', 'Текст', author_id)
+            
+            def first_page(i):
+                user_id = rng.randint(1, users)
+                cursor = get_feed.execute(user_id, page_size)[1]
+                if cursor is not None:
+                    cursors.append((user_id, cursor))
+            
+            def next_page(i):
+                # Курсоры собраны сценарием первой страницы
+                if cursors:
+                    user_id, cursor = cursors[i % len(cursors)]
+                    get_feed.execute(user_id, page_size, cursor)
+            
+            def pull_only(i):
+                followed = select(FollowModel.author_id).where(FollowModel.follower_id == rng.randint(1, users))
+                db.session.execute(
+                    select(PostModel.id, PostModel.title, PostModel.content, PostModel.author_id, PostModel.created_at)
+                    .where(PostModel.author_id.in_(followed), PostModel.deleted_at.is_(None))
+                    .order_by(PostModel.created_at.desc(), PostModel.id.desc())
+                    .limit(page_size)
+                ).all()
+            
+            cases = {
+                'CreatePostUseCase.execute (рассылка)': ordinary_author,
+                'CreatePostUseCase.execute (популярный автор)': lambda i: create_post.execute(
+                    'Бенчмарк', 'Текст', rng.choice(popular)
+                ),
+                'GetFeedUseCase.execute (первая страница)': first_page,
+                'GetFeedUseCase.execute (следующая страница)': next_page,
+                'Лента без рассылки (слияние при чтении)': pull_only,
+            }
+            for name, operation in cases.items():
+                results[name] = _measure(operation, iterations)
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
\ No newline at end of file
@@ -0,0 +1,201 @@
+import http.client
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from benchmarks.results import summarize
+
+# Доли запросов к эндпоинтам по умолчанию: типичный блог, где чтений больше записей
+DEFAULT_MIX = {
+    'get_post': 55,
+    'get_user': 15,
+    'get_comment': 10,
+    'create_comment': 10,
+    'create_post': 4,
+    'create_user': 2,
+    'delete_comment': 2,
+    'get_all_posts': 1,
+    'get_all_users': 1,
+}
+# Регистрации с занятыми именами (поток дубликатов) в смесь по умолчанию не входят
+REQUESTS = set(DEFAULT_MIX) | {'get_all_comments', 'create_duplicate_user'}
+
+
+def parse_mix(text: str | None) -> dict:
+    """
+    Разобрать смесь вида 'get_post=70,create_comment=30'.
+    
+    Args:
+        text: Описание смеси или None для смеси по умолчанию
+    
+    Returns:
+        Словарь эндпоинт -> вес
+    """
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in REQUESTS:
+            raise ValueError(f"Неизвестный эндпоинт в смеси: {name}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def _request(name: str, rng: random.Random, sizes: dict) -> tuple:
+    """Сформировать (метод, путь, тело) для эндпоинта."""
+    users, posts, comments = sizes['users'], sizes['posts'], sizes['comments']
+    if name == 'get_post':
+        return 'GET', f'/posts/{rng.randint(1, posts)}', None
+    if name == 'get_user':
+        return 'GET', f'/users/{rng.randint(1, users)}', None
+    if name == 'get_comment':
+        return 'GET', f'/comments/{rng.randint(1, comments)}', None
+    if name == 'create_comment':
+        return 'POST', '/comments', {
+            'content': 'Нагрузка', 'post_id': rng.randint(1, posts), 'author_id': rng.randint(1, users)
+        }
+    if name == 'create_post':
+        return 'POST', '/posts', {'title': 'Нагрузка', 'content': 'Текст', 'author_id': rng.randint(1, users)}
+    if name == 'create_user':
+        suffix = f'{rng.getrandbits(64):x}'
+        return 'POST', '/users', {'username': f'load_{suffix}', 'email': f'load_{suffix}@example.com'}
+    if name == 'create_duplicate_user':
+        user_id = rng.randint(1, users)
+        return 'POST', '/users', {'username': f'user{user_id}', 'email': f'user{user_id}@example.com'}
+    if name == 'delete_comment':
+        return 'DELETE', f'/comments/{rng.randint(1, comments)}', None
+    if name == 'get_all_posts':
+        return 'GET', '/posts', None
+    if name == 'get_all_users':
+        return 'GET', '/users', None
+    if name == 'get_all_comments':
+        return 'GET', '/comments', None
+    raise ValueError(name)
+
+
+def dataset_sizes(db_path: str) -> dict:
+    """Максимальные ID пользователей, публикаций и комментариев в наборе данных."""
+    connection = sqlite3.connect(db_path)
+    try:
+        return {
+            f'{table}s': connection.execute(f'SELECT COALESCE(MAX(id), 1) FROM {table}_model').fetchone()[0]
+            for table in ('user', 'post', 'comment')
+        }
+    finally:
+        connection.close()
+
+
+class HttpTransport:
+    """Отправка запросов на запущенный сервер через постоянное соединение."""
+    
+    def __init__(self, base_url: str):
+        parts = urlsplit(base_url)
+        self.connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    
+    def send(self, method: str, path: str, body: dict | None) -> int:
+        payload = json.dumps(body) if body is not None else None
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        self.connection.request(method, path, body=payload, headers=headers)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status
+
+
+class InProcessTransport:
+    """Отправка запросов в приложение в том же процессе через тестовый клиент."""
+    
+    def __init__(self, app):
+        self.client = app.test_client()
+    
+    def send(self, method: str, path: str, body: dict | None) -> int:
+        return self.client.open(path, method=method, json=body).status_code
+
+
+def run_load(transport_factory, sizes: dict, mix: dict, workers: int = 4,
+             requests_per_worker: int = 1000, seed: int = 1) -> dict:
+    """
+    Прогнать нагрузку смесью запросов в несколько потоков.
+    
+    Args:
+        transport_factory: Функция, создающая транспорт для потока
+        sizes: Максимальные ID пользователей, публикаций и комментариев
+        mix: Веса эндпоинтов
+        workers: Количество параллельных клиентов
+        requests_per_worker: Запросов на одного клиента
+        seed: Зерно генератора случайных чисел
+    
+    Returns:
+        Сводки по эндпоинтам и общая сводка под ключом 'total'
+    """
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    
+    def worker(index: int):
+        rng = random.Random(seed * 1000 + index)
+        transport = transport_factory()
+        local = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        for _ in range(requests_per_worker):
+            name = rng.choices(names, weights)[0]
+            method, path, body = _request(name, rng, sizes)
+            start = perf_counter()
+            try:
+                status = transport.send(method, path, body)
+            except OSError:
+                status = 599
+            local[name].append(perf_counter() - start)
+            if status >= 500:
+                local_errors[name] += 1
+        with lock:
+            for name in names:
+                latencies[name].extend(local[name])
+                errors[name] += local_errors[name]
+    
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+    started = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - started
+    
+    results = {name: summarize(latencies[name], elapsed, errors[name]) for name in names if latencies[name]}
+    results['total'] = summarize(
+        [value for values in latencies.values() for value in values], elapsed, sum(errors.values())
+    )
+    return results
+
+
+def run_in_process(db_path: str, mix: dict, workers: int, requests_per_worker: int,
+                   seed: int = 1, config: dict | None = None) -> dict:
+    """
+    Прогнать нагрузку на приложение в том же процессе на копии набора данных.
+    
+    Returns:
+        Сводки по эндпоинтам
+    """
+    from interfaces.web.app import create_app
+    
+    workdir = tempfile.mkdtemp(prefix='blog-load-')
+    work_path = os.path.join(workdir, 'load.db')
+    shutil.copy(db_path, work_path)
+    try:
+        sizes = dataset_sizes(work_path)
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{work_path}',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            **(config or {}),
+        })
+        return run_load(lambda: InProcessTransport(app), sizes, mix, workers, requests_per_worker, seed)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
\ No newline at end of file
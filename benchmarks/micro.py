@@ -0,0 +1,180 @@
+import os
+import random
+import shutil
+import tempfile
+from time import perf_counter
+
+from sqlalchemy import func
+
+from application.use_cases import (
+    CreateCommentUseCase,
+    CreatePostUseCase,
+    GetAllPostsUseCase,
+    GetCommentByIdUseCase,
+    GetPostUseCase,
+    GetUserByIdUseCase,
+)
+from benchmarks.results import summarize
+from domain.factories import UserFactory, PostFactory, CommentFactory
+from infrastructure.database import db, UserModel, PostModel, CommentModel
+from infrastructure.factories import RepositoryFactory
+from infrastructure.ratelimit import TokenBucketLimiter
+from infrastructure.repositories import SQLUserRepository, SQLPostRepository, SQLCommentRepository
+
+
+def _measure(operation, iterations: int) -> dict:
+    """Выполнить операцию iterations раз и вернуть сводку."""
+    latencies = []
+    errors = 0
+    started = perf_counter()
+    for i in range(iterations):
+        start = perf_counter()
+        try:
+            operation(i)
+        except Exception:
+            errors += 1
+            db.session.rollback()
+        latencies.append(perf_counter() - start)
+    return summarize(latencies, perf_counter() - started, errors)
+
+
+def build_cases(user_repo, post_repo, comment_repo, sizes: dict, rng: random.Random) -> dict:
+    """
+    Сценарии микробенчмарков: методы репозиториев и сценарии использования.
+    
+    Args:
+        user_repo: Репозиторий пользователей
+        post_repo: Репозиторий публикаций
+        comment_repo: Репозиторий комментариев
+        sizes: Максимальные ID пользователей, публикаций и комментариев
+        rng: Генератор случайных чисел
+    
+    Returns:
+        Словарь имя -> (функция от номера итерации, признак списочной операции)
+    """
+    users, posts, comments = sizes['users'], sizes['posts'], sizes['comments']
+    created_comments = []
+    
+    def create_comment(i):
+        created_comments.append(comment_repo.create(
+            CommentFactory.create('Бенчмарк', rng.randint(1, posts), rng.randint(1, users))
+        ).id)
+    
+    def delete_comment(i):
+        if created_comments:
+            comment_repo.delete(created_comments.pop())
+    
+    return {
+        'SQLUserRepository.get_by_id': (lambda i: user_repo.get_by_id(rng.randint(1, users)), False),
+        'SQLPostRepository.get_by_id': (lambda i: post_repo.get_by_id(rng.randint(1, posts)), False),
+        'SQLCommentRepository.get_by_id': (lambda i: comment_repo.get_by_id(rng.randint(1, comments)), False),
+        'SQLUserRepository.create': (lambda i: user_repo.create(
+            UserFactory.create(f'bench{i}_{rng.random()}', f'bench{i}_{rng.random()}@example.com')
+        ), False),
+        'SQLPostRepository.create': (lambda i: post_repo.create(
+            PostFactory.create('Бенчмарк', 'Текст', rng.randint(1, users))
+        ), False),
+        'SQLCommentRepository.create': (create_comment, False),
+        'SQLCommentRepository.delete': (delete_comment, False),
+        'SQLUserRepository.get_all': (lambda i: user_repo.get_all(), True),
+        'SQLPostRepository.get_all': (lambda i: post_repo.get_all(), True),
+        'SQLCommentRepository.get_all': (lambda i: comment_repo.get_all(), True),
+        'GetPostUseCase.execute': (lambda i: GetPostUseCase(post_repo).execute(rng.randint(1, posts)), False),
+        'GetUserByIdUseCase.execute': (lambda i: GetUserByIdUseCase(user_repo).execute(rng.randint(1, users)), False),
+        'GetCommentByIdUseCase.execute': (
+            lambda i: GetCommentByIdUseCase(comment_repo).execute(rng.randint(1, comments)), False
+        ),
+        'CreatePostUseCase.execute': (lambda i: CreatePostUseCase(post_repo, user_repo).execute(
+            'Бенчмарк', 'Текст', rng.randint(1, users)
+        ), False),
+        'CreateCommentUseCase.execute': (lambda i: CreateCommentUseCase(comment_repo, post_repo, user_repo).execute(
+            'Бенчмарк', rng.randint(1, posts), rng.randint(1, users)
+        ), False),
+        'GetAllPostsUseCase.execute': (lambda i: GetAllPostsUseCase(post_repo).execute(), True),
+    }
+
+
+def build_container_cases(sizes: dict, rng: random.Random) -> dict:
+    """
+    Сценарии накладных расходов контейнера на запрос.
+    
+    Контейнер без декораторов, чтобы RequestScope.get_post.execute можно было
+    сравнить с GetPostUseCase.execute на тех же репозиториях.
+    """
+    from interfaces.web.container import Container
+    
+    container = Container(RepositoryFactory())
+    posts = sizes['posts']
+    return {
+        'RequestScope.resolve': (lambda i: container.scope().get_post, False),
+        'RequestScope.get_post.execute': (
+            lambda i: container.scope().get_post.execute(rng.randint(1, posts)), False
+        ),
+    }
+
+
+def build_rate_limit_cases(workdir: str, rng: random.Random) -> dict:
+    """
+    Накладные расходы ограничения частоты на запрос.
+    
+    Корзины в памяти процесса и в общем файле (как у нескольких
+    рабочих процессов), 10 000 клиентов.
+    """
+    local = TokenBucketLimiter()
+    shared = TokenBucketLimiter(os.path.join(workdir, 'ratelimit.bin'))
+    return {
+        'TokenBucketLimiter.acquire (память процесса)': (
+            lambda i: local.acquire(f'ip:{rng.randrange(10_000)}|controllers.get_post', 100, 50.0), False
+        ),
+        'TokenBucketLimiter.acquire (общий файл)': (
+            lambda i: shared.acquire(f'ip:{rng.randrange(10_000)}|controllers.get_post', 100, 50.0), False
+        ),
+    }
+
+
+def run_micro(db_path: str, iterations: int = 1000, list_iterations: int = 5,
+              seed: int = 1, only: list | None = None, config: dict | None = None) -> dict:
+    """
+    Прогнать микробенчмарки на копии набора данных.
+    
+    Args:
+        db_path: Файл набора данных (не изменяется)
+        iterations: Итераций для точечных операций
+        list_iterations: Итераций для списочных операций get_all
+        seed: Зерно генератора случайных чисел
+        only: Подстроки имён сценариев, которые нужно выполнить
+        config: Дополнительная конфигурация приложения
+    
+    Returns:
+        Сводки по сценариям
+    """
+    from interfaces.web.app import create_app
+    
+    workdir = tempfile.mkdtemp(prefix='blog-bench-')
+    work_path = os.path.join(workdir, 'bench.db')
+    shutil.copy(db_path, work_path)
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{work_path}',
+        'SOFT_DELETE_PURGE_ENABLED': False,
+        **(config or {}),
+    })
+    rng = random.Random(seed)
+    results = {}
+    try:
+        with app.app_context():
+            sizes = {
+                'users': db.session.query(func.max(UserModel.id)).scalar() or 1,
+                'posts': db.session.query(func.max(PostModel.id)).scalar() or 1,
+                'comments': db.session.query(func.max(CommentModel.id)).scalar() or 1,
+            }
+            cases = build_cases(SQLUserRepository(), SQLPostRepository(), SQLCommentRepository(), sizes, rng)
+            cases.update(build_container_cases(sizes, rng))
+            cases.update(build_rate_limit_cases(workdir, rng))
+            for name, (operation, is_list) in cases.items():
+                if only and not any(part in name for part in only):
+                    continue
+                results[name] = _measure(operation, list_iterations if is_list else iterations)
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
\ No newline at end of file
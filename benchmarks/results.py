@@ -0,0 +1,115 @@
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """
+    Перцентиль по отсортированной выборке (ближайший ранг).
+    
+    Args:
+        sorted_values: Отсортированные значения
+        fraction: Доля от 0 до 1, например 0.99
+    
+    Returns:
+        Значение перцентиля или 0.0 для пустой выборки
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: list, elapsed: float, errors: int = 0) -> dict:
+    """
+    Сводка по замерам одного сценария.
+    
+    Args:
+        latencies: Длительности операций в секундах
+        elapsed: Общее время прогона в секундах
+        errors: Количество неуспешных операций
+    
+    Returns:
+        Словарь с p50/p99 в миллисекундах и пропускной способностью
+    """
+    values = sorted(latencies)
+    return {
+        'operations': len(values),
+        'errors': errors,
+        'p50_ms': round(percentile(values, 0.50) * 1000, 4),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 4),
+        'max_ms': round((values[-1] if values else 0.0) * 1000, 4),
+        'throughput_ops': round(len(values) / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def max_rss_mb() -> float:
+    """Пиковое потребление памяти процессом в мегабайтах."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux отдаёт килобайты, macOS - байты
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit() -> str | None:
+    """Текущий коммит репозитория, если он доступен."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path: str, kind: str, parameters: dict, results: dict) -> dict:
+    """
+    Записать результаты прогона в JSON для сравнения между коммитами.
+    
+    Args:
+        path: Путь к файлу результатов
+        kind: Вид прогона: micro или load
+        parameters: Параметры прогона
+        results: Сводки по сценариям
+    
+    Returns:
+        Записанный документ
+    """
+    document = {
+        'kind': kind,
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parameters': parameters,
+        'max_rss_mb': max_rss_mb(),
+        'results': results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, ensure_ascii=False, indent=2)
+    return document
+
+
+def compare_results(baseline: dict, current: dict) -> list:
+    """
+    Сравнить два прогона по p50, p99 и пропускной способности.
+    
+    Returns:
+        Строки таблицы: (сценарий, метрика, было, стало, изменение в %)
+    """
+    rows = []
+    for name, before in baseline['results'].items():
+        after = current['results'].get(name)
+        if after is None:
+            continue
+        for metric in ('p50_ms', 'p99_ms', 'throughput_ops'):
+            old, new = before[metric], after[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            rows.append((name, metric, old, new, round(change, 1)))
+    return rows
\ No newline at end of file
@@ -0,0 +1,67 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.results import summarize
+
+# Код, выполняемый в чистом интерпретаторе: импорт приложения и create_app
+_PROBE = '''
+import json, sys
+from time import perf_counter
+started = perf_counter()
+from interfaces.web.app import create_app
+imported = perf_counter()
+app = create_app({'SQLALCHEMY_DATABASE_URI': sys.argv[1], 'SOFT_DELETE_PURGE_ENABLED': False})
+created = perf_counter()
+app.test_client().get('/')
+served = perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'first_request': served - created,
+    'flasgger_imported': 'flasgger' in sys.modules,
+}))
+'''
+
+
+def _probe(database_uri: str) -> dict:
+    """Один холодный старт в отдельном процессе."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE, database_uri],
+        capture_output=True, text=True, check=True, cwd=root
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run_startup(runs: int = 10) -> dict:
+    """
+    Измерить холодный старт: импорт, create_app и первый запрос.
+    
+    Первый прогон создаёт схему в базе, остальные стартуют на готовой
+    базе, как рабочий процесс после масштабирования.
+    
+    Args:
+        runs: Количество запусков интерпретатора
+    
+    Returns:
+        Сводки по этапам и общая сводка под ключом 'total'
+    """
+    workdir = tempfile.mkdtemp(prefix='blog-startup-')
+    database_uri = f'sqlite:///{os.path.join(workdir, "startup.db")}'
+    try:
+        _probe(database_uri)
+        samples = [_probe(database_uri) for _ in range(runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    results = {}
+    for stage in ('import', 'create_app', 'first_request'):
+        values = [sample[stage] for sample in samples]
+        results[stage] = summarize(values, sum(values))
+    totals = [sample['import'] + sample['create_app'] + sample['first_request'] for sample in samples]
+    results['total'] = summarize(totals, sum(totals))
+    results['total']['flasgger_imported'] = any(sample['flasgger_imported'] for sample in samples)
+    return results
\ No newline at end of file
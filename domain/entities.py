@@ -37,7 +37,8 @@ class Post:
 class Comment:
     """Сущность комментария."""
     
-    def __init__(self, id: int, content: str, post_id: int, author_id: int):
+    def __init__(self, id: int, content: str, post_id: int, author_id: int,
+                 parent_id: int | None = None, depth: int = 0):
         """
         Инициализация комментария.
         
@@ -46,8 +47,12 @@ class Comment:
             content: Содержание
             post_id: ID публикации
             author_id: ID автора
+            parent_id: ID комментария, на который это ответ (None - комментарий верхнего уровня)
+            depth: Уровень вложенности (0 - верхний уровень)
         """
         self.id = id
         self.content = content
         self.post_id = post_id
-        self.author_id = author_id
\ No newline at end of file
+        self.author_id = author_id
+        self.parent_id = parent_id
+        self.depth = depth
\ No newline at end of file
@@ -42,7 +42,7 @@ class CommentFactory:
     """Фабрика для создания объектов комментариев."""
     
     @staticmethod
-    def create(content: str, post_id: int, author_id: int) -> Comment:
+    def create(content: str, post_id: int, author_id: int, parent: Comment | None = None) -> Comment:
         """
         Создать новый комментарий.
         
@@ -50,8 +50,14 @@ class CommentFactory:
             content: Содержание
             post_id: ID публикации
             author_id: ID автора
+            parent: Комментарий, на который это ответ
             
         Returns:
             Объект комментария без ID
         """
-        return Comment(id=None, content=content, post_id=post_id, author_id=author_id)
\ No newline at end of file
+        if parent is None:
+            return Comment(id=None, content=content, post_id=post_id, author_id=author_id)
+        return Comment(
+            id=None, content=content, post_id=post_id, author_id=author_id,
+            parent_id=parent.id, depth=parent.depth + 1
+        )
\ No newline at end of file
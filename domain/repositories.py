@@ -1,16 +1,41 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, TYPE_CHECKING
+from datetime import datetime
+from typing import List, Optional, Tuple, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from domain.entities import User, Post, Comment
 
 
+class UserAlreadyExists(ValueError):
+    """Имя пользователя или почта уже заняты."""
+    
+    def __init__(self, field: str, value: str):
+        """
+        Инициализация ошибки.
+        
+        Args:
+            field: Занятое поле: username или email
+            value: Значение поля
+        """
+        self.field = field
+        self.value = value
+        if field == 'username':
+            super().__init__(f"Пользователь {value} уже существует")
+        else:
+            super().__init__(f"Почта {value} уже используется")
+
+
 class IUserRepository(ABC):
     """Интерфейс репозитория для работы с пользователями."""
     
     @abstractmethod
     def create(self, user: 'User') -> 'User':
-        """Создать нового пользователя."""
+        """
+        Создать нового пользователя.
+        
+        Raises:
+            UserAlreadyExists: Если имя или почта уже заняты
+        """
         pass
     
     @abstractmethod
@@ -74,4 +99,86 @@ class ICommentRepository(ABC):
     @abstractmethod
     def delete(self, comment_id: int) -> None:
         """Удалить комментарий по ID."""
-        pass
\ No newline at end of file
+        pass
+    
+    @abstractmethod
+    def get_thread(self, post_id: int, limit: int, start: Optional[int] = None,
+                   max_depth: Optional[int] = None) -> Tuple[List['Comment'], Optional[int]]:
+        """
+        Получить страницу обсуждения публикации.
+        
+        Страница - limit комментариев верхнего уровня, начиная с start,
+        вместе со всеми ответами не глубже max_depth, в порядке обхода
+        дерева. Возвращает комментарии и ID первого комментария
+        верхнего уровня следующей страницы.
+        """
+        pass
+
+
+class ITrendingRepository(ABC):
+    """
+    Интерфейс рейтинга обсуждаемых публикаций.
+    
+    Счёт обновляется репозиторием комментариев в той же транзакции,
+    что и создание или удаление комментария.
+    """
+    
+    @abstractmethod
+    def top(self, limit: int) -> List[Tuple['Post', float]]:
+        """Получить публикации с наибольшим затухающим счётом."""
+        pass
+    
+    @abstractmethod
+    def prune(self) -> int:
+        """Удалить затухшие счётчики."""
+        pass
+
+
+class IFeedRepository(ABC):
+    """
+    Интерфейс подписок и лент пользователей.
+    
+    Публикации авторов с небольшим числом подписчиков рассылаются по
+    лентам при создании, публикации популярных авторов подтягиваются
+    при чтении ленты.
+    """
+    
+    @abstractmethod
+    def follow(self, follower_id: int, author_id: int) -> bool:
+        """Подписать пользователя на автора; False, если подписка уже есть."""
+        pass
+    
+    @abstractmethod
+    def unfollow(self, follower_id: int, author_id: int) -> bool:
+        """Отписать пользователя от автора; False, если подписки не было."""
+        pass
+    
+    @abstractmethod
+    def fan_out(self, post: 'Post') -> int:
+        """Разослать публикацию по лентам подписчиков автора."""
+        pass
+    
+    @abstractmethod
+    def get_feed(self, user_id: int, limit: int,
+                 before: Optional[Tuple[datetime, int]] = None) -> List[Tuple['Post', datetime]]:
+        """Получить страницу ленты: публикации старше курсора before."""
+        pass
+
+
+class IContentRenderer(ABC):
+    """Интерфейс отрисовки Markdown публикаций в HTML."""
+    
+    @abstractmethod
+    def render(self, post: 'Post') -> str:
+        """Получить HTML содержания публикации."""
+        pass
+    
+    @abstractmethod
+    def prerender(self, post: 'Post') -> None:
+        """Заранее отрисовать публикацию, не задерживая вызывающий код."""
+        pass
+    
+    @abstractmethod
+    def invalidate(self, post_id: int) -> None:
+        """Забыть отрисованный HTML публикации."""
+        pass
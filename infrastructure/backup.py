@@ -0,0 +1,272 @@
+import glob
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from time import perf_counter, sleep
+
+from infrastructure.metrics import metrics
+
+logger = logging.getLogger('blog.backup')
+
+# Имя копии: момент снимка в UTC, поэтому имена сортируются по времени
+NAME_FORMAT = 'blog-%Y%m%dT%H%M%S%fZ.db'
+
+metrics.describe('blog_backups_total', 'counter', 'Резервные копии базы по результату')
+metrics.describe('blog_backup_duration_seconds', 'histogram', 'Длительность резервного копирования')
+metrics.describe('blog_backup_step_seconds', 'histogram', 'Длительность шага копирования (блокировка источника)')
+
+
+class TooManyRestarts(RuntimeError):
+    """Копирование слишком часто начиналось заново из-за записи в источник."""
+
+
+def backup_database(db_path: str, target_path: str, pages: int = 256, pause: float = 0.001,
+                    max_restarts: int = 3) -> dict:
+    """
+    Снять согласованную копию работающей базы через backup API SQLite.
+    
+    Копирование идёт шагами по pages страниц с паузой pause между ними.
+    В режиме WAL соединение-источник держит читающую транзакцию от начала
+    до конца: копия - снимок на момент начала, писатели не ждут, а их
+    записи не перезапускают копирование. В режиме журнала отката
+    писатель ждёт не дольше шага, но каждая запись начинает копирование
+    заново; после max_restarts перезапусков копирование прерывается, а
+    не доводится под блокировкой, которая остановила бы запись.
+    Копия пишется во временный файл и появляется под target_path целиком.
+    
+    Args:
+        db_path: Файл базы
+        target_path: Файл копии
+        pages: Страниц за шаг
+        pause: Пауза между шагами в секундах
+        max_restarts: Допустимое число перезапусков
+    
+    Returns:
+        Размер копии, число страниц, шагов и перезапусков, длительность,
+        самый долгий шаг и скорость копирования
+    
+    Raises:
+        TooManyRestarts: Если база в режиме журнала отката изменилась
+            во время копирования больше max_restarts раз
+    """
+    temp_path = f'{target_path}.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    source = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, isolation_level=None)
+    target = sqlite3.connect(temp_path)
+    steps = []
+    restarts = 0
+    started = perf_counter()
+    step_started = [started]
+    previous = [None]
+    
+    def progress(status, remaining, total):
+        nonlocal restarts
+        now = perf_counter()
+        steps.append((now - step_started[0], total))
+        metrics.observe('blog_backup_step_seconds', (), now - step_started[0])
+        # Источник изменился, и SQLite начал копирование с первой страницы
+        if previous[0] is not None and remaining > previous[0]:
+            restarts += 1
+            if restarts > max_restarts:
+                raise TooManyRestarts(
+                    f"База {db_path} изменилась во время копирования {restarts} раз; переведите её в режим WAL"
+                )
+        previous[0] = remaining
+        if remaining and pause:
+            sleep(pause)
+        step_started[0] = perf_counter()
+    
+    try:
+        # Сброс на диск - один раз после копирования, а не внутри последнего
+        # шага, пока источник ещё заблокирован
+        target.execute('PRAGMA synchronous=OFF')
+        if source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+            source.execute('BEGIN')
+            # Читающая транзакция начинается с первого чтения
+            source.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        source.backup(target, pages=pages, progress=progress)
+        if source.in_transaction:
+            source.execute('COMMIT')
+        # Копия открывается одним файлом, без журнала WAL
+        target.execute('PRAGMA journal_mode=DELETE')
+    except BaseException:
+        target.close()
+        os.remove(temp_path)
+        raise
+    finally:
+        source.close()
+    target.close()
+    with open(temp_path, 'rb') as file:
+        os.fsync(file.fileno())
+    os.replace(temp_path, target_path)
+    duration = perf_counter() - started
+    size = os.path.getsize(target_path)
+    return {
+        'path': target_path,
+        'bytes': size,
+        'pages': steps[-1][1] if steps else 0,
+        'steps': len(steps),
+        'restarts': restarts,
+        'seconds': duration,
+        'max_step_ms': max((step for step, _ in steps), default=0.0) * 1000,
+        'mb_per_second': size / 2 ** 20 / duration if duration else 0.0,
+    }
+
+
+def snapshot_time(path: str) -> datetime | None:
+    """Момент снимка по имени файла копии (UTC без часового пояса)."""
+    try:
+        return datetime.strptime(os.path.basename(path), NAME_FORMAT)
+    except ValueError:
+        return None
+
+
+def list_backups(directory: str) -> list:
+    """
+    Копии в каталоге от старых к новым.
+    
+    Returns:
+        Пары (момент снимка, путь)
+    """
+    backups = ((snapshot_time(path), path) for path in glob.glob(os.path.join(directory, 'blog-*.db')))
+    return sorted(backup for backup in backups if backup[0] is not None)
+
+
+def prune_backups(directory: str, keep: int) -> list:
+    """
+    Удалить старые копии, оставив keep последних.
+    
+    Returns:
+        Пути удалённых копий
+    """
+    backups = list_backups(directory)
+    removed = [path for _, path in backups[:max(len(backups) - keep, 0)]]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def find_backup(directory: str, at: datetime | None = None) -> str | None:
+    """Последняя копия, снятая не позже at (по умолчанию - самая новая)."""
+    candidates = [path for moment, path in list_backups(directory) if at is None or moment <= at]
+    return candidates[-1] if candidates else None
+
+
+def restore_database(backup_path: str, db_path: str) -> dict:
+    """
+    Восстановить базу из копии.
+    
+    Копия проверяется PRAGMA integrity_check и переносится в базу через
+    backup API, поэтому файлы WAL базы остаются согласованными.
+    Приложение должно быть остановлено.
+    
+    Args:
+        backup_path: Файл копии
+        db_path: Файл восстанавливаемой базы
+    
+    Returns:
+        Размер копии и длительность восстановления
+    
+    Raises:
+        ValueError: Если копия повреждена
+    """
+    started = perf_counter()
+    source = sqlite3.connect(f'file:{backup_path}?mode=ro', uri=True)
+    try:
+        try:
+            problems = [row[0] for row in source.execute('PRAGMA integrity_check')]
+        except sqlite3.DatabaseError as e:
+            problems = [str(e)]
+        if problems != ['ok']:
+            raise ValueError(f"Копия {backup_path} повреждена: {'; '.join(problems[:5])}")
+        target = sqlite3.connect(db_path)
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+    finally:
+        source.close()
+    return {'bytes': os.path.getsize(backup_path), 'seconds': perf_counter() - started}
+
+
+class BackupScheduler:
+    """
+    Периодическое резервное копирование с хранением последних копий.
+    
+    Копии складываются в каталог под именами с моментом снимка, после
+    каждой копии лишние старые удаляются.
+    """
+    
+    def __init__(self, db_path: str, directory: str, interval: float = 3600.0, keep: int = 24,
+                 pages: int = 256, pause: float = 0.001):
+        """
+        Инициализация расписания.
+        
+        Args:
+            db_path: Файл базы
+            directory: Каталог копий
+            interval: Период копирования в секундах
+            keep: Сколько последних копий хранить
+            pages: Страниц за шаг копирования
+            pause: Пауза между шагами в секундах
+        """
+        self.db_path = db_path
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.pages = pages
+        self.pause = pause
+        self.last_result = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def run_once(self) -> dict:
+        """
+        Снять копию и удалить лишние старые.
+        
+        Returns:
+            Отчёт backup_database и пути удалённых копий (removed)
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            name = datetime.now(timezone.utc).strftime(NAME_FORMAT)
+            try:
+                result = backup_database(self.db_path, os.path.join(self.directory, name), self.pages, self.pause)
+            except Exception:
+                metrics.inc('blog_backups_total', (('status', 'error'),))
+                raise
+            metrics.inc('blog_backups_total', (('status', 'ok'),))
+            metrics.observe('blog_backup_duration_seconds', (), result['seconds'])
+            result['removed'] = prune_backups(self.directory, self.keep)
+            self.last_result = result
+            logger.info(
+                "Резервная копия %s: %.1f МБ за %.2f с (%.1f МБ/с), %d шагов, самый долгий %.1f мс",
+                result['path'], result['bytes'] / 2 ** 20, result['seconds'], result['mb_per_second'],
+                result['steps'], result['max_step_ms']
+            )
+            return result
+    
+    def _run(self) -> None:
+        """Цикл фонового потока."""
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("Ошибка резервного копирования: %s", e)
+    
+    def start(self) -> None:
+        """Запустить периодическое копирование."""
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='backup', daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Остановить периодическое копирование."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
\ No newline at end of file
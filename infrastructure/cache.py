@@ -0,0 +1,102 @@
+import copy
+import threading
+from collections import OrderedDict
+from time import monotonic
+
+
+class RepositoryCache:
+    """
+    LRU-кэш сущностей с ограничением по времени жизни.
+    
+    Один экземпляр разделяется всеми кэширующими репозиториями приложения,
+    чтобы удаление (с каскадом на публикации и комментарии) сбрасывало
+    кэш целиком и не оставляло устаревших записей.
+    """
+    
+    def __init__(self, maxsize: int = 10000, ttl: float = 5.0):
+        """
+        Инициализация кэша.
+        
+        Args:
+            maxsize: Максимальное количество записей
+            ttl: Время жизни записи в секундах
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+    
+    def get(self, key: tuple):
+        """Получить значение или None, если записи нет или она устарела."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key: tuple, value) -> None:
+        """Сохранить значение, вытеснив самую старую запись при переполнении."""
+        with self._lock:
+            self._entries[key] = (value, monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+    
+    def delete(self, key: tuple) -> None:
+        """Удалить запись, если она есть."""
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self) -> None:
+        """Сбросить кэш."""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class CachedRepository:
+    """
+    Декоратор репозитория, кэширующий get_by_id.
+    
+    Отсутствующие сущности не кэшируются, поэтому созданная позже запись
+    с тем же ID сразу видна. Любое удаление сбрасывает общий кэш.
+    """
+    
+    def __init__(self, repository, cache: RepositoryCache):
+        """
+        Инициализация декоратора.
+        
+        Args:
+            repository: Оборачиваемый репозиторий
+            cache: Общий кэш сущностей
+        """
+        self._repository = repository
+        self._cache = cache
+        self._name = getattr(repository, '_name', type(repository).__name__)
+    
+    def get_by_id(self, entity_id: int):
+        key = (self._name, entity_id)
+        cached = self._cache.get(key)
+        if cached is not None:
+            # Копия защищает кэш от изменений сущности вызывающим кодом
+            return copy.copy(cached)
+        entity = self._repository.get_by_id(entity_id)
+        if entity is not None:
+            self._cache.set(key, copy.copy(entity))
+        return entity
+    
+    def delete(self, entity_id: int) -> None:
+        try:
+            self._repository.delete(entity_id)
+        finally:
+            self._cache.clear()
+    
+    def __getattr__(self, name: str):
+        return getattr(self._repository, name)
\ No newline at end of file
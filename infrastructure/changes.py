@@ -0,0 +1,183 @@
+import json
+import logging
+import threading
+from bisect import bisect_right
+
+from sqlalchemy import bindparam, func, select
+
+from infrastructure.database import db, ChangeLogModel, utcnow
+
+logger = logging.getLogger('blog.changes')
+
+_changes = ChangeLogModel.__table__
+INSERT_CHANGE = _changes.insert().values(
+    entity=bindparam('entity'),
+    operation=bindparam('operation'),
+    entity_id=bindparam('entity_id'),
+    payload=bindparam('payload'),
+    created_at=bindparam('created_at')
+)
+READ_CHANGES = (
+    select(_changes)
+    .where(_changes.c.id > bindparam('after'))
+    .order_by(_changes.c.id)
+    .limit(bindparam('limit'))
+)
+
+
+def record_change(entity: str, operation: str, entity_id: int, payload: dict) -> None:
+    """
+    Добавить запись в журнал изменений в текущей транзакции db.session.
+    
+    Args:
+        entity: user, post, comment или follow
+        operation: create или delete
+        entity_id: ID сущности
+        payload: Поля сущности
+    """
+    db.session.execute(INSERT_CHANGE, {
+        'entity': entity,
+        'operation': operation,
+        'entity_id': entity_id,
+        'payload': json.dumps(payload, ensure_ascii=False, separators=(',', ':')),
+        'created_at': utcnow(),
+    })
+
+
+def event_json(row) -> str:
+    """
+    JSON события для записи журнала.
+    
+    Поля сущности уже хранятся в JSON и вставляются без повторного разбора.
+    """
+    head = json.dumps({
+        'id': row.id,
+        'entity': row.entity,
+        'operation': row.operation,
+        'entity_id': row.entity_id,
+        'created_at': row.created_at.isoformat(),
+    }, ensure_ascii=False, separators=(',', ':'))
+    return f'{head[:-1]},"data":{row.payload}}}'
+
+
+def format_event(row) -> bytes:
+    """Событие Server-Sent Events для записи журнала."""
+    return f'id: {row.id}\ndata: {event_json(row)}\n\n'.encode()
+
+
+class ChangeFeed:
+    """
+    Раздача журнала изменений подписчикам из одного читателя.
+    
+    Фоновый поток раз в poll_interval секунд дочитывает новые записи
+    журнала, один раз превращает их в события SSE и складывает в буфер
+    последних buffer_size событий. Подписчики берут события из буфера и
+    к базе не обращаются; только подписчик, отставший дальше начала
+    буфера, дочитывает пропущенное из базы сам.
+    """
+    
+    def __init__(self, engine, poll_interval: float = 0.2, buffer_size: int = 10000, batch_size: int = 1000):
+        """
+        Инициализация раздачи.
+        
+        Args:
+            engine: Движок SQLAlchemy основной базы
+            poll_interval: Период чтения журнала в секундах
+            buffer_size: Сколько последних событий держать в памяти
+            batch_size: Максимум событий за одно чтение и одну отправку
+        """
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.last_id = 0
+        # Пары (ID, событие) по возрастанию ID
+        self._events = []
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def read(self, after: int, limit: int | None = None) -> list:
+        """
+        Прочитать события журнала из базы.
+        
+        Args:
+            after: ID, после которого читать
+            limit: Максимум событий (по умолчанию batch_size)
+        
+        Returns:
+            Пары (ID, событие) по возрастанию ID
+        """
+        with self.engine.connect() as connection:
+            rows = connection.execute(READ_CHANGES, {'after': after, 'limit': limit or self.batch_size}).all()
+        return [(row.id, format_event(row)) for row in rows]
+    
+    def poll(self) -> int:
+        """
+        Дочитать новые записи журнала в буфер и разбудить подписчиков.
+        
+        Returns:
+            Количество новых событий
+        """
+        events = self.read(self.last_id)
+        if events:
+            with self._condition:
+                self._events.extend(events)
+                # Буфер обрезается с запасом, чтобы не сдвигать список на каждом чтении
+                if len(self._events) > 2 * self.buffer_size:
+                    del self._events[:-self.buffer_size]
+                self.last_id = events[-1][0]
+                self._condition.notify_all()
+        return len(events)
+    
+    def wait(self, after: int, timeout: float) -> list | None:
+        """
+        Дождаться событий после ID after.
+        
+        Args:
+            after: Последний полученный подписчиком ID
+            timeout: Сколько ждать новых событий
+        
+        Returns:
+            Пары (ID, событие); пустой список, если за timeout событий не
+            было; None, если подписчик отстал от буфера и должен дочитать
+            пропущенное через read
+        """
+        with self._condition:
+            if after >= self.last_id:
+                self._condition.wait(timeout)
+                if after >= self.last_id:
+                    return []
+            events = self._events
+            if not events or after < events[0][0] - 1:
+                return None
+            start = bisect_right(events, after, key=lambda event: event[0])
+            return events[start:start + self.batch_size]
+    
+    def _run(self) -> None:
+        """Цикл фонового потока."""
+        while not self._stop.is_set():
+            try:
+                # Пока журнал дочитывается пачками, пауз нет
+                if self.poll() >= self.batch_size:
+                    continue
+            except Exception as e:
+                logger.error("Ошибка чтения журнала изменений: %s", e)
+            self._stop.wait(self.poll_interval)
+    
+    def start(self) -> None:
+        """Запустить читателя с текущего конца журнала (повторный вызов ничего не делает)."""
+        with self._condition:
+            if self._thread is not None:
+                return
+            with self.engine.connect() as connection:
+                self.last_id = connection.execute(select(func.max(_changes.c.id))).scalar() or 0
+            self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Остановить читателя."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
\ No newline at end of file
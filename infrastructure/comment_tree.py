@@ -0,0 +1,88 @@
+from sqlalchemy import bindparam, func, select
+
+from infrastructure.database import CommentModel
+
+# Ширина ID в сегменте пути; хватает и для глобальных ID шардов
+PATH_DIGITS = 12
+# Больше любого символа пути: граница после последнего обсуждения
+PATH_END = '~'
+# max_depth для чтения без ограничения глубины
+UNLIMITED_DEPTH = 2 ** 31
+
+comments = CommentModel.__table__
+parents = comments.alias('parent')
+
+
+def path_segment(comment_id: int) -> str:
+    """Сегмент пути комментария: ID фиксированной ширины и разделитель."""
+    return f'{comment_id:0{PATH_DIGITS}d}/'
+
+
+def root_id(path: str) -> int:
+    """ID комментария верхнего уровня по его пути."""
+    return int(path[:PATH_DIGITS])
+
+
+def parent_path(parent_id):
+    """Путь родителя подзапросом ('' у комментария верхнего уровня)."""
+    return func.coalesce(select(parents.c.path).where(parents.c.id == parent_id).scalar_subquery(), '')
+
+
+# Путь первого комментария верхнего уровня следующей страницы:
+# limit-й по счёту, начиная со start_path
+PAGE_END = (
+    select(comments.c.path)
+    .where(
+        comments.c.post_id == bindparam('post_id'),
+        comments.c.parent_id.is_(None),
+        comments.c.deleted_at.is_(None),
+        comments.c.path >= bindparam('start_path')
+    )
+    .order_by(comments.c.path)
+    .limit(1)
+    .offset(bindparam('limit'))
+)
+
+
+def thread_statement(query):
+    """
+    Страница обсуждения поверх запроса видимых комментариев.
+    
+    Комментарии верхнего уровня страницы и все их ответы лежат между
+    start_path и end_path, поэтому читаются одним диапазоном индекса
+    (post_id, path) уже в порядке обхода дерева.
+    Параметры: post_id, start_path, end_path, max_depth.
+    """
+    return query.where(
+        comments.c.post_id == bindparam('post_id'),
+        comments.c.path >= bindparam('start_path'),
+        comments.c.path < bindparam('end_path'),
+        comments.c.depth <= bindparam('max_depth')
+    ).order_by(comments.c.path)
+
+
+def thread_params(post_id: int, limit: int, start: int | None, max_depth: int | None) -> dict:
+    """Параметры PAGE_END; end_path дописывается после его выполнения."""
+    return {
+        'post_id': post_id,
+        'limit': limit,
+        'start_path': path_segment(start) if start is not None else '',
+        'max_depth': UNLIMITED_DEPTH if max_depth is None else max_depth,
+    }
+
+
+def read_thread(connection, statement, params: dict) -> tuple[list, int | None]:
+    """
+    Прочитать страницу обсуждения двумя запросами по индексу.
+    
+    Args:
+        connection: Сессия или соединение
+        statement: Запрос из thread_statement
+        params: Параметры из thread_params
+    
+    Returns:
+        Строки комментариев и ID первого комментария следующей страницы
+    """
+    end_path = connection.execute(PAGE_END, params).scalar()
+    rows = connection.execute(statement, {**params, 'end_path': end_path or PATH_END}).all()
+    return rows, root_id(end_path) if end_path else None
\ No newline at end of file
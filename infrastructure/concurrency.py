@@ -0,0 +1,97 @@
+import math
+import threading
+
+# Доля лимита, доступная классу: при росте нагрузки сначала отсекаются
+# списки, затем записи, точечные чтения получают весь лимит
+DEFAULT_SHARES = {
+    'critical': 1.0,
+    'write': 0.8,
+    'list': 0.5,
+}
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Адаптивный лимит одновременных запросов по градиенту задержки.
+    
+    Длинное скользящее среднее задержки служит базой, с которой
+    сравнивается каждый замер: пока задержка не выходит за допуск
+    tolerance, лимит растёт на запас sqrt(limit); когда запросы начинают
+    ждать блокировок и задержка растёт, лимит уменьшается пропорционально
+    отношению базы к замеру. Запрос, не поместившийся в долю лимита
+    своего класса, отклоняется сразу, без очереди.
+    """
+    
+    def __init__(self, initial_limit: int = 20, min_limit: int = 4, max_limit: int = 200,
+                 tolerance: float = 1.5, smoothing: float = 0.2, window: int = 600,
+                 shares: dict | None = None):
+        """
+        Инициализация лимита.
+        
+        Args:
+            initial_limit: Начальный лимит
+            min_limit: Нижняя граница лимита
+            max_limit: Верхняя граница лимита
+            tolerance: Во сколько раз замер может превысить базу без снижения лимита
+            smoothing: Вес нового значения лимита (0..1)
+            window: Число замеров, за которое усредняется база
+            shares: Доли лимита по классам запросов
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.window = window
+        self.shares = shares or DEFAULT_SHARES
+        self.limit = float(initial_limit)
+        self.inflight = 0
+        self._baseline = None
+        self._lock = threading.Lock()
+    
+    def try_acquire(self, priority: str) -> bool:
+        """
+        Занять место для запроса.
+        
+        Args:
+            priority: Класс запроса (ключ shares)
+        
+        Returns:
+            True, если запрос можно выполнять; тогда нужно вызвать release
+        """
+        with self._lock:
+            if self.inflight >= max(math.floor(self.limit * self.shares[priority]), 1):
+                return False
+            self.inflight += 1
+            return True
+    
+    def release(self, latency: float | None = None) -> None:
+        """
+        Освободить место и учесть задержку запроса.
+        
+        Args:
+            latency: Длительность запроса в секундах; None - без замера
+                (например, запрос завершился ошибкой)
+        """
+        with self._lock:
+            inflight = self.inflight
+            self.inflight -= 1
+            if latency is not None:
+                self._update(latency, inflight)
+    
+    def _update(self, latency: float, inflight: int) -> None:
+        """Пересчитать лимит по замеру."""
+        latency = max(latency, 1e-6)
+        if self._baseline is None:
+            self._baseline = latency
+        else:
+            self._baseline += (latency - self._baseline) / self.window
+            # После перегрузки база возвращается к текущим задержкам быстрее
+            if self._baseline > 2 * latency:
+                self._baseline *= 0.95
+        # Лимит используется меньше чем наполовину: замер ничего не говорит о пределе
+        if inflight < self.limit / 2:
+            return
+        gradient = max(0.5, min(1.0, self.tolerance * self._baseline / latency))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        limit = self.limit * (1 - self.smoothing) + target * self.smoothing
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
\ No newline at end of file
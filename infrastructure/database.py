@@ -1,7 +1,18 @@
+from datetime import datetime, timezone
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
 
 db = SQLAlchemy()
 
+# Версия схемы в PRAGMA user_version; увеличивать при изменении моделей
+SCHEMA_VERSION = 7
+
+
+def utcnow() -> datetime:
+    """Текущее время в UTC без часового пояса (так его хранит SQLite)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
 
 class UserModel(db.Model):
     """Модель пользователя для базы данных."""
@@ -11,8 +22,18 @@ class UserModel(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
+    # Число подписчиков: решает, рассылать публикации по лентам или нет
+    follower_count = db.Column(db.Integer, nullable=True, default=0)
+    deleted_at = db.Column(db.DateTime, nullable=True)
     posts = db.relationship('PostModel', backref='author', cascade='all, delete-orphan')
     comments = db.relationship('CommentModel', backref='author', cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        # Частичные индексы: чтение идёт только по «живым» строкам,
+        # очистка — только по помеченным на удаление
+        db.Index('ix_user_model_live', 'id', sqlite_where=db.text('deleted_at IS NULL')),
+        db.Index('ix_user_model_deleted', 'deleted_at', sqlite_where=db.text('deleted_at IS NOT NULL')),
+    )
 
 
 class PostModel(db.Model):
@@ -24,7 +45,19 @@ class PostModel(db.Model):
     title = db.Column(db.String(100), nullable=False)
     content = db.Column(db.Text, nullable=False)
     author_id = db.Column(db.Integer, db.ForeignKey('user_model.id'), nullable=False)
+    # NULL у публикаций, созданных до появления лент
+    created_at = db.Column(db.DateTime, nullable=True, default=utcnow)
+    deleted_at = db.Column(db.DateTime, nullable=True)
     comments = db.relationship('CommentModel', backref='post', cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('ix_post_model_live', 'author_id', sqlite_where=db.text('deleted_at IS NULL')),
+        db.Index(
+            'ix_post_model_author_created', 'author_id', 'created_at',
+            sqlite_where=db.text('deleted_at IS NULL')
+        ),
+        db.Index('ix_post_model_deleted', 'deleted_at', sqlite_where=db.text('deleted_at IS NOT NULL')),
+    )
 
 
 class CommentModel(db.Model):
@@ -35,4 +68,217 @@ class CommentModel(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('post_model.id'), nullable=False)
-    author_id = db.Column(db.Integer, db.ForeignKey('user_model.id'), nullable=False)
\ No newline at end of file
+    author_id = db.Column(db.Integer, db.ForeignKey('user_model.id'), nullable=False)
+    # NULL у комментариев, созданных до появления столбца
+    created_at = db.Column(db.DateTime, nullable=True, default=utcnow)
+    deleted_at = db.Column(db.DateTime, nullable=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('comment_model.id'), nullable=True)
+    # Материализованный путь: ID предков и самого комментария фиксированной
+    # ширины, поэтому порядок путей - порядок обхода дерева. Комментарии,
+    # созданные до появления ответов, становятся комментариями верхнего уровня
+    path = db.Column(db.String(512), nullable=True, info={'backfill': "printf('%012d/', id)"})
+    depth = db.Column(db.Integer, nullable=True, default=0, info={'backfill': '0'})
+    
+    __table_args__ = (
+        db.Index('ix_comment_model_live', 'post_id', sqlite_where=db.text('deleted_at IS NULL')),
+        # Обсуждение публикации читается одним диапазоном по пути
+        db.Index('ix_comment_model_thread', 'post_id', 'path'),
+        db.Index('ix_comment_model_author', 'author_id'),
+        db.Index('ix_comment_model_deleted', 'deleted_at', sqlite_where=db.text('deleted_at IS NOT NULL')),
+    )
+
+
+class PostTrendingModel(db.Model):
+    """
+    Затухающий счётчик комментариев публикации.
+    
+    Хранится логарифм суммы exp(rate * t) по времени t комментариев,
+    отсчитанному от фиксированной эпохи. Порядок по score совпадает с
+    порядком по текущему затухающему счёту, поэтому строки не нужно
+    пересчитывать со временем.
+    """
+    
+    __tablename__ = 'post_trending'
+    
+    post_id = db.Column(db.Integer, db.ForeignKey('post_model.id'), primary_key=True)
+    score = db.Column(db.Float, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_post_trending_score', score.desc()),
+    )
+
+
+class FollowModel(db.Model):
+    """Подписка пользователя на автора."""
+    
+    __tablename__ = 'follow'
+    
+    follower_id = db.Column(db.Integer, db.ForeignKey('user_model.id'), primary_key=True)
+    author_id = db.Column(db.Integer, db.ForeignKey('user_model.id'), primary_key=True)
+    
+    __table_args__ = (
+        # Рассылка публикации идёт по подписчикам автора
+        db.Index('ix_follow_author', 'author_id', 'follower_id'),
+    )
+
+
+class FeedHeadModel(db.Model):
+    """Счётчик записей в ленте пользователя (голова кольцевого буфера)."""
+    
+    __tablename__ = 'feed_head'
+    
+    user_id = db.Column(db.Integer, primary_key=True)
+    head = db.Column(db.Integer, nullable=False, default=0)
+
+
+class FeedEntryModel(db.Model):
+    """
+    Публикация, разосланная в ленту подписчика.
+    
+    Лента - кольцевой буфер: запись попадает в ячейку head % размер
+    ленты и вытесняет самую старую, поэтому лента не растёт без
+    ограничений и не требует отдельной очистки. Внешних ключей на
+    публикацию нет: записи удалённых публикаций отсеиваются при чтении.
+    """
+    
+    __tablename__ = 'feed_entry'
+    
+    user_id = db.Column(db.Integer, primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True)
+    post_id = db.Column(db.Integer, nullable=False)
+    author_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_feed_entry_user_created', 'user_id', 'created_at', 'post_id'),
+    )
+
+
+class IdempotencyKeyModel(db.Model):
+    """
+    Сохранённый ответ на POST-запрос с заголовком Idempotency-Key.
+    
+    Строка с пустым status_code - запрос ещё выполняется; до expires_at
+    повторы ждут его ответа, после - строку может занять следующий
+    запрос. Готовый ответ хранится до expires_at и удаляется очисткой.
+    """
+    
+    __tablename__ = 'idempotency_key'
+    
+    key = db.Column(db.String(255), primary_key=True)
+    # Хеш метода, пути и тела запроса: тот же ключ с другим запросом - ошибка клиента
+    fingerprint = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)
+    content_type = db.Column(db.String(100), nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_idempotency_key_expires', 'expires_at'),
+    )
+
+
+class ChangeLogModel(db.Model):
+    """
+    Запись журнала изменений: создание или удаление сущности.
+    
+    Пишется репозиторием в той же транзакции, что и само изменение.
+    ID - смещение в журнале: AUTOINCREMENT не выдаёт ID повторно и после
+    очистки старых записей, поэтому потребитель продолжает чтение с
+    последнего полученного ID.
+    """
+    
+    __tablename__ = 'change_log'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    # user, post, comment или follow
+    entity = db.Column(db.String(20), nullable=False)
+    # create или delete
+    operation = db.Column(db.String(10), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    # Поля сущности в JSON
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_change_log_created', 'created_at'),
+        {'sqlite_autoincrement': True},
+    )
+
+
+class WebhookModel(db.Model):
+    """
+    Подписка внешнего получателя на события журнала изменений.
+    
+    Журнал изменений служит очередью исходящих событий: он пишется в
+    транзакции изменения, а подписка хранит лишь позицию доставки
+    (cursor) и состояние повторов. Пока lease_until в будущем, подпиской
+    занят один обработчик доставки.
+    """
+    
+    __tablename__ = 'webhook'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(2048), nullable=False)
+    # Типы событий через запятую: post.create,comment.create
+    events = db.Column(db.String(200), nullable=False)
+    # Ключ подписи HMAC-SHA256 тела запроса
+    secret = db.Column(db.String(128), nullable=True)
+    # ID последней обработанной записи журнала изменений
+    cursor = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
+    lease_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    deleted_at = db.Column(db.DateTime, nullable=True)
+
+
+class WebhookDeadLetterModel(db.Model):
+    """Пачка событий, которую не удалось доставить за все попытки."""
+    
+    __tablename__ = 'webhook_dead_letter'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    webhook_id = db.Column(db.Integer, db.ForeignKey('webhook.id'), nullable=False)
+    first_change_id = db.Column(db.Integer, nullable=False)
+    last_change_id = db.Column(db.Integer, nullable=False)
+    # Тело недоставленного запроса
+    body = db.Column(db.Text, nullable=False)
+    attempts = db.Column(db.Integer, nullable=False)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_webhook_dead_letter_webhook', 'webhook_id', 'id'),
+    )
+
+
+def upgrade_schema(connection, tables: list | None = None) -> None:
+    """
+    Создать недостающие таблицы, столбцы и индексы.
+    
+    create_all не меняет существующие таблицы, поэтому новые столбцы
+    (только допускающие NULL) добавляются через ALTER TABLE и, если у
+    столбца есть info['backfill'], заполняются этим SQL-выражением.
+    
+    Args:
+        connection: Соединение SQLAlchemy
+        tables: Таблицы для обновления; по умолчанию все модели
+    """
+    tables = tables or db.metadata.sorted_tables
+    db.metadata.create_all(connection, tables=tables)
+    inspector = inspect(connection)
+    for table in tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(connection.dialect)
+                connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+                if 'backfill' in column.info:
+                    connection.exec_driver_sql(
+                        f"UPDATE {table.name} SET {column.name} = {column.info['backfill']} WHERE {column.name} IS NULL"
+                    )
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
\ No newline at end of file
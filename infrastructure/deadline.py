@@ -0,0 +1,113 @@
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic
+
+from sqlalchemy import event
+
+# Через сколько инструкций виртуальной машины SQLite проверять срок
+PROGRESS_STEPS = 1000
+
+# Срок текущего HTTP-запроса или блока deadline
+current_deadline = ContextVar('current_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Срок обработки запроса истёк."""
+
+
+class Deadline:
+    """Срок обработки и признак того, что работа была из-за него прервана."""
+    
+    __slots__ = ('timeout', 'expires_at', 'interrupted')
+    
+    def __init__(self, timeout: float):
+        """
+        Инициализация срока.
+        
+        Args:
+            timeout: Секунд на обработку, начиная с текущего момента
+        """
+        self.timeout = timeout
+        self.expires_at = monotonic() + timeout
+        self.interrupted = False
+    
+    def expired(self) -> bool:
+        """Истёк ли срок."""
+        return monotonic() >= self.expires_at
+
+
+@contextmanager
+def deadline(timeout: float):
+    """
+    Ограничить сроком SQL-запросы внутри блока.
+    
+    Args:
+        timeout: Секунд на выполнение блока
+    
+    Yields:
+        Объект Deadline
+    """
+    state = Deadline(timeout)
+    token = current_deadline.set(state)
+    try:
+        yield state
+    finally:
+        current_deadline.reset(token)
+
+
+def check_deadline() -> None:
+    """
+    Проверить срок текущего запроса.
+    
+    Raises:
+        DeadlineExceeded: Если срок истёк
+    """
+    state = current_deadline.get()
+    if state is not None and state.expired():
+        state.interrupted = True
+        raise DeadlineExceeded(f"Срок обработки {state.timeout:g} с истёк")
+
+
+def _progress() -> int:
+    """Обработчик прогресса SQLite: ненулевой ответ прерывает запрос."""
+    state = current_deadline.get()
+    return 1 if state is not None and state.expired() else 0
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Обработчик ставится один раз на соединение пула, в том числе уже открытое
+    record = conn.connection
+    if 'deadline_progress' not in record.info:
+        record.driver_connection.set_progress_handler(_progress, PROGRESS_STEPS)
+        record.info['deadline_progress'] = True
+    check_deadline()
+
+
+def _handle_error(exception_context):
+    state = current_deadline.get()
+    if (
+        state is not None
+        and state.expired()
+        and isinstance(exception_context.original_exception, sqlite3.OperationalError)
+    ):
+        state.interrupted = True
+        # Остальные обработчики ошибок (трассировка) видят исключение как обычно
+        return DeadlineExceeded(f"Срок обработки {state.timeout:g} с истёк, запрос к базе прерван")
+
+
+def watch_engine(engine) -> None:
+    """
+    Прерывать запросы движка SQLite, когда истекает срок текущего запроса.
+    
+    Долгий запрос прерывается обработчиком прогресса SQLite, транзакция
+    откатывается, и соединение возвращается в пул; вместо ошибки
+    OperationalError поднимается DeadlineExceeded.
+    
+    Args:
+        engine: Движок SQLAlchemy
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
\ No newline at end of file
@@ -1,21 +1,106 @@
+from sqlalchemy import event
+
 from infrastructure.repositories import SQLUserRepository, SQLPostRepository, SQLCommentRepository
-from domain.repositories import IUserRepository, IPostRepository, ICommentRepository
+from infrastructure.memory_repositories import (
+    InMemoryStore,
+    InMemoryUserRepository,
+    InMemoryPostRepository,
+    InMemoryCommentRepository,
+    InMemoryTrendingRepository,
+    InMemoryFeedRepository
+)
+from infrastructure.sharding import (
+    ShardedStore,
+    ShardedUserRepository,
+    ShardedPostRepository,
+    ShardedCommentRepository,
+    ShardedTrendingRepository,
+    ShardedFeedRepository
+)
+from infrastructure.feed import DEFAULT_FANOUT_THRESHOLD, DEFAULT_MAX_ENTRIES, SQLFeedRepository
+from infrastructure.trending import DEFAULT_HALF_LIFE, SQLTrendingRepository
+from domain.repositories import (
+    IUserRepository,
+    IPostRepository,
+    ICommentRepository,
+    ITrendingRepository,
+    IFeedRepository
+)
+
+BACKENDS = ('sql', 'memory', 'sharded')
 
 
 class RepositoryFactory:
     """Фабрика для создания репозиториев."""
     
+    def __init__(self, backend: str = 'sql', shard_uris: list | None = None,
+                 trending_half_life: float = DEFAULT_HALF_LIFE,
+                 feed_fanout_threshold: int = DEFAULT_FANOUT_THRESHOLD,
+                 feed_max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Инициализация фабрики.
+        
+        Args:
+            backend: Хранилище: sql (SQLAlchemy), memory (словари в памяти)
+                или sharded (несколько файлов SQLite)
+            shard_uris: URI или пути шардов для хранилища sharded
+            trending_half_life: Период полураспада веса комментария в рейтинге
+            feed_fanout_threshold: Число подписчиков, начиная с которого
+                публикации автора не рассылаются по лентам
+            feed_max_entries: Размер ленты пользователя
+        
+        Raises:
+            ValueError: Если хранилище неизвестно
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Неизвестное хранилище репозиториев: {backend}")
+        self.backend = backend
+        self.trending_half_life = trending_half_life
+        self.feed_fanout_threshold = feed_fanout_threshold
+        self.feed_max_entries = feed_max_entries
+        # Репозитории в памяти должны разделять одно хранилище
+        self.memory_store = InMemoryStore() if backend == 'memory' else None
+        self.sharded_store = ShardedStore(shard_uris or []) if backend == 'sharded' else None
+    
     def create_user_repository(self) -> IUserRepository:
         """Создать репозиторий пользователей."""
+        if self.backend == 'memory':
+            return InMemoryUserRepository(self.memory_store)
+        if self.backend == 'sharded':
+            return ShardedUserRepository(self.sharded_store)
         return SQLUserRepository()
     
     def create_post_repository(self) -> IPostRepository:
         """Создать репозиторий публикаций."""
+        if self.backend == 'memory':
+            return InMemoryPostRepository(self.memory_store)
+        if self.backend == 'sharded':
+            return ShardedPostRepository(self.sharded_store)
         return SQLPostRepository()
     
     def create_comment_repository(self) -> ICommentRepository:
         """Создать репозиторий комментариев."""
-        return SQLCommentRepository()
+        if self.backend == 'memory':
+            return InMemoryCommentRepository(self.memory_store, self.trending_half_life)
+        if self.backend == 'sharded':
+            return ShardedCommentRepository(self.sharded_store, self.trending_half_life)
+        return SQLCommentRepository(self.trending_half_life)
+    
+    def create_trending_repository(self) -> ITrendingRepository:
+        """Создать репозиторий рейтинга публикаций."""
+        if self.backend == 'memory':
+            return InMemoryTrendingRepository(self.memory_store, self.trending_half_life)
+        if self.backend == 'sharded':
+            return ShardedTrendingRepository(self.sharded_store, self.trending_half_life)
+        return SQLTrendingRepository(self.trending_half_life)
+    
+    def create_feed_repository(self) -> IFeedRepository:
+        """Создать репозиторий подписок и лент."""
+        if self.backend == 'memory':
+            return InMemoryFeedRepository(self.memory_store, self.feed_fanout_threshold, self.feed_max_entries)
+        if self.backend == 'sharded':
+            return ShardedFeedRepository(self.sharded_store, self.feed_fanout_threshold, self.feed_max_entries)
+        return SQLFeedRepository(self.feed_fanout_threshold, self.feed_max_entries)
 
 
 class DatabaseFactory:
@@ -26,10 +111,32 @@ class DatabaseFactory:
         """
         Инициализировать базу данных.
         
+        Таблицы создаются только если версия схемы в базе отличается от
+        SCHEMA_VERSION, поэтому обычный запуск стоит двух PRAGMA. Файл
+        SQLite переводится в режим WAL: читатели (резервное копирование,
+        реплика, выгрузка) не блокируют писателей, а писатели - читателей.
+        
         Args:
             app: Экземпляр Flask приложения
         """
-        from infrastructure.database import db
+        from infrastructure.database import db, upgrade_schema, SCHEMA_VERSION
+        from infrastructure.trending import register_sql_functions
         db.init_app(app)
         with app.app_context():
-            db.create_all()
\ No newline at end of file
+            if db.engine.dialect.name == 'sqlite':
+                # Функции затухающего счёта нужны каждому соединению
+                event.listen(db.engine, 'connect', register_sql_functions)
+            else:
+                db.create_all()
+                return
+            with db.engine.connect() as connection:
+                database = db.engine.url.database
+                # Режим WAL хранится в самом файле; базе в памяти он не нужен
+                if database and database != ':memory:' and 'mode=memory' not in database:
+                    connection.exec_driver_sql('PRAGMA journal_mode=WAL')
+                version = connection.exec_driver_sql('PRAGMA user_version').scalar()
+                if version == SCHEMA_VERSION:
+                    return
+                upgrade_schema(connection)
+                connection.exec_driver_sql(f'PRAGMA user_version = {SCHEMA_VERSION:d}')
+                connection.commit()
\ No newline at end of file
@@ -0,0 +1,331 @@
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import DateTime, Integer, and_, bindparam, func, literal, select, tuple_, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from domain.entities import Post
+from domain.repositories import IFeedRepository
+from infrastructure.changes import record_change
+from infrastructure.database import db, FeedEntryModel, FeedHeadModel, FollowModel, PostModel, UserModel
+from infrastructure.repositories import read_session
+
+# Авторы с таким числом подписчиков и больше не рассылают публикации по лентам
+DEFAULT_FANOUT_THRESHOLD = 1000
+# Размер ленты пользователя (кольцевого буфера)
+DEFAULT_MAX_ENTRIES = 500
+# Популярных авторов в одном UNION ALL: SQLite допускает не больше 500
+# частей составного SELECT, а число форм запросов в кэше ограничено
+MAX_PULLED_AUTHORS = 400
+
+follows = FollowModel.__table__
+heads = FeedHeadModel.__table__
+entries = FeedEntryModel.__table__
+users = UserModel.__table__
+posts = PostModel.__table__
+
+# Популярные авторы, на которых подписан пользователь (их публикации читаются при запросе ленты)
+POPULAR_FOLLOWED = (
+    select(follows.c.author_id)
+    .join(users, users.c.id == follows.c.author_id)
+    .where(
+        follows.c.follower_id == bindparam('user_id'),
+        users.c.follower_count >= bindparam('threshold'),
+        users.c.deleted_at.is_(None)
+    )
+)
+
+
+def advance_heads_statement(*conditions):
+    """
+    UPSERT, сдвигающий голову ленты каждого подписчика автора.
+    
+    Параметры: author_id.
+    """
+    statement = sqlite_insert(heads).from_select(
+        ['user_id', 'head'],
+        select(follows.c.follower_id, literal(0)).where(follows.c.author_id == bindparam('author_id'), *conditions)
+    )
+    return statement.on_conflict_do_update(
+        index_elements=[heads.c.user_id],
+        set_={'head': heads.c.head + 1}
+    )
+
+
+def write_entries_statement(created_at, *conditions):
+    """
+    INSERT OR REPLACE публикации в ячейку головы ленты каждого подписчика.
+    
+    Параметры: author_id, post_id, max_entries.
+    """
+    return sqlite_insert(entries).prefix_with('OR REPLACE').from_select(
+        ['user_id', 'slot', 'post_id', 'author_id', 'created_at'],
+        select(
+            heads.c.user_id,
+            heads.c.head % bindparam('max_entries'),
+            bindparam('post_id'),
+            bindparam('author_id'),
+            created_at
+        )
+        .select_from(follows.join(heads, heads.c.user_id == follows.c.follower_id))
+        .where(follows.c.author_id == bindparam('author_id'), *conditions)
+    )
+
+
+def before_cursor(created_column, id_column, with_cursor: bool) -> list:
+    """Условие курсора: строки строго старше (before_created, before_id)."""
+    if not with_cursor:
+        return []
+    return [tuple_(created_column, id_column) < tuple_(
+        bindparam('before_created', type_=DateTime), bindparam('before_id', type_=Integer)
+    )]
+
+
+def pushed_query(with_cursor: bool):
+    """
+    Записи ленты пользователя, чьи публикации и авторы не удалены.
+    
+    Записи авторов, от которых пользователь отписался, отсеиваются
+    соединением с подписками. Параметры: user_id, limit и курсор.
+    """
+    return (
+        select(posts.c.id, posts.c.title, posts.c.content, posts.c.author_id, posts.c.created_at)
+        .select_from(
+            entries
+            .join(follows, and_(
+                follows.c.follower_id == entries.c.user_id,
+                follows.c.author_id == entries.c.author_id
+            ))
+            # Совпадение времени защищает от переиспользованного ID публикации
+            .join(posts, and_(posts.c.id == entries.c.post_id, posts.c.created_at == entries.c.created_at))
+            .join(users, users.c.id == posts.c.author_id)
+        )
+        .where(
+            entries.c.user_id == bindparam('user_id'),
+            posts.c.deleted_at.is_(None),
+            users.c.deleted_at.is_(None),
+            *before_cursor(entries.c.created_at, entries.c.post_id, with_cursor)
+        )
+        .order_by(entries.c.created_at.desc(), entries.c.post_id.desc())
+        .limit(bindparam('limit'))
+    )
+
+
+def pulled_queries(count: int, with_cursor: bool) -> list:
+    """
+    Последние публикации count авторов, читаемые при запросе ленты.
+    
+    Каждый автор - отдельный подзапрос по индексу (author_id, created_at)
+    со своим LIMIT, поэтому стоимость не зависит от числа его публикаций.
+    Параметры: author_0 ... author_{count-1}, limit и курсор.
+    """
+    return [
+        select(
+            select(posts.c.id, posts.c.title, posts.c.content, posts.c.author_id, posts.c.created_at)
+            .join(users, users.c.id == posts.c.author_id)
+            .where(
+                posts.c.author_id == bindparam(f'author_{index}'),
+                posts.c.deleted_at.is_(None),
+                posts.c.created_at.is_not(None),
+                users.c.deleted_at.is_(None),
+                *before_cursor(posts.c.created_at, posts.c.id, with_cursor)
+            )
+            .order_by(posts.c.created_at.desc(), posts.c.id.desc())
+            .limit(bindparam('limit'))
+            .subquery()
+        )
+        for index in range(count)
+    ]
+
+
+def union_of(queries: list):
+    """UNION ALL нескольких запросов; один запрос возвращается как есть."""
+    return queries[0] if len(queries) == 1 else union_all(*queries)
+
+
+@lru_cache(maxsize=256)
+def feed_statement(popular_count: int, with_cursor: bool):
+    """
+    Запрос страницы ленты: записи ленты и публикации популярных авторов.
+    
+    Запросы собираются один раз на форму (число авторов, есть ли курсор)
+    и дальше выполняются с параметрами: построение и ключ кэша
+    SQLAlchemy иначе стоят дороже самого чтения из SQLite.
+    """
+    query = pushed_query(with_cursor)
+    if popular_count:
+        query = union_of([select(query.subquery())] + pulled_queries(popular_count, with_cursor))
+    return query
+
+
+@lru_cache(maxsize=256)
+def pulled_statement(count: int, with_cursor: bool):
+    """Закэшированный UNION ALL публикаций count популярных авторов."""
+    return union_of(pulled_queries(count, with_cursor))
+
+
+def author_chunks(author_ids: list) -> list:
+    """Разбить популярных авторов на части не длиннее MAX_PULLED_AUTHORS."""
+    return [author_ids[start:start + MAX_PULLED_AUTHORS] for start in range(0, len(author_ids), MAX_PULLED_AUTHORS)]
+
+
+def feed_params(limit: int, before: tuple | None, author_ids=(), **params) -> dict:
+    """Параметры запросов страницы ленты."""
+    params['limit'] = limit
+    if before is not None:
+        params['before_created'], params['before_id'] = before
+    for index, author_id in enumerate(author_ids):
+        params[f'author_{index}'] = author_id
+    return params
+
+
+def merge_page(rows, limit: int) -> list[tuple[Post, datetime]]:
+    """
+    Собрать страницу ленты из строк разных источников.
+    
+    Публикация может прийти дважды, если автор стал популярным после
+    рассылки; дубликаты отбрасываются.
+    """
+    page = []
+    seen = set()
+    for row in sorted(rows, key=lambda row: (row.created_at, row.id), reverse=True):
+        if row.id in seen:
+            continue
+        seen.add(row.id)
+        page.append((Post(id=row.id, title=row.title, content=row.content, author_id=row.author_id), row.created_at))
+        if len(page) == limit:
+            break
+    return page
+
+
+# Рассылка в одной базе: порог и время публикации вычисляются в самих запросах
+_below_threshold = select(func.coalesce(users.c.follower_count, 0)).where(
+    users.c.id == bindparam('author_id')
+).scalar_subquery() < bindparam('threshold')
+ADVANCE_HEADS = advance_heads_statement(_below_threshold)
+WRITE_ENTRIES = write_entries_statement(
+    select(posts.c.created_at).where(posts.c.id == bindparam('post_id')).scalar_subquery(),
+    _below_threshold
+)
+
+
+class SQLFeedRepository(IFeedRepository):
+    """
+    Реализация подписок и лент на SQLAlchemy.
+    
+    Гибридная рассылка: публикация автора, у которого меньше
+    fanout_threshold подписчиков, записывается в ленты подписчиков двумя
+    INSERT ... SELECT; публикации популярных авторов читаются из их
+    собственных публикаций при запросе ленты.
+    """
+    
+    def __init__(self, fanout_threshold: int = DEFAULT_FANOUT_THRESHOLD, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Инициализация репозитория.
+        
+        Args:
+            fanout_threshold: Число подписчиков, начиная с которого автор не рассылает публикации
+            max_entries: Размер ленты пользователя
+        """
+        self.fanout_threshold = fanout_threshold
+        self.max_entries = max_entries
+    
+    def _change_follower_count(self, author_id: int, delta: int) -> None:
+        db.session.execute(
+            users.update()
+            .where(users.c.id == author_id)
+            .values(follower_count=func.coalesce(users.c.follower_count, 0) + delta)
+        )
+    
+    def follow(self, follower_id: int, author_id: int) -> bool:
+        """
+        Подписать пользователя на автора.
+        
+        Прошлые публикации автора в ленту не переносятся.
+        
+        Args:
+            follower_id: ID подписчика
+            author_id: ID автора
+        
+        Returns:
+            True, если подписка создана
+        """
+        created = db.session.execute(
+            sqlite_insert(follows).values(follower_id=follower_id, author_id=author_id).on_conflict_do_nothing()
+        ).rowcount == 1
+        if created:
+            self._change_follower_count(author_id, 1)
+            record_change('follow', 'create', follower_id, {'follower_id': follower_id, 'author_id': author_id})
+        db.session.commit()
+        return created
+    
+    def unfollow(self, follower_id: int, author_id: int) -> bool:
+        """
+        Отписать пользователя от автора.
+        
+        Записи автора остаются в ленте до вытеснения, но не показываются.
+        
+        Returns:
+            True, если подписка была удалена
+        """
+        deleted = db.session.execute(
+            follows.delete().where(follows.c.follower_id == follower_id, follows.c.author_id == author_id)
+        ).rowcount == 1
+        if deleted:
+            self._change_follower_count(author_id, -1)
+            record_change('follow', 'delete', follower_id, {'follower_id': follower_id, 'author_id': author_id})
+        db.session.commit()
+        return deleted
+    
+    def fan_out(self, post: Post) -> int:
+        """
+        Разослать публикацию по лентам подписчиков автора.
+        
+        Проверка порога и время публикации вычисляются внутри тех же
+        запросов, поэтому рассылка стоит ровно двух statement.
+        
+        Args:
+            post: Созданная публикация
+        
+        Returns:
+            Количество лент, в которые записана публикация
+        """
+        params = {
+            'author_id': post.author_id,
+            'post_id': post.id,
+            'threshold': self.fanout_threshold,
+            'max_entries': self.max_entries,
+        }
+        db.session.execute(ADVANCE_HEADS, params)
+        written = db.session.execute(WRITE_ENTRIES, params).rowcount
+        db.session.commit()
+        return written
+    
+    def get_feed(self, user_id: int, limit: int, before: tuple | None = None) -> list[tuple[Post, datetime]]:
+        """
+        Получить страницу ленты.
+        
+        Args:
+            user_id: ID читателя
+            limit: Размер страницы
+            before: Курсор (created_at, post_id) последней публикации предыдущей страницы
+        
+        Returns:
+            Пары (публикация, время создания) от новых к старым
+        """
+        session = read_session()
+        popular = session.execute(
+            POPULAR_FOLLOWED, {'user_id': user_id, 'threshold': self.fanout_threshold}
+        ).scalars().all()
+        # Обычно авторы помещаются в один запрос вместе с записями ленты,
+        # остальные части читаются отдельными UNION ALL
+        first, *rest = author_chunks(popular) or [[]]
+        rows = session.execute(
+            feed_statement(len(first), before is not None),
+            feed_params(limit, before, first, user_id=user_id)
+        ).all()
+        for chunk in rest:
+            rows += session.execute(
+                pulled_statement(len(chunk), before is not None), feed_params(limit, before, chunk)
+            ).all()
+        return merge_page(rows, limit)
\ No newline at end of file
@@ -0,0 +1,164 @@
+import threading
+import time
+from datetime import timedelta
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from infrastructure.database import db, IdempotencyKeyModel, utcnow
+
+# Результаты захвата ключа
+OWNER = 'owner'
+REPLAY = 'replay'
+PENDING = 'pending'
+MISMATCH = 'mismatch'
+
+keys = IdempotencyKeyModel.__table__
+
+
+class IdempotencyStore:
+    """
+    Ключи идемпотентности и сохранённые ответы в таблице idempotency_key.
+    
+    Запрос захватывает ключ одной вставкой: новый ключ или ключ с
+    истёкшим сроком достаётся ему, иначе он получает сохранённый ответ
+    или узнаёт, что такой же запрос ещё выполняется. Повторы в том же
+    процессе ждут завершения по событию, в других процессах - опрашивают
+    таблицу.
+    """
+    
+    def __init__(self, ttl: float = 24 * 3600.0, lock_timeout: float = 30.0):
+        """
+        Инициализация хранилища.
+        
+        Args:
+            ttl: Сколько секунд хранится готовый ответ
+            lock_timeout: Через сколько секунд ключ незавершённого запроса
+                (например, упавшего процесса) можно захватить снова
+        """
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self._events = {}
+        self._lock = threading.Lock()
+    
+    def claim(self, key: str, fingerprint: str) -> tuple[str, object]:
+        """
+        Захватить ключ.
+        
+        Args:
+            key: Ключ идемпотентности
+            fingerprint: Хеш запроса
+        
+        Returns:
+            OWNER - запрос нужно выполнить; REPLAY и строка с ответом;
+            PENDING - такой же запрос ещё выполняется; MISMATCH - ключ
+            занят другим запросом
+        """
+        now = utcnow()
+        statement = sqlite_insert(keys).values(
+            key=key,
+            fingerprint=fingerprint,
+            created_at=now,
+            expires_at=now + timedelta(seconds=self.lock_timeout)
+        )
+        claimed = db.session.execute(statement.on_conflict_do_update(
+            index_elements=[keys.c.key],
+            set_={
+                'fingerprint': statement.excluded.fingerprint,
+                'status_code': None,
+                'content_type': None,
+                'response_body': None,
+                'created_at': statement.excluded.created_at,
+                'expires_at': statement.excluded.expires_at,
+            },
+            where=keys.c.expires_at <= now
+        )).rowcount
+        if claimed:
+            db.session.commit()
+            with self._lock:
+                self._events.setdefault(key, threading.Event())
+            return OWNER, None
+        row = db.session.execute(
+            select(keys.c.fingerprint, keys.c.status_code, keys.c.content_type, keys.c.response_body)
+            .where(keys.c.key == key)
+        ).first()
+        # Снимок чтения не должен мешать увидеть ответ при следующем опросе
+        db.session.rollback()
+        if row is None:
+            # Ключ удалили между вставкой и чтением: следующая попытка его захватит
+            return PENDING, None
+        if row.fingerprint != fingerprint:
+            return MISMATCH, row
+        if row.status_code is None:
+            return PENDING, None
+        return REPLAY, row
+    
+    def complete(self, key: str, fingerprint: str, status_code: int, content_type: str, body: str) -> None:
+        """
+        Сохранить ответ захваченного ключа и разбудить ждущие повторы.
+        
+        Args:
+            key: Ключ идемпотентности
+            fingerprint: Хеш запроса
+            status_code: Код ответа
+            content_type: Тип содержимого ответа
+            body: Тело ответа
+        """
+        # Ошибку сценария могли обработать без отката сессии
+        db.session.rollback()
+        try:
+            db.session.execute(
+                keys.update()
+                .where(keys.c.key == key, keys.c.fingerprint == fingerprint, keys.c.status_code.is_(None))
+                .values(
+                    status_code=status_code,
+                    content_type=content_type,
+                    response_body=body,
+                    expires_at=utcnow() + timedelta(seconds=self.ttl)
+                )
+            )
+            db.session.commit()
+        finally:
+            self._wake(key)
+    
+    def release(self, key: str, fingerprint: str) -> None:
+        """
+        Освободить ключ без ответа (ошибка сервера): повтор выполнится заново.
+        
+        Args:
+            key: Ключ идемпотентности
+            fingerprint: Хеш запроса
+        """
+        db.session.rollback()
+        try:
+            db.session.execute(
+                keys.delete()
+                .where(keys.c.key == key, keys.c.fingerprint == fingerprint, keys.c.status_code.is_(None))
+            )
+            db.session.commit()
+        finally:
+            self._wake(key)
+    
+    def wait(self, key: str, timeout: float) -> None:
+        """
+        Подождать завершения запроса с ключом.
+        
+        Запрос этого процесса будит ждущих сразу; запрос другого
+        процесса не виден, и ожидание длится timeout.
+        
+        Args:
+            key: Ключ идемпотентности
+            timeout: Максимальное ожидание в секундах
+        """
+        event = self._events.get(key)
+        if event is not None:
+            event.wait(timeout)
+        else:
+            time.sleep(timeout)
+    
+    def _wake(self, key: str) -> None:
+        """Разбудить повторы, ждущие ключ."""
+        with self._lock:
+            event = self._events.pop(key, None)
+        if event is not None:
+            event.set()
\ No newline at end of file
@@ -0,0 +1,96 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import mistune
+
+from domain.entities import Post
+from domain.repositories import IContentRenderer
+from infrastructure.cache import RepositoryCache
+from infrastructure.metrics import metrics
+
+logger = logging.getLogger('blog.markdown')
+
+metrics.describe('blog_markdown_renders_total', 'counter', 'Обращения к отрисовке Markdown: попадания в кэш и отрисовки')
+
+
+def content_digest(content: str) -> str:
+    """Хеш содержания: отличает отрисовку изменённой публикации."""
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class MarkdownRenderer(IContentRenderer):
+    """
+    Отрисовка Markdown в HTML с кэшем по ID публикации и хешу содержания.
+    
+    HTML в исходном тексте экранируется. Запись кэша хранит хеш
+    содержания, поэтому изменённая публикация отрисовывается заново и
+    вытесняет старую запись, а не живёт рядом с ней.
+    """
+    
+    def __init__(self, maxsize: int = 10000, ttl: float = 24 * 3600.0, background: bool = True):
+        """
+        Инициализация рендерера.
+        
+        Args:
+            maxsize: Максимальное количество отрисованных публикаций в кэше
+            ttl: Время жизни записи кэша в секундах
+            background: Отрисовывать новые публикации в фоновом потоке
+        """
+        self._markdown = mistune.create_markdown(escape=True, plugins=['strikethrough', 'table', 'url'])
+        self.cache = RepositoryCache(maxsize, ttl)
+        self.background = background
+        self._executor = None
+    
+    def render(self, post: Post) -> str:
+        """
+        Получить HTML содержания публикации.
+        
+        Args:
+            post: Публикация
+        
+        Returns:
+            HTML из кэша или только что отрисованный
+        """
+        key = ('html', post.id)
+        digest = content_digest(post.content)
+        cached = self.cache.get(key)
+        if cached is not None and cached[0] == digest:
+            metrics.inc('blog_markdown_renders_total', (('result', 'hit'),))
+            return cached[1]
+        metrics.inc('blog_markdown_renders_total', (('result', 'render'),))
+        html = self._markdown(post.content)
+        self.cache.set(key, (digest, html))
+        return html
+    
+    def _render_quietly(self, post: Post) -> None:
+        try:
+            self.render(post)
+        except Exception as e:
+            logger.error("Ошибка отрисовки публикации %s: %s", post.id, e)
+    
+    def prerender(self, post: Post) -> None:
+        """
+        Отрисовать новую публикацию заранее, чтобы первое чтение попало в кэш.
+        
+        Пул из одного потока создаётся при первом вызове.
+        
+        Args:
+            post: Созданная публикация
+        """
+        if not self.background:
+            self._render_quietly(post)
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix='markdown')
+        self._executor.submit(self._render_quietly, post)
+    
+    def invalidate(self, post_id: int) -> None:
+        """Забыть HTML удалённой публикации."""
+        self.cache.delete(('html', post_id))
+    
+    def shutdown(self) -> None:
+        """Дождаться фоновых отрисовок и остановить пул."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
\ No newline at end of file
@@ -0,0 +1,372 @@
+import heapq
+import math
+import threading
+from collections import deque
+from datetime import datetime
+
+from domain.entities import User, Post, Comment
+from domain.repositories import (
+    IUserRepository,
+    IPostRepository,
+    ICommentRepository,
+    ITrendingRepository,
+    IFeedRepository,
+    UserAlreadyExists
+)
+from infrastructure.database import utcnow
+from infrastructure.feed import DEFAULT_FANOUT_THRESHOLD, DEFAULT_MAX_ENTRIES
+from infrastructure.trending import (
+    DEFAULT_HALF_LIFE,
+    NEGLIGIBLE_SCORE,
+    current_score,
+    decay_rate,
+    log_weight,
+    logaddexp,
+    logsubexp
+)
+
+
+class InMemoryStore:
+    """
+    Общее хранилище для репозиториев в памяти.
+    
+    Таблицы - словари по ID, плюс индексы по автору и публикации.
+    Все операции выполняются под одной блокировкой, поэтому каскадное
+    удаление атомарно относительно других потоков.
+    """
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.users = {}
+        self.posts = {}
+        self.comments = {}
+        self.usernames = {}
+        self.emails = {}
+        self.posts_by_author = {}
+        self.comments_by_post = {}
+        self.comments_by_author = {}
+        # Материализованные пути комментариев: кортежи ID от корня
+        self.comment_paths = {}
+        # Рейтинг: логарифм счёта публикации и вес каждого комментария
+        self.trending = {}
+        self.comment_weights = {}
+        # Подписки в обе стороны, время публикаций и ленты (deque c maxlen)
+        self.followers = {}
+        self.following = {}
+        self.post_created = {}
+        self.feeds = {}
+        self._next_ids = {'user': 1, 'post': 1, 'comment': 1}
+    
+    def next_id(self, table: str) -> int:
+        """Выдать следующий ID таблицы (аналог AUTOINCREMENT)."""
+        value = self._next_ids[table]
+        self._next_ids[table] = value + 1
+        return value
+    
+    def delete_comment(self, comment_id: int) -> None:
+        """Удалить комментарий и убрать его из индексов."""
+        comment = self.comments.pop(comment_id, None)
+        if comment is not None:
+            self.comments_by_post.get(comment.post_id, set()).discard(comment_id)
+            self.comments_by_author.get(comment.author_id, set()).discard(comment_id)
+            self.comment_paths.pop(comment_id, None)
+            score = logsubexp(self.trending.get(comment.post_id), self.comment_weights.pop(comment_id))
+            if score is None:
+                self.trending.pop(comment.post_id, None)
+            else:
+                self.trending[comment.post_id] = score
+    
+    def delete_post(self, post_id: int) -> None:
+        """Удалить публикацию вместе с её комментариями."""
+        post = self.posts.pop(post_id, None)
+        if post is None:
+            return
+        for comment_id in list(self.comments_by_post.pop(post_id, ())):
+            self.delete_comment(comment_id)
+        self.trending.pop(post_id, None)
+        self.post_created.pop(post_id, None)
+        self.posts_by_author.get(post.author_id, set()).discard(post_id)
+    
+    def delete_user(self, user_id: int) -> None:
+        """Удалить пользователя, его публикации и комментарии."""
+        user = self.users.pop(user_id, None)
+        if user is None:
+            return
+        for post_id in list(self.posts_by_author.pop(user_id, ())):
+            self.delete_post(post_id)
+        for comment_id in list(self.comments_by_author.pop(user_id, ())):
+            self.delete_comment(comment_id)
+        for author_id in self.following.pop(user_id, ()):
+            self.followers.get(author_id, set()).discard(user_id)
+        for follower_id in self.followers.pop(user_id, ()):
+            self.following.get(follower_id, set()).discard(user_id)
+        self.feeds.pop(user_id, None)
+        self.usernames.pop(user.username, None)
+        self.emails.pop(user.email, None)
+
+
+def _copy_user(user: User) -> User:
+    return User(id=user.id, username=user.username, email=user.email)
+
+
+def _copy_post(post: Post) -> Post:
+    return Post(id=post.id, title=post.title, content=post.content, author_id=post.author_id)
+
+
+def _copy_comment(comment: Comment) -> Comment:
+    return Comment(
+        id=comment.id, content=comment.content, post_id=comment.post_id, author_id=comment.author_id,
+        parent_id=comment.parent_id, depth=comment.depth
+    )
+
+
+class InMemoryUserRepository(IUserRepository):
+    """Реализация репозитория пользователей в памяти."""
+    
+    def __init__(self, store: InMemoryStore):
+        self.store = store
+    
+    def create(self, user: User) -> User:
+        """
+        Создать нового пользователя.
+        
+        Args:
+            user: Сущность пользователя
+        
+        Returns:
+            Созданная сущность пользователя с ID
+        
+        Raises:
+            UserAlreadyExists: Если имя или почта уже заняты (аналог UNIQUE)
+        """
+        store = self.store
+        with store.lock:
+            if user.username in store.usernames:
+                raise UserAlreadyExists('username', user.username)
+            if user.email in store.emails:
+                raise UserAlreadyExists('email', user.email)
+            created = User(id=store.next_id('user'), username=user.username, email=user.email)
+            store.users[created.id] = created
+            store.usernames[created.username] = created.id
+            store.emails[created.email] = created.id
+        return _copy_user(created)
+    
+    def get_by_id(self, user_id: int) -> User | None:
+        """Получить пользователя по ID."""
+        user = self.store.users.get(user_id)
+        return _copy_user(user) if user else None
+    
+    def get_all(self) -> list[User]:
+        """Получить всех пользователей в порядке ID."""
+        with self.store.lock:
+            users = list(self.store.users.values())
+        return [_copy_user(u) for u in users]
+    
+    def delete(self, user_id: int) -> None:
+        """Удалить пользователя по ID каскадно."""
+        with self.store.lock:
+            self.store.delete_user(user_id)
+
+
+class InMemoryPostRepository(IPostRepository):
+    """Реализация репозитория публикаций в памяти."""
+    
+    def __init__(self, store: InMemoryStore):
+        self.store = store
+    
+    def create(self, post: Post) -> Post:
+        """
+        Создать новую публикацию.
+        
+        Raises:
+            ValueError: Если автор не существует (аналог внешнего ключа)
+        """
+        store = self.store
+        with store.lock:
+            if post.author_id not in store.users:
+                raise ValueError(f"Автор с ID {post.author_id} не существует")
+            created = Post(id=store.next_id('post'), title=post.title, content=post.content, author_id=post.author_id)
+            store.posts[created.id] = created
+            store.post_created[created.id] = utcnow()
+            store.posts_by_author.setdefault(created.author_id, set()).add(created.id)
+        return _copy_post(created)
+    
+    def get_by_id(self, post_id: int) -> Post | None:
+        """Получить публикацию по ID."""
+        post = self.store.posts.get(post_id)
+        return _copy_post(post) if post else None
+    
+    def get_all(self) -> list[Post]:
+        """Получить все публикации в порядке ID."""
+        with self.store.lock:
+            posts = list(self.store.posts.values())
+        return [_copy_post(p) for p in posts]
+    
+    def delete(self, post_id: int) -> None:
+        """Удалить публикацию по ID вместе с комментариями."""
+        with self.store.lock:
+            self.store.delete_post(post_id)
+
+
+class InMemoryCommentRepository(ICommentRepository):
+    """Реализация репозитория комментариев в памяти."""
+    
+    def __init__(self, store: InMemoryStore, trending_half_life: float = DEFAULT_HALF_LIFE):
+        self.store = store
+        self.trending_rate = decay_rate(trending_half_life)
+    
+    def create(self, comment: Comment) -> Comment:
+        """
+        Создать новый комментарий.
+        
+        Raises:
+            ValueError: Если публикация или автор не существуют
+        """
+        store = self.store
+        with store.lock:
+            if comment.post_id not in store.posts:
+                raise ValueError(f"Публикация с ID {comment.post_id} не существует")
+            if comment.author_id not in store.users:
+                raise ValueError(f"Автор с ID {comment.author_id} не существует")
+            created = Comment(
+                id=store.next_id('comment'),
+                content=comment.content,
+                post_id=comment.post_id,
+                author_id=comment.author_id,
+                parent_id=comment.parent_id,
+                depth=comment.depth
+            )
+            store.comments[created.id] = created
+            store.comment_paths[created.id] = store.comment_paths.get(comment.parent_id, ()) + (created.id,)
+            store.comments_by_post.setdefault(created.post_id, set()).add(created.id)
+            store.comments_by_author.setdefault(created.author_id, set()).add(created.id)
+            weight = log_weight(utcnow(), self.trending_rate)
+            store.comment_weights[created.id] = weight
+            store.trending[created.post_id] = logaddexp(store.trending.get(created.post_id), weight)
+        return _copy_comment(created)
+    
+    def get_all(self) -> list[Comment]:
+        """Получить все комментарии в порядке ID."""
+        with self.store.lock:
+            comments = list(self.store.comments.values())
+        return [_copy_comment(c) for c in comments]
+    
+    def get_by_id(self, comment_id: int) -> Comment | None:
+        """Получить комментарий по ID."""
+        comment = self.store.comments.get(comment_id)
+        return _copy_comment(comment) if comment else None
+    
+    def delete(self, comment_id: int) -> None:
+        """Удалить комментарий по ID."""
+        with self.store.lock:
+            self.store.delete_comment(comment_id)
+    
+    def get_thread(self, post_id: int, limit: int, start: int | None = None,
+                   max_depth: int | None = None) -> tuple[list[Comment], int | None]:
+        """Получить страницу обсуждения: сортировка путей комментариев публикации."""
+        store = self.store
+        with store.lock:
+            paths = sorted(store.comment_paths[comment_id] for comment_id in store.comments_by_post.get(post_id, ()))
+            roots = [path[0] for path in paths if len(path) == 1 and path[0] >= (start or 0)]
+            next_start = roots[limit] if len(roots) > limit else None
+            return [
+                _copy_comment(store.comments[path[-1]])
+                for path in paths
+                if path[0] >= (start or 0) and (next_start is None or path[0] < next_start)
+                and (max_depth is None or len(path) <= max_depth + 1)
+            ], next_start
+
+
+class InMemoryTrendingRepository(ITrendingRepository):
+    """Реализация рейтинга публикаций в памяти."""
+    
+    def __init__(self, store: InMemoryStore, half_life: float = DEFAULT_HALF_LIFE):
+        self.store = store
+        self.rate = decay_rate(half_life)
+    
+    def top(self, limit: int) -> list[tuple[Post, float]]:
+        """Получить публикации с наибольшим затухающим счётом."""
+        with self.store.lock:
+            best = heapq.nlargest(limit, self.store.trending.items(), key=lambda item: item[1])
+            posts = [(self.store.posts[post_id], score) for post_id, score in best]
+        now = utcnow()
+        return [(_copy_post(post), current_score(score, self.rate, now)) for post, score in posts]
+    
+    def prune(self) -> int:
+        """Удалить счётчики, затухшие ниже порога."""
+        threshold = log_weight(utcnow(), self.rate) + math.log(NEGLIGIBLE_SCORE)
+        with self.store.lock:
+            stale = [post_id for post_id, score in self.store.trending.items() if score < threshold]
+            for post_id in stale:
+                del self.store.trending[post_id]
+        return len(stale)
+
+
+class InMemoryFeedRepository(IFeedRepository):
+    """Реализация подписок и лент в памяти: лента - deque фиксированной длины."""
+    
+    def __init__(self, store: InMemoryStore, fanout_threshold: int = DEFAULT_FANOUT_THRESHOLD,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.store = store
+        self.fanout_threshold = fanout_threshold
+        self.max_entries = max_entries
+    
+    def follow(self, follower_id: int, author_id: int) -> bool:
+        """Подписать пользователя на автора."""
+        store = self.store
+        with store.lock:
+            followers = store.followers.setdefault(author_id, set())
+            if follower_id in followers:
+                return False
+            followers.add(follower_id)
+            store.following.setdefault(follower_id, set()).add(author_id)
+        return True
+    
+    def unfollow(self, follower_id: int, author_id: int) -> bool:
+        """Отписать пользователя от автора."""
+        store = self.store
+        with store.lock:
+            followers = store.followers.get(author_id, set())
+            if follower_id not in followers:
+                return False
+            followers.discard(follower_id)
+            store.following.get(follower_id, set()).discard(author_id)
+        return True
+    
+    def fan_out(self, post: Post) -> int:
+        """Разослать публикацию по лентам подписчиков, если автор не популярен."""
+        store = self.store
+        with store.lock:
+            followers = store.followers.get(post.author_id, set())
+            created_at = store.post_created.get(post.id)
+            if created_at is None or len(followers) >= self.fanout_threshold:
+                return 0
+            for follower_id in followers:
+                feed = store.feeds.get(follower_id)
+                if feed is None:
+                    feed = store.feeds[follower_id] = deque(maxlen=self.max_entries)
+                feed.append((created_at, post.id))
+        return len(followers)
+    
+    def get_feed(self, user_id: int, limit: int, before: tuple | None = None) -> list[tuple[Post, datetime]]:
+        """Получить страницу ленты: разосланные записи и публикации популярных авторов."""
+        store = self.store
+        with store.lock:
+            following = store.following.get(user_id, set())
+            candidates = set(store.feeds.get(user_id, ()))
+            for author_id in following:
+                if len(store.followers.get(author_id, ())) >= self.fanout_threshold:
+                    candidates.update(
+                        (store.post_created[post_id], post_id) for post_id in store.posts_by_author.get(author_id, ())
+                    )
+            page = []
+            for created_at, post_id in sorted(candidates, reverse=True):
+                if before is not None and (created_at, post_id) >= tuple(before):
+                    continue
+                post = store.posts.get(post_id)
+                if post is None or post.author_id not in following:
+                    continue
+                page.append((_copy_post(post), created_at))
+                if len(page) == limit:
+                    break
+        return page
@@ -0,0 +1,272 @@
+import glob
+import json
+import os
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import monotonic, perf_counter
+
+# Границы корзин гистограмм длительности в секундах
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Метод репозитория, выполняющийся в текущем контексте, например SQLPostRepository.get_by_id
+current_repository_method = ContextVar('current_repository_method', default=None)
+
+
+class MetricsRegistry:
+    """
+    Реестр метрик в формате Prometheus.
+    
+    Значения хранятся в памяти процесса. Если задан каталог METRICS_DIR,
+    каждый процесс периодически сбрасывает снимок своих метрик в файл
+    metrics_<pid>.json, а при выдаче /metrics снимки всех процессов
+    суммируются. Счётчики и гистограммы завершившихся процессов
+    учитываются и дальше, чтобы суммы не убывали, а их датчики
+    отбрасываются. Каталог следует очищать при старте сервиса.
+    """
+    
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Инициализация реестра.
+        
+        Args:
+            buckets: Границы корзин гистограмм
+        """
+        self.buckets = buckets
+        self.directory = None
+        self.flush_interval = 1.0
+        self._lock = threading.Lock()
+        self._descriptions = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._last_flush = 0.0
+    
+    def init_app(self, app) -> None:
+        """
+        Настроить реестр по конфигурации приложения.
+        
+        Args:
+            app: Экземпляр Flask приложения
+        """
+        self.directory = app.config.get('METRICS_DIR')
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 1.0)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        app.extensions['metrics'] = self
+    
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        """
+        Зарегистрировать описание метрики.
+        
+        Args:
+            name: Имя метрики
+            kind: Тип: counter, gauge или histogram
+            help_text: Текст для строки HELP
+        """
+        self._descriptions[name] = (kind, help_text)
+    
+    def inc(self, name: str, labels: tuple, amount: float = 1.0) -> None:
+        """Увеличить счётчик. Метки передаются кортежем пар (имя, значение)."""
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+    
+    def gauge_add(self, name: str, labels: tuple, amount: float) -> None:
+        """Изменить значение датчика на amount."""
+        key = (name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0.0) + amount
+    
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        """Добавить наблюдение в гистограмму."""
+        key = (name, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+    
+    def snapshot(self) -> dict:
+        """
+        Получить снимок метрик текущего процесса.
+        
+        Returns:
+            Словарь, пригодный для сериализации в JSON
+        """
+        with self._lock:
+            return {
+                'counters': [[n, [list(p) for p in l], v] for (n, l), v in self._counters.items()],
+                'gauges': [[n, [list(p) for p in l], v] for (n, l), v in self._gauges.items()],
+                'histograms': [
+                    [n, [list(p) for p in l], list(h[0]), h[1], h[2]]
+                    for (n, l), h in self._histograms.items()
+                ],
+            }
+    
+    def flush(self) -> None:
+        """Записать снимок метрик процесса в общий каталог."""
+        self._last_flush = monotonic()
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f'metrics_{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+    
+    def maybe_flush(self) -> None:
+        """Сбросить снимок, если с прошлого сброса прошло flush_interval секунд."""
+        if self.directory and monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+    
+    def collect(self) -> dict:
+        """
+        Собрать метрики всех процессов.
+        
+        Returns:
+            Снимок с просуммированными значениями
+        """
+        snapshots = [self.snapshot()]
+        if self.directory:
+            self.flush()
+            own = os.path.join(self.directory, f'metrics_{os.getpid()}.json')
+            for path in glob.glob(os.path.join(self.directory, 'metrics_*.json')):
+                if path == own:
+                    continue
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                # Датчики (запросы в обработке, подписчики) умершего процесса
+                # остались бы ненулевыми навсегда
+                if not _process_alive(path):
+                    snapshot['gauges'] = []
+                snapshots.append(snapshot)
+        
+        merged = {'counters': {}, 'gauges': {}, 'histograms': {}}
+        for snapshot in snapshots:
+            for kind in ('counters', 'gauges'):
+                for name, labels, value in snapshot[kind]:
+                    key = (name, tuple(tuple(p) for p in labels))
+                    merged[kind][key] = merged[kind].get(key, 0.0) + value
+            for name, labels, counts, total, count in snapshot['histograms']:
+                key = (name, tuple(tuple(p) for p in labels))
+                histogram = merged['histograms'].setdefault(key, [[0] * len(counts), 0.0, 0])
+                histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+                histogram[1] += total
+                histogram[2] += count
+        return merged
+    
+    def render(self) -> str:
+        """
+        Сформировать текст в формате экспозиции Prometheus.
+        
+        Returns:
+            Текст для эндпоинта /metrics
+        """
+        merged = self.collect()
+        families = {}
+        for kind in ('counters', 'gauges', 'histograms'):
+            for (name, labels), value in merged[kind].items():
+                families.setdefault(name, []).append((labels, value))
+        
+        lines = []
+        for name in sorted(families):
+            kind, help_text = self._descriptions.get(name, ('untyped', ''))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(families[name]):
+                if kind == 'histogram':
+                    counts, total, count = value
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                        cumulative += bucket_count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+                    lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+                    lines.append(f'{name}_count{_format_labels(labels)} {count}')
+                else:
+                    lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _process_alive(path: str) -> bool:
+    """Жив ли процесс, записавший снимок metrics_<pid>.json."""
+    try:
+        pid = int(os.path.basename(path)[len('metrics_'):-len('.json')])
+    except ValueError:
+        return False
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_labels(labels: tuple) -> str:
+    """Отформатировать метки в виде {a="1",b="2"}."""
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in labels
+    )
+    return '{' + pairs + '}'
+
+
+metrics = MetricsRegistry()
+metrics.describe('blog_repository_calls_total', 'counter', 'Количество вызовов методов репозиториев')
+metrics.describe('blog_repository_duration_seconds', 'histogram', 'Длительность вызовов методов репозиториев')
+
+
+class MetricsRepository:
+    """
+    Декоратор репозитория, считающий вызовы и их длительность.
+    
+    Проксирует все публичные методы обёрнутого репозитория, поэтому
+    подходит для любой реализации I*Repository.
+    """
+    
+    def __init__(self, repository, registry: MetricsRegistry = metrics):
+        """
+        Инициализация декоратора.
+        
+        Args:
+            repository: Оборачиваемый репозиторий
+            registry: Реестр метрик
+        """
+        self._repository = repository
+        self._registry = registry
+        self._name = getattr(repository, '_name', type(repository).__name__)
+    
+    def __getattr__(self, name: str):
+        attr = getattr(self._repository, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        
+        registry = self._registry
+        labels = (('repository', self._name), ('method', name))
+        qualified_name = f'{self._name}.{name}'
+        
+        def timed(*args, **kwargs):
+            token = current_repository_method.set(qualified_name)
+            start = perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                current_repository_method.reset(token)
+                registry.inc('blog_repository_calls_total', labels)
+                registry.observe('blog_repository_duration_seconds', labels, perf_counter() - start)
+        
+        # Кэшируем обёртку, чтобы не создавать её на каждый вызов
+        self.__dict__[name] = timed
+        return timed
\ No newline at end of file
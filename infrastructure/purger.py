@@ -0,0 +1,305 @@
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from sqlalchemy import bindparam, exists, func, select, tuple_
+
+from infrastructure.database import (
+    db,
+    UserModel,
+    PostModel,
+    CommentModel,
+    PostTrendingModel,
+    FollowModel,
+    FeedHeadModel,
+    FeedEntryModel,
+    IdempotencyKeyModel,
+    ChangeLogModel,
+    WebhookModel,
+    utcnow
+)
+
+
+class SoftDeletePurger:
+    """
+    Фоновая физическая очистка мягко удалённых записей.
+    
+    Работает небольшими пачками, каждая в своей короткой транзакции,
+    поэтому блокировка записи SQLite не удерживается надолго.
+    """
+    
+    def __init__(self, app, batch_size: int = 500, interval: float = 1.0,
+                 change_log_retention: float | None = None):
+        """
+        Инициализация очистки.
+        
+        Args:
+            app: Экземпляр Flask приложения
+            batch_size: Максимум строк, обрабатываемых одним шагом
+            interval: Пауза между шагами в секундах
+            change_log_retention: Срок хранения журнала изменений в секундах (None - бессрочно)
+        """
+        self.app = app
+        self.batch_size = batch_size
+        self.interval = interval
+        self.change_log_retention = change_log_retention
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def _mark_orphans_in(self, session, deleted_users) -> int:
+        """
+        Пометить удалёнными потомков удалённых родителей, не фиксируя транзакцию.
+        
+        Args:
+            session: Сессия или соединение с открытой транзакцией
+            deleted_users: Подзапрос или список ID удалённых пользователей
+        
+        Returns:
+            Количество помеченных строк
+        """
+        posts = PostModel.__table__
+        comments = CommentModel.__table__
+        now = utcnow()
+        deleted_posts = select(posts.c.id).where(posts.c.deleted_at.is_not(None))
+        
+        orphan_posts = (
+            select(posts.c.id)
+            .where(posts.c.deleted_at.is_(None), posts.c.author_id.in_(deleted_users))
+            .limit(self.batch_size)
+        )
+        affected = session.execute(
+            posts.update().where(posts.c.id.in_(orphan_posts)).values(deleted_at=now)
+        ).rowcount
+        
+        orphan_comments = (
+            select(comments.c.id)
+            .where(
+                comments.c.deleted_at.is_(None),
+                comments.c.author_id.in_(deleted_users) | comments.c.post_id.in_(deleted_posts)
+            )
+            .limit(self.batch_size)
+        )
+        affected += session.execute(
+            comments.update()
+            .where(comments.c.id.in_(orphan_comments))
+            .values(deleted_at=now)
+        ).rowcount
+        return affected
+    
+    def _mark_orphans(self) -> int:
+        """Пометить удалёнными потомков удалённых родителей."""
+        users = UserModel.__table__
+        deleted_users = select(users.c.id).where(users.c.deleted_at.is_not(None))
+        affected = self._mark_orphans_in(db.session, deleted_users)
+        db.session.commit()
+        return affected
+    
+    def _delete_leaves(self, session) -> int:
+        """
+        Удалить помеченные комментарии и публикации, на которые больше ничто не ссылается.
+        
+        Args:
+            session: Сессия или соединение с открытой транзакцией
+        
+        Returns:
+            Количество удалённых строк
+        """
+        posts = PostModel.__table__
+        comments = CommentModel.__table__
+        trending = PostTrendingModel.__table__
+        
+        affected = session.execute(
+            comments.delete().where(comments.c.id.in_(
+                select(comments.c.id)
+                .where(comments.c.deleted_at.is_not(None))
+                .limit(self.batch_size)
+            ))
+        ).rowcount
+        
+        affected += session.execute(
+            trending.delete().where(trending.c.post_id.in_(
+                select(trending.c.post_id)
+                .join(posts, posts.c.id == trending.c.post_id)
+                .where(posts.c.deleted_at.is_not(None))
+                .limit(self.batch_size)
+            ))
+        ).rowcount
+        
+        affected += session.execute(
+            posts.delete().where(posts.c.id.in_(
+                select(posts.c.id)
+                .where(
+                    posts.c.deleted_at.is_not(None),
+                    ~exists().where(comments.c.post_id == posts.c.id),
+                    ~exists().where(trending.c.post_id == posts.c.id)
+                )
+                .limit(self.batch_size)
+            ))
+        ).rowcount
+        return affected
+    
+    def _delete_feeds(self, session) -> int:
+        """
+        Удалить ленты удалённых пользователей (лента лежит рядом с пользователем).
+        
+        Args:
+            session: Сессия или соединение с открытой транзакцией
+        
+        Returns:
+            Количество удалённых строк
+        """
+        users = UserModel.__table__
+        affected = 0
+        for table in (FeedEntryModel.__table__, FeedHeadModel.__table__):
+            affected += session.execute(
+                table.delete().where(table.c.user_id.in_(
+                    select(users.c.id)
+                    .where(users.c.deleted_at.is_not(None), exists().where(table.c.user_id == users.c.id))
+                    .limit(self.batch_size)
+                ))
+            ).rowcount
+        return affected
+    
+    def _delete_follows(self) -> int:
+        """
+        Удалить подписки и ленты удалённых пользователей.
+        
+        Счётчики подписчиков авторов уменьшаются на число удалённых
+        подписок, чтобы решение о рассылке оставалось верным.
+        """
+        users = UserModel.__table__
+        follows = FollowModel.__table__
+        deleted_users = select(users.c.id).where(users.c.deleted_at.is_not(None))
+        
+        removed = db.session.execute(
+            follows.delete()
+            .where(tuple_(follows.c.follower_id, follows.c.author_id).in_(
+                select(follows.c.follower_id, follows.c.author_id)
+                .where(follows.c.follower_id.in_(deleted_users) | follows.c.author_id.in_(deleted_users))
+                .limit(self.batch_size)
+            ))
+            .returning(follows.c.author_id)
+        ).scalars().all()
+        if removed:
+            db.session.execute(
+                users.update()
+                .where(users.c.id == bindparam('author_id'))
+                .values(follower_count=func.coalesce(users.c.follower_count, 0) - bindparam('removed')),
+                [{'author_id': author_id, 'removed': count} for author_id, count in Counter(removed).items()]
+            )
+        return len(removed) + self._delete_feeds(db.session)
+    
+    def _delete_marked(self) -> int:
+        """Физически удалить помеченные строки, начиная с листьев."""
+        users = UserModel.__table__
+        posts = PostModel.__table__
+        comments = CommentModel.__table__
+        follows = FollowModel.__table__
+        
+        affected = self._delete_leaves(db.session)
+        affected += self._delete_follows()
+        
+        affected += db.session.execute(
+            users.delete().where(users.c.id.in_(
+                select(users.c.id)
+                .where(
+                    users.c.deleted_at.is_not(None),
+                    ~exists().where(posts.c.author_id == users.c.id),
+                    ~exists().where(comments.c.author_id == users.c.id),
+                    ~exists().where(follows.c.follower_id == users.c.id),
+                    ~exists().where(follows.c.author_id == users.c.id)
+                )
+                .limit(self.batch_size)
+            ))
+        ).rowcount
+        db.session.commit()
+        return affected
+    
+    def _delete_expired_keys(self) -> int:
+        """Удалить ключи идемпотентности с истёкшим сроком хранения."""
+        keys = IdempotencyKeyModel.__table__
+        affected = db.session.execute(
+            keys.delete().where(keys.c.key.in_(
+                select(keys.c.key)
+                .where(keys.c.expires_at <= utcnow())
+                .limit(self.batch_size)
+            ))
+        ).rowcount
+        db.session.commit()
+        return affected
+    
+    def _delete_old_changes(self) -> int:
+        """
+        Удалить записи журнала изменений старше срока хранения.
+        
+        Журнал - очередь доставки webhook, поэтому записи, которые ещё
+        не прошла хотя бы одна живая подписка, не удаляются и после срока
+        хранения. Курсор не застревает: недоставленные пачки уходят в
+        webhook_dead_letter, и подписка идёт дальше.
+        """
+        if self.change_log_retention is None:
+            return 0
+        changes = ChangeLogModel.__table__
+        webhooks = WebhookModel.__table__
+        delivered = select(func.min(webhooks.c.cursor)).where(webhooks.c.deleted_at.is_(None)).scalar_subquery()
+        affected = db.session.execute(
+            changes.delete().where(changes.c.id.in_(
+                select(changes.c.id)
+                .where(
+                    changes.c.created_at <= utcnow() - timedelta(seconds=self.change_log_retention),
+                    changes.c.id <= func.coalesce(delivered, changes.c.id)
+                )
+                .limit(self.batch_size)
+            ))
+        ).rowcount
+        db.session.commit()
+        return affected
+    
+    def purge_batch(self) -> int:
+        """
+        Выполнить один шаг очистки.
+        
+        Returns:
+            Количество затронутых строк
+        """
+        with self.app.app_context():
+            return (
+                self._mark_orphans() + self._delete_marked() + self._delete_expired_keys()
+                + self._delete_old_changes()
+            )
+    
+    def run_once(self) -> int:
+        """
+        Очистить всё, что помечено на удаление, не делая пауз.
+        
+        Returns:
+            Общее количество затронутых строк
+        """
+        total = 0
+        while True:
+            affected = self.purge_batch()
+            if not affected:
+                return total
+            total += affected
+    
+    def _run(self) -> None:
+        """Цикл фонового потока."""
+        while not self._stop.is_set():
+            try:
+                self.purge_batch()
+            except Exception as e:
+                self.app.logger.error(f"Ошибка фоновой очистки: {str(e)}")
+            self._stop.wait(self.interval)
+    
+    def start(self) -> None:
+        """Запустить фоновый поток очистки."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='soft-delete-purger', daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Остановить фоновый поток очистки."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
\ No newline at end of file
@@ -0,0 +1,172 @@
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from flask import g, request
+from sqlalchemy import event
+
+from infrastructure.database import db
+from infrastructure.metrics import metrics, current_repository_method
+
+logger = logging.getLogger('blog.sql.slow')
+
+# Статистика SQL-запросов текущего HTTP-запроса или блока capture_queries
+current_query_stats = ContextVar('current_query_stats', default=None)
+
+metrics.describe('blog_slow_queries_total', 'counter', 'Количество медленных SQL-запросов')
+metrics.describe('blog_query_budget_exceeded_total', 'counter', 'Превышения бюджета SQL-запросов маршрута')
+
+
+class QueryBudgetExceeded(Exception):
+    """Маршрут выполнил больше SQL-запросов, чем разрешено бюджетом."""
+
+
+class QueryStats:
+    """Счётчики SQL-запросов, выполненных в рамках запроса или блока кода."""
+    
+    def __init__(self, endpoint: str | None = None, parent: 'QueryStats | None' = None):
+        """
+        Инициализация счётчиков.
+        
+        Args:
+            endpoint: Имя эндпоинта Flask
+            parent: Внешние счётчики, которым передаются те же значения
+        """
+        self.endpoint = endpoint or (parent.endpoint if parent else None)
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.statements = []
+    
+    def record(self, statement: str, duration: float) -> None:
+        """Учесть выполненный запрос."""
+        stats = self
+        while stats is not None:
+            stats.count += 1
+            stats.duration += duration
+            stats.statements.append(statement)
+            stats = stats.parent
+
+
+@contextmanager
+def capture_queries():
+    """
+    Посчитать SQL-запросы, выполненные внутри блока.
+    
+    Yields:
+        Объект QueryStats, заполняемый по мере выполнения запросов
+    """
+    stats = QueryStats(parent=current_query_stats.get())
+    token = current_query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        current_query_stats.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """
+    Тестовый помощник: упасть, если блок выполнил больше limit запросов.
+    
+    Args:
+        limit: Допустимое количество запросов
+    """
+    with capture_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        raise AssertionError(
+            f"Выполнено {stats.count} SQL-запросов при бюджете {limit}:\n" + '\n'.join(stats.statements)
+        )
+
+
+class QueryLog:
+    """
+    Учёт SQL-запросов через события движка SQLAlchemy.
+    
+    Считает количество и время запросов каждого HTTP-запроса, пишет
+    медленные запросы в лог blog.sql.slow и проверяет бюджеты маршрутов
+    из конфигурации QUERY_BUDGETS.
+    """
+    
+    def __init__(self):
+        self.slow_threshold = 0.1
+        self.budgets = {}
+        self.raise_on_budget = False
+    
+    def init_app(self, app) -> None:
+        """
+        Подключить учёт запросов к движку и запросам приложения.
+        
+        Args:
+            app: Экземпляр Flask приложения
+        """
+        self.slow_threshold = app.config.get('SLOW_QUERY_THRESHOLD', 0.1)
+        self.budgets = app.config.get('QUERY_BUDGETS', {})
+        self.raise_on_budget = app.config.get('QUERY_BUDGET_RAISE', app.testing)
+        
+        with app.app_context():
+            self.watch_engine(db.engine)
+        
+        @app.before_request
+        def start_query_stats():
+            stats = QueryStats(request.endpoint, parent=current_query_stats.get())
+            g.query_stats = stats
+            g.query_stats_token = current_query_stats.set(stats)
+        
+        @app.after_request
+        def check_query_budget(response):
+            stats = g.get('query_stats')
+            budget = self.budgets.get(request.endpoint)
+            if stats is not None and budget is not None and stats.count > budget:
+                metrics.inc('blog_query_budget_exceeded_total', (('endpoint', request.endpoint),))
+                message = (
+                    f"Эндпоинт {request.endpoint} выполнил {stats.count} SQL-запросов "
+                    f"при бюджете {budget}"
+                )
+                if self.raise_on_budget:
+                    raise QueryBudgetExceeded(message)
+                app.logger.warning(message)
+            return response
+        
+        @app.teardown_request
+        def reset_query_stats(error=None):
+            # g живёт в контексте приложения и может пережить запрос
+            # (например, в тестах), а before_request до учёта могут
+            # ответить сами: учёт не должен переходить в следующий запрос
+            g.pop('query_stats', None)
+            token = g.pop('query_stats_token', None)
+            if token is not None:
+                current_query_stats.reset(token)
+    
+    def watch_engine(self, engine) -> None:
+        """
+        Учитывать запросы движка (основного или дополнительного, например шарда).
+        
+        Args:
+            engine: Движок SQLAlchemy
+        """
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+    
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(perf_counter())
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        duration = perf_counter() - conn.info['query_start'].pop()
+        stats = current_query_stats.get()
+        if stats is not None:
+            stats.record(statement, duration)
+        if duration >= self.slow_threshold:
+            metrics.inc('blog_slow_queries_total', ())
+            logger.warning(
+                "Медленный запрос %.1f мс (метод: %s, эндпоинт: %s): %s",
+                duration * 1000,
+                current_repository_method.get(),
+                stats.endpoint if stats is not None else None,
+                statement
+            )
+
+
+query_log = QueryLog()
\ No newline at end of file
@@ -0,0 +1,107 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+from time import time
+
+# Ячейка корзины: тег ключа, токены, время последнего обновления
+SLOT = struct.Struct('<Qdd')
+# Ячеек в наборе: ключ может занять любую ячейку своего набора
+WAYS = 4
+# Блокировки потоков по наборам (между процессами - fcntl по байтам набора)
+LOCK_STRIPES = 64
+
+
+def key_tag(key: str) -> int:
+    """64-битный тег ключа; 0 зарезервирован за пустой ячейкой."""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+
+class TokenBucketLimiter:
+    """
+    Корзины токенов в общей памяти.
+    
+    Таблица фиксированного размера лежит в mmap файла, поэтому её видят
+    все рабочие процессы, открывшие тот же путь (без пути - память
+    процесса). Ключ попадает в набор из WAYS ячеек по хешу; если в наборе
+    нет места, вытесняется корзина, обновлявшаяся раньше всех, и её
+    клиент начинает с полной корзины.
+    """
+    
+    def __init__(self, path: str | None = None, slots: int = 65536):
+        """
+        Инициализация таблицы.
+        
+        Args:
+            path: Файл таблицы (лучше на tmpfs, например /dev/shm); None - без общей памяти
+            slots: Количество ячеек
+        """
+        self.sets = max(slots // WAYS, 1)
+        size = self.sets * WAYS * SLOT.size
+        self._fd = None
+        if path:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._buffer = mmap.mmap(self._fd, size)
+        else:
+            self._buffer = mmap.mmap(-1, size)
+        self._locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+    
+    def acquire(self, key: str, capacity: float, rate: float, now: float | None = None) -> tuple[bool, float, float]:
+        """
+        Взять токен из корзины ключа.
+        
+        Args:
+            key: Ключ корзины (клиент и маршрут)
+            capacity: Размер корзины
+            rate: Пополнение, токенов в секунду
+            now: Текущее время (для тестов)
+        
+        Returns:
+            Разрешён ли запрос, оставшиеся токены и секунды до следующего
+            токена (0, если запрос разрешён)
+        """
+        now = time() if now is None else now
+        tag = key_tag(key)
+        index = tag % self.sets
+        offset = index * WAYS * SLOT.size
+        with self._locks[index % LOCK_STRIPES]:
+            if self._fd is not None:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, WAYS * SLOT.size, offset)
+            try:
+                position, tokens = self._find(tag, offset, capacity, now, rate)
+                if tokens >= 1:
+                    tokens -= 1
+                    allowed, retry_after = True, 0.0
+                else:
+                    allowed, retry_after = False, (1 - tokens) / rate
+                SLOT.pack_into(self._buffer, position, tag, tokens, now)
+            finally:
+                if self._fd is not None:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN, WAYS * SLOT.size, offset)
+        return allowed, tokens, retry_after
+    
+    def _find(self, tag: int, offset: int, capacity: float, now: float, rate: float) -> tuple[int, float]:
+        """Ячейка ключа в наборе и её токены после пополнения."""
+        victim, victim_updated = offset, None
+        for way in range(WAYS):
+            position = offset + way * SLOT.size
+            slot_tag, tokens, updated = SLOT.unpack_from(self._buffer, position)
+            if slot_tag == tag:
+                # Часы другого процесса могли отстать: время назад не идёт
+                return position, min(capacity, tokens + max(now - updated, 0.0) * rate)
+            if slot_tag == 0:
+                updated = float('-inf')
+            if victim_updated is None or updated < victim_updated:
+                victim, victim_updated = position, updated
+        return victim, float(capacity)
+    
+    def close(self) -> None:
+        """Закрыть отображение и файл."""
+        self._buffer.close()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
\ No newline at end of file
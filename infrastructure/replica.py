@@ -0,0 +1,79 @@
+import logging
+import os
+import threading
+from time import monotonic
+
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from infrastructure.backup import backup_database
+
+logger = logging.getLogger('blog.replica')
+
+
+class SQLiteReplica:
+    """
+    Реплика для чтения: копия файла SQLite, обновляемая backup API.
+    
+    Копия снимается во временный файл и атомарно подменяет реплику,
+    поэтому читатели никогда не видят наполовину записанный файл.
+    Движок реплики не держит пул соединений: каждое новое соединение
+    открывает актуальный файл.
+    """
+    
+    def __init__(self, primary_path: str, replica_path: str, interval: float = 1.0):
+        """
+        Инициализация реплики.
+        
+        Args:
+            primary_path: Файл основной базы
+            replica_path: Файл реплики
+            interval: Период синхронизации в секундах (0 - только вручную)
+        """
+        self.primary_path = primary_path
+        self.replica_path = replica_path
+        self.interval = interval
+        self.synced_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sync()
+        self.engine = create_engine(
+            f'sqlite:///file:{os.path.abspath(replica_path)}?mode=ro&uri=true',
+            poolclass=NullPool
+        )
+    
+    def sync(self) -> None:
+        """
+        Снять свежую копию основной базы и подменить ею реплику.
+        
+        Копия снимается тем же пошаговым backup_database, что и резервные
+        копии: основная база открывается только на чтение и копируется
+        шагами с паузами, поэтому писатели не ждут копирования всего файла.
+        """
+        with self._lock:
+            started = monotonic()
+            backup_database(self.primary_path, self.replica_path)
+            self.synced_at = started
+    
+    def _run(self) -> None:
+        """Цикл фонового потока."""
+        while not self._stop.wait(self.interval):
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error("Ошибка синхронизации реплики: %s", e)
+    
+    def start(self) -> None:
+        """Запустить периодическую синхронизацию."""
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='replica-sync', daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Остановить периодическую синхронизацию."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.engine.dispose()
\ No newline at end of file
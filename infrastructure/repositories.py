@@ -1,10 +1,229 @@
+import logging
+import threading
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import bindparam, func, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
 from domain.entities import User, Post, Comment
-from domain.repositories import IUserRepository, IPostRepository, ICommentRepository
-from infrastructure.database import db, UserModel, PostModel, CommentModel
+from domain.repositories import IUserRepository, IPostRepository, ICommentRepository, UserAlreadyExists
+from infrastructure.bloom import BloomFilter
+from infrastructure.changes import record_change
+from infrastructure.comment_tree import parent_path, path_segment, read_thread, thread_params, thread_statement
+from infrastructure.database import db, UserModel, PostModel, CommentModel, utcnow
+from infrastructure.metrics import metrics
+from infrastructure.trending import (
+    DEFAULT_HALF_LIFE,
+    add_comment_statement,
+    decay_rate,
+    log_weight,
+    remove_comment_statement
+)
+
+logger = logging.getLogger('blog.repositories')
+
+metrics.describe('blog_user_unique_checks_total', 'counter', 'Проверки занятости имени и почты при регистрации по результату')
+
+_users = UserModel.__table__
+# Занятость проверяется по всем строкам: UNIQUE действует и на удалённых до очистки
+USER_KEYS_PAGE = (
+    select(_users.c.id, _users.c.username, _users.c.email)
+    .where(_users.c.id > bindparam('after'))
+    .order_by(_users.c.id)
+    .limit(bindparam('limit'))
+)
+COUNT_USERS = select(func.count()).select_from(_users)
+FIND_USER_KEYS = (
+    select(_users.c.username, _users.c.email)
+    .where(or_(_users.c.username == bindparam('username'), _users.c.email == bindparam('email')))
+    .limit(1)
+)
+# Минимальная ёмкость фильтра занятых имён и почт (ключей)
+MIN_FILTER_CAPACITY = 1 << 16
+# Пользователей за один запрос при построении фильтра
+WARM_UP_BATCH = 10000
+
+
+def read_session():
+    """
+    Сессия для чтения.
+    
+    Если запрос направлен на реплику (см. interfaces/web/replica.py),
+    чтения идут в её сессию; записи всегда идут в db.session.
+    """
+    if has_app_context():
+        session = g.get('blog_replica_session')
+        if session is not None:
+            return session
+    return db.session
+
+
+def live_users():
+    """Запрос неудалённых пользователей."""
+    return read_session().query(UserModel).filter(UserModel.deleted_at.is_(None))
+
+
+def live_posts():
+    """Запрос неудалённых публикаций неудалённых авторов."""
+    return (
+        read_session().query(PostModel)
+        .join(UserModel, PostModel.author_id == UserModel.id)
+        .filter(PostModel.deleted_at.is_(None), UserModel.deleted_at.is_(None))
+    )
+
+
+def live_comments():
+    """
+    Запрос видимых комментариев.
+    
+    Комментарий скрыт, если удалён он сам, его публикация, автор
+    публикации или автор комментария: дочерние строки не помечаются
+    при удалении родителя, этим занимается фоновая очистка.
+    """
+    post_author = aliased(UserModel)
+    comment_author = aliased(UserModel)
+    return (
+        read_session().query(CommentModel)
+        .join(PostModel, CommentModel.post_id == PostModel.id)
+        .join(post_author, PostModel.author_id == post_author.id)
+        .join(comment_author, CommentModel.author_id == comment_author.id)
+        .filter(
+            CommentModel.deleted_at.is_(None),
+            PostModel.deleted_at.is_(None),
+            post_author.deleted_at.is_(None),
+            comment_author.deleted_at.is_(None)
+        )
+    )
+
+
+def to_comment(comment) -> Comment:
+    """Сущность комментария из модели или строки."""
+    return Comment(
+        id=comment.id,
+        content=comment.content,
+        post_id=comment.post_id,
+        author_id=comment.author_id,
+        parent_id=comment.parent_id,
+        depth=comment.depth or 0
+    )
+
+
+_comments = CommentModel.__table__
+_post_author = UserModel.__table__.alias('post_author')
+_comment_author = UserModel.__table__.alias('comment_author')
+# Страница обсуждения с теми же условиями видимости, что и live_comments
+THREAD = thread_statement(
+    select(_comments)
+    .join(PostModel.__table__, _comments.c.post_id == PostModel.__table__.c.id)
+    .join(_post_author, PostModel.__table__.c.author_id == _post_author.c.id)
+    .join(_comment_author, _comments.c.author_id == _comment_author.c.id)
+    .where(
+        _comments.c.deleted_at.is_(None),
+        PostModel.__table__.c.deleted_at.is_(None),
+        _post_author.c.deleted_at.is_(None),
+        _comment_author.c.deleted_at.is_(None)
+    )
+)
+# Путь нового комментария известен только после выдачи ID
+SET_PATH = (
+    _comments.update()
+    .where(_comments.c.id == bindparam('comment_id'))
+    .values(path=parent_path(_comments.c.parent_id) + bindparam('segment'))
+)
+
+
+def _soft_delete(model, entity: str, entity_id: int) -> None:
+    """
+    Пометить запись удалённой одним UPDATE по первичному ключу.
+    
+    Удаление записывается в журнал изменений той же транзакцией.
+    
+    Args:
+        model: Модель SQLAlchemy
+        entity: Имя сущности в журнале изменений
+        entity_id: ID записи
+    """
+    deleted = db.session.execute(
+        model.__table__.update()
+        .where(model.__table__.c.id == entity_id, model.__table__.c.deleted_at.is_(None))
+        .values(deleted_at=utcnow())
+    ).rowcount
+    if deleted:
+        record_change(entity, 'delete', entity_id, {'id': entity_id})
+    db.session.commit()
+
+
+def unique_violation(error: IntegrityError, user: User) -> UserAlreadyExists:
+    """Ошибка занятости по нарушению UNIQUE (SQLite называет столбец в сообщении)."""
+    if '.email' in str(error.orig):
+        return UserAlreadyExists('email', user.email)
+    return UserAlreadyExists('username', user.username)
 
 
 class SQLUserRepository(IUserRepository):
-    """Реализация репозитория пользователей на SQLAlchemy."""
+    """
+    Реализация репозитория пользователей на SQLAlchemy.
+    
+    Занятые имена и почты держатся в фильтре Блума: регистрация со
+    свободными значениями не делает лишних запросов, а при возможном
+    совпадении занятость подтверждается одним SELECT по уникальным
+    индексам, поэтому дубликат отклоняется без транзакции записи.
+    Пока фильтр не построен (см. warm_up), занятость проверяется в базе.
+    Записи других процессов в фильтр не попадают, их ловит UNIQUE.
+    """
+    
+    def __init__(self):
+        self._taken = None
+        self._building = threading.Lock()
+    
+    def warm_up(self) -> None:
+        """
+        Построить фильтр занятых имён и почт, если его нет или он заполнен.
+        
+        Требует контекста приложения. Миллион пользователей читается и
+        добавляется в фильтр за 3-4 секунды, поэтому приложение строит его
+        в фоне (start_warm_up). Пользователи читаются страницами по
+        WARM_UP_BATCH отдельными запросами: без WAL долгое чтение
+        не давало бы писателям завершить транзакцию.
+        """
+        if not self._building.acquire(blocking=False):
+            return
+        try:
+            taken = self._taken
+            if taken is not None and taken.count <= taken.capacity:
+                return
+            users = db.session.execute(COUNT_USERS).scalar()
+            # Запас вдвое: по два ключа на пользователя
+            taken = BloomFilter(max(4 * users, MIN_FILTER_CAPACITY))
+            after = 0
+            while True:
+                rows = db.session.execute(USER_KEYS_PAGE, {'after': after, 'limit': WARM_UP_BATCH}).all()
+                for _, username, email in rows:
+                    taken.add('u:' + username)
+                    taken.add('e:' + email)
+                if len(rows) < WARM_UP_BATCH:
+                    break
+                after = rows[-1].id
+            self._taken = taken
+        finally:
+            self._building.release()
+    
+    def start_warm_up(self, app) -> None:
+        """
+        Построить фильтр в фоновом потоке.
+        
+        Args:
+            app: Экземпляр Flask приложения
+        """
+        def run():
+            try:
+                with app.app_context():
+                    self.warm_up()
+            except Exception as e:
+                logger.error("Ошибка построения фильтра занятых имён и почт: %s", e)
+        
+        threading.Thread(target=run, name='user-filter', daemon=True).start()
     
     def create(self, user: User) -> User:
         """
@@ -15,15 +234,50 @@ class SQLUserRepository(IUserRepository):
             
         Returns:
             Созданная сущность пользователя с ID
+        
+        Raises:
+            UserAlreadyExists: Если имя или почта уже заняты
         """
+        taken = self._taken
+        username_key, email_key = 'u:' + user.username, 'e:' + user.email
+        if taken is None or username_key in taken or email_key in taken:
+            row = db.session.execute(FIND_USER_KEYS, {'username': user.username, 'email': user.email}).first()
+            if row is not None:
+                metrics.inc('blog_user_unique_checks_total', (('result', 'taken'),))
+                if row.username == user.username:
+                    raise UserAlreadyExists('username', user.username)
+                raise UserAlreadyExists('email', user.email)
+            result = 'not_ready' if taken is None else 'false_positive'
+        else:
+            result = 'free'
+        metrics.inc('blog_user_unique_checks_total', (('result', result),))
         user_model = UserModel(username=user.username, email=user.email)
         db.session.add(user_model)
-        db.session.commit()
-        return User(
+        # Сущность собирается до commit: после него атрибуты модели
+        # истекают, и чтение id стоило бы лишнего SELECT
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            # Значение заняли другой процесс или параллельный запрос
+            db.session.rollback()
+            metrics.inc('blog_user_unique_checks_total', (('result', 'conflict'),))
+            error = unique_violation(e, user)
+            if taken is not None:
+                taken.add(username_key if error.field == 'username' else email_key)
+            raise error from e
+        created = User(
             id=user_model.id, 
             username=user_model.username, 
             email=user_model.email
         )
+        record_change('user', 'create', created.id, vars(created))
+        db.session.commit()
+        if taken is not None:
+            taken.add(username_key)
+            taken.add(email_key)
+            if taken.count > taken.capacity and not self._building.locked():
+                self.start_warm_up(current_app._get_current_object())
+        return created
     
     def get_by_id(self, user_id: int) -> User | None:
         """
@@ -35,7 +289,7 @@ class SQLUserRepository(IUserRepository):
         Returns:
             Сущность пользователя или None если не найден
         """
-        user_model = db.session.get(UserModel, user_id)
+        user_model = live_users().filter(UserModel.id == user_id).first()
         if user_model:
             return User(
                 id=user_model.id,
@@ -46,7 +300,7 @@ class SQLUserRepository(IUserRepository):
     
     def get_all(self) -> list[User]:
         """Получить всех пользователей."""
-        users = UserModel.query.all()
+        users = live_users().all()
         return [
             User(id=u.id, username=u.username, email=u.email) 
             for u in users
@@ -56,13 +310,13 @@ class SQLUserRepository(IUserRepository):
         """
         Удалить пользователя по ID.
         
+        Удаление мягкое: публикации и комментарии пользователя
+        скрываются сразу, а физически удаляются фоновой очисткой.
+        
         Args:
             user_id: ID пользователя для удаления
         """
-        user = UserModel.query.get(user_id)
-        if user:
-            db.session.delete(user)
-            db.session.commit()
+        _soft_delete(UserModel, 'user', user_id)
 
 
 class SQLPostRepository(IPostRepository):
@@ -84,13 +338,16 @@ class SQLPostRepository(IPostRepository):
             author_id=post.author_id
         )
         db.session.add(post_model)
-        db.session.commit()
-        return Post(
+        db.session.flush()
+        created = Post(
             id=post_model.id,
             title=post_model.title,
             content=post_model.content,
             author_id=post_model.author_id
         )
+        record_change('post', 'create', created.id, vars(created))
+        db.session.commit()
+        return created
     
     def get_by_id(self, post_id: int) -> Post | None:
         """
@@ -102,7 +359,7 @@ class SQLPostRepository(IPostRepository):
         Returns:
             Сущность публикации или None если не найдена
         """
-        post_model = db.session.get(PostModel, post_id)
+        post_model = live_posts().filter(PostModel.id == post_id).first()
         if post_model:
             return Post(
                 id=post_model.id,
@@ -114,7 +371,7 @@ class SQLPostRepository(IPostRepository):
     
     def get_all(self) -> list[Post]:
         """Получить все публикации."""
-        posts = PostModel.query.all()
+        posts = live_posts().all()
         return [
             Post(id=p.id, title=p.title, content=p.content, author_id=p.author_id) 
             for p in posts
@@ -122,24 +379,34 @@ class SQLPostRepository(IPostRepository):
 
     def delete(self, post_id: int) -> None:
         """
-        Удалить публикацию по ID.
+        Удалить публикацию по ID (мягкое удаление).
         
         Args:
             post_id: ID публикации для удаления
         """
-        post = PostModel.query.get(post_id)
-        if post:
-            db.session.delete(post)
-            db.session.commit()
+        _soft_delete(PostModel, 'post', post_id)
 
 
 class SQLCommentRepository(ICommentRepository):
     """Реализация репозитория комментариев на SQLAlchemy."""
     
+    def __init__(self, trending_half_life: float = DEFAULT_HALF_LIFE):
+        """
+        Инициализация репозитория.
+        
+        Args:
+            trending_half_life: Период полураспада веса комментария в рейтинге
+        """
+        self.trending_rate = decay_rate(trending_half_life)
+    
     def create(self, comment: Comment) -> Comment:
         """
         Создать новый комментарий в базе данных.
         
+        В той же транзакции к счёту публикации в рейтинге
+        прибавляется вес нового комментария, а в журнал изменений
+        добавляется запись о создании.
+        
         Args:
             comment: Сущность комментария
             
@@ -149,28 +416,26 @@ class SQLCommentRepository(ICommentRepository):
         comment_model = CommentModel(
             content=comment.content,
             post_id=comment.post_id,
-            author_id=comment.author_id
+            author_id=comment.author_id,
+            created_at=utcnow(),
+            parent_id=comment.parent_id,
+            depth=comment.depth
         )
         db.session.add(comment_model)
+        db.session.flush()
+        db.session.execute(SET_PATH, {'comment_id': comment_model.id, 'segment': path_segment(comment_model.id)})
+        db.session.execute(add_comment_statement(
+            comment_model.post_id, log_weight(comment_model.created_at, self.trending_rate)
+        ))
+        created = to_comment(comment_model)
+        record_change('comment', 'create', created.id, vars(created))
         db.session.commit()
-        return Comment(
-            id=comment_model.id,
-            content=comment_model.content,
-            post_id=comment_model.post_id,
-            author_id=comment_model.author_id
-        )
+        return created
     
     def get_all(self) -> list[Comment]:
         """Получить все комментарии."""
-        comments = CommentModel.query.all()
-        return [
-            Comment(
-                id=c.id,
-                content=c.content,
-                post_id=c.post_id,
-                author_id=c.author_id
-            ) for c in comments
-        ]
+        comments = live_comments().all()
+        return [to_comment(c) for c in comments]
 
     def get_by_id(self, comment_id: int) -> Comment | None:
         """
@@ -182,24 +447,49 @@ class SQLCommentRepository(ICommentRepository):
         Returns:
             Сущность комментария или None если не найден
         """
-        comment = CommentModel.query.get(comment_id)
+        comment = live_comments().filter(CommentModel.id == comment_id).first()
         if comment:
-            return Comment(
-                id=comment.id,
-                content=comment.content,
-                post_id=comment.post_id,
-                author_id=comment.author_id
-            )
+            return to_comment(comment)
         return None
 
     def delete(self, comment_id: int) -> None:
         """
-        Удалить комментарий по ID.
+        Удалить комментарий по ID (мягкое удаление).
+        
+        Вес комментария вычитается из счёта публикации в рейтинге.
         
         Args:
             comment_id: ID комментария для удаления
         """
-        comment = CommentModel.query.get(comment_id)
-        if comment:
-            db.session.delete(comment)
-            db.session.commit()
\ No newline at end of file
+        table = CommentModel.__table__
+        deleted = db.session.execute(
+            table.update()
+            .where(table.c.id == comment_id, table.c.deleted_at.is_(None))
+            .values(deleted_at=utcnow())
+            .returning(table.c.post_id, table.c.created_at)
+        ).first()
+        # Комментарии без created_at созданы до рейтинга и в нём не учтены
+        if deleted is not None and deleted.created_at is not None:
+            db.session.execute(remove_comment_statement(
+                deleted.post_id, log_weight(deleted.created_at, self.trending_rate)
+            ))
+        if deleted is not None:
+            record_change('comment', 'delete', comment_id, {'id': comment_id, 'post_id': deleted.post_id})
+        db.session.commit()
+    
+    def get_thread(self, post_id: int, limit: int, start: int | None = None,
+                   max_depth: int | None = None) -> tuple[list[Comment], int | None]:
+        """
+        Получить страницу обсуждения публикации.
+        
+        Args:
+            post_id: ID публикации
+            limit: Количество комментариев верхнего уровня
+            start: ID комментария верхнего уровня, с которого начинается страница
+            max_depth: Максимальная глубина ответов (None - без ограничения)
+        
+        Returns:
+            Комментарии в порядке обхода дерева и ID начала следующей страницы
+        """
+        rows, next_start = read_thread(read_session(), THREAD, thread_params(post_id, limit, start, max_depth))
+        return [to_comment(row) for row in rows], next_start
\ No newline at end of file
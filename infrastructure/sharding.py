@@ -0,0 +1,835 @@
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import zlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    PrimaryKeyConstraint,
+    String,
+    Table,
+    create_engine,
+    event,
+    bindparam,
+    exists,
+    func,
+    select,
+    tuple_
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from domain.entities import User, Post, Comment
+from domain.repositories import (
+    IUserRepository,
+    IPostRepository,
+    ICommentRepository,
+    ITrendingRepository,
+    IFeedRepository,
+    UserAlreadyExists
+)
+from infrastructure.comment_tree import parent_path, path_segment, read_thread, thread_params, thread_statement
+from infrastructure.database import (
+    UserModel,
+    PostModel,
+    CommentModel,
+    PostTrendingModel,
+    FollowModel,
+    FeedHeadModel,
+    FeedEntryModel,
+    upgrade_schema,
+    utcnow
+)
+from infrastructure.feed import (
+    DEFAULT_FANOUT_THRESHOLD,
+    DEFAULT_MAX_ENTRIES,
+    advance_heads_statement,
+    author_chunks,
+    before_cursor,
+    feed_params,
+    merge_page,
+    pulled_statement,
+    write_entries_statement
+)
+from infrastructure.purger import SoftDeletePurger
+from infrastructure.repositories import unique_violation
+from infrastructure.trending import (
+    DEFAULT_HALF_LIFE,
+    NEGLIGIBLE_SCORE,
+    add_comment_statement,
+    current_score,
+    decay_rate,
+    log_weight,
+    register_sql_functions,
+    remove_comment_statement
+)
+
+# Количество логических корзин; ID хранит номер корзины в младших разрядах,
+# поэтому значение нельзя менять после появления данных
+BUCKET_COUNT = 1024
+
+sequence_metadata = MetaData()
+
+# Последовательности ID по корзинам: переносятся вместе с корзиной при решардинге
+shard_sequence = Table(
+    'shard_sequence', sequence_metadata,
+    Column('name', String(32), nullable=False),
+    Column('bucket', Integer, nullable=False),
+    Column('value', Integer, nullable=False),
+    PrimaryKeyConstraint('name', 'bucket'),
+)
+
+# Занятые почты: строка лежит на шарде корзины хеша почты, поэтому
+# уникальность проверяет один PRIMARY KEY, а не проверка всех шардов
+user_email = Table(
+    'user_email', sequence_metadata,
+    Column('email', String(120), primary_key=True),
+    Column('bucket', Integer, nullable=False),
+    Column('user_id', Integer, nullable=False),
+)
+
+users = UserModel.__table__
+posts = PostModel.__table__
+comments = CommentModel.__table__
+trending = PostTrendingModel.__table__
+follows = FollowModel.__table__
+feed_heads = FeedHeadModel.__table__
+feed_entries = FeedEntryModel.__table__
+SHARDED_TABLES = (users, posts, comments, trending, follows, feed_heads, feed_entries)
+
+
+def shard_uri(value: str) -> str:
+    """Превратить путь к файлу в URI SQLite; URI возвращается без изменений."""
+    if '://' in value:
+        return value
+    return f'sqlite:///{os.path.abspath(value)}'
+
+
+def user_bucket(username: str) -> int:
+    """Корзина пользователя: стабильный хеш имени."""
+    return zlib.crc32(username.encode('utf-8')) % BUCKET_COUNT
+
+
+def email_bucket(email: str) -> int:
+    """Корзина строки занятой почты: стабильный хеш почты."""
+    return zlib.crc32(email.encode('utf-8')) % BUCKET_COUNT
+
+
+def bucket_of(entity_id: int) -> int:
+    """Корзина, закодированная в глобальном ID."""
+    return entity_id % BUCKET_COUNT
+
+
+def make_id(sequence: int, bucket: int) -> int:
+    """Глобальный ID из номера в последовательности корзины и самой корзины."""
+    return sequence * BUCKET_COUNT + bucket
+
+
+class ShardedStore:
+    """
+    Маршрутизация по шардам - отдельным файлам SQLite.
+    
+    Пользователь попадает в корзину по хешу имени, его публикации - в
+    корзину автора, комментарии - в корзину публикации. Корзина
+    хранится в ID, а шард корзины - bucket % количество шардов, поэтому
+    маршрут любой записи вычисляется по её ID без справочника.
+    """
+    
+    def __init__(self, uris: list):
+        """
+        Инициализация хранилища.
+        
+        Args:
+            uris: URI или пути файлов SQLite, по одному на шард
+        
+        Raises:
+            ValueError: Если список шардов пуст
+        """
+        if not uris:
+            raise ValueError("Для шардированного хранилища нужен хотя бы один шард (SHARD_DATABASE_URIS)")
+        self.engines = [create_engine(shard_uri(uri)) for uri in uris]
+        for engine in self.engines:
+            event.listen(engine, 'connect', register_sql_functions)
+            with engine.begin() as connection:
+                upgrade_schema(connection, list(SHARDED_TABLES))
+            sequence_metadata.create_all(engine)
+        self._executor = ThreadPoolExecutor(len(self.engines), thread_name_prefix='shard') \
+            if len(self.engines) > 1 else None
+    
+    def engine_for_bucket(self, bucket: int):
+        """Движок шарда, которому принадлежит корзина."""
+        return self.engines[bucket % len(self.engines)]
+    
+    def engine_for_id(self, entity_id: int):
+        """Движок шарда, где лежит запись с данным ID."""
+        return self.engine_for_bucket(bucket_of(entity_id))
+    
+    def scatter(self, query) -> list:
+        """
+        Выполнить функцию на всех шардах параллельно.
+        
+        Args:
+            query: Функция от соединения шарда
+        
+        Returns:
+            Результаты в порядке шардов
+        """
+        def run(engine):
+            with engine.connect() as connection:
+                return query(connection)
+        
+        if self._executor is None:
+            return [run(self.engines[0])]
+        # Копия контекста сохраняет учёт запросов и текущий спан в потоках
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, run, engine)
+            for engine in self.engines
+        ]
+        return [future.result() for future in futures]
+    
+    def gather(self, query) -> list:
+        """Scatter-gather: объединить отсортированные по ID строки всех шардов."""
+        return list(heapq.merge(*self.scatter(query), key=lambda row: row.id))
+    
+    @staticmethod
+    def next_id(connection, name: str, bucket: int) -> int:
+        """
+        Выдать следующий глобальный ID в транзакции вставки.
+        
+        Args:
+            connection: Соединение шарда с открытой транзакцией
+            name: Имя последовательности (таблицы)
+            bucket: Корзина записи
+        
+        Returns:
+            Глобальный ID
+        """
+        sequence = connection.execute(
+            shard_sequence.update()
+            .where(shard_sequence.c.name == name, shard_sequence.c.bucket == bucket)
+            .values(value=shard_sequence.c.value + 1)
+            .returning(shard_sequence.c.value)
+        ).scalar()
+        if sequence is None:
+            sequence = 1
+            connection.execute(shard_sequence.insert().values(name=name, bucket=bucket, value=sequence))
+        return make_id(sequence, bucket)
+    
+    def live_user_ids(self, user_ids) -> set:
+        """
+        Отобрать неудалённых пользователей, опрашивая только их шарды.
+        
+        Args:
+            user_ids: ID пользователей
+        
+        Returns:
+            Множество ID неудалённых пользователей
+        """
+        live = set()
+        for engine, ids in self.group_by_engine(user_ids):
+            with engine.connect() as connection:
+                live.update(connection.execute(
+                    select(users.c.id).where(users.c.id.in_(ids), users.c.deleted_at.is_(None))
+                ).scalars())
+        return live
+    
+    def group_by_engine(self, entity_ids, chunk_size: int = 500):
+        """
+        Разбить ID по шардам пачками для запросов с IN.
+        
+        Args:
+            entity_ids: ID записей
+            chunk_size: Максимальный размер пачки
+        
+        Yields:
+            Пары (движок шарда, список ID)
+        """
+        by_engine = {}
+        for entity_id in set(entity_ids):
+            by_engine.setdefault(self.engine_for_id(entity_id), []).append(entity_id)
+        for engine, ids in by_engine.items():
+            for start in range(0, len(ids), chunk_size):
+                yield engine, ids[start:start + chunk_size]
+    
+    def soft_delete(self, table, entity_id: int) -> None:
+        """Пометить запись удалённой на её шарде."""
+        with self.engine_for_id(entity_id).begin() as connection:
+            connection.execute(
+                table.update()
+                .where(table.c.id == entity_id, table.c.deleted_at.is_(None))
+                .values(deleted_at=utcnow())
+            )
+    
+    def dispose(self) -> None:
+        """Закрыть соединения и пул потоков."""
+        if self._executor is not None:
+            self._executor.shutdown()
+        for engine in self.engines:
+            engine.dispose()
+
+
+def _live_posts_query():
+    """Неудалённые публикации неудалённых авторов (автор всегда на том же шарде)."""
+    return (
+        select(posts)
+        .join(users, posts.c.author_id == users.c.id)
+        .where(posts.c.deleted_at.is_(None), users.c.deleted_at.is_(None))
+    )
+
+
+def _local_comments_query():
+    """
+    Комментарии, видимые в пределах шарда.
+    
+    Публикация и её автор лежат на шарде комментария; автор комментария
+    может быть на другом шарде и проверяется отдельно.
+    """
+    return (
+        select(comments)
+        .join(posts, comments.c.post_id == posts.c.id)
+        .join(users, posts.c.author_id == users.c.id)
+        .where(comments.c.deleted_at.is_(None), posts.c.deleted_at.is_(None), users.c.deleted_at.is_(None))
+    )
+
+
+# Страница обсуждения в пределах шарда публикации
+SHARD_THREAD = thread_statement(_local_comments_query())
+
+
+def _to_comment(row) -> Comment:
+    return Comment(
+        id=row.id, content=row.content, post_id=row.post_id, author_id=row.author_id,
+        parent_id=row.parent_id, depth=row.depth or 0
+    )
+
+
+class ShardedUserRepository(IUserRepository):
+    """Реализация репозитория пользователей поверх шардов."""
+    
+    def __init__(self, store: ShardedStore):
+        self.store = store
+    
+    def create(self, user: User) -> User:
+        """
+        Создать нового пользователя на шарде его корзины.
+        
+        Имя уникально в пределах шарда (одно имя - одна корзина). Почта
+        до вставки пользователя занимается строкой user_email на шарде
+        корзины почты: из параллельных регистраций с одной почтой её
+        займёт только одна. Если пользователь не вставлен, почта
+        освобождается; при падении процесса между этими шагами она
+        останется занятой.
+        
+        Raises:
+            UserAlreadyExists: Если имя или почта уже заняты
+        """
+        store = self.store
+        bucket = user_bucket(user.username)
+        engine = store.engine_for_bucket(bucket)
+        with engine.begin() as connection:
+            user_id = store.next_id(connection, 'user', bucket)
+        claim_bucket = email_bucket(user.email)
+        claim_engine = store.engine_for_bucket(claim_bucket)
+        try:
+            with claim_engine.begin() as connection:
+                connection.execute(user_email.insert().values(
+                    email=user.email, bucket=claim_bucket, user_id=user_id
+                ))
+        except IntegrityError as e:
+            raise UserAlreadyExists('email', user.email) from e
+        try:
+            with engine.begin() as connection:
+                connection.execute(users.insert().values(id=user_id, username=user.username, email=user.email))
+        except IntegrityError as e:
+            with claim_engine.begin() as connection:
+                connection.execute(user_email.delete().where(
+                    user_email.c.email == user.email, user_email.c.user_id == user_id
+                ))
+            raise unique_violation(e, user) from e
+        return User(id=user_id, username=user.username, email=user.email)
+    
+    def get_by_id(self, user_id: int) -> User | None:
+        """Получить пользователя по ID с его шарда."""
+        with self.store.engine_for_id(user_id).connect() as connection:
+            row = connection.execute(
+                select(users).where(users.c.id == user_id, users.c.deleted_at.is_(None))
+            ).first()
+        return User(id=row.id, username=row.username, email=row.email) if row else None
+    
+    def get_all(self) -> list[User]:
+        """Получить всех пользователей со всех шардов в порядке ID."""
+        rows = self.store.gather(lambda connection: connection.execute(
+            select(users).where(users.c.deleted_at.is_(None)).order_by(users.c.id)
+        ).all())
+        return [User(id=row.id, username=row.username, email=row.email) for row in rows]
+    
+    def delete(self, user_id: int) -> None:
+        """Удалить пользователя по ID (мягкое удаление)."""
+        self.store.soft_delete(users, user_id)
+
+
+class ShardedPostRepository(IPostRepository):
+    """Реализация репозитория публикаций поверх шардов."""
+    
+    def __init__(self, store: ShardedStore):
+        self.store = store
+    
+    def create(self, post: Post) -> Post:
+        """Создать публикацию на шарде автора."""
+        bucket = bucket_of(post.author_id)
+        with self.store.engine_for_bucket(bucket).begin() as connection:
+            post_id = self.store.next_id(connection, 'post', bucket)
+            connection.execute(posts.insert().values(
+                id=post_id, title=post.title, content=post.content, author_id=post.author_id
+            ))
+        return Post(id=post_id, title=post.title, content=post.content, author_id=post.author_id)
+    
+    def get_by_id(self, post_id: int) -> Post | None:
+        """Получить публикацию по ID с её шарда."""
+        with self.store.engine_for_id(post_id).connect() as connection:
+            row = connection.execute(_live_posts_query().where(posts.c.id == post_id)).first()
+        return Post(id=row.id, title=row.title, content=row.content, author_id=row.author_id) if row else None
+    
+    def get_all(self) -> list[Post]:
+        """Получить все публикации со всех шардов в порядке ID."""
+        rows = self.store.gather(lambda connection: connection.execute(
+            _live_posts_query().order_by(posts.c.id)
+        ).all())
+        return [Post(id=row.id, title=row.title, content=row.content, author_id=row.author_id) for row in rows]
+    
+    def delete(self, post_id: int) -> None:
+        """Удалить публикацию по ID (мягкое удаление)."""
+        self.store.soft_delete(posts, post_id)
+
+
+class ShardedCommentRepository(ICommentRepository):
+    """Реализация репозитория комментариев поверх шардов."""
+    
+    def __init__(self, store: ShardedStore, trending_half_life: float = DEFAULT_HALF_LIFE):
+        self.store = store
+        self.trending_rate = decay_rate(trending_half_life)
+    
+    def create(self, comment: Comment) -> Comment:
+        """
+        Создать комментарий на шарде публикации и учесть его в рейтинге.
+        
+        Ответ лежит на шарде публикации вместе с родителем, поэтому путь
+        вычисляется в том же INSERT.
+        """
+        bucket = bucket_of(comment.post_id)
+        created_at = utcnow()
+        with self.store.engine_for_bucket(bucket).begin() as connection:
+            comment_id = self.store.next_id(connection, 'comment', bucket)
+            connection.execute(comments.insert().values(
+                id=comment_id, content=comment.content, post_id=comment.post_id,
+                author_id=comment.author_id, created_at=created_at,
+                parent_id=comment.parent_id, depth=comment.depth,
+                path=parent_path(comment.parent_id) + path_segment(comment_id)
+            ))
+            connection.execute(add_comment_statement(comment.post_id, log_weight(created_at, self.trending_rate)))
+        return Comment(
+            id=comment_id, content=comment.content, post_id=comment.post_id, author_id=comment.author_id,
+            parent_id=comment.parent_id, depth=comment.depth
+        )
+    
+    def get_all(self) -> list[Comment]:
+        """Получить все видимые комментарии со всех шардов в порядке ID."""
+        rows = self.store.gather(lambda connection: connection.execute(
+            _local_comments_query().order_by(comments.c.id)
+        ).all())
+        live_authors = self.store.live_user_ids(row.author_id for row in rows)
+        return [_to_comment(row) for row in rows if row.author_id in live_authors]
+    
+    def get_by_id(self, comment_id: int) -> Comment | None:
+        """Получить комментарий по ID с его шарда."""
+        with self.store.engine_for_id(comment_id).connect() as connection:
+            row = connection.execute(_local_comments_query().where(comments.c.id == comment_id)).first()
+        if row is None or not self.store.live_user_ids([row.author_id]):
+            return None
+        return _to_comment(row)
+    
+    def delete(self, comment_id: int) -> None:
+        """Удалить комментарий по ID (мягкое удаление) и вычесть его из рейтинга."""
+        with self.store.engine_for_id(comment_id).begin() as connection:
+            deleted = connection.execute(
+                comments.update()
+                .where(comments.c.id == comment_id, comments.c.deleted_at.is_(None))
+                .values(deleted_at=utcnow())
+                .returning(comments.c.post_id, comments.c.created_at)
+            ).first()
+            if deleted is not None and deleted.created_at is not None:
+                connection.execute(remove_comment_statement(
+                    deleted.post_id, log_weight(deleted.created_at, self.trending_rate)
+                ))
+    
+    def get_thread(self, post_id: int, limit: int, start: int | None = None,
+                   max_depth: int | None = None) -> tuple[list[Comment], int | None]:
+        """Получить страницу обсуждения с шарда публикации."""
+        with self.store.engine_for_id(post_id).connect() as connection:
+            rows, next_start = read_thread(connection, SHARD_THREAD, thread_params(post_id, limit, start, max_depth))
+        live_authors = self.store.live_user_ids(row.author_id for row in rows)
+        return [_to_comment(row) for row in rows if row.author_id in live_authors], next_start
+
+
+class ShardedTrendingRepository(ITrendingRepository):
+    """Рейтинг публикаций поверх шардов: топ каждого шарда и слияние."""
+    
+    def __init__(self, store: ShardedStore, half_life: float = DEFAULT_HALF_LIFE):
+        self.store = store
+        self.rate = decay_rate(half_life)
+    
+    def top(self, limit: int) -> list[tuple[Post, float]]:
+        """Получить публикации с наибольшим счётом со всех шардов."""
+        query = (
+            _live_posts_query()
+            .add_columns(trending.c.score.label('trending_score'))
+            .join(trending, trending.c.post_id == posts.c.id)
+            .where(trending.c.score.is_not(None))
+            .order_by(trending.c.score.desc())
+            .limit(limit)
+        )
+        rows = heapq.merge(
+            *self.store.scatter(lambda connection: connection.execute(query).all()),
+            key=lambda row: row.trending_score, reverse=True
+        )
+        now = utcnow()
+        return [
+            (
+                Post(id=row.id, title=row.title, content=row.content, author_id=row.author_id),
+                current_score(row.trending_score, self.rate, now)
+            )
+            for row in itertools.islice(rows, limit)
+        ]
+    
+    def prune(self) -> int:
+        """Удалить затухшие счётчики на всех шардах."""
+        threshold = log_weight(utcnow(), self.rate) + math.log(NEGLIGIBLE_SCORE)
+        affected = 0
+        for engine in self.store.engines:
+            with engine.begin() as connection:
+                affected += connection.execute(
+                    trending.delete().where(trending.c.score.is_(None) | (trending.c.score < threshold))
+                ).rowcount
+        return affected
+
+
+# Рассылка на шарде: порог уже проверен на шарде автора, время передаётся параметром
+SHARD_ADVANCE_HEADS = advance_heads_statement()
+SHARD_WRITE_ENTRIES = write_entries_statement(bindparam('created_at', type_=DateTime))
+
+
+class ShardedFeedRepository(IFeedRepository):
+    """
+    Подписки и ленты поверх шардов.
+    
+    Подписка и лента лежат на шарде подписчика, счётчик подписчиков - на
+    шарде автора. Рассылка выполняется на всех шардах параллельно: каждый
+    шард пишет в ленты своих подписчиков теми же двумя INSERT ... SELECT,
+    что и одиночная база.
+    """
+    
+    def __init__(self, store: ShardedStore, fanout_threshold: int = DEFAULT_FANOUT_THRESHOLD,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.store = store
+        self.fanout_threshold = fanout_threshold
+        self.max_entries = max_entries
+    
+    def _change_follower_count(self, author_id: int, delta: int) -> None:
+        with self.store.engine_for_id(author_id).begin() as connection:
+            connection.execute(
+                users.update()
+                .where(users.c.id == author_id)
+                .values(follower_count=func.coalesce(users.c.follower_count, 0) + delta)
+            )
+    
+    def follow(self, follower_id: int, author_id: int) -> bool:
+        """Подписать пользователя на автора (подписка - на шарде подписчика)."""
+        with self.store.engine_for_id(follower_id).begin() as connection:
+            created = connection.execute(
+                sqlite_insert(follows).values(follower_id=follower_id, author_id=author_id).on_conflict_do_nothing()
+            ).rowcount == 1
+        if created:
+            self._change_follower_count(author_id, 1)
+        return created
+    
+    def unfollow(self, follower_id: int, author_id: int) -> bool:
+        """Отписать пользователя от автора."""
+        with self.store.engine_for_id(follower_id).begin() as connection:
+            deleted = connection.execute(
+                follows.delete().where(follows.c.follower_id == follower_id, follows.c.author_id == author_id)
+            ).rowcount == 1
+        if deleted:
+            self._change_follower_count(author_id, -1)
+        return deleted
+    
+    def fan_out(self, post: Post) -> int:
+        """Разослать публикацию по лентам подписчиков на всех шардах."""
+        with self.store.engine_for_id(post.author_id).connect() as connection:
+            row = connection.execute(
+                select(users.c.follower_count, posts.c.created_at)
+                .join(posts, posts.c.author_id == users.c.id)
+                .where(users.c.id == post.author_id, posts.c.id == post.id)
+            ).first()
+        if row is None or row.created_at is None or (row.follower_count or 0) >= self.fanout_threshold:
+            return 0
+        
+        params = {
+            'author_id': post.author_id,
+            'post_id': post.id,
+            'created_at': row.created_at,
+            'max_entries': self.max_entries,
+        }
+        
+        def write(connection):
+            connection.execute(SHARD_ADVANCE_HEADS, params)
+            written = connection.execute(SHARD_WRITE_ENTRIES, params).rowcount
+            connection.commit()
+            return written
+        
+        return sum(self.store.scatter(write))
+    
+    def get_feed(self, user_id: int, limit: int, before: tuple | None = None) -> list[tuple[Post, datetime]]:
+        """
+        Получить страницу ленты.
+        
+        Записи ленты читаются с шарда пользователя целиком (их не больше
+        max_entries), публикации по ним - с шардов авторов пачками, пока
+        не наберётся страница живых публикаций.
+        """
+        store = self.store
+        with store.engine_for_id(user_id).connect() as connection:
+            following = set(connection.execute(
+                select(follows.c.author_id).where(follows.c.follower_id == user_id)
+            ).scalars())
+            candidates = sorted({
+                (row.created_at, row.post_id)
+                for row in connection.execute(
+                    select(feed_entries.c.created_at, feed_entries.c.post_id, feed_entries.c.author_id)
+                    .where(
+                        feed_entries.c.user_id == user_id,
+                        *before_cursor(feed_entries.c.created_at, feed_entries.c.post_id, before is not None)
+                    ),
+                    feed_params(limit, before)
+                )
+                if row.author_id in following
+            }, reverse=True)
+        
+        rows = []
+        for engine, author_ids in store.group_by_engine(following):
+            with engine.connect() as connection:
+                popular = connection.execute(
+                    select(users.c.id).where(
+                        users.c.id.in_(author_ids),
+                        users.c.follower_count >= self.fanout_threshold,
+                        users.c.deleted_at.is_(None)
+                    )
+                ).scalars().all()
+                for chunk in author_chunks(popular):
+                    rows.extend(connection.execute(
+                        pulled_statement(len(chunk), before is not None), feed_params(limit, before, chunk)
+                    ).all())
+        
+        pushed = 0
+        for start in range(0, len(candidates), limit):
+            if pushed >= limit:
+                break
+            for engine, post_ids in store.group_by_engine(post_id for _, post_id in candidates[start:start + limit]):
+                with engine.connect() as connection:
+                    live = connection.execute(_live_posts_query().where(posts.c.id.in_(post_ids))).all()
+                pushed += len(live)
+                rows.extend(live)
+        return merge_page(rows, limit)
+
+
+class ShardedSoftDeletePurger(SoftDeletePurger):
+    """
+    Фоновая очистка мягко удалённых записей на шардах.
+    
+    Проходы те же, что у одиночной базы, но выполняются на каждом шарде:
+    удалённые пользователи собираются со всех шардов, потому что
+    комментарии и подписки ссылаются на авторов с других шардов.
+    Пользователь удаляется, когда на него не ссылается ни один шард, а
+    вместе с ним освобождается его почта в user_email. Ключи
+    идемпотентности и журнал изменений по-прежнему чистятся в основной базе.
+    """
+    
+    def __init__(self, app, store: ShardedStore, **kwargs):
+        """
+        Инициализация очистки.
+        
+        Args:
+            app: Экземпляр Flask приложения
+            store: Шардированное хранилище
+            **kwargs: Параметры SoftDeletePurger
+        """
+        super().__init__(app, **kwargs)
+        self.store = store
+    
+    def _deleted_user_ids(self) -> list:
+        """Пачка мягко удалённых пользователей со всех шардов."""
+        query = select(users.c.id).where(users.c.deleted_at.is_not(None)).order_by(users.c.id).limit(self.batch_size)
+        return [row.id for row in self.store.gather(lambda connection: connection.execute(query).all())]
+    
+    def _mark_orphans(self) -> int:
+        """Пометить удалёнными потомков удалённых родителей на каждом шарде."""
+        deleted_users = self._deleted_user_ids()
+        affected = 0
+        for engine in self.store.engines:
+            with engine.begin() as connection:
+                affected += self._mark_orphans_in(connection, deleted_users)
+        return affected
+    
+    def _remove_follows(self, connection, deleted_users: list) -> Counter:
+        """
+        Удалить подписки удалённых пользователей на шарде.
+        
+        Returns:
+            Количество удалённых подписок по ID автора
+        """
+        return Counter(connection.execute(
+            follows.delete()
+            .where(tuple_(follows.c.follower_id, follows.c.author_id).in_(
+                select(follows.c.follower_id, follows.c.author_id)
+                .where(follows.c.follower_id.in_(deleted_users) | follows.c.author_id.in_(deleted_users))
+                .limit(self.batch_size)
+            ))
+            .returning(follows.c.author_id)
+        ).scalars())
+    
+    def _delete_marked(self) -> int:
+        """Физически удалить помеченные строки на всех шардах, начиная с листьев."""
+        store = self.store
+        deleted_users = self._deleted_user_ids()
+        affected = 0
+        removed = Counter()
+        for engine in store.engines:
+            with engine.begin() as connection:
+                affected += self._delete_leaves(connection)
+                removed += self._remove_follows(connection, deleted_users)
+                affected += self._delete_feeds(connection)
+        affected += sum(removed.values())
+        
+        # Счётчик подписчиков лежит на шарде автора и меняется отдельной
+        # транзакцией, как в ShardedFeedRepository
+        for engine, author_ids in store.group_by_engine(removed):
+            with engine.begin() as connection:
+                connection.execute(
+                    users.update()
+                    .where(users.c.id == bindparam('author_id'))
+                    .values(follower_count=func.coalesce(users.c.follower_count, 0) - bindparam('removed')),
+                    [{'author_id': author_id, 'removed': removed[author_id]} for author_id in author_ids]
+                )
+        
+        if not deleted_users:
+            return affected
+        # Комментарии и подписки могут ссылаться на пользователя с любого шарда
+        referenced = set()
+        for engine in store.engines:
+            with engine.connect() as connection:
+                for column in (comments.c.author_id, follows.c.follower_id, follows.c.author_id):
+                    referenced.update(connection.execute(
+                        select(column).where(column.in_(deleted_users)).distinct()
+                    ).scalars())
+        
+        purged = []
+        for engine, user_ids in store.group_by_engine(set(deleted_users) - referenced):
+            with engine.begin() as connection:
+                purged.extend(connection.execute(
+                    users.delete()
+                    .where(
+                        users.c.id.in_(user_ids),
+                        users.c.deleted_at.is_not(None),
+                        ~exists().where(posts.c.author_id == users.c.id)
+                    )
+                    .returning(users.c.id, users.c.email)
+                ).all())
+        
+        # Почта освобождается на шарде своей корзины, только если занята этим пользователем
+        claims = {}
+        for row in purged:
+            claims.setdefault(store.engine_for_bucket(email_bucket(row.email)), []).append(
+                {'claimed_email': row.email, 'claimed_by': row.id}
+            )
+        for engine, rows in claims.items():
+            with engine.begin() as connection:
+                connection.execute(
+                    user_email.delete().where(
+                        user_email.c.email == bindparam('claimed_email'),
+                        user_email.c.user_id == bindparam('claimed_by')
+                    ),
+                    rows
+                )
+        return affected + len(purged)
+
+
+# Столбец, по которому строка таблицы попадает в корзину (по умолчанию id)
+RESHARD_BUCKETS = {
+    shard_sequence.name: shard_sequence.c.bucket,
+    user_email.name: user_email.c.bucket,
+    trending.name: trending.c.post_id,
+    follows.name: follows.c.follower_id,
+    feed_heads.name: feed_heads.c.user_id,
+    feed_entries.name: feed_entries.c.user_id,
+}
+
+
+def reshard(source_uris: list, target_uris: list, batch_size: int = 5000) -> dict:
+    """
+    Перераспределить корзины по новому набору шардов.
+    
+    Строки копируются пачками из исходных файлов в целевые по корзине ID,
+    последовательности корзин переносятся вместе с ними. Исходные файлы
+    не изменяются; приложение должно быть остановлено на время переноса.
+    
+    Args:
+        source_uris: Текущие шарды
+        target_uris: Новые шарды (должны быть пустыми)
+        batch_size: Строк в одной пачке
+    
+    Returns:
+        Количество перенесённых строк по таблицам
+    
+    Raises:
+        ValueError: Если целевые шарды уже содержат данные
+    """
+    source = ShardedStore(source_uris)
+    target = ShardedStore(target_uris)
+    moved = SHARDED_TABLES + (shard_sequence, user_email)
+    copied = {table.name: 0 for table in moved}
+    try:
+        for engine in target.engines:
+            with engine.connect() as connection:
+                if any(connection.execute(select(table).limit(1)).first() for table in SHARDED_TABLES):
+                    raise ValueError(f"Целевой шард {engine.url} не пуст")
+        for engine in source.engines:
+            with engine.connect() as connection:
+                for table in moved:
+                    bucket_column = RESHARD_BUCKETS.get(table.name, table.c.get('id'))
+                    # У последовательностей и почт корзина хранится в столбце
+                    if table not in (shard_sequence, user_email):
+                        bucket_column = bucket_column % BUCKET_COUNT
+                    result = connection.execution_options(yield_per=batch_size).execute(
+                        select(table, bucket_column.label('_bucket'))
+                    )
+                    for rows in result.partitions():
+                        by_engine = {}
+                        for row in rows:
+                            values = dict(row._mapping)
+                            bucket = values.pop('_bucket')
+                            by_engine.setdefault(target.engine_for_bucket(bucket), []).append(values)
+                        for target_engine, values in by_engine.items():
+                            with target_engine.begin() as target_connection:
+                                target_connection.execute(table.insert(), values)
+                        copied[table.name] += len(rows)
+    finally:
+        source.dispose()
+        target.dispose()
+    return copied
\ No newline at end of file
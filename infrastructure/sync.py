@@ -0,0 +1,161 @@
+from sqlalchemy import bindparam, select, text
+
+from infrastructure.database import ChangeLogModel, CommentModel, PostModel, UserModel
+from infrastructure.repositories import live_comments, live_posts, live_users, read_session, to_comment
+
+# Разделы ответа в порядке полной синхронизации и имена сущностей в журнале
+KINDS = ('users', 'posts', 'comments')
+ENTITIES = {'users': 'user', 'posts': 'post', 'comments': 'comment'}
+KIND_OF = {entity: kind for kind, entity in ENTITIES.items()}
+
+_changes = ChangeLogModel.__table__
+# Начало журнала и последний выданный ID (после очистки журнал может быть пуст)
+LOG_BOUNDS = text(
+    "SELECT min(id), (SELECT seq FROM sqlite_sequence WHERE name = 'change_log') FROM change_log"
+)
+READ_LOG = (
+    select(_changes.c.id, _changes.c.entity, _changes.c.operation, _changes.c.entity_id)
+    .where(_changes.c.id > bindparam('after'), _changes.c.entity.in_(tuple(KIND_OF)))
+    .order_by(_changes.c.id)
+    .limit(bindparam('limit'))
+)
+
+_SOURCES = {
+    'users': (live_users, UserModel, lambda u: {'id': u.id, 'username': u.username, 'email': u.email}),
+    'posts': (live_posts, PostModel, lambda p: {
+        'id': p.id, 'title': p.title, 'content': p.content, 'author_id': p.author_id
+    }),
+    'comments': (live_comments, CommentModel, lambda c: vars(to_comment(c))),
+}
+
+
+class SyncTokenExpired(Exception):
+    """Изменения после токена уже удалены из журнала: нужна полная синхронизация."""
+
+
+def _log_bounds(session) -> tuple[int, int]:
+    """Первый хранящийся и последний выданный ID журнала."""
+    first, head = session.execute(LOG_BOUNDS).one()
+    head = head or 0
+    return (first if first is not None else head + 1), head
+
+
+def parse_token(token: str) -> tuple:
+    """
+    Разобрать токен синхронизации.
+    
+    Токен d_<ID> - изменения после ID журнала; s_<ID>_<раздел>_<ID строки> -
+    продолжение полной синхронизации, начатой при последнем ID журнала.
+    
+    Raises:
+        ValueError: Если токен некорректен
+    """
+    try:
+        parts = token.split('_')
+        if parts[0] == 'd' and len(parts) == 2:
+            version = int(parts[1])
+            if version >= 0:
+                return ('d', version)
+        elif parts[0] == 's' and len(parts) == 4 and parts[2] in KINDS:
+            head, after = int(parts[1]), int(parts[3])
+            if head >= 0 and after >= 0:
+                return ('s', head, parts[2], after)
+    except ValueError:
+        pass
+    raise ValueError(f"Некорректный токен синхронизации: {token}")
+
+
+def _empty(token: str, has_more: bool) -> dict:
+    """Пустая страница синхронизации."""
+    result = {kind: [] for kind in KINDS}
+    result['deleted'] = {kind: [] for kind in KINDS}
+    result['token'] = token
+    result['has_more'] = has_more
+    return result
+
+
+def _snapshot_page(head: int, kind: str, after: int, limit: int) -> dict:
+    """Страница полной синхронизации: живые строки раздела по возрастанию ID."""
+    live, model, to_dict = _SOURCES[kind]
+    rows = live().filter(model.id > after).order_by(model.id).limit(limit).all()
+    if len(rows) == limit:
+        token = f's_{head}_{kind}_{rows[-1].id}'
+    elif kind != KINDS[-1]:
+        token = f's_{head}_{KINDS[KINDS.index(kind) + 1]}_0'
+    else:
+        # Изменения, сделанные во время полной синхронизации, придут дельтой
+        token = f'd_{head}'
+    result = _empty(token, True)
+    result[kind] = [to_dict(row) for row in rows]
+    return result
+
+
+def _delta_page(session, version: int, limit: int) -> dict:
+    """Изменения пользователей, публикаций и комментариев после ID журнала version."""
+    first, head = _log_bounds(session)
+    if version > head:
+        raise ValueError(f"Некорректный токен синхронизации: d_{version}")
+    if version < first - 1:
+        raise SyncTokenExpired(f"Журнал изменений после d_{version} уже очищен")
+    log = session.execute(READ_LOG, {'after': version, 'limit': limit}).all()
+    # Важна только последняя операция над сущностью в пределах страницы
+    latest = {}
+    for row in log:
+        latest[(KIND_OF[row.entity], row.entity_id)] = row.operation
+    has_more = len(log) == limit
+    # Неполная страница дочитала журнал до head: подписки после последней
+    # записи пропускаются и в следующий раз не читаются
+    if has_more:
+        version = log[-1].id
+    else:
+        version = max(head, log[-1].id) if log else head
+    result = _empty(f'd_{version}', has_more)
+    for kind in KINDS:
+        created, deleted = [], set()
+        for (entity_kind, entity_id), operation in latest.items():
+            if entity_kind != kind:
+                continue
+            if operation == 'create':
+                created.append(entity_id)
+            else:
+                deleted.add(entity_id)
+        if created:
+            live, model, to_dict = _SOURCES[kind]
+            rows = live().filter(model.id.in_(created)).order_by(model.id).all()
+            result[kind] = [to_dict(row) for row in rows]
+            # Созданное и уже скрытое (удалён автор, публикация) - тоже удалено
+            deleted.update(set(created) - {row.id for row in rows})
+        result['deleted'][kind] = sorted(deleted)
+    return result
+
+
+def sync_page(token: str | None, limit: int) -> dict:
+    """
+    Страница синхронизации.
+    
+    Без токена начинается полная синхронизация: живые пользователи,
+    публикации и комментарии страницами по limit строк. Затем токен
+    указывает на ID журнала изменений, и страницы содержат только
+    созданное (текущее состояние) и удалённое (ID) после него, поэтому
+    объём работы зависит от числа изменений, а не от размера базы.
+    
+    Args:
+        token: Токен из предыдущей страницы (None - полная синхронизация)
+        limit: Максимум строк (записей журнала) на странице
+    
+    Returns:
+        Разделы users, posts, comments, удалённые ID в deleted, новый
+        token и признак has_more
+    
+    Raises:
+        ValueError: Если токен некорректен
+        SyncTokenExpired: Если журнал после токена уже очищен
+    """
+    session = read_session()
+    if token is None:
+        _, head = _log_bounds(session)
+        return _snapshot_page(head, KINDS[0], 0, limit)
+    state = parse_token(token)
+    if state[0] == 's':
+        return _snapshot_page(*state[1:], limit)
+    return _delta_page(session, state[1], limit)
\ No newline at end of file
@@ -0,0 +1,313 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from infrastructure.database import db
+
+# Текущий активный спан; None - вне трассы
+current_span = ContextVar('current_span', default=None)
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+
+class Span:
+    """Спан трассы в терминах OpenTelemetry."""
+    
+    __slots__ = (
+        'trace_id', 'span_id', 'parent_span_id', 'name', 'kind',
+        'start_ns', 'end_ns', 'attributes', 'status', 'sampled', 'trace', 'token'
+    )
+    
+    def __init__(self, name: str, trace_id: str, parent_span_id: str | None,
+                 kind: int, sampled: bool, trace: list | None):
+        """
+        Инициализация спана.
+        
+        Args:
+            name: Имя операции
+            trace_id: ID трассы (32 hex-символа)
+            parent_span_id: ID родительского спана или None для корня
+            kind: Вид спана OTLP
+            sampled: Записывается ли трасса
+            trace: Общий список завершённых спанов трассы
+        """
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex() if sampled else ''
+        self.parent_span_id = parent_span_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {}
+        self.status = STATUS_UNSET
+        self.sampled = sampled
+        self.trace = trace
+        self.token = None
+    
+    def set_attribute(self, key: str, value) -> None:
+        """Установить атрибут спана."""
+        if self.sampled:
+            self.attributes[key] = value
+    
+    def to_otlp(self) -> dict:
+        """Представление спана в формате OTLP JSON."""
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_span_id or '',
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            'status': {'code': self.status},
+        }
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    """Атрибут в формате OTLP JSON."""
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+def _otlp_payload(spans: list, service_name: str) -> dict:
+    """Обернуть спаны в запрос ExportTraceServiceRequest."""
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attribute('service.name', service_name)]},
+            'scopeSpans': [{
+                'scope': {'name': 'blog.tracing'},
+                'spans': [span.to_otlp() for span in spans],
+            }],
+        }]
+    }
+
+
+class FileSpanExporter:
+    """Экспорт трасс в файл: по одному запросу OTLP JSON на строку."""
+    
+    def __init__(self, path: str, service_name: str = 'blog'):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+    
+    def export(self, spans: list) -> None:
+        """Записать завершённую трассу."""
+        line = json.dumps(_otlp_payload(spans, self.service_name), ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+class OtlpHttpSpanExporter:
+    """
+    Экспорт трасс в коллектор по OTLP/HTTP JSON (POST /v1/traces).
+    
+    Отправка идёт из фонового потока, чтобы не задерживать ответ.
+    """
+    
+    def __init__(self, endpoint: str, service_name: str = 'blog', timeout: float = 2.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=1000)
+        threading.Thread(target=self._run, name='otlp-exporter', daemon=True).start()
+    
+    def export(self, spans: list) -> None:
+        """Поставить трассу в очередь на отправку; при переполнении - отбросить."""
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            pass
+    
+    def _run(self) -> None:
+        while True:
+            spans = self._queue.get()
+            body = json.dumps(_otlp_payload(spans, self.service_name)).encode('utf-8')
+            http_request = urllib.request.Request(
+                self.endpoint, data=body, headers={'Content-Type': 'application/json'}
+            )
+            try:
+                urllib.request.urlopen(http_request, timeout=self.timeout).close()
+            except OSError:
+                pass
+
+
+class Tracer:
+    """
+    Трассировщик с решением о сэмплировании в корне трассы.
+    
+    Вложенные спаны наследуют решение корня, поэтому трасса либо
+    записывается целиком, либо почти ничего не стоит.
+    """
+    
+    def __init__(self):
+        self.enabled = False
+        self.sample_rate = 1.0
+        self.exporter = None
+    
+    def init_app(self, app) -> None:
+        """
+        Настроить трассировку по конфигурации приложения.
+        
+        Args:
+            app: Экземпляр Flask приложения
+        """
+        self.enabled = app.config.get('TRACING_ENABLED', False)
+        self.sample_rate = app.config.get('TRACING_SAMPLE_RATE', 1.0)
+        service_name = app.config.get('TRACING_SERVICE_NAME', 'blog')
+        if app.config.get('TRACING_OTLP_ENDPOINT'):
+            self.exporter = OtlpHttpSpanExporter(app.config['TRACING_OTLP_ENDPOINT'], service_name)
+        else:
+            self.exporter = FileSpanExporter(app.config.get('TRACING_EXPORT_PATH', 'traces.jsonl'), service_name)
+        app.extensions['tracer'] = self
+        
+        with app.app_context():
+            self.watch_engine(db.engine)
+    
+    def watch_engine(self, engine) -> None:
+        """
+        Создавать SQL-спаны для запросов движка.
+        
+        Args:
+            engine: Движок SQLAlchemy
+        """
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+    
+    def start_span(self, name: str, kind: int = SPAN_KIND_INTERNAL,
+                   trace_id: str | None = None, parent_span_id: str | None = None,
+                   sampled: bool | None = None) -> Span | None:
+        """
+        Начать спан и сделать его текущим.
+        
+        Args:
+            name: Имя операции
+            kind: Вид спана
+            trace_id: ID внешней трассы (из заголовка traceparent)
+            parent_span_id: ID внешнего родительского спана
+            sampled: Внешнее решение о сэмплировании
+        
+        Returns:
+            Спан или None, если трассировка выключена
+        """
+        if not self.enabled:
+            return None
+        parent = current_span.get()
+        if parent is not None:
+            span = Span(name, parent.trace_id, parent.span_id, kind, parent.sampled, parent.trace)
+        else:
+            if sampled is None:
+                sampled = random.random() < self.sample_rate
+            span = Span(
+                name, trace_id or os.urandom(16).hex(), parent_span_id, kind,
+                sampled, [] if sampled else None
+            )
+        span.token = current_span.set(span)
+        return span
+    
+    def end_span(self, span: Span | None, error: BaseException | None = None) -> None:
+        """
+        Завершить спан и восстановить родительский.
+        
+        Корневой спан выгружает всю трассу в экспортёр.
+        """
+        if span is None:
+            return
+        current_span.reset(span.token)
+        if not span.sampled:
+            return
+        span.end_ns = time.time_ns()
+        if error is not None:
+            span.status = STATUS_ERROR
+            span.attributes['exception.type'] = type(error).__name__
+            span.attributes['exception.message'] = str(error)
+        span.trace.append(span)
+        if current_span.get() is None and self.exporter is not None:
+            self.exporter.export(span.trace)
+    
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        parent = current_span.get()
+        if parent is None or not parent.sampled:
+            return
+        span = self.start_span(f'SQL {statement.split(None, 1)[0].upper()}', SPAN_KIND_CLIENT)
+        span.set_attribute('db.system', 'sqlite')
+        span.set_attribute('db.statement', statement)
+        conn.info.setdefault('trace_spans', []).append(span)
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get('trace_spans')
+        if spans:
+            span = spans.pop()
+            span.set_attribute('db.rows', cursor.rowcount)
+            self.end_span(span)
+    
+    def _handle_error(self, exception_context):
+        spans = exception_context.connection.info.get('trace_spans') if exception_context.connection else None
+        if spans:
+            self.end_span(spans.pop(), exception_context.original_exception)
+
+
+tracer = Tracer()
+
+
+class TracedProxy:
+    """
+    Декоратор, оборачивающий публичные методы объекта в спаны.
+    
+    Применяется к репозиториям (спаны SQL*Repository.get_by_id и т.п.)
+    и к сценариям использования (спаны *UseCase.execute).
+    """
+    
+    def __init__(self, target, tracer_: Tracer = tracer):
+        """
+        Инициализация декоратора.
+        
+        Args:
+            target: Оборачиваемый объект
+            tracer_: Трассировщик
+        """
+        self._target = target
+        self._tracer = tracer_
+        self._name = getattr(target, '_name', type(target).__name__)
+    
+    def __getattr__(self, name: str):
+        attr = getattr(self._target, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        
+        active_tracer = self._tracer
+        span_name = f'{self._name}.{name}'
+        
+        def traced(*args, **kwargs):
+            span = active_tracer.start_span(span_name)
+            try:
+                result = attr(*args, **kwargs)
+            except Exception as e:
+                active_tracer.end_span(span, e)
+                raise
+            active_tracer.end_span(span)
+            return result
+        
+        self.__dict__[name] = traced
+        return traced
\ No newline at end of file
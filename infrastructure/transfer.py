@@ -0,0 +1,427 @@
+import gzip
+import json
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from infrastructure.comment_tree import PATH_DIGITS, path_segment
+from infrastructure.database import utcnow
+from infrastructure.trending import DEFAULT_HALF_LIFE, decay_rate, log_weight, logaddexp, register_sql_functions
+
+# Типы записей в порядке выгрузки: ссылки ведут только на предыдущие типы
+# или на более ранние записи того же типа (ответ - на родителя)
+EXPORTS = {
+    'user': (
+        'SELECT id, username, email FROM user_model '
+        'WHERE deleted_at IS NULL AND id > ? ORDER BY id LIMIT ?'
+    ),
+    'post': (
+        'SELECT id, title, content, author_id, created_at FROM post_model p '
+        'WHERE deleted_at IS NULL AND id > ? '
+        'AND EXISTS (SELECT 1 FROM user_model u WHERE u.id = p.author_id AND u.deleted_at IS NULL) '
+        'ORDER BY id LIMIT ?'
+    ),
+    'comment': (
+        'SELECT id, content, post_id, author_id, parent_id, path, depth, created_at FROM comment_model c '
+        'WHERE deleted_at IS NULL AND id > ? '
+        'AND EXISTS (SELECT 1 FROM user_model u WHERE u.id = c.author_id AND u.deleted_at IS NULL) '
+        'AND EXISTS (SELECT 1 FROM post_model p WHERE p.id = c.post_id AND p.deleted_at IS NULL) '
+        'ORDER BY id LIMIT ?'
+    ),
+}
+FIELDS = {
+    'user': ('id', 'username', 'email'),
+    'post': ('id', 'title', 'content', 'author_id', 'created_at'),
+    'comment': ('id', 'content', 'post_id', 'author_id', 'parent_id', 'path', 'depth', 'created_at'),
+}
+TABLES = {'user': 'user_model', 'post': 'post_model', 'comment': 'comment_model'}
+# Ссылки строки для вставки: позиция в строке и тип записи, на которую она ведёт
+REFERENCES = {
+    'user': (),
+    'post': ((3, 'user'),),
+    'comment': ((2, 'post'), (3, 'user'), (4, 'comment')),
+}
+INSERTS = {
+    'user': 'INSERT INTO user_model (id, username, email, follower_count) VALUES (?, ?, ?, 0)',
+    'post': 'INSERT INTO post_model (id, title, content, author_id, created_at) VALUES (?, ?, ?, ?, ?)',
+    'comment': (
+        'INSERT INTO comment_model (id, content, post_id, author_id, parent_id, path, depth, created_at) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+    ),
+}
+# Записи журнала изменений о загруженных строках пачки (ID - JSON-массив);
+# поля события те же, что пишут репозитории при создании сущностей
+CHANGES = {
+    'user': "json_object('id', id, 'username', username, 'email', email)",
+    'post': "json_object('id', id, 'title', title, 'content', content, 'author_id', author_id)",
+    'comment': (
+        "json_object('id', id, 'content', content, 'post_id', post_id, 'author_id', author_id, "
+        "'parent_id', parent_id, 'depth', coalesce(depth, 0))"
+    ),
+}
+RECORD_CHANGES = {
+    kind: (
+        f"INSERT INTO change_log (entity, operation, entity_id, payload, created_at) "
+        f"SELECT '{kind}', 'create', id, {payload}, ? FROM {TABLES[kind]} "
+        f"WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id"
+    )
+    for kind, payload in CHANGES.items()
+}
+ADD_TRENDING = (
+    'INSERT INTO post_trending (post_id, score) VALUES (?, ?) '
+    'ON CONFLICT (post_id) DO UPDATE SET score = blog_logaddexp(score, excluded.score)'
+)
+# Ограничения столбцов моделей
+MAX_LENGTHS = {'username': 80, 'email': 120, 'title': 100}
+
+CHECKPOINTS = (
+    'CREATE TABLE IF NOT EXISTS import_checkpoint ('
+    'source TEXT PRIMARY KEY, lines INTEGER NOT NULL, '
+    'user_offset INTEGER NOT NULL, post_offset INTEGER NOT NULL, comment_offset INTEGER NOT NULL)'
+)
+
+
+def _open(path: str, mode: str):
+    """Открыть файл NDJSON; расширение .gz - со сжатием gzip."""
+    if path.endswith('.gz'):
+        # Минимальное сжатие: выгрузка упирается в gzip, а не в базу
+        return gzip.open(path, mode, compresslevel=1) if 'w' in mode else gzip.open(path, mode)
+    return open(path, mode)
+
+
+def export_ndjson(db_path: str, output: str, chunk_size: int = 10_000) -> dict:
+    """
+    Выгрузить пользователей, публикации и комментарии в NDJSON.
+    
+    Строки читаются пачками по возрастанию ID в одной читающей
+    транзакции, поэтому выгрузка согласована и не блокирует запись
+    (в режиме WAL). Удалённые записи, записи удалённых авторов и
+    публикаций и ответы на невыгруженные комментарии не выгружаются.
+    
+    Args:
+        db_path: Файл базы данных
+        output: Файл выгрузки (.gz - со сжатием)
+        chunk_size: Строк в одной пачке чтения
+    
+    Returns:
+        Количество выгруженных записей по типам
+    """
+    connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, isolation_level=None)
+    counts = {kind: 0 for kind in EXPORTS}
+    exported = IdSet()
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    try:
+        connection.execute('BEGIN')
+        with _open(output, 'wt') as f:
+            for kind, query in EXPORTS.items():
+                fields = ('type',) + FIELDS[kind]
+                last_id = 0
+                while True:
+                    rows = connection.execute(query, (last_id, chunk_size)).fetchall()
+                    if not rows:
+                        break
+                    last_id = rows[-1][0]
+                    if kind == 'comment':
+                        # Ответы скрытых комментариев скрыты вместе с ними; родитель
+                        # выгружается раньше ответа, так как его ID меньше
+                        rows = [row for row in rows if row[4] is None or row[4] in exported]
+                        for row in rows:
+                            exported.add(row[0])
+                    f.write(''.join(dumps(dict(zip(fields, (kind,) + row))) + '\n' for row in rows))
+                    counts[kind] += len(rows)
+        connection.execute('COMMIT')
+    finally:
+        connection.close()
+    return counts
+
+
+def _text(record: dict, field: str, required: bool = True) -> str | None:
+    value = record.get(field)
+    if value.__class__ is str and value.strip():
+        if field in MAX_LENGTHS and len(value) > MAX_LENGTHS[field]:
+            raise ValueError(f"поле {field} длиннее {MAX_LENGTHS[field]} символов")
+        return value
+    if value is None and not required:
+        return None
+    raise ValueError(f"поле {field} должно быть непустой строкой")
+
+
+def _id(record: dict, field: str, required: bool = True) -> int | None:
+    value = record.get(field)
+    # bool - подкласс int, поэтому сравнивается точный класс
+    if value.__class__ is int and value > 0:
+        return value
+    if value is None and not required:
+        return None
+    raise ValueError(f"поле {field} должно быть положительным целым")
+
+
+def _comment_path(path: str | None, comment_id: int, parent_id: int | None, offset: int) -> tuple[str, int]:
+    """Путь комментария в целевой базе и его глубина."""
+    segment = path_segment(comment_id)
+    if parent_id is None:
+        if path is not None and path != segment:
+            raise ValueError("поле path не соответствует id")
+        return path_segment(comment_id + offset), 0
+    if path is None or not path.endswith(path_segment(parent_id) + segment):
+        raise ValueError("поле path не соответствует id и parent_id")
+    ancestors = path.split('/')[:-1]
+    if len(path) != len(ancestors) * (PATH_DIGITS + 1) or not all(part.isdigit() for part in ancestors):
+        raise ValueError("поле path имеет неверный формат")
+    return ''.join(path_segment(int(part) + offset) for part in ancestors), len(ancestors) - 1
+
+
+def _parse_record(record: dict, offsets: dict) -> tuple[str, tuple]:
+    """
+    Проверить запись и перевести её ID в ID целевой базы.
+    
+    Returns:
+        Тип записи и строка для вставки
+    """
+    kind = record.get('type')
+    if kind == 'comment':
+        comment_id = _id(record, 'id')
+        parent_id = _id(record, 'parent_id', required=False)
+        path, depth = _comment_path(_text(record, 'path', required=False), comment_id, parent_id, offsets['comment'])
+        return kind, (
+            comment_id + offsets['comment'],
+            _text(record, 'content'),
+            _id(record, 'post_id') + offsets['post'],
+            _id(record, 'author_id') + offsets['user'],
+            parent_id + offsets['comment'] if parent_id is not None else None,
+            path,
+            depth,
+            _text(record, 'created_at', required=False)
+        )
+    if kind == 'post':
+        return kind, (
+            _id(record, 'id') + offsets['post'],
+            _text(record, 'title'),
+            _text(record, 'content'),
+            _id(record, 'author_id') + offsets['user'],
+            _text(record, 'created_at', required=False)
+        )
+    if kind == 'user':
+        email = _text(record, 'email')
+        if '@' not in email:
+            raise ValueError("поле email должно содержать '@'")
+        return kind, (_id(record, 'id') + offsets['user'], _text(record, 'username'), email)
+    raise ValueError(f"неизвестный тип записи {kind!r}")
+
+
+def parse_chunk(lines: list, first_line: int, offsets: dict) -> tuple[list, list]:
+    """
+    Разобрать и проверить пачку строк NDJSON (выполняется в пуле процессов).
+    
+    Args:
+        lines: Строки файла
+        first_line: Номер первой строки в файле (с 1)
+        offsets: Сдвиги ID по типам
+    
+    Returns:
+        Записи (номер строки, тип, строка для вставки) и ошибки
+        (номер строки, сообщение)
+    """
+    records, errors = [], []
+    decode = json.JSONDecoder().decode
+    for number, line in enumerate(lines, first_line):
+        try:
+            record = decode(line)
+            if record.__class__ is not dict:
+                raise ValueError("запись должна быть объектом JSON")
+            records.append((number,) + _parse_record(record, offsets))
+        except ValueError as e:
+            if line.strip():
+                errors.append((number, str(e)))
+    return records, errors
+
+
+class IdSet:
+    """Множество исходных ID в виде битовой карты (по биту на ID)."""
+    
+    def __init__(self):
+        self._bits = bytearray()
+    
+    def add(self, value: int) -> None:
+        index = value >> 3
+        if index >= len(self._bits):
+            self._bits.extend(bytes(max(index + 1 - len(self._bits), len(self._bits))))
+        self._bits[index] |= 1 << (value & 7)
+    
+    def __contains__(self, value: int) -> bool:
+        index = value >> 3
+        return index < len(self._bits) and bool(self._bits[index] & (1 << (value & 7)))
+
+
+def _chunks(f, skip: int, size: int):
+    """Пачки строк файла (номер первой строки, строки), начиная после skip строк."""
+    number = skip + 1
+    for _ in islice(f, skip):
+        pass
+    while True:
+        lines = list(islice(f, size))
+        if not lines:
+            return
+        yield number, lines
+        number += len(lines)
+
+
+def _accept(connection, records: list, loaded: dict, offsets: dict, errors: list) -> dict:
+    """
+    Отобрать записи пачки, которые можно вставить.
+    
+    Отбрасываются повторы, записи со ссылками на незагруженные записи и
+    пользователи с уже занятыми именем или почтой.
+    
+    Returns:
+        Строки для вставки по типам
+    """
+    taken = set()
+    names = [row for _, kind, row in records if kind == 'user']
+    if names:
+        for column, index in (('username', 1), ('email', 2)):
+            taken.update((column, value) for (value,) in connection.execute(
+                f'SELECT value FROM json_each(?) WHERE value IN (SELECT {column} FROM user_model)',
+                (json.dumps([row[index] for row in names]),)
+            ))
+    rows = {kind: [] for kind in TABLES}
+    for number, kind, row in records:
+        missing = next((
+            (target, row[index] - offsets[target]) for index, target in REFERENCES[kind]
+            if row[index] is not None and row[index] - offsets[target] not in loaded[target]
+        ), None)
+        if missing is not None:
+            errors.append((number, f"ссылка на отсутствующую запись {missing[0]} {missing[1]}"))
+            continue
+        source_id = row[0] - offsets[kind]
+        if source_id in loaded[kind]:
+            errors.append((number, f"повторная запись {kind} {source_id}"))
+            continue
+        if kind == 'user':
+            conflict = next((column for column, value in (('username', row[1]), ('email', row[2]))
+                             if (column, value) in taken), None)
+            if conflict is not None:
+                errors.append((number, f"{conflict} {row[1] if conflict == 'username' else row[2]} уже занят"))
+                continue
+            taken.update((('username', row[1]), ('email', row[2])))
+        loaded[kind].add(source_id)
+        rows[kind].append(row)
+    return rows
+
+
+def _trending_weights(comment_rows: list, rate: float) -> list:
+    """Суммарные веса комментариев пачки по публикациям (без created_at не учитываются)."""
+    weights = {}
+    for row in comment_rows:
+        try:
+            created_at = datetime.fromisoformat(row[7]) if row[7] is not None else None
+        except ValueError:
+            continue
+        if created_at is not None:
+            weights[row[2]] = logaddexp(weights.get(row[2]), log_weight(created_at, rate))
+    return list(weights.items())
+
+
+def import_ndjson(input_path: str, db_path: str, workers: int | None = None, batch_size: int = 50_000,
+                  on_batch=None, half_life: float = DEFAULT_HALF_LIFE) -> dict:
+    """
+    Загрузить выгрузку export_ndjson в базу.
+    
+    Строки разбираются и проверяются в пуле процессов, вставляются
+    пачками по batch_size строк, каждая в своей транзакции. ID сдвигаются
+    за максимальные ID целевой базы, поэтому загрузка не пересекается с
+    существующими данными, а ссылки пересчитываются без таблицы
+    соответствия. В той же транзакции пачка пишет события create в
+    журнал изменений и веса комментариев в рейтинг обсуждаемых, как
+    репозитории при обычном создании. Вместе с каждой пачкой фиксируется
+    контрольная точка (таблица import_checkpoint): прерванная загрузка
+    того же файла продолжается с первой незафиксированной строки. Пока
+    идёт загрузка, в базу не должен писать никто другой. На время
+    загрузки база переводится в режим WAL, после неё прежний режим
+    журнала восстанавливается.
+    
+    Args:
+        input_path: Файл выгрузки (.gz - со сжатием)
+        db_path: Файл базы данных со схемой блога
+        workers: Процессов разбора (по умолчанию - по числу ядер)
+        batch_size: Строк в одной пачке
+        on_batch: Вызывается после каждой пачки с числом обработанных строк
+        half_life: Период полураспада веса комментария в рейтинге
+    
+    Returns:
+        Количество загруженных записей по типам, число строк, пропущенных
+        при возобновлении (resumed), и ошибки (номер строки, сообщение)
+    """
+    source = os.path.abspath(input_path)
+    connection = sqlite3.connect(db_path, isolation_level=None)
+    register_sql_functions(connection)
+    rate = decay_rate(half_life)
+    journal_mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute(CHECKPOINTS)
+    checkpoint = connection.execute(
+        'SELECT lines, user_offset, post_offset, comment_offset FROM import_checkpoint WHERE source = ?',
+        (source,)
+    ).fetchone()
+    if checkpoint:
+        skip, offsets = checkpoint[0], dict(zip(('user', 'post', 'comment'), checkpoint[1:]))
+    else:
+        skip = 0
+        offsets = {
+            kind: connection.execute(f'SELECT coalesce(max(id), 0) FROM {table}').fetchone()[0]
+            for kind, table in TABLES.items()
+        }
+    # Какие исходные ID уже загружены (нужно для проверки ссылок после возобновления)
+    loaded = {kind: IdSet() for kind in TABLES}
+    for kind, table in TABLES.items():
+        for (new_id,) in connection.execute(f'SELECT id FROM {table} WHERE id > ?', (offsets[kind],)):
+            loaded[kind].add(new_id - offsets[kind])
+    
+    counts = {kind: 0 for kind in TABLES}
+    errors = []
+    lines_done = skip
+    workers = workers or os.cpu_count() or 1
+    try:
+        with _open(input_path, 'rt') as f, ProcessPoolExecutor(workers) as pool:
+            futures = []
+            chunks = _chunks(f, skip, batch_size)
+            # Разбор опережает вставку не больше чем на две пачки на процесс
+            for number, lines in islice(chunks, 2 * workers):
+                futures.append((len(lines), pool.submit(parse_chunk, lines, number, offsets)))
+            while futures:
+                line_count, future = futures.pop(0)
+                records, chunk_errors = future.result()
+                for number, lines in islice(chunks, 1):
+                    futures.append((len(lines), pool.submit(parse_chunk, lines, number, offsets)))
+                rows = _accept(connection, records, loaded, offsets, chunk_errors)
+                lines_done += line_count
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    created_at = utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')
+                    for kind, kind_rows in rows.items():
+                        connection.executemany(INSERTS[kind], kind_rows)
+                        connection.execute(RECORD_CHANGES[kind], (created_at, json.dumps([row[0] for row in kind_rows])))
+                        counts[kind] += len(kind_rows)
+                    connection.executemany(ADD_TRENDING, _trending_weights(rows['comment'], rate))
+                    connection.execute(
+                        'INSERT OR REPLACE INTO import_checkpoint VALUES (?, ?, ?, ?, ?)',
+                        (source, lines_done, offsets['user'], offsets['post'], offsets['comment'])
+                    )
+                    connection.execute('COMMIT')
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+                errors.extend(sorted(chunk_errors))
+                if on_batch is not None:
+                    on_batch(lines_done)
+        connection.execute('DELETE FROM import_checkpoint WHERE source = ?', (source,))
+        connection.execute('ANALYZE')
+    finally:
+        try:
+            connection.execute(f'PRAGMA journal_mode={journal_mode}')
+        finally:
+            connection.close()
+    return {**counts, 'resumed': skip, 'errors': errors}
\ No newline at end of file
@@ -0,0 +1,216 @@
+import logging
+import math
+import threading
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from domain.entities import Post
+from domain.repositories import ITrendingRepository
+from infrastructure.database import db, PostModel, PostTrendingModel, UserModel, utcnow
+
+logger = logging.getLogger('blog.trending')
+
+# Начало отсчёта времени для логарифмов весов; менять нельзя
+TRENDING_EPOCH = datetime(2024, 1, 1)
+# Период полураспада веса комментария по умолчанию (6 часов)
+DEFAULT_HALF_LIFE = 6 * 3600.0
+# Счёт ниже порога считается нулевым и удаляется фоновой задачей
+NEGLIGIBLE_SCORE = 1e-3
+
+
+def decay_rate(half_life: float) -> float:
+    """Скорость затухания для периода полураспада в секундах."""
+    return math.log(2) / half_life
+
+
+def log_weight(created_at: datetime, rate: float) -> float:
+    """Логарифм веса комментария, созданного в момент created_at."""
+    return rate * (created_at - TRENDING_EPOCH).total_seconds()
+
+
+def current_score(log_score: float, rate: float, now: datetime | None = None) -> float:
+    """
+    Текущий затухающий счёт публикации.
+    
+    Равен сумме 2^(-возраст / период полураспада) по её комментариям.
+    """
+    return math.exp(log_score - log_weight(now or utcnow(), rate))
+
+
+def logaddexp(a: float | None, b: float) -> float:
+    """log(exp(a) + exp(b)) без переполнения; None - пустая сумма."""
+    if a is None:
+        return b
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def logsubexp(a: float | None, b: float) -> float | None:
+    """log(exp(a) - exp(b)); None, если от суммы ничего не осталось."""
+    if a is None or b >= a:
+        return None
+    remainder = -math.expm1(b - a)
+    # Остаток на уровне погрешности - это вычитание последнего слагаемого
+    if remainder < 1e-9:
+        return None
+    return a + math.log(remainder)
+
+
+def register_sql_functions(dbapi_connection, connection_record=None) -> None:
+    """Зарегистрировать logaddexp/logsubexp в соединении SQLite."""
+    dbapi_connection.create_function('blog_logaddexp', 2, logaddexp, deterministic=True)
+    dbapi_connection.create_function('blog_logsubexp', 2, logsubexp, deterministic=True)
+
+
+def add_comment_statement(post_id: int, weight: float):
+    """UPSERT, прибавляющий вес комментария к счёту публикации."""
+    table = PostTrendingModel.__table__
+    statement = sqlite_insert(table).values(post_id=post_id, score=weight)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.post_id],
+        set_={'score': func.blog_logaddexp(table.c.score, statement.excluded.score)}
+    )
+
+
+def remove_comment_statement(post_id: int, weight: float):
+    """UPDATE, вычитающий вес удалённого комментария."""
+    table = PostTrendingModel.__table__
+    return (
+        table.update()
+        .where(table.c.post_id == post_id)
+        .values(score=func.blog_logsubexp(table.c.score, weight))
+    )
+
+
+class SQLTrendingRepository(ITrendingRepository):
+    """Реализация рейтинга публикаций на SQLAlchemy."""
+    
+    def __init__(self, half_life: float = DEFAULT_HALF_LIFE):
+        self.rate = decay_rate(half_life)
+    
+    def top(self, limit: int) -> list[tuple[Post, float]]:
+        """
+        Получить самые обсуждаемые публикации.
+        
+        Чтение идёт по индексу счёта и останавливается на limit строках.
+        
+        Args:
+            limit: Количество публикаций
+        
+        Returns:
+            Пары (публикация, текущий счёт) по убыванию счёта
+        """
+        rows = (
+            db.session.query(PostModel, PostTrendingModel.score)
+            .join(PostTrendingModel, PostTrendingModel.post_id == PostModel.id)
+            .join(UserModel, PostModel.author_id == UserModel.id)
+            .filter(
+                PostTrendingModel.score.is_not(None),
+                PostModel.deleted_at.is_(None),
+                UserModel.deleted_at.is_(None)
+            )
+            .order_by(PostTrendingModel.score.desc())
+            .limit(limit)
+            .all()
+        )
+        now = utcnow()
+        return [
+            (
+                Post(id=post.id, title=post.title, content=post.content, author_id=post.author_id),
+                current_score(score, self.rate, now)
+            )
+            for post, score in rows
+        ]
+    
+    def prune(self) -> int:
+        """
+        Удалить счётчики, затухшие ниже порога или обнулённые удалениями.
+        
+        Returns:
+            Количество удалённых строк
+        """
+        table = PostTrendingModel.__table__
+        threshold = log_weight(utcnow(), self.rate) + math.log(NEGLIGIBLE_SCORE)
+        affected = db.session.execute(
+            table.delete().where(table.c.score.is_(None) | (table.c.score < threshold))
+        ).rowcount
+        db.session.commit()
+        return affected
+
+
+class TrendingBoard:
+    """
+    Готовый топ публикаций, обновляемый фоновым потоком.
+    
+    Запрос отдаёт срез заранее собранного списка за O(K) без обращения к
+    базе. Поток запускается при первом обращении, поэтому приложения,
+    которые не используют рейтинг, его не создают.
+    """
+    
+    def __init__(self, app, load, prune=None, top_k: int = 100, interval: float = 5.0):
+        """
+        Инициализация топа.
+        
+        Args:
+            app: Экземпляр Flask приложения
+            load: Функция limit -> список пар (публикация, счёт)
+            prune: Функция очистки затухших счётчиков
+            top_k: Сколько публикаций держать наготове
+            interval: Период обновления в секундах (0 - без фонового потока)
+        """
+        self.app = app
+        self.load = load
+        self.prune = prune
+        self.top_k = top_k
+        self.interval = interval
+        self.snapshot = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def refresh(self) -> None:
+        """Пересобрать топ и удалить затухшие счётчики."""
+        with self.app.app_context():
+            if self.prune is not None:
+                self.prune()
+            self.snapshot = self.load(self.top_k)
+    
+    def get(self, limit: int) -> list:
+        """
+        Получить первые limit публикаций топа.
+        
+        Args:
+            limit: Количество публикаций (не больше top_k)
+        
+        Returns:
+            Пары (публикация, счёт)
+        """
+        if self.snapshot is None:
+            with self._lock:
+                if self.snapshot is None:
+                    self.snapshot = self.load(self.top_k)
+                    self.start()
+        return self.snapshot[:limit]
+    
+    def _run(self) -> None:
+        """Цикл фонового потока."""
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error("Ошибка обновления топа публикаций: %s", e)
+    
+    def start(self) -> None:
+        """Запустить фоновое обновление."""
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='trending-refresh', daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Остановить фоновое обновление."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
\ No newline at end of file
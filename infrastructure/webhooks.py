@@ -0,0 +1,417 @@
+import hashlib
+import hmac
+import logging
+import random
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from sqlalchemy import bindparam, func, or_, select
+
+from infrastructure.changes import event_json
+from infrastructure.database import db, ChangeLogModel, WebhookDeadLetterModel, WebhookModel, utcnow
+from infrastructure.metrics import metrics
+
+logger = logging.getLogger('blog.webhooks')
+
+# Типы событий, на которые можно подписаться, и подписка по умолчанию
+EVENTS = ('user.create', 'user.delete', 'post.create', 'post.delete', 'comment.create', 'comment.delete')
+DEFAULT_EVENTS = ('post.create', 'comment.create')
+SIGNATURE_HEADER = 'X-Blog-Signature'
+DELIVERY_HEADER = 'X-Blog-Delivery'
+
+metrics.describe('blog_webhook_deliveries_total', 'counter', 'Попытки доставки пачек событий webhook по результату')
+metrics.describe('blog_webhook_events_total', 'counter', 'События, доставленные получателям webhook')
+metrics.describe('blog_webhook_delivery_seconds', 'histogram', 'Длительность HTTP-запроса доставки webhook')
+
+_webhooks = WebhookModel.__table__
+_dead_letters = WebhookDeadLetterModel.__table__
+_changes = ChangeLogModel.__table__
+_event_type = _changes.c.entity + '.' + _changes.c.operation
+
+READ_BATCH = (
+    select(_changes)
+    .where(_changes.c.id > bindparam('cursor'), _event_type.in_(bindparam('events', expanding=True)))
+    .order_by(_changes.c.id)
+    .limit(bindparam('limit'))
+)
+
+
+class DeliveryError(Exception):
+    """Получатель не принял пачку событий."""
+    
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def sign(secret: str, body: bytes) -> str:
+    """Подпись тела запроса: sha256=<HMAC-SHA256 в hex>."""
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def backoff_delay(attempts: int, base: float, maximum: float) -> float:
+    """
+    Пауза перед следующей попыткой: экспоненциальный рост со случайным разбросом.
+    
+    Разброс не даёт подпискам, упавшим одновременно, повторять попытки
+    тоже одновременно.
+    
+    Args:
+        attempts: Число неудачных попыток подряд
+        base: Пауза после первой неудачи в секундах
+        maximum: Наибольшая пауза в секундах
+    """
+    return min(maximum, base * 2 ** (attempts - 1)) * random.uniform(0.5, 1.0)
+
+
+def _retry_after(value: str | None) -> float | None:
+    """Секунды из заголовка Retry-After (дата не поддерживается)."""
+    try:
+        return max(float(value), 0.0) if value else None
+    except ValueError:
+        return None
+
+
+def post_batch(url: str, body: bytes, headers: dict, timeout: float) -> None:
+    """
+    Отправить пачку событий POST-запросом.
+    
+    Raises:
+        DeliveryError: Если ответ не 2xx или запрос не удался
+    """
+    request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+    except urllib.error.HTTPError as e:
+        raise DeliveryError(f'HTTP {e.code}', _retry_after(e.headers.get('Retry-After')))
+    except (urllib.error.URLError, OSError) as e:
+        raise DeliveryError(str(getattr(e, 'reason', e)))
+
+
+def validate_subscription(url: str, events: list | None) -> list:
+    """
+    Проверить адрес и типы событий подписки.
+    
+    Returns:
+        Типы событий (по умолчанию DEFAULT_EVENTS)
+    
+    Raises:
+        ValueError: Если адрес или типы событий некорректны
+    """
+    parts = urlsplit(url or '')
+    if parts.scheme not in ('http', 'https') or not parts.netloc or len(url) > 2048:
+        raise ValueError('Адрес webhook должен быть URL http или https')
+    events = list(events) if events is not None else list(DEFAULT_EVENTS)
+    unknown = sorted(set(events) - set(EVENTS))
+    if not events or unknown:
+        raise ValueError(f"Неизвестные типы событий: {', '.join(unknown) or '(пусто)'}; допустимы: {', '.join(EVENTS)}")
+    return events
+
+
+def create_webhook(url: str, events: list | None = None, secret: str | None = None) -> dict:
+    """
+    Создать подписку; доставка начнётся с событий после текущего конца журнала.
+    
+    Raises:
+        ValueError: Если адрес или типы событий некорректны
+    """
+    events = validate_subscription(url, events)
+    head = db.session.execute(select(func.max(_changes.c.id))).scalar() or 0
+    webhook = WebhookModel(url=url, events=','.join(events), secret=secret, cursor=head)
+    db.session.add(webhook)
+    db.session.flush()
+    created = webhook_dict(webhook)
+    db.session.commit()
+    return created
+
+
+def webhook_dict(webhook) -> dict:
+    """Подписка для ответа API (без ключа подписи)."""
+    return {
+        'id': webhook.id,
+        'url': webhook.url,
+        'events': webhook.events.split(','),
+        'cursor': webhook.cursor,
+        'attempts': webhook.attempts,
+        'next_attempt_at': webhook.next_attempt_at.isoformat() if webhook.next_attempt_at else None,
+        'last_error': webhook.last_error,
+    }
+
+
+def list_webhooks() -> list:
+    """Действующие подписки."""
+    webhooks = db.session.query(WebhookModel).filter(WebhookModel.deleted_at.is_(None)).order_by(WebhookModel.id)
+    return [webhook_dict(webhook) for webhook in webhooks]
+
+
+def delete_webhook(webhook_id: int) -> bool:
+    """
+    Отменить подписку.
+    
+    Returns:
+        True, если подписка была
+    """
+    deleted = db.session.execute(
+        _webhooks.update()
+        .where(_webhooks.c.id == webhook_id, _webhooks.c.deleted_at.is_(None))
+        .values(deleted_at=utcnow())
+    ).rowcount
+    db.session.commit()
+    return deleted == 1
+
+
+def list_dead_letters(webhook_id: int, limit: int = 100) -> list:
+    """Последние недоставленные пачки подписки."""
+    rows = db.session.execute(
+        select(_dead_letters)
+        .where(_dead_letters.c.webhook_id == webhook_id)
+        .order_by(_dead_letters.c.id.desc())
+        .limit(limit)
+    ).all()
+    return [{
+        'id': row.id,
+        'first_change_id': row.first_change_id,
+        'last_change_id': row.last_change_id,
+        'attempts': row.attempts,
+        'error': row.error,
+        'created_at': row.created_at.isoformat(),
+    } for row in rows]
+
+
+class WebhookDispatcher:
+    """
+    Доставка событий журнала изменений подписчикам webhook.
+    
+    Планировщик раз в poll_interval секунд находит подписки, у которых
+    в журнале есть необработанные записи и подошло время попытки, и
+    отдаёт их пулу из workers потоков. Каждой подписке за раз
+    отправляется одна пачка до batch_size событий, поэтому события
+    приходят по порядку, а медленный получатель занимает один поток.
+    Подписка захватывается арендой в базе, так что несколько процессов
+    не доставляют одну пачку дважды. После неудачи следующая попытка
+    откладывается экспоненциально (или по Retry-After), после
+    max_attempts неудач пачка переносится в webhook_dead_letter, и
+    доставка идёт дальше.
+    """
+    
+    def __init__(self, engine, workers: int = 4, batch_size: int = 100, max_attempts: int = 8,
+                 backoff_base: float = 1.0, backoff_max: float = 3600.0, timeout: float = 5.0,
+                 poll_interval: float = 1.0):
+        """
+        Инициализация доставки.
+        
+        Args:
+            engine: Движок SQLAlchemy основной базы
+            workers: Потоков доставки (одновременных запросов к получателям)
+            batch_size: Событий в одном запросе
+            max_attempts: Попыток до переноса пачки в недоставленные
+            backoff_base: Пауза после первой неудачи в секундах
+            backoff_max: Наибольшая пауза между попытками в секундах
+            timeout: Таймаут HTTP-запроса в секундах
+            poll_interval: Период поиска подписок с новыми событиями
+        """
+        self.engine = engine
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        # Аренда с запасом на запрос и запись результата
+        self.lease = timedelta(seconds=2 * timeout + 5)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webhook')
+        self._inflight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+    
+    def due(self) -> list:
+        """ID подписок, у которых есть необработанные события и подошло время попытки."""
+        now = utcnow()
+        with self.engine.connect() as connection:
+            return list(connection.execute(
+                select(_webhooks.c.id)
+                .where(
+                    _webhooks.c.deleted_at.is_(None),
+                    _webhooks.c.cursor < select(func.max(_changes.c.id)).scalar_subquery(),
+                    or_(_webhooks.c.next_attempt_at.is_(None), _webhooks.c.next_attempt_at <= now),
+                    or_(_webhooks.c.lease_until.is_(None), _webhooks.c.lease_until <= now)
+                )
+                .order_by(_webhooks.c.id)
+            ).scalars())
+    
+    def _claim(self, webhook_id: int):
+        """Захватить подписку арендой; None, если её уже обрабатывают."""
+        now = utcnow()
+        with self.engine.begin() as connection:
+            return connection.execute(
+                _webhooks.update()
+                .where(
+                    _webhooks.c.id == webhook_id,
+                    _webhooks.c.deleted_at.is_(None),
+                    or_(_webhooks.c.lease_until.is_(None), _webhooks.c.lease_until <= now)
+                )
+                .values(lease_until=now + self.lease)
+                .returning(_webhooks)
+            ).first()
+    
+    def _finish(self, webhook_id: int, **values) -> None:
+        """Записать результат попытки и снять аренду."""
+        with self.engine.begin() as connection:
+            connection.execute(
+                _webhooks.update().where(_webhooks.c.id == webhook_id).values(lease_until=None, **values)
+            )
+    
+    def deliver(self, webhook) -> int:
+        """
+        Отправить подписке следующую пачку событий.
+        
+        Args:
+            webhook: Захваченная строка подписки
+        
+        Returns:
+            Число доставленных событий (пачка целиком или 0)
+        """
+        with self.engine.connect() as connection:
+            head = connection.execute(select(func.max(_changes.c.id))).scalar() or 0
+            rows = connection.execute(READ_BATCH, {
+                'cursor': webhook.cursor, 'events': webhook.events.split(','), 'limit': self.batch_size
+            }).all()
+        if not rows:
+            # Новые записи журнала - не на события подписки
+            self._finish(webhook.id, cursor=max(webhook.cursor, head))
+            return 0
+        body = (
+            f'{{"webhook_id":{webhook.id},"events":[' + ','.join(event_json(row) for row in rows) + ']}'
+        ).encode()
+        headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': 'blog-webhooks',
+            # Одинаков у повторов одной пачки: получатель может отбросить дубликат
+            DELIVERY_HEADER: f'{webhook.id}-{rows[0].id}-{rows[-1].id}',
+        }
+        if webhook.secret:
+            headers[SIGNATURE_HEADER] = sign(webhook.secret, body)
+        started = perf_counter()
+        try:
+            post_batch(webhook.url, body, headers, self.timeout)
+        except DeliveryError as e:
+            metrics.observe('blog_webhook_delivery_seconds', (), perf_counter() - started)
+            self._failed(webhook, rows, body, e)
+            return 0
+        metrics.observe('blog_webhook_delivery_seconds', (), perf_counter() - started)
+        metrics.inc('blog_webhook_deliveries_total', (('status', 'ok'),))
+        metrics.inc('blog_webhook_events_total', (), len(rows))
+        self._finish(webhook.id, cursor=rows[-1].id, attempts=0, next_attempt_at=None, last_error=None)
+        return len(rows)
+    
+    def _failed(self, webhook, rows, body: bytes, error: DeliveryError) -> None:
+        """Отложить повтор пачки или, если попытки кончились, перенести её в недоставленные."""
+        attempts = webhook.attempts + 1
+        if attempts < self.max_attempts:
+            metrics.inc('blog_webhook_deliveries_total', (('status', 'retry'),))
+            delay = backoff_delay(attempts, self.backoff_base, self.backoff_max)
+            if error.retry_after is not None:
+                delay = max(delay, min(error.retry_after, self.backoff_max))
+            self._finish(
+                webhook.id, attempts=attempts, last_error=str(error),
+                next_attempt_at=utcnow() + timedelta(seconds=delay)
+            )
+            return
+        metrics.inc('blog_webhook_deliveries_total', (('status', 'dead'),))
+        logger.warning(
+            "Webhook %d: пачка %d-%d не доставлена за %d попыток (%s)",
+            webhook.id, rows[0].id, rows[-1].id, attempts, error
+        )
+        with self.engine.begin() as connection:
+            connection.execute(_dead_letters.insert().values(
+                webhook_id=webhook.id,
+                first_change_id=rows[0].id,
+                last_change_id=rows[-1].id,
+                body=body.decode(),
+                attempts=attempts,
+                error=str(error),
+                created_at=utcnow()
+            ))
+            connection.execute(_webhooks.update().where(_webhooks.c.id == webhook.id).values(
+                cursor=rows[-1].id, attempts=0, next_attempt_at=None, lease_until=None, last_error=str(error)
+            ))
+    
+    def process(self, webhook_id: int) -> int:
+        """
+        Захватить подписку и доставить ей пачку.
+        
+        Returns:
+            Число доставленных событий
+        """
+        webhook = self._claim(webhook_id)
+        if webhook is None:
+            return 0
+        try:
+            return self.deliver(webhook)
+        except Exception:
+            self._finish(webhook_id)
+            raise
+    
+    def run_once(self) -> int:
+        """
+        Доставить по одной пачке всем подпискам, которым пора, и дождаться результата.
+        
+        Returns:
+            Число доставленных событий
+        """
+        return sum(self._executor.map(self.process, self.due()))
+    
+    def _process_async(self, webhook_id: int) -> None:
+        """Обработка подписки в пуле: полная пачка - сигнал сразу искать следующую."""
+        try:
+            if self.process(webhook_id) >= self.batch_size:
+                self._wake.set()
+        except Exception as e:
+            logger.error("Ошибка доставки webhook %d: %s", webhook_id, e)
+        finally:
+            with self._lock:
+                self._inflight.discard(webhook_id)
+    
+    def _schedule(self) -> None:
+        """Раздать пулу подписки, которым пора, не больше одной пачки на подписку."""
+        for webhook_id in self.due():
+            with self._lock:
+                if webhook_id in self._inflight or len(self._inflight) >= self.workers:
+                    continue
+                self._inflight.add(webhook_id)
+            self._executor.submit(self._process_async, webhook_id)
+    
+    def _run(self) -> None:
+        """Цикл планировщика."""
+        while not self._stop.is_set():
+            try:
+                self._schedule()
+            except Exception as e:
+                logger.error("Ошибка планировщика webhook: %s", e)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+    
+    def start(self) -> None:
+        """Запустить фоновую доставку (повторный вызов ничего не делает)."""
+        with self._lock:
+            if self._thread is None and not self._stop.is_set():
+                self._thread = threading.Thread(target=self._run, name='webhook-scheduler', daemon=True)
+                self._thread.start()
+    
+    def stop(self) -> None:
+        """Остановить фоновую доставку и дождаться текущих запросов."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._executor.shutdown(wait=True)
\ No newline at end of file
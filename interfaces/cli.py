@@ -0,0 +1,203 @@
+import glob
+import io
+import json
+import os
+import pstats
+from collections import Counter
+
+import click
+
+
+@click.group()
+def cli():
+    """Служебные команды Blog API."""
+
+
+@cli.command('profile-token')
+@click.option('--secret', envvar='FLASK_SECRET_KEY', required=True, help='SECRET_KEY приложения')
+def profile_token(secret):
+    """Вывести подписанный токен для заголовка профилирования."""
+    from interfaces.web.profiling import make_profile_token
+    click.echo(make_profile_token(secret))
+
+
+@cli.command('profile-report')
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--top', default=20, show_default=True, help='Сколько горячих точек показать')
+@click.option('--sort', default='cumulative', show_default=True, help='Сортировка pstats: cumulative, tottime, calls')
+@click.option('--route', default=None, help='Только указанный эндпоинт, например controllers.get_post')
+def profile_report(directory, top, sort, route):
+    """Объединить профили из DIRECTORY и вывести топ горячих точек по эндпоинтам."""
+    routes = [route] if route else sorted(os.listdir(directory))
+    for name in routes:
+        route_dir = os.path.join(directory, name)
+        if not os.path.isdir(route_dir):
+            continue
+        
+        prof_files = sorted(glob.glob(os.path.join(route_dir, '*.prof')))
+        if prof_files:
+            click.echo(f'=== {name}: {len(prof_files)} профилей cProfile')
+            stream = io.StringIO()
+            stats = pstats.Stats(*prof_files, stream=stream)
+            stats.strip_dirs().sort_stats(sort).print_stats(top)
+            click.echo(stream.getvalue())
+        
+        folded_files = sorted(glob.glob(os.path.join(route_dir, '*.folded')))
+        if folded_files:
+            stacks = Counter()
+            for path in folded_files:
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        stack, _, count = line.rstrip('\n').rpartition(' ')
+                        stacks[stack] += int(count)
+            total = sum(stacks.values()) or 1
+            self_samples = Counter()
+            for stack, count in stacks.items():
+                self_samples[stack.rsplit(';', 1)[-1]] += count
+            
+            click.echo(f'=== {name}: {len(folded_files)} профилей сэмплера, {total} сэмплов')
+            for frame, count in self_samples.most_common(top):
+                click.echo(f'{count / total:7.1%}  {count:8d}  {frame}')
+            merged_path = os.path.join(route_dir, 'merged.folded.txt')
+            with open(merged_path, 'w', encoding='utf-8') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f'{stack} {count}\n')
+            click.echo(f'Объединённые стеки для flamegraph: {merged_path}\n')
+
+
+@cli.command('build-spec')
+@click.argument('output', type=click.Path(dir_okay=False))
+def build_spec_command(output):
+    """Собрать спецификацию Swagger в OUTPUT для SWAGGER_SPEC_PATH."""
+    from interfaces.web.app import create_app
+    from interfaces.web.docs import build_spec
+    
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'SOFT_DELETE_PURGE_ENABLED': False})
+    spec = build_spec(app)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(spec, f, ensure_ascii=False, indent=2)
+    click.echo(f'{len(spec.get("paths", {}))} путей записано в {output}')
+
+
+@cli.command('reshard')
+@click.option('--source', multiple=True, required=True, help='Текущий шард (путь или URI), можно несколько раз')
+@click.option('--target', multiple=True, required=True, help='Новый шард (путь или URI), можно несколько раз')
+@click.option('--batch-size', default=5000, show_default=True, help='Строк в одной пачке')
+def reshard_command(source, target, batch_size):
+    """Перенести данные шардов на новый набор файлов (приложение должно быть остановлено)."""
+    from infrastructure.sharding import reshard
+    
+    copied = reshard(list(source), list(target), batch_size)
+    for table, count in copied.items():
+        click.echo(f'{table}: {count}')
+    click.echo(f'Укажите новые шарды в SHARD_DATABASE_URIS: {json.dumps(list(target))}')
+
+
+@cli.command('export')
+@click.argument('db_path', type=click.Path(exists=True, dir_okay=False))
+@click.argument('output', type=click.Path(dir_okay=False))
+@click.option('--chunk-size', default=10_000, show_default=True, help='Строк в одной пачке чтения')
+def export_command(db_path, output, chunk_size):
+    """Выгрузить пользователей, публикации и комментарии из DB_PATH в OUTPUT (NDJSON, .gz - со сжатием)."""
+    from time import perf_counter
+    from infrastructure.transfer import export_ndjson
+    
+    start = perf_counter()
+    counts = export_ndjson(db_path, output, chunk_size)
+    elapsed = perf_counter() - start
+    for kind, count in counts.items():
+        click.echo(f'{kind}: {count}')
+    click.echo(f'{sum(counts.values()) / max(elapsed, 1e-9) * 60:,.0f} записей в минуту')
+
+
+@cli.command('import')
+@click.argument('input_path', type=click.Path(exists=True, dir_okay=False))
+@click.argument('db_path', type=click.Path(dir_okay=False))
+@click.option('--workers', default=None, type=int, help='Процессов разбора (по умолчанию - по числу ядер)')
+@click.option('--batch-size', default=50_000, show_default=True, help='Строк в одной транзакции')
+def import_command(input_path, db_path, workers, batch_size):
+    """Загрузить выгрузку INPUT_PATH в DB_PATH (прерванная загрузка продолжается с контрольной точки)."""
+    from time import perf_counter
+    from infrastructure.database import db
+    from infrastructure.transfer import import_ndjson
+    from interfaces.web.app import create_app
+    
+    # Схема создаётся и обновляется так же, как при запуске приложения
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{os.path.abspath(db_path)}',
+        'SOFT_DELETE_PURGE_ENABLED': False,
+    })
+    with app.app_context():
+        db.engine.dispose()
+    
+    start = perf_counter()
+    result = import_ndjson(
+        input_path, db_path, workers, batch_size,
+        on_batch=lambda lines: click.echo(f'строк обработано: {lines}', err=True),
+        half_life=app.config['TRENDING_HALF_LIFE']
+    )
+    elapsed = perf_counter() - start
+    if result['resumed']:
+        click.echo(f'Продолжено с контрольной точки: пропущено {result["resumed"]} строк')
+    total = 0
+    for kind in ('user', 'post', 'comment'):
+        total += result[kind]
+        click.echo(f'{kind}: {result[kind]}')
+    click.echo(f'{total / max(elapsed, 1e-9) * 60:,.0f} записей в минуту')
+    errors = result['errors']
+    if errors:
+        click.echo(f'Пропущено записей с ошибками: {len(errors)}', err=True)
+        for number, message in errors[:20]:
+            click.echo(f'  строка {number}: {message}', err=True)
+
+
+@cli.command('backup')
+@click.argument('db_path', type=click.Path(exists=True, dir_okay=False))
+@click.argument('directory', type=click.Path(file_okay=False))
+@click.option('--keep', default=24, show_default=True, help='Сколько последних копий хранить')
+@click.option('--pages', default=256, show_default=True, help='Страниц за шаг копирования')
+@click.option('--pause', default=0.001, show_default=True, help='Пауза между шагами в секундах')
+def backup_command(db_path, directory, keep, pages, pause):
+    """Снять копию работающей базы DB_PATH в каталог DIRECTORY, не останавливая запись."""
+    from infrastructure.backup import BackupScheduler, TooManyRestarts
+    
+    try:
+        result = BackupScheduler(db_path, directory, interval=0, keep=keep, pages=pages, pause=pause).run_once()
+    except TooManyRestarts as e:
+        raise click.ClickException(str(e))
+    click.echo(result['path'])
+    click.echo(f'{result["bytes"] / 2 ** 20:.1f} МБ за {result["seconds"]:.2f} с ({result["mb_per_second"]:.1f} МБ/с)')
+    click.echo(f'шагов: {result["steps"]}, самый долгий шаг: {result["max_step_ms"]:.1f} мс')
+    if result['restarts']:
+        click.echo(f'перезапусков из-за записи: {result["restarts"]}')
+    for path in result['removed']:
+        click.echo(f'удалена старая копия: {path}')
+
+
+@cli.command('restore')
+@click.argument('db_path', type=click.Path(dir_okay=False))
+@click.argument('source', type=click.Path(exists=True))
+@click.option('--at', 'at', default=None, type=click.DateTime(), help='Момент (UTC): взять последнюю копию не позже него')
+def restore_command(db_path, source, at):
+    """Восстановить DB_PATH из копии SOURCE (файл или каталог копий). Приложение должно быть остановлено."""
+    from infrastructure.backup import find_backup, restore_database
+    
+    backup_path = source
+    if os.path.isdir(source):
+        backup_path = find_backup(source, at)
+        if backup_path is None:
+            raise click.ClickException(f'В {source} нет подходящей копии')
+    try:
+        result = restore_database(backup_path, db_path)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Восстановлено из {backup_path}: {result["bytes"] / 2 ** 20:.1f} МБ за {result["seconds"]:.2f} с')
+
+
+def main():
+    """Точка входа консольной команды blog."""
+    cli()
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -1,35 +1,256 @@
 from flask import Flask, jsonify
-from flasgger import Swagger
 from infrastructure.factories import DatabaseFactory
+from infrastructure.metrics import metrics
+from infrastructure.purger import SoftDeletePurger
+from infrastructure.query_log import query_log
+from infrastructure.sharding import ShardedSoftDeletePurger
+from .backup import init_backup
+from .changes import bp as changes_bp, init_change_stream
+from .concurrency import init_concurrency_limit
+from .container import init_container
+from .deadline import init_deadlines
 from .controllers import bp as controllers_bp
+from .docs import init_docs
+from .idempotency import init_idempotency
+from .metrics import bp as metrics_bp, init_request_metrics
+from .profiling import init_profiling
+from .ratelimit import init_rate_limit
+from .replica import init_read_replica
+from .tracing import init_tracing
+from .webhooks import bp as webhooks_bp, init_webhooks
 
 
-def create_app() -> Flask:
+def create_app(config: dict | None = None) -> Flask:
     """
     Создать и настроить Flask приложение.
     
+    Args:
+        config: Параметры, переопределяющие конфигурацию по умолчанию
+    
     Returns:
         Экземпляр Flask приложения
     """
     app = Flask(__name__)
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///blog.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Хранилище репозиториев: sql, memory или sharded
+    app.config['REPOSITORY_BACKEND'] = 'sql'
+    # Файлы SQLite шардов для хранилища sharded
+    app.config['SHARD_DATABASE_URIS'] = []
+    # Рейтинг обсуждаемых публикаций: период полураспада веса комментария,
+    # размер готового топа и период его фонового обновления
+    app.config['TRENDING_HALF_LIFE'] = 6 * 3600.0
+    app.config['TRENDING_TOP_K'] = 100
+    app.config['TRENDING_REFRESH_INTERVAL'] = 5.0
+    # Ленты: авторы с таким числом подписчиков и больше не рассылают
+    # публикации, а подтягиваются при чтении; размер ленты пользователя
+    app.config['FEED_FANOUT_THRESHOLD'] = 1000
+    app.config['FEED_MAX_ENTRIES'] = 500
+    # Реплика для чтения: копия SQLite-файла, обновляемая backup API
+    app.config['REPLICA_ENABLED'] = False
+    app.config['REPLICA_PATH'] = None
+    app.config['REPLICA_SYNC_INTERVAL'] = 1.0
+    # Сколько секунд после записи клиент читает с основной базы
+    app.config['READ_YOUR_WRITES_WINDOW'] = 5.0
+    # Декораторы репозиториев и сценариев (первый в списке - самый внутренний)
+    app.config['REPOSITORY_DECORATORS'] = ['tracing', 'metrics']
+    app.config['USE_CASE_DECORATORS'] = ['tracing']
+    # Кэш get_by_id для декоратора cache
+    app.config['REPOSITORY_CACHE_SIZE'] = 10000
+    app.config['REPOSITORY_CACHE_TTL'] = 5.0
+    # Ограничение частоты: корзина токенов на (клиент, маршрут) -
+    # (размер корзины, пополнение в секунду); таблица корзин в файле
+    # RATELIMIT_STATE_PATH общая для процессов (None - память процесса)
+    app.config['RATELIMIT_ENABLED'] = False
+    app.config['RATELIMIT_STATE_PATH'] = None
+    app.config['RATELIMIT_SLOTS'] = 65536
+    # Заголовок с ID клиента (например, X-Client-Id) можно задавать только
+    # за прокси, который проверяет клиента и перезаписывает заголовок;
+    # иначе клиент получает новую корзину, подменив значение (None - по IP)
+    app.config['RATELIMIT_CLIENT_HEADER'] = None
+    app.config['RATELIMIT_DEFAULT'] = (100, 50.0)
+    app.config['RATELIMIT_ROUTES'] = {
+        'controllers.get_all_users': (5, 0.5),
+        'controllers.get_all_posts': (5, 0.5),
+        'controllers.get_all_comments': (5, 0.5),
+    }
+    app.config['RATELIMIT_EXEMPT'] = ['metrics.export_metrics']
+    # Адаптивный лимит одновременных запросов API: границы лимита, допуск
+    # роста задержки и доли лимита по классам; списки - отдельный класс,
+    # остальные запросы делятся на записи и точечные чтения
+    app.config['CONCURRENCY_LIMIT_ENABLED'] = False
+    app.config['CONCURRENCY_LIMIT_INITIAL'] = 20
+    app.config['CONCURRENCY_LIMIT_MIN'] = 4
+    app.config['CONCURRENCY_LIMIT_MAX'] = 200
+    app.config['CONCURRENCY_LIMIT_TOLERANCE'] = 1.5
+    app.config['CONCURRENCY_SHARES'] = {'critical': 1.0, 'write': 0.8, 'list': 0.5}
+    app.config['CONCURRENCY_ROUTES'] = {
+        'controllers.get_all_users': 'list',
+        'controllers.get_all_posts': 'list',
+        'controllers.get_all_comments': 'list',
+        'controllers.get_post_comments': 'list',
+        'controllers.get_feed': 'list',
+    }
+    app.config['CONCURRENCY_RETRY_AFTER'] = 1
+    # Сроки обработки запросов API в секундах (None - без срока);
+    # заголовок X-Request-Timeout может срок только сократить
+    app.config['REQUEST_DEADLINE_ENABLED'] = True
+    app.config['REQUEST_DEADLINE_DEFAULT'] = 30.0
+    app.config['REQUEST_DEADLINE_ROUTES'] = {
+        'controllers.get_all_users': 10.0,
+        'controllers.get_all_posts': 10.0,
+        'controllers.get_all_comments': 10.0,
+    }
+    # Ключи идемпотентности POST-запросов (заголовок Idempotency-Key):
+    # срок хранения ответа, срок захвата ключа выполняющимся запросом,
+    # ожидание повтором ответа выполняющегося запроса и период опроса
+    # таблицы, если запрос выполняется в другом процессе
+    app.config['IDEMPOTENCY_ENABLED'] = True
+    app.config['IDEMPOTENCY_TTL'] = 24 * 3600.0
+    app.config['IDEMPOTENCY_LOCK_TIMEOUT'] = 30.0
+    app.config['IDEMPOTENCY_WAIT'] = 10.0
+    app.config['IDEMPOTENCY_POLL_INTERVAL'] = 0.05
+    # Кэш HTML публикаций (?format=html); новые публикации отрисовываются
+    # в фоновом потоке, False - сразу в запросе создания
+    app.config['MARKDOWN_CACHE_SIZE'] = 10000
+    app.config['MARKDOWN_CACHE_TTL'] = 24 * 3600.0
+    app.config['MARKDOWN_PRERENDER_BACKGROUND'] = True
+    # Фоновая очистка мягко удалённых записей
+    app.config['SOFT_DELETE_PURGE_ENABLED'] = True
+    app.config['SOFT_DELETE_PURGE_BATCH_SIZE'] = 500
+    app.config['SOFT_DELETE_PURGE_INTERVAL'] = 1.0
+    # Резервное копирование работающей базы: каталог, период, сколько копий
+    # хранить, страниц за шаг копирования и пауза между шагами
+    app.config['BACKUP_ENABLED'] = False
+    app.config['BACKUP_DIR'] = 'backups'
+    app.config['BACKUP_INTERVAL'] = 3600.0
+    app.config['BACKUP_KEEP'] = 24
+    app.config['BACKUP_PAGES_PER_STEP'] = 256
+    app.config['BACKUP_STEP_PAUSE'] = 0.001
+    # Журнал изменений и поток GET /changes/stream: период чтения журнала,
+    # буфер последних событий в памяти, пачка событий, период комментариев
+    # для удержания соединения и пауза переподключения клиента
+    app.config['CHANGE_LOG_RETENTION'] = 7 * 24 * 3600.0
+    app.config['CHANGE_STREAM_POLL_INTERVAL'] = 0.2
+    app.config['CHANGE_STREAM_BUFFER_SIZE'] = 10000
+    app.config['CHANGE_STREAM_BATCH_SIZE'] = 1000
+    app.config['CHANGE_STREAM_HEARTBEAT'] = 15.0
+    app.config['CHANGE_STREAM_RETRY'] = 3.0
+    # Страница GET /sync: по умолчанию и наибольшая
+    app.config['SYNC_PAGE_SIZE'] = 500
+    app.config['SYNC_MAX_PAGE_SIZE'] = 1000
+    # Доставка webhook: потоки, событий в запросе, попытки до переноса в
+    # недоставленные, рост пауз между попытками, таймаут запроса и период
+    # поиска подписок с новыми событиями
+    app.config['WEBHOOK_DELIVERY_ENABLED'] = True
+    app.config['WEBHOOK_WORKERS'] = 4
+    app.config['WEBHOOK_BATCH_SIZE'] = 100
+    app.config['WEBHOOK_MAX_ATTEMPTS'] = 8
+    app.config['WEBHOOK_BACKOFF_BASE'] = 1.0
+    app.config['WEBHOOK_BACKOFF_MAX'] = 3600.0
+    app.config['WEBHOOK_TIMEOUT'] = 5.0
+    app.config['WEBHOOK_POLL_INTERVAL'] = 1.0
+    # Каталог для объединения метрик нескольких процессов (None - один процесс)
+    app.config['METRICS_DIR'] = None
+    app.config['METRICS_FLUSH_INTERVAL'] = 1.0
+    # Журнал медленных запросов и бюджеты SQL-запросов по эндпоинтам
+    app.config['SLOW_QUERY_THRESHOLD'] = 0.1
+    app.config['QUERY_BUDGETS'] = {
+        'controllers.create_user': 3,
+        'controllers.create_post': 5,
+        'controllers.get_post': 1,
+        'controllers.get_trending_posts': 1,
+        'controllers.get_post_comments': 3,
+        'controllers.create_comment': 7,
+        'controllers.get_all_users': 1,
+        'controllers.get_user': 1,
+        'controllers.delete_user': 3,
+        'controllers.get_all_posts': 1,
+        'controllers.delete_post': 3,
+        'controllers.get_all_comments': 1,
+        'controllers.get_comment': 1,
+        'controllers.delete_comment': 4,
+        'controllers.follow_user': 5,
+        'controllers.unfollow_user': 3,
+        'controllers.get_feed': 3,
+        'changes.sync': 5,
+    }
+    # Бюджеты хранилища sharded поверх QUERY_BUDGETS: (постоянная часть, запросов
+    # на каждый шард). Почта занимается на отдельном шарде, а списки и рассылка
+    # опрашивают все шарды
+    app.config['SHARDED_QUERY_BUDGETS'] = {
+        'controllers.create_user': (4, 0),
+        'controllers.create_post': (5, 2),
+        'controllers.get_trending_posts': (0, 1),
+        'controllers.get_post_comments': (3, 1),
+        'controllers.get_all_users': (0, 1),
+        'controllers.get_all_posts': (0, 1),
+        'controllers.get_all_comments': (0, 2),
+        'controllers.get_comment': (2, 0),
+        'controllers.get_feed': (2, 2),
+    }
+    # Выборочное профилирование запросов
+    app.config['PROFILING_ENABLED'] = False
+    app.config['PROFILING_SAMPLE_RATE'] = 0.01
+    app.config['PROFILING_MODE'] = 'cprofile'
+    app.config['PROFILING_SAMPLER_INTERVAL'] = 0.001
+    app.config['PROFILING_DIR'] = 'profiles'
+    app.config['PROFILING_HEADER'] = 'X-Profile-Token'
+    app.config['PROFILING_TOKEN_MAX_AGE'] = 3600
+    # Трассировка запрос -> сценарий -> репозиторий -> SQL
+    app.config['TRACING_ENABLED'] = False
+    app.config['TRACING_SAMPLE_RATE'] = 0.01
+    app.config['TRACING_SERVICE_NAME'] = 'blog'
+    app.config['TRACING_EXPORT_PATH'] = 'traces.jsonl'
+    app.config['TRACING_OTLP_ENDPOINT'] = None
+    # Заранее собранная спецификация (blog build-spec); None - разбор docstring
+    app.config['SWAGGER_SPEC_PATH'] = None
     app.config['SWAGGER'] = {
         'title': 'Blog API',
         'version': '1.0',
         'description': 'Простое API для блога с чистой архитектурой',
     }
+    # Переменные окружения FLASK_* переопределяют значения по умолчанию
+    app.config.from_prefixed_env()
+    if config:
+        app.config.update(config)
 
-    Swagger(app, template={
-        'info': {
-            'title': 'Blog API',
-            'version': '1.0',
-            'description': 'Документация для API блога'
-        }
-    })
+    init_docs(app)
     
     DatabaseFactory.initialize_db(app)
+    metrics.init_app(app)
+    init_request_metrics(app)
+    init_rate_limit(app)
+    # До учёта запросов: обслуживание ключей не входит в бюджеты эндпоинтов
+    init_idempotency(app)
+    init_concurrency_limit(app)
+    init_deadlines(app)
+    query_log.init_app(app)
+    init_profiling(app)
+    init_tracing(app)
+    init_read_replica(app)
+    init_container(app)
+    init_change_stream(app)
+    init_webhooks(app)
     app.register_blueprint(controllers_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(changes_bp)
+    app.register_blueprint(webhooks_bp)
+    
+    purger_options = {
+        'batch_size': app.config['SOFT_DELETE_PURGE_BATCH_SIZE'],
+        'interval': app.config['SOFT_DELETE_PURGE_INTERVAL'],
+        'change_log_retention': app.config['CHANGE_LOG_RETENTION']
+    }
+    sharded_store = app.extensions['container'].factory.sharded_store
+    if sharded_store is not None:
+        purger = ShardedSoftDeletePurger(app, sharded_store, **purger_options)
+    else:
+        purger = SoftDeletePurger(app, **purger_options)
+    app.extensions['soft_delete_purger'] = purger
+    if app.config['SOFT_DELETE_PURGE_ENABLED']:
+        purger.start()
+    init_backup(app)
     
     @app.route('/favicon.ico')
     def favicon():
@@ -0,0 +1,39 @@
+from flask import Flask
+
+from infrastructure.backup import BackupScheduler
+from infrastructure.database import db
+
+
+def init_backup(app: Flask) -> BackupScheduler | None:
+    """
+    Подключить периодическое резервное копирование базы.
+    
+    Раз в BACKUP_INTERVAL секунд в BACKUP_DIR снимается согласованная
+    копия работающей базы, хранятся BACKUP_KEEP последних. Копирование
+    идёт шагами и не останавливает запись. Поддерживается только файловая
+    SQLite.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    
+    Returns:
+        Расписание копирования или None, если оно выключено
+    """
+    if not app.config['BACKUP_ENABLED']:
+        return None
+    with app.app_context():
+        db_path = db.engine.url.database
+    if not db_path or db_path == ':memory:':
+        app.logger.warning("Резервное копирование требует файловую базу SQLite и не будет включено")
+        return None
+    scheduler = BackupScheduler(
+        db_path,
+        app.config['BACKUP_DIR'],
+        interval=app.config['BACKUP_INTERVAL'],
+        keep=app.config['BACKUP_KEEP'],
+        pages=app.config['BACKUP_PAGES_PER_STEP'],
+        pause=app.config['BACKUP_STEP_PAUSE']
+    )
+    app.extensions['backup_scheduler'] = scheduler
+    scheduler.start()
+    return scheduler
\ No newline at end of file
@@ -0,0 +1,193 @@
+from flask import Blueprint, Flask, Response, current_app, jsonify, request
+
+from infrastructure.changes import ChangeFeed
+from infrastructure.database import db
+from infrastructure.metrics import metrics
+from infrastructure.sync import SyncTokenExpired, sync_page
+
+bp = Blueprint('changes', __name__)
+
+metrics.describe('blog_change_stream_subscribers', 'gauge', 'Подписчики потока изменений')
+metrics.describe('blog_change_stream_catchup_total', 'counter', 'Дочитывания журнала изменений отставшими подписчиками')
+
+
+def init_change_stream(app: Flask) -> ChangeFeed:
+    """
+    Подготовить раздачу журнала изменений для GET /changes/stream.
+    
+    Читатель журнала запускается при первом подписчике.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    
+    Returns:
+        Раздача журнала изменений
+    """
+    with app.app_context():
+        engine = db.engine
+    feed = ChangeFeed(
+        engine,
+        poll_interval=app.config['CHANGE_STREAM_POLL_INTERVAL'],
+        buffer_size=app.config['CHANGE_STREAM_BUFFER_SIZE'],
+        batch_size=app.config['CHANGE_STREAM_BATCH_SIZE']
+    )
+    app.extensions['change_feed'] = feed
+    return feed
+
+
+def _events(feed: ChangeFeed, cursor: int, heartbeat: float, retry: int):
+    """Тело ответа SSE: события после cursor, а в паузах - комментарии для удержания соединения."""
+    metrics.gauge_add('blog_change_stream_subscribers', (), 1)
+    try:
+        yield f'retry: {retry}\n\n'.encode()
+        while True:
+            events = feed.wait(cursor, heartbeat)
+            if events is None:
+                metrics.inc('blog_change_stream_catchup_total', ())
+                events = feed.read(cursor)
+            if not events:
+                yield b': keepalive\n\n'
+                continue
+            cursor = events[-1][0]
+            yield b''.join(event for _, event in events)
+    finally:
+        metrics.gauge_add('blog_change_stream_subscribers', (), -1)
+
+
+@bp.route('/changes/stream')
+def stream_changes():
+    """
+    Поток изменений (Server-Sent Events).
+    ---
+    tags:
+      - general
+    parameters:
+      - name: Last-Event-ID
+        in: header
+        type: integer
+        required: false
+        description: ID последнего полученного события; поток продолжится после него
+      - name: last_event_id
+        in: query
+        type: integer
+        required: false
+        description: То же, что Last-Event-ID (0 - весь журнал); без них поток начинается с текущего момента
+    produces:
+      - text/event-stream
+    responses:
+      200:
+        description: >
+          События создания и удаления пользователей, публикаций, комментариев
+          и подписок. Поле id события - смещение в журнале, data - JSON с
+          полями entity, operation, entity_id, created_at и data
+      400:
+        description: Неверный ID события
+      501:
+        description: Хранилище не ведёт журнал изменений
+    """
+    if current_app.config['REPOSITORY_BACKEND'] != 'sql':
+        return jsonify({'error': 'Поток изменений доступен только для хранилища sql'}), 501
+    feed = current_app.extensions['change_feed']
+    feed.start()
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id is None:
+        cursor = feed.last_id
+    else:
+        try:
+            cursor = int(last_event_id)
+        except ValueError:
+            cursor = -1
+        if cursor < 0:
+            return jsonify({'error': 'ID события должен быть неотрицательным целым числом'}), 400
+    response = Response(
+        _events(
+            feed, cursor,
+            current_app.config['CHANGE_STREAM_HEARTBEAT'],
+            int(current_app.config['CHANGE_STREAM_RETRY'] * 1000)
+        ),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx не должен буферизовать поток
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@bp.route('/sync')
+def sync():
+    """
+    Синхронизация: пользователи, публикации и комментарии, изменённые после токена.
+    
+    Без since возвращается первая страница полной синхронизации. Клиент
+    запрашивает страницы с token из ответа, пока has_more истинно, и
+    сохраняет последний token; следующая синхронизация с ним вернёт
+    только созданное и удалённое с тех пор. Удаление пользователя или
+    публикации скрывает их публикации и комментарии без отдельных записей
+    в deleted.
+    ---
+    tags:
+      - general
+    parameters:
+      - name: since
+        in: query
+        type: string
+        required: false
+        description: Токен из предыдущего ответа
+      - name: limit
+        in: query
+        type: integer
+        default: 500
+    responses:
+      200:
+        description: Страница изменений
+        schema:
+          type: object
+          properties:
+            users:
+              type: array
+              items:
+                type: object
+            posts:
+              type: array
+              items:
+                type: object
+            comments:
+              type: array
+              items:
+                type: object
+            deleted:
+              type: object
+              properties:
+                users:
+                  type: array
+                  items:
+                    type: integer
+                posts:
+                  type: array
+                  items:
+                    type: integer
+                comments:
+                  type: array
+                  items:
+                    type: integer
+            token:
+              type: string
+            has_more:
+              type: boolean
+      400:
+        description: Некорректный токен
+      410:
+        description: Журнал после токена очищен, нужна полная синхронизация без since
+      501:
+        description: Хранилище не ведёт журнал изменений
+    """
+    if current_app.config['REPOSITORY_BACKEND'] != 'sql':
+        return jsonify({'error': 'Синхронизация доступна только для хранилища sql'}), 501
+    max_limit = current_app.config['SYNC_MAX_PAGE_SIZE']
+    limit = min(max(request.args.get('limit', current_app.config['SYNC_PAGE_SIZE'], type=int), 1), max_limit)
+    try:
+        return jsonify(sync_page(request.args.get('since'), limit))
+    except SyncTokenExpired as e:
+        return jsonify({'error': str(e)}), 410
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
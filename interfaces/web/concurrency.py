@@ -0,0 +1,69 @@
+from time import perf_counter
+
+from flask import Flask, g, jsonify, request
+
+from infrastructure.concurrency import AdaptiveConcurrencyLimiter
+from infrastructure.metrics import metrics
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+metrics.describe('blog_load_shed_total', 'counter', 'Запросы, отклонённые адаптивным лимитом одновременных запросов')
+
+
+def request_priority(routes: dict) -> str:
+    """Класс текущего запроса: из CONCURRENCY_ROUTES, иначе запись или точечное чтение."""
+    priority = routes.get(request.endpoint)
+    if priority is not None:
+        return priority
+    return 'critical' if request.method in READ_METHODS else 'write'
+
+
+def init_concurrency_limit(app: Flask) -> AdaptiveConcurrencyLimiter | None:
+    """
+    Подключить адаптивный лимит одновременных запросов к API.
+    
+    Лимит подстраивается под задержку ответов (см.
+    AdaptiveConcurrencyLimiter). Запросы API делятся на классы:
+    списки из CONCURRENCY_ROUTES, записи и точечные чтения, каждому
+    доступна своя доля лимита из CONCURRENCY_SHARES. Лишние запросы
+    сразу получают 503 с Retry-After и не ждут блокировок SQLite.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    
+    Returns:
+        Лимит или None, если он выключен
+    """
+    if not app.config['CONCURRENCY_LIMIT_ENABLED']:
+        return None
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=app.config['CONCURRENCY_LIMIT_INITIAL'],
+        min_limit=app.config['CONCURRENCY_LIMIT_MIN'],
+        max_limit=app.config['CONCURRENCY_LIMIT_MAX'],
+        tolerance=app.config['CONCURRENCY_LIMIT_TOLERANCE'],
+        shares=app.config['CONCURRENCY_SHARES']
+    )
+    app.extensions['concurrency_limiter'] = limiter
+    routes = app.config['CONCURRENCY_ROUTES']
+    retry_after = app.config['CONCURRENCY_RETRY_AFTER']
+    
+    @app.before_request
+    def acquire_slot():
+        if request.blueprint != 'controllers':
+            return
+        priority = request_priority(routes)
+        if not limiter.try_acquire(priority):
+            metrics.inc('blog_load_shed_total', (('priority', priority),))
+            response = jsonify({'error': 'Сервер перегружен, повторите запрос позже'})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(retry_after)
+            return response
+        g.blog_concurrency_start = perf_counter()
+    
+    @app.teardown_request
+    def release_slot(error=None):
+        start = g.pop('blog_concurrency_start', None)
+        if start is not None:
+            limiter.release(perf_counter() - start if error is None else None)
+    
+    return limiter
\ No newline at end of file
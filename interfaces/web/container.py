@@ -0,0 +1,230 @@
+from flask import Flask, current_app, g
+from application.use_cases import (
+    CreateUserUseCase,
+    CreatePostUseCase,
+    CreateCommentUseCase,
+    GetPostUseCase,
+    GetAllUsersUseCase,
+    GetUserByIdUseCase,
+    DeleteUserUseCase,
+    GetAllPostsUseCase,
+    DeletePostUseCase,
+    GetAllCommentsUseCase,
+    GetCommentByIdUseCase,
+    GetCommentThreadUseCase,
+    DeleteCommentUseCase,
+    GetTrendingPostsUseCase,
+    FollowUserUseCase,
+    UnfollowUserUseCase,
+    GetFeedUseCase
+)
+from infrastructure.cache import CachedRepository, RepositoryCache
+from infrastructure.database import db
+from infrastructure.deadline import watch_engine
+from infrastructure.factories import RepositoryFactory
+from infrastructure.markdown import MarkdownRenderer
+from infrastructure.metrics import MetricsRepository
+from infrastructure.query_log import query_log
+from infrastructure.tracing import TracedProxy, tracer
+from infrastructure.trending import TrendingBoard
+
+# Сценарии использования: имя -> (класс, репозитории в порядке аргументов)
+USE_CASES = {
+    'create_user': (CreateUserUseCase, ('user',)),
+    'create_post': (CreatePostUseCase, ('post', 'user', 'feed', 'renderer')),
+    'create_comment': (CreateCommentUseCase, ('comment', 'post', 'user')),
+    'get_post': (GetPostUseCase, ('post',)),
+    'get_all_users': (GetAllUsersUseCase, ('user',)),
+    'get_user_by_id': (GetUserByIdUseCase, ('user',)),
+    'delete_user': (DeleteUserUseCase, ('user',)),
+    'get_all_posts': (GetAllPostsUseCase, ('post',)),
+    'delete_post': (DeletePostUseCase, ('post', 'renderer')),
+    'get_all_comments': (GetAllCommentsUseCase, ('comment',)),
+    'get_comment_by_id': (GetCommentByIdUseCase, ('comment',)),
+    'get_comment_thread': (GetCommentThreadUseCase, ('comment',)),
+    'delete_comment': (DeleteCommentUseCase, ('comment',)),
+    'get_trending_posts': (GetTrendingPostsUseCase, ('trending',)),
+    'follow_user': (FollowUserUseCase, ('feed', 'user')),
+    'unfollow_user': (UnfollowUserUseCase, ('feed',)),
+    'get_feed': (GetFeedUseCase, ('feed',)),
+}
+
+# Декораторы: имя -> функция (объект, контейнер) -> обёрнутый объект
+REPOSITORY_DECORATORS = {
+    'cache': lambda repository, container: CachedRepository(repository, container.cache),
+    'metrics': lambda repository, container: MetricsRepository(repository),
+    'tracing': lambda repository, container: TracedProxy(repository),
+}
+USE_CASE_DECORATORS = {
+    'tracing': lambda use_case, container: TracedProxy(use_case),
+}
+
+
+class Container:
+    """
+    Контейнер зависимостей приложения.
+    
+    Репозитории создаются фабрикой один раз на приложение и оборачиваются
+    декораторами из конфигурации (первый в списке - самый внутренний).
+    Сценарии использования собираются лениво в области запроса.
+    """
+    
+    def __init__(self, factory: RepositoryFactory, repository_decorators=(), use_case_decorators=(),
+                 cache: RepositoryCache | None = None, renderer: MarkdownRenderer | None = None):
+        """
+        Инициализация контейнера.
+        
+        Args:
+            factory: Фабрика репозиториев выбранного хранилища
+            repository_decorators: Имена декораторов репозиториев
+            use_case_decorators: Имена декораторов сценариев использования
+            cache: Кэш сущностей для декоратора cache
+            renderer: Отрисовка Markdown публикаций с кэшем HTML
+        
+        Raises:
+            ValueError: Если декоратор неизвестен
+        """
+        for name in repository_decorators:
+            if name not in REPOSITORY_DECORATORS:
+                raise ValueError(f"Неизвестный декоратор репозиториев: {name}")
+        for name in use_case_decorators:
+            if name not in USE_CASE_DECORATORS:
+                raise ValueError(f"Неизвестный декоратор сценариев: {name}")
+        self.factory = factory
+        self.cache = cache or RepositoryCache()
+        self.renderer = renderer or MarkdownRenderer()
+        self.use_case_decorators = tuple(use_case_decorators)
+        self.repositories = {
+            'user': self._decorate(factory.create_user_repository(), repository_decorators, REPOSITORY_DECORATORS),
+            'post': self._decorate(factory.create_post_repository(), repository_decorators, REPOSITORY_DECORATORS),
+            'comment': self._decorate(
+                factory.create_comment_repository(), repository_decorators, REPOSITORY_DECORATORS
+            ),
+            'trending': self._decorate(
+                factory.create_trending_repository(), repository_decorators, REPOSITORY_DECORATORS
+            ),
+            'feed': self._decorate(factory.create_feed_repository(), repository_decorators, REPOSITORY_DECORATORS),
+            # Рендерер передаётся сценариям как зависимость, но не оборачивается декораторами репозиториев
+            'renderer': self.renderer,
+        }
+    
+    def _decorate(self, target, names, registry: dict):
+        for name in names:
+            target = registry[name](target, self)
+        return target
+    
+    def build_use_case(self, name: str):
+        """
+        Собрать сценарий использования с репозиториями контейнера.
+        
+        Args:
+            name: Имя сценария из USE_CASES
+        
+        Returns:
+            Обёрнутый декораторами сценарий использования
+        """
+        use_case_class, repositories = USE_CASES[name]
+        use_case = use_case_class(*(self.repositories[repository] for repository in repositories))
+        return self._decorate(use_case, self.use_case_decorators, USE_CASE_DECORATORS)
+    
+    def scope(self) -> 'RequestScope':
+        """Создать область одного запроса."""
+        return RequestScope(self)
+    
+    @classmethod
+    def from_config(cls, app: Flask) -> 'Container':
+        """Создать контейнер по конфигурации приложения."""
+        return cls(
+            RepositoryFactory(
+                app.config['REPOSITORY_BACKEND'],
+                app.config['SHARD_DATABASE_URIS'],
+                app.config['TRENDING_HALF_LIFE'],
+                app.config['FEED_FANOUT_THRESHOLD'],
+                app.config['FEED_MAX_ENTRIES']
+            ),
+            app.config['REPOSITORY_DECORATORS'],
+            app.config['USE_CASE_DECORATORS'],
+            RepositoryCache(app.config['REPOSITORY_CACHE_SIZE'], app.config['REPOSITORY_CACHE_TTL']),
+            MarkdownRenderer(
+                app.config['MARKDOWN_CACHE_SIZE'],
+                app.config['MARKDOWN_CACHE_TTL'],
+                app.config['MARKDOWN_PRERENDER_BACKGROUND']
+            )
+        )
+
+
+class RequestScope:
+    """
+    Область запроса: сценарии использования, собранные для одного запроса.
+    
+    SQL-репозитории работают через db.session, который Flask-SQLAlchemy
+    привязывает к контексту приложения и закрывает в его teardown,
+    поэтому каждый запрос получает свою сессию.
+    """
+    
+    def __init__(self, container: Container):
+        self._container = container
+    
+    def __getattr__(self, name: str):
+        if name not in USE_CASES:
+            raise AttributeError(name)
+        use_case = self._container.build_use_case(name)
+        # Повторное обращение в том же запросе не пересобирает сценарий
+        self.__dict__[name] = use_case
+        return use_case
+
+
+def init_container(app: Flask) -> Container:
+    """
+    Создать контейнер и сохранить его в расширениях приложения.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    
+    Returns:
+        Созданный контейнер
+    """
+    container = Container.from_config(app)
+    app.extensions['container'] = container
+    sharded_store = container.factory.sharded_store
+    if sharded_store is not None:
+        # Запросы к шардам учитываются в бюджетах, трассировке и сроках как основные
+        for engine in sharded_store.engines:
+            query_log.watch_engine(engine)
+            tracer.watch_engine(engine)
+            watch_engine(engine)
+        shard_count = len(sharded_store.engines)
+        query_log.budgets = {
+            **query_log.budgets,
+            **{
+                endpoint: fixed + per_shard * shard_count
+                for endpoint, (fixed, per_shard) in app.config['SHARDED_QUERY_BUDGETS'].items()
+            }
+        }
+    users = container.repositories['user']
+    if hasattr(users, 'warm_up'):
+        # Фильтр занятых имён и почт строится в фоне. База в памяти при
+        # старте пуста, а её единственное соединение нельзя делить с потоком
+        with app.app_context():
+            database = db.engine.url.database
+            in_memory = not database or database == ':memory:'
+            if in_memory:
+                users.warm_up()
+        if not in_memory:
+            users.start_warm_up(app)
+    app.extensions['trending_board'] = TrendingBoard(
+        app,
+        lambda limit: container.build_use_case('get_trending_posts').execute(limit),
+        container.repositories['trending'].prune,
+        app.config['TRENDING_TOP_K'],
+        app.config['TRENDING_REFRESH_INTERVAL']
+    )
+    return container
+
+
+def current_scope() -> RequestScope:
+    """Область текущего запроса (создаётся при первом обращении)."""
+    scope = g.get('blog_scope')
+    if scope is None:
+        scope = g.blog_scope = current_app.extensions['container'].scope()
+    return scope
\ No newline at end of file
@@ -1,44 +1,20 @@
 from flask import Blueprint, request, jsonify, current_app
-from application.use_cases import (
-    CreateUserUseCase, 
-    CreatePostUseCase, 
-    CreateCommentUseCase,
-    GetPostUseCase,
-    GetAllUsersUseCase,
-    GetUserByIdUseCase,
-    DeleteUserUseCase,
-    GetAllPostsUseCase,
-    DeletePostUseCase,
-    GetAllCommentsUseCase,
-    GetCommentByIdUseCase,
-    DeleteCommentUseCase
-)
-from infrastructure.repositories import (
-    SQLUserRepository, 
-    SQLPostRepository, 
-    SQLCommentRepository
-)
+from domain.repositories import UserAlreadyExists
+from .container import current_scope
 
 bp = Blueprint('controllers', __name__)
 
-# Инициализация репозиториев
-user_repo = SQLUserRepository()
-post_repo = SQLPostRepository()
-comment_repo = SQLCommentRepository()
-
-# Инициализация сценариев использования
-create_user_uc = CreateUserUseCase(user_repo)
-create_post_uc = CreatePostUseCase(post_repo, user_repo)
-create_comment_uc = CreateCommentUseCase(comment_repo, post_repo, user_repo)
-get_post_uc = GetPostUseCase(post_repo)
-get_all_users_uc = GetAllUsersUseCase(user_repo)
-get_user_by_id_uc = GetUserByIdUseCase(user_repo)
-delete_user_uc = DeleteUserUseCase(user_repo)
-get_all_posts_uc = GetAllPostsUseCase(post_repo)
-delete_post_uc = DeletePostUseCase(post_repo)
-get_all_comments_uc = GetAllCommentsUseCase(comment_repo)
-get_comment_by_id_uc = GetCommentByIdUseCase(comment_repo)
-delete_comment_uc = DeleteCommentUseCase(comment_repo)
+
+def _post_content():
+    """
+    Функция содержания публикации для ответа.
+    
+    С ?format=html содержание отдаётся отрисованным из Markdown в HTML
+    (через кэш рендерера), иначе - исходным Markdown.
+    """
+    if request.args.get('format') == 'html':
+        return current_app.extensions['container'].renderer.render
+    return lambda post: post.content
 
 
 @bp.route('/')
@@ -65,7 +41,11 @@ def index():
             'create_user': 'POST /users',
             'create_post': 'POST /posts',
             'get_post': 'GET /posts/<int:post_id>',
-            'create_comment': 'POST /comments'
+            'get_trending_posts': 'GET /posts/trending',
+            'create_comment': 'POST /comments',
+            'get_post_comments': 'GET /posts/<int:post_id>/comments',
+            'follow_user': 'POST /users/<int:user_id>/following',
+            'get_feed': 'GET /users/<int:user_id>/feed'
         }
     })
 
@@ -104,9 +84,14 @@ def create_user():
               type: string
             email:
               type: string
+      409:
+        description: Имя пользователя или почта уже заняты (поле field)
     """
     data = request.json
-    user = create_user_uc.execute(data['username'], data['email'])
+    try:
+        user = current_scope().create_user.execute(data['username'], data['email'])
+    except UserAlreadyExists as e:
+        return jsonify({'error': str(e), 'field': e.field}), 409
     return jsonify({
         'id': user.id,
         'username': user.username,
@@ -166,7 +151,7 @@ def create_post():
     """
     data = request.json
     try:
-        post = create_post_uc.execute(
+        post = current_scope().create_post.execute(
             data['title'], 
             data['content'], 
             data['author_id']
@@ -196,6 +181,11 @@ def get_post(post_id):
         in: path
         type: integer
         required: true
+      - name: format
+        in: query
+        type: string
+        enum: [markdown, html]
+        default: markdown
     responses:
       200:
         description: Публикация найдена
@@ -213,17 +203,173 @@ def get_post(post_id):
       404:
         description: Публикация не найдена
     """
-    post = get_post_uc.execute(post_id)
+    post = current_scope().get_post.execute(post_id)
     if post:
         return jsonify({
             'id': post.id,
             'title': post.title,
-            'content': post.content,
+            'content': _post_content()(post),
             'author_id': post.author_id
         })
     return jsonify({'error': 'Публикация не найдена'}), 404
 
 
+def _comment_tree(comments) -> list:
+    """Вложить ответы в родителей; комментарии идут в порядке обхода дерева."""
+    roots = []
+    nodes = {}
+    for comment in comments:
+        node = nodes[comment.id] = {
+            'id': comment.id,
+            'content': comment.content,
+            'author_id': comment.author_id,
+            'depth': comment.depth,
+            'replies': []
+        }
+        siblings = nodes[comment.parent_id]['replies'] if comment.parent_id is not None else roots
+        siblings.append(node)
+    return roots
+
+
+@bp.route('/posts/<int:post_id>/comments', methods=['GET'])
+def get_post_comments(post_id):
+    """
+    Получить обсуждение публикации.
+    
+    Страница - limit комментариев верхнего уровня со всеми ответами не
+    глубже max_depth. С tree=1 ответы вложены в родителей, иначе
+    комментарии идут плоским списком в порядке обхода дерева.
+    ---
+    tags:
+      - posts
+    parameters:
+      - name: post_id
+        in: path
+        type: integer
+        required: true
+      - name: tree
+        in: query
+        type: integer
+        default: 0
+      - name: limit
+        in: query
+        type: integer
+        default: 20
+      - name: max_depth
+        in: query
+        type: integer
+      - name: cursor
+        in: query
+        type: string
+    responses:
+      200:
+        description: Страница обсуждения
+        schema:
+          type: object
+          properties:
+            comments:
+              type: array
+              items:
+                type: object
+                properties:
+                  id:
+                    type: integer
+                  content:
+                    type: string
+                  author_id:
+                    type: integer
+                  parent_id:
+                    type: integer
+                  depth:
+                    type: integer
+                  replies:
+                    type: array
+                    items:
+                      type: object
+            next_cursor:
+              type: string
+      400:
+        description: Некорректный курсор
+      404:
+        description: Публикация не найдена
+    """
+    if not current_scope().get_post.execute(post_id):
+        return jsonify({'error': 'Публикация не найдена'}), 404
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    max_depth = request.args.get('max_depth', type=int)
+    if max_depth is not None:
+        max_depth = max(max_depth, 0)
+    try:
+        comments, next_cursor = current_scope().get_comment_thread.execute(
+            post_id, limit, request.args.get('cursor'), max_depth
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if request.args.get('tree', 0, type=int):
+        return jsonify({'comments': _comment_tree(comments), 'next_cursor': next_cursor})
+    return jsonify({
+        'comments': [{
+            'id': c.id,
+            'content': c.content,
+            'author_id': c.author_id,
+            'parent_id': c.parent_id,
+            'depth': c.depth
+        } for c in comments],
+        'next_cursor': next_cursor
+    })
+
+
+@bp.route('/posts/trending', methods=['GET'])
+def get_trending_posts():
+    """
+    Получить самые обсуждаемые публикации.
+    
+    Счёт - число комментариев, где каждый весит 2^(-возраст / период
+    полураспада). Ответ берётся из заранее собранного топа.
+    ---
+    tags:
+      - posts
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        default: 10
+      - name: format
+        in: query
+        type: string
+        enum: [markdown, html]
+        default: markdown
+    responses:
+      200:
+        description: Публикации по убыванию счёта
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              id:
+                type: integer
+              title:
+                type: string
+              content:
+                type: string
+              author_id:
+                type: integer
+              score:
+                type: number
+    """
+    board = current_app.extensions['trending_board']
+    limit = min(max(request.args.get('limit', 10, type=int), 1), board.top_k)
+    content = _post_content()
+    return jsonify([{
+        'id': post.id,
+        'title': post.title,
+        'content': content(post),
+        'author_id': post.author_id,
+        'score': round(score, 4)
+    } for post, score in board.get(limit)])
+
+
 @bp.route('/comments', methods=['POST'])
 def create_comment():
     """
@@ -250,6 +396,9 @@ def create_comment():
             author_id:
               type: integer
               example: 1
+            parent_id:
+              type: integer
+              description: ID комментария, на который это ответ
     responses:
       201:
         description: Комментарий создан
@@ -264,18 +413,35 @@ def create_comment():
               type: integer
             author_id:
               type: integer
+            parent_id:
+              type: integer
+            depth:
+              type: integer
+      400:
+        description: Неверные входные данные
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
     """
     data = request.json
-    comment = create_comment_uc.execute(
-        data['content'], 
-        data['post_id'], 
-        data['author_id']
-    )
+    try:
+        comment = current_scope().create_comment.execute(
+            data['content'], 
+            data['post_id'], 
+            data['author_id'],
+            data.get('parent_id')
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     return jsonify({
         'id': comment.id,
         'content': comment.content,
         'post_id': comment.post_id,
-        'author_id': comment.author_id
+        'author_id': comment.author_id,
+        'parent_id': comment.parent_id,
+        'depth': comment.depth
     }), 201
 
 
@@ -301,7 +467,7 @@ def get_all_users():
               email:
                 type: string
     """
-    users = get_all_users_uc.execute()
+    users = current_scope().get_all_users.execute()
     return jsonify([{
         'id': u.id,
         'username': u.username,
@@ -336,7 +502,7 @@ def get_user(user_id):
       404:
         description: Пользователь не найден
     """
-    user = get_user_by_id_uc.execute(user_id)
+    user = current_scope().get_user_by_id.execute(user_id)
     if user:
         return jsonify({
             'id': user.id,
@@ -364,14 +530,155 @@ def delete_user(user_id):
       404:
         description: Пользователь не найден
     """
-    user = get_user_by_id_uc.execute(user_id)
+    user = current_scope().get_user_by_id.execute(user_id)
     if not user:
         return jsonify({'error': 'Пользователь не найден'}), 404
     
-    delete_user_uc.execute(user_id)
+    current_scope().delete_user.execute(user_id)
     return '', 204
 
 
+@bp.route('/users/<int:user_id>/following', methods=['POST'])
+def follow_user(user_id):
+    """
+    Подписать пользователя на автора.
+    ---
+    tags:
+      - users
+    parameters:
+      - name: user_id
+        in: path
+        type: integer
+        required: true
+      - in: body
+        name: body
+        schema:
+          type: object
+          required:
+            - author_id
+          properties:
+            author_id:
+              type: integer
+              example: 2
+    responses:
+      201:
+        description: Подписка создана
+      200:
+        description: Подписка уже была
+      400:
+        description: Неверные входные данные
+      404:
+        description: Пользователь не найден
+    """
+    if not current_scope().get_user_by_id.execute(user_id):
+        return jsonify({'error': 'Пользователь не найден'}), 404
+    author_id = request.json['author_id']
+    try:
+        created = current_scope().follow_user.execute(user_id, author_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'follower_id': user_id, 'author_id': author_id}), 201 if created else 200
+
+
+@bp.route('/users/<int:user_id>/following/<int:author_id>', methods=['DELETE'])
+def unfollow_user(user_id, author_id):
+    """
+    Отписать пользователя от автора.
+    ---
+    tags:
+      - users
+    parameters:
+      - name: user_id
+        in: path
+        type: integer
+        required: true
+      - name: author_id
+        in: path
+        type: integer
+        required: true
+    responses:
+      204:
+        description: Подписка удалена
+      404:
+        description: Подписка не найдена
+    """
+    if not current_scope().unfollow_user.execute(user_id, author_id):
+        return jsonify({'error': 'Подписка не найдена'}), 404
+    return '', 204
+
+
+@bp.route('/users/<int:user_id>/feed', methods=['GET'])
+def get_feed(user_id):
+    """
+    Получить ленту публикаций авторов, на которых подписан пользователь.
+    
+    Страницы идут от новых публикаций к старым; next_cursor передаётся
+    в параметре cursor для получения следующей страницы.
+    ---
+    tags:
+      - users
+    parameters:
+      - name: user_id
+        in: path
+        type: integer
+        required: true
+      - name: limit
+        in: query
+        type: integer
+        default: 20
+      - name: cursor
+        in: query
+        type: string
+      - name: format
+        in: query
+        type: string
+        enum: [markdown, html]
+        default: markdown
+    responses:
+      200:
+        description: Страница ленты
+        schema:
+          type: object
+          properties:
+            posts:
+              type: array
+              items:
+                type: object
+                properties:
+                  id:
+                    type: integer
+                  title:
+                    type: string
+                  content:
+                    type: string
+                  author_id:
+                    type: integer
+            next_cursor:
+              type: string
+      400:
+        description: Некорректный курсор
+      404:
+        description: Пользователь не найден
+    """
+    if not current_scope().get_user_by_id.execute(user_id):
+        return jsonify({'error': 'Пользователь не найден'}), 404
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    try:
+        posts, next_cursor = current_scope().get_feed.execute(user_id, limit, request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    content = _post_content()
+    return jsonify({
+        'posts': [{
+            'id': p.id,
+            'title': p.title,
+            'content': content(p),
+            'author_id': p.author_id
+        } for p in posts],
+        'next_cursor': next_cursor
+    })
+
+
 @bp.route('/posts', methods=['GET'])
 def get_all_posts():
     """
@@ -379,6 +686,12 @@ def get_all_posts():
     ---
     tags:
       - posts
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: [markdown, html]
+        default: markdown
     responses:
       200:
         description: Список публикаций
@@ -396,11 +709,12 @@ def get_all_posts():
               author_id:
                 type: integer
     """
-    posts = get_all_posts_uc.execute()
+    posts = current_scope().get_all_posts.execute()
+    content = _post_content()
     return jsonify([{
         'id': p.id,
         'title': p.title,
-        'content': p.content,
+        'content': content(p),
         'author_id': p.author_id
     } for p in posts])
 
@@ -423,11 +737,11 @@ def delete_post(post_id):
       404:
         description: Публикация не найдена
     """
-    post = get_post_uc.execute(post_id)
+    post = current_scope().get_post.execute(post_id)
     if not post:
         return jsonify({'error': 'Публикация не найдена'}), 404
     
-    delete_post_uc.execute(post_id)
+    current_scope().delete_post.execute(post_id)
     return '', 204
 
 
@@ -455,7 +769,7 @@ def get_all_comments():
               author_id:
                 type: integer
     """
-    comments = get_all_comments_uc.execute()
+    comments = current_scope().get_all_comments.execute()
     return jsonify([{
         'id': c.id,
         'content': c.content,
@@ -490,16 +804,19 @@ def get_comment(comment_id):
               type: integer
             author_id:
               type: integer
+            parent_id:
+              type: integer
       404:
         description: Комментарий не найден
     """
-    comment = get_comment_by_id_uc.execute(comment_id)
+    comment = current_scope().get_comment_by_id.execute(comment_id)
     if comment:
         return jsonify({
             'id': comment.id,
             'content': comment.content,
             'post_id': comment.post_id,
-            'author_id': comment.author_id
+            'author_id': comment.author_id,
+            'parent_id': comment.parent_id
         })
     return jsonify({'error': 'Комментарий не найден'}), 404
 
@@ -522,9 +839,9 @@ def delete_comment(comment_id):
       404:
         description: Комментарий не найден
     """
-    comment = get_comment_by_id_uc.execute(comment_id)
+    comment = current_scope().get_comment_by_id.execute(comment_id)
     if not comment:
         return jsonify({'error': 'Комментарий не найден'}), 404
     
-    delete_comment_uc.execute(comment_id)
+    current_scope().delete_comment.execute(comment_id)
     return '', 204
\ No newline at end of file
@@ -0,0 +1,78 @@
+from flask import Flask, g, jsonify, request
+
+from infrastructure.database import db
+from infrastructure.deadline import Deadline, DeadlineExceeded, current_deadline, watch_engine
+from infrastructure.metrics import metrics
+
+HEADER = 'X-Request-Timeout'
+
+metrics.describe('blog_deadline_exceeded_total', 'counter', 'Запросы, прерванные по истечении срока обработки')
+
+
+def _requested_timeout() -> float | None:
+    """Срок из заголовка X-Request-Timeout в секундах, если он задан верно."""
+    try:
+        timeout = float(request.headers.get(HEADER, ''))
+    except ValueError:
+        return None
+    return timeout if timeout > 0 else None
+
+
+def _timeout_response():
+    """Ответ 504: транзакция откатывается, соединение уходит в пул."""
+    db.session.rollback()
+    metrics.inc('blog_deadline_exceeded_total', (('endpoint', str(request.endpoint)),))
+    response = jsonify({'error': 'Срок обработки запроса истёк'})
+    response.status_code = 504
+    return response
+
+
+def init_deadlines(app: Flask) -> None:
+    """
+    Подключить сроки обработки запросов API.
+    
+    Срок маршрута берётся из REQUEST_DEADLINE_ROUTES, иначе
+    REQUEST_DEADLINE_DEFAULT; заголовок X-Request-Timeout может его только
+    сократить. SQL-запрос, не уложившийся в срок, прерывается
+    (infrastructure.deadline), и клиент получает 504.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    """
+    with app.app_context():
+        watch_engine(db.engine)
+    if not app.config['REQUEST_DEADLINE_ENABLED']:
+        return
+    default = app.config['REQUEST_DEADLINE_DEFAULT']
+    routes = app.config['REQUEST_DEADLINE_ROUTES']
+    
+    @app.before_request
+    def start_deadline():
+        if request.blueprint != 'controllers':
+            return
+        timeout = routes.get(request.endpoint, default)
+        requested = _requested_timeout()
+        if requested is not None:
+            timeout = requested if timeout is None else min(timeout, requested)
+        if timeout is not None:
+            g.blog_deadline = Deadline(timeout)
+            g.blog_deadline_token = current_deadline.set(g.blog_deadline)
+    
+    @app.after_request
+    def replace_interrupted(response):
+        # Контроллер мог превратить прерванный запрос в ответ 500
+        state = g.get('blog_deadline')
+        if state is not None and state.interrupted and response.status_code != 504:
+            return _timeout_response()
+        return response
+    
+    @app.errorhandler(DeadlineExceeded)
+    def deadline_exceeded(error):
+        return _timeout_response()
+    
+    @app.teardown_request
+    def reset_deadline(error=None):
+        g.pop('blog_deadline', None)
+        token = g.pop('blog_deadline_token', None)
+        if token is not None:
+            current_deadline.reset(token)
\ No newline at end of file
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+
+from flask import Flask
+
+# Пути, которые обслуживает flasgger
+DOCS_PATH_PREFIXES = ('/apidocs', '/apispec', '/flasgger_static')
+
+SWAGGER_TEMPLATE = {
+    'info': {
+        'title': 'Blog API',
+        'version': '1.0',
+        'description': 'Документация для API блога'
+    }
+}
+
+
+def build_docs_app(app: Flask) -> Flask:
+    """
+    Собрать отдельное приложение с документацией Swagger.
+    
+    Если SWAGGER_SPEC_PATH указывает на заранее собранную спецификацию,
+    она отдаётся как есть; иначе flasgger разбирает YAML из docstring
+    контроллеров.
+    
+    Args:
+        app: Основное приложение
+    
+    Returns:
+        Приложение, обслуживающее /apidocs и /apispec_1.json
+    """
+    from flasgger import Swagger
+    from .controllers import bp as controllers_bp
+    
+    docs_app = Flask(app.import_name)
+    docs_app.config['SWAGGER'] = app.config['SWAGGER']
+    spec_path = app.config['SWAGGER_SPEC_PATH']
+    if spec_path and os.path.exists(spec_path):
+        with open(spec_path, encoding='utf-8') as f:
+            template = json.load(f)
+    else:
+        # Эндпоинты регистрируются только ради docstring, запросы к ним сюда не попадают
+        docs_app.register_blueprint(controllers_bp)
+        template = SWAGGER_TEMPLATE
+    Swagger(docs_app, template=template)
+    return docs_app
+
+
+def build_spec(app: Flask) -> dict:
+    """
+    Собрать спецификацию OpenAPI из docstring контроллеров.
+    
+    Args:
+        app: Основное приложение
+    
+    Returns:
+        Спецификация в виде словаря
+    """
+    source = Flask(app.import_name)
+    source.config['SWAGGER'] = app.config['SWAGGER']
+    # Собираем из docstring, даже если уже есть готовый файл
+    source.config['SWAGGER_SPEC_PATH'] = None
+    docs_app = build_docs_app(source)
+    return docs_app.test_client().get('/apispec_1.json').get_json()
+
+
+class LazySwaggerMiddleware:
+    """
+    WSGI-прослойка, собирающая документацию при первом обращении.
+    
+    Импорт flasgger и разбор docstring не входят в холодный старт;
+    остальные запросы идут в основное приложение без изменений.
+    """
+    
+    def __init__(self, app: Flask, wsgi_app):
+        """
+        Инициализация прослойки.
+        
+        Args:
+            app: Основное приложение (источник конфигурации)
+            wsgi_app: Исходный WSGI-обработчик приложения
+        """
+        self.app = app
+        self.wsgi_app = wsgi_app
+        self.docs_app = None
+        self._lock = threading.Lock()
+    
+    def get_docs_app(self) -> Flask:
+        """Приложение документации (собирается один раз)."""
+        if self.docs_app is None:
+            with self._lock:
+                if self.docs_app is None:
+                    self.docs_app = build_docs_app(self.app)
+        return self.docs_app
+    
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO', '').startswith(DOCS_PATH_PREFIXES):
+            return self.get_docs_app()(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+
+def init_docs(app: Flask) -> None:
+    """
+    Подключить ленивую документацию Swagger.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    """
+    app.wsgi_app = LazySwaggerMiddleware(app, app.wsgi_app)
\ No newline at end of file
@@ -0,0 +1,102 @@
+import hashlib
+import math
+from time import monotonic
+
+from flask import Flask, Response, g, jsonify, request
+
+from infrastructure.idempotency import IdempotencyStore, MISMATCH, OWNER, REPLAY
+from infrastructure.metrics import metrics
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+metrics.describe('blog_idempotent_replays_total', 'counter', 'Ответы, повторённые по ключу идемпотентности')
+
+
+def request_fingerprint() -> str:
+    """Хеш метода, пути с параметрами и тела запроса."""
+    digest = hashlib.sha256()
+    for part in (request.method.encode(), request.path.encode('utf-8'), request.query_string):
+        digest.update(part)
+        digest.update(b'\0')
+    # Тело кэшируется, контроллер прочитает его ещё раз
+    digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+def _error(message: str, status_code: int) -> Response:
+    response = jsonify({'error': message})
+    response.status_code = status_code
+    return response
+
+
+def init_idempotency(app: Flask) -> IdempotencyStore | None:
+    """
+    Подключить ключи идемпотентности для POST-запросов.
+    
+    Первый запрос с заголовком Idempotency-Key выполняется, и его ответ
+    (кроме ошибок сервера) хранится IDEMPOTENCY_TTL секунд. Повтор с тем
+    же ключом и тем же запросом получает сохранённый ответ с заголовком
+    Idempotent-Replayed, не доходя до сценария; повтор во время выполнения
+    ждёт ответа до IDEMPOTENCY_WAIT секунд, потом получает 409. Тот же
+    ключ с другим запросом - 422.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    
+    Returns:
+        Хранилище ключей или None, если ключи выключены
+    """
+    if not app.config['IDEMPOTENCY_ENABLED']:
+        return None
+    store = IdempotencyStore(app.config['IDEMPOTENCY_TTL'], app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+    app.extensions['idempotency'] = store
+    wait = app.config['IDEMPOTENCY_WAIT']
+    poll_interval = app.config['IDEMPOTENCY_POLL_INTERVAL']
+    
+    @app.before_request
+    def claim_key():
+        key = request.headers.get(HEADER)
+        if request.method != 'POST' or key is None:
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return _error(f'Заголовок {HEADER} должен содержать от 1 до {MAX_KEY_LENGTH} символов', 400)
+        fingerprint = request_fingerprint()
+        deadline = monotonic() + wait
+        while True:
+            state, row = store.claim(key, fingerprint)
+            if state == OWNER:
+                g.blog_idempotency = (key, fingerprint)
+                return
+            if state == REPLAY:
+                metrics.inc('blog_idempotent_replays_total', (('endpoint', str(request.endpoint)),))
+                response = Response(row.response_body, status=row.status_code, content_type=row.content_type)
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+            if state == MISMATCH:
+                return _error(f'Ключ {HEADER} уже использован для другого запроса', 422)
+            remaining = deadline - monotonic()
+            if remaining <= 0:
+                response = _error('Запрос с этим ключом ещё выполняется', 409)
+                response.headers['Retry-After'] = str(max(math.ceil(poll_interval), 1))
+                return response
+            store.wait(key, min(poll_interval, remaining))
+    
+    @app.after_request
+    def save_response(response):
+        claim = g.pop('blog_idempotency', None)
+        if claim is not None:
+            if response.status_code >= 500:
+                store.release(*claim)
+            else:
+                store.complete(*claim, response.status_code, response.content_type, response.get_data(as_text=True))
+        return response
+    
+    @app.teardown_request
+    def release_key(error=None):
+        # Необработанное исключение: after_request не выполнялся
+        claim = g.pop('blog_idempotency', None)
+        if claim is not None:
+            store.release(*claim)
+    
+    return store
\ No newline at end of file
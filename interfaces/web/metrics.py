@@ -0,0 +1,61 @@
+from time import perf_counter
+
+from flask import Blueprint, Response, g, request
+
+from infrastructure.metrics import metrics
+
+bp = Blueprint('metrics', __name__)
+
+metrics.describe('blog_http_requests_total', 'counter', 'Количество HTTP-запросов по маршрутам и статусам')
+metrics.describe('blog_http_request_duration_seconds', 'histogram', 'Длительность обработки HTTP-запросов')
+metrics.describe('blog_http_requests_in_flight', 'gauge', 'Количество запросов в обработке')
+
+
+def _route() -> str:
+    """Шаблон маршрута текущего запроса."""
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+
+def init_request_metrics(app) -> None:
+    """
+    Подключить сбор метрик HTTP-запросов к приложению.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    """
+    
+    @app.before_request
+    def start_timer():
+        g.metrics_start = perf_counter()
+        g.metrics_route = _route()
+        metrics.gauge_add('blog_http_requests_in_flight', (('route', g.metrics_route),), 1)
+    
+    @app.after_request
+    def record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            labels = (('method', request.method), ('route', g.metrics_route))
+            metrics.inc('blog_http_requests_total', labels + (('status', str(response.status_code)),))
+            metrics.observe('blog_http_request_duration_seconds', labels, perf_counter() - start)
+        return response
+    
+    @app.teardown_request
+    def finish_request(error=None):
+        route = g.pop('metrics_route', None)
+        if route is not None:
+            metrics.gauge_add('blog_http_requests_in_flight', (('route', route),), -1)
+        metrics.maybe_flush()
+
+
+@bp.route('/metrics')
+def export_metrics():
+    """
+    Метрики приложения в формате Prometheus.
+    ---
+    tags:
+      - general
+    responses:
+      200:
+        description: Текст в формате экспозиции Prometheus
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
\ No newline at end of file
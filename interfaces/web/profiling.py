@@ -0,0 +1,136 @@
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+
+PROFILE_SALT = 'blog-profiling'
+
+
+class StackSampler:
+    """
+    Сэмплирующий профилировщик одного потока.
+    
+    Отдельный поток раз в interval секунд снимает стек профилируемого
+    потока через sys._current_frames и копит свёрнутые стеки
+    (формат collapsed stacks для flamegraph).
+    """
+    
+    def __init__(self, interval: float = 0.001):
+        """
+        Инициализация профилировщика.
+        
+        Args:
+            interval: Период снятия стека в секундах
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self) -> None:
+        """Начать сэмплирование текущего потока."""
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Остановить сэмплирование."""
+        self._stop.set()
+        self._thread.join()
+    
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+    
+    def dump(self, path: str) -> None:
+        """Записать свёрнутые стеки в файл."""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.items():
+                f.write(f'{stack} {count}\n')
+
+
+def make_profile_token(secret_key: str) -> str:
+    """
+    Сформировать значение подписанного заголовка профилирования.
+    
+    Args:
+        secret_key: SECRET_KEY приложения
+    
+    Returns:
+        Подписанный токен
+    """
+    return URLSafeTimedSerializer(secret_key, salt=PROFILE_SALT).dumps('profile')
+
+
+def _route_dir(endpoint: str | None) -> str:
+    """Безопасное имя каталога для эндпоинта."""
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint or 'unmatched')
+
+
+def init_profiling(app) -> None:
+    """
+    Подключить выборочное профилирование запросов.
+    
+    Запрос профилируется, если PROFILING_ENABLED и он попал в долю
+    PROFILING_SAMPLE_RATE, либо если пришёл заголовок PROFILING_HEADER
+    с токеном, подписанным SECRET_KEY. Результат пишется в
+    PROFILING_DIR/<endpoint>/ в формате pstats (.prof) для режима
+    cprofile или свёрнутых стеков (.folded) для режима sampler.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    """
+    
+    def should_profile() -> bool:
+        token = request.headers.get(app.config['PROFILING_HEADER'])
+        if token and app.secret_key:
+            serializer = URLSafeTimedSerializer(app.secret_key, salt=PROFILE_SALT)
+            try:
+                serializer.loads(token, max_age=app.config['PROFILING_TOKEN_MAX_AGE'])
+                return True
+            except BadSignature:
+                pass
+        return app.config['PROFILING_ENABLED'] and random.random() < app.config['PROFILING_SAMPLE_RATE']
+    
+    @app.before_request
+    def start_profiling():
+        if not should_profile():
+            return
+        if app.config['PROFILING_MODE'] == 'sampler':
+            profiler = StackSampler(app.config['PROFILING_SAMPLER_INTERVAL'])
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        g.profiler = profiler
+    
+    @app.teardown_request
+    def finish_profiling(error=None):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+        directory = os.path.join(app.config['PROFILING_DIR'], _route_dir(request.endpoint))
+        os.makedirs(directory, exist_ok=True)
+        name = f'{time.time_ns()}-{os.getpid()}'
+        if isinstance(profiler, StackSampler):
+            profiler.stop()
+            profiler.dump(os.path.join(directory, f'{name}.folded'))
+        else:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(directory, f'{name}.prof'))
\ No newline at end of file
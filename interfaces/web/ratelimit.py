@@ -0,0 +1,76 @@
+import math
+
+from flask import Flask, g, jsonify, request
+
+from infrastructure.metrics import metrics
+from infrastructure.ratelimit import TokenBucketLimiter
+
+metrics.describe('blog_rate_limited_total', 'counter', 'Запросы, отклонённые ограничением частоты')
+
+
+def _client_id(header: str | None) -> str:
+    """
+    Клиент: заголовок с его ID, если он задан и передан, иначе IP.
+    
+    Заголовку можно верить только за прокси, который проверяет клиента
+    и перезаписывает заголовок, поэтому по умолчанию он не задан.
+    """
+    if header:
+        client = request.headers.get(header)
+        if client:
+            return f'id:{client}'
+    return f'ip:{request.remote_addr}'
+
+
+def init_rate_limit(app: Flask) -> TokenBucketLimiter | None:
+    """
+    Подключить ограничение частоты запросов корзинами токенов.
+    
+    Корзина у каждой пары (клиент, маршрут): RATELIMIT_DEFAULT задаёт
+    размер корзины и пополнение в секунду, RATELIMIT_ROUTES - отдельные
+    бюджеты дорогих маршрутов. Ответы несут заголовки RateLimit-Limit,
+    RateLimit-Remaining и RateLimit-Reset, отказ - 429 с Retry-After.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    
+    Returns:
+        Ограничитель или None, если он выключен
+    """
+    if not app.config['RATELIMIT_ENABLED']:
+        return None
+    limiter = TokenBucketLimiter(app.config['RATELIMIT_STATE_PATH'], app.config['RATELIMIT_SLOTS'])
+    app.extensions['rate_limiter'] = limiter
+    default = app.config['RATELIMIT_DEFAULT']
+    routes = app.config['RATELIMIT_ROUTES']
+    exempt = set(app.config['RATELIMIT_EXEMPT'])
+    header = app.config['RATELIMIT_CLIENT_HEADER']
+    
+    @app.before_request
+    def take_token():
+        endpoint = request.endpoint
+        if endpoint is None or endpoint in exempt:
+            return
+        capacity, rate = routes.get(endpoint, default)
+        allowed, remaining, retry_after = limiter.acquire(f'{_client_id(header)}|{endpoint}', capacity, rate)
+        g.blog_rate_limit = (capacity, rate, remaining)
+        if not allowed:
+            metrics.inc('blog_rate_limited_total', (('endpoint', endpoint),))
+            response = jsonify({'error': 'Слишком много запросов'})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            return response
+    
+    @app.after_request
+    def add_headers(response):
+        state = g.pop('blog_rate_limit', None)
+        if state is not None:
+            capacity, rate, remaining = state
+            response.headers['RateLimit-Limit'] = str(int(capacity))
+            response.headers['RateLimit-Remaining'] = str(int(remaining))
+            # Через сколько секунд корзина снова будет полной
+            response.headers['RateLimit-Reset'] = str(math.ceil((capacity - remaining) / rate))
+            response.headers['RateLimit-Policy'] = f'{int(capacity)};w={math.ceil(capacity / rate)}'
+        return response
+    
+    return limiter
\ No newline at end of file
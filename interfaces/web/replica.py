@@ -0,0 +1,84 @@
+from time import time
+
+from flask import Flask, g, request
+from sqlalchemy.orm import Session
+
+from infrastructure.database import db
+from infrastructure.deadline import watch_engine
+from infrastructure.metrics import metrics
+from infrastructure.query_log import query_log
+from infrastructure.replica import SQLiteReplica
+from infrastructure.tracing import tracer
+
+# Cookie с моментом последней записи клиента (read-your-writes)
+LAST_WRITE_COOKIE = 'blog_last_write'
+READ_METHODS = ('GET', 'HEAD')
+
+metrics.describe('blog_read_routing_total', 'counter', 'Чтения, направленные на основную базу или реплику')
+
+
+def _sticky_to_primary(window: float) -> bool:
+    """Клиент недавно писал и должен читать свои записи с основной базы."""
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, ''))
+    except ValueError:
+        return False
+    return time() - last_write < window
+
+
+def init_read_replica(app: Flask) -> SQLiteReplica | None:
+    """
+    Подключить маршрутизацию чтений на реплику.
+    
+    GET и HEAD читают с реплики, если клиент не писал в последние
+    READ_YOUR_WRITES_WINDOW секунд; записи и остальные запросы идут в
+    основную базу. Реплика поддерживается только для файловой SQLite.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    
+    Returns:
+        Реплика или None, если она выключена
+    """
+    if not app.config['REPLICA_ENABLED']:
+        return None
+    with app.app_context():
+        primary_path = db.engine.url.database
+    if not primary_path or primary_path == ':memory:':
+        app.logger.warning("Реплика чтения требует файловую базу SQLite и не будет включена")
+        return None
+    replica = SQLiteReplica(
+        primary_path,
+        app.config['REPLICA_PATH'] or f'{primary_path}.replica',
+        app.config['REPLICA_SYNC_INTERVAL']
+    )
+    app.extensions['replica'] = replica
+    query_log.watch_engine(replica.engine)
+    tracer.watch_engine(replica.engine)
+    watch_engine(replica.engine)
+    window = app.config['READ_YOUR_WRITES_WINDOW']
+    
+    @app.before_request
+    def route_reads():
+        if request.method not in READ_METHODS:
+            return
+        if _sticky_to_primary(window):
+            metrics.inc('blog_read_routing_total', (('target', 'primary'),))
+            return
+        g.blog_replica_session = Session(replica.engine)
+        metrics.inc('blog_read_routing_total', (('target', 'replica'),))
+    
+    @app.after_request
+    def remember_write(response):
+        if request.method not in READ_METHODS and response.status_code < 400:
+            response.set_cookie(LAST_WRITE_COOKIE, f'{time():.3f}', max_age=int(window) + 1, httponly=True)
+        return response
+    
+    @app.teardown_request
+    def close_replica_session(error=None):
+        session = g.pop('blog_replica_session', None)
+        if session is not None:
+            session.close()
+    
+    replica.start()
+    return replica
\ No newline at end of file
@@ -0,0 +1,53 @@
+import re
+
+from flask import g, request
+
+from infrastructure.tracing import tracer, SPAN_KIND_SERVER, STATUS_ERROR
+
+# W3C Trace Context: version-trace_id-parent_id-flags
+TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+
+def init_tracing(app) -> None:
+    """
+    Открывать корневой спан на каждый HTTP-запрос.
+    
+    Входящий заголовок traceparent продолжает внешнюю трассу и
+    переносит её решение о сэмплировании.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    """
+    tracer.init_app(app)
+    
+    @app.before_request
+    def start_request_span():
+        if not tracer.enabled:
+            return
+        trace_id = parent_span_id = sampled = None
+        match = TRACEPARENT_RE.match(request.headers.get('traceparent', ''))
+        if match:
+            trace_id, parent_span_id = match.group(1), match.group(2)
+            sampled = bool(int(match.group(3), 16) & 1)
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        span = tracer.start_span(
+            f'{request.method} {route}', SPAN_KIND_SERVER,
+            trace_id=trace_id, parent_span_id=parent_span_id, sampled=sampled
+        )
+        span.set_attribute('http.method', request.method)
+        span.set_attribute('http.route', route)
+        span.set_attribute('http.target', request.full_path.rstrip('?'))
+        g.request_span = span
+    
+    @app.after_request
+    def record_status(response):
+        span = g.get('request_span')
+        if span is not None:
+            span.set_attribute('http.status_code', response.status_code)
+            if response.status_code >= 500:
+                span.status = STATUS_ERROR
+        return response
+    
+    @app.teardown_request
+    def end_request_span(error=None):
+        tracer.end_span(g.pop('request_span', None), error)
\ No newline at end of file
@@ -0,0 +1,170 @@
+from flask import Blueprint, Flask, current_app, jsonify, request
+
+from infrastructure.database import db, WebhookModel
+from infrastructure.webhooks import (
+    WebhookDispatcher,
+    create_webhook,
+    delete_webhook,
+    list_dead_letters,
+    list_webhooks
+)
+
+bp = Blueprint('webhooks', __name__)
+
+
+def init_webhooks(app: Flask) -> WebhookDispatcher:
+    """
+    Подготовить доставку webhook.
+    
+    Фоновая доставка запускается при WEBHOOK_DELIVERY_ENABLED, если
+    подписки уже есть, иначе - при создании первой подписки.
+    
+    Args:
+        app: Экземпляр Flask приложения
+    
+    Returns:
+        Доставка webhook
+    """
+    with app.app_context():
+        engine = db.engine
+        has_webhooks = (
+            app.config['REPOSITORY_BACKEND'] == 'sql'
+            and db.session.query(WebhookModel.id).filter(WebhookModel.deleted_at.is_(None)).first() is not None
+        )
+        db.session.remove()
+    dispatcher = WebhookDispatcher(
+        engine,
+        workers=app.config['WEBHOOK_WORKERS'],
+        batch_size=app.config['WEBHOOK_BATCH_SIZE'],
+        max_attempts=app.config['WEBHOOK_MAX_ATTEMPTS'],
+        backoff_base=app.config['WEBHOOK_BACKOFF_BASE'],
+        backoff_max=app.config['WEBHOOK_BACKOFF_MAX'],
+        timeout=app.config['WEBHOOK_TIMEOUT'],
+        poll_interval=app.config['WEBHOOK_POLL_INTERVAL']
+    )
+    app.extensions['webhook_dispatcher'] = dispatcher
+    if app.config['WEBHOOK_DELIVERY_ENABLED'] and has_webhooks:
+        dispatcher.start()
+    return dispatcher
+
+
+def _unsupported():
+    """Ответ 501 для хранилищ, не ведущих журнал изменений."""
+    if current_app.config['REPOSITORY_BACKEND'] != 'sql':
+        return jsonify({'error': 'Webhook доступны только для хранилища sql'}), 501
+    return None
+
+
+@bp.route('/webhooks', methods=['POST'])
+def create_webhook_subscription():
+    """
+    Подписаться на события.
+    
+    События доставляются пачками POST-запросом с телом
+    {"webhook_id": ..., "events": [...]}; событие имеет тот же вид, что и
+    в GET /changes/stream. С secret тело подписывается HMAC-SHA256 в
+    заголовке X-Blog-Signature.
+    ---
+    tags:
+      - webhooks
+    parameters:
+      - in: body
+        name: body
+        schema:
+          type: object
+          required:
+            - url
+          properties:
+            url:
+              type: string
+              example: https://example.com/hooks/blog
+            events:
+              type: array
+              items:
+                type: string
+                enum: [user.create, user.delete, post.create, post.delete, comment.create, comment.delete]
+              example: [post.create, comment.create]
+            secret:
+              type: string
+    responses:
+      201:
+        description: Подписка создана
+      400:
+        description: Некорректный адрес или типы событий
+    """
+    unsupported = _unsupported()
+    if unsupported is not None:
+        return unsupported
+    data = request.get_json(silent=True) or {}
+    try:
+        webhook = create_webhook(data.get('url'), data.get('events'), data.get('secret'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if current_app.config['WEBHOOK_DELIVERY_ENABLED']:
+        current_app.extensions['webhook_dispatcher'].start()
+    return jsonify(webhook), 201
+
+
+@bp.route('/webhooks', methods=['GET'])
+def get_webhook_subscriptions():
+    """
+    Получить подписки и состояние их доставки.
+    ---
+    tags:
+      - webhooks
+    responses:
+      200:
+        description: Список подписок
+    """
+    unsupported = _unsupported()
+    if unsupported is not None:
+        return unsupported
+    return jsonify(list_webhooks())
+
+
+@bp.route('/webhooks/<int:webhook_id>', methods=['DELETE'])
+def delete_webhook_subscription(webhook_id):
+    """
+    Отменить подписку.
+    ---
+    tags:
+      - webhooks
+    parameters:
+      - name: webhook_id
+        in: path
+        type: integer
+        required: true
+    responses:
+      204:
+        description: Подписка отменена
+      404:
+        description: Подписка не найдена
+    """
+    unsupported = _unsupported()
+    if unsupported is not None:
+        return unsupported
+    if not delete_webhook(webhook_id):
+        return jsonify({'error': 'Подписка не найдена'}), 404
+    return '', 204
+
+
+@bp.route('/webhooks/<int:webhook_id>/dead-letters', methods=['GET'])
+def get_dead_letters(webhook_id):
+    """
+    Получить пачки событий, которые не удалось доставить.
+    ---
+    tags:
+      - webhooks
+    parameters:
+      - name: webhook_id
+        in: path
+        type: integer
+        required: true
+    responses:
+      200:
+        description: Недоставленные пачки, новые первыми
+    """
+    unsupported = _unsupported()
+    if unsupported is not None:
+        return unsupported
+    return jsonify(list_dead_letters(webhook_id))
\ No newline at end of file
@@ -4,4 +4,9 @@ setup(
     name='blog',
     version='0.1.0',
     packages=find_packages(),
+    entry_points={
+        'console_scripts': [
+            'blog=interfaces.cli:main',
+        ],
+    },
 )
\ No newline at end of file
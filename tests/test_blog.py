@@ -1,6 +1,18 @@
+import json
+import os
+
 import pytest
-from unittest.mock import MagicMock
+from click.testing import CliRunner
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine, inspect
+from unittest.mock import MagicMock, patch
+from benchmarks.dataset import generate_dataset
+from benchmarks.feed import run_feed
+from benchmarks.load import run_in_process
+from benchmarks.micro import run_micro
+from benchmarks.startup import run_startup
 from domain.entities import User, Post, Comment
+from domain.repositories import UserAlreadyExists
 from application.use_cases import (
     CreateUserUseCase, 
     CreatePostUseCase, 
@@ -13,18 +25,75 @@ from application.use_cases import (
     DeletePostUseCase,
     GetAllCommentsUseCase,
     GetCommentByIdUseCase,
-    DeleteCommentUseCase
+    GetCommentThreadUseCase,
+    DeleteCommentUseCase,
+    GetFeedUseCase
+)
+from infrastructure.bloom import BloomFilter
+from infrastructure.cache import CachedRepository, RepositoryCache
+from infrastructure.concurrency import AdaptiveConcurrencyLimiter
+from infrastructure.deadline import DeadlineExceeded, deadline
+from infrastructure.database import (
+    SCHEMA_VERSION,
+    db,
+    UserModel,
+    PostModel,
+    CommentModel,
+    PostTrendingModel,
+    FollowModel,
+    FeedEntryModel,
+    IdempotencyKeyModel,
+    ChangeLogModel,
+    upgrade_schema
+)
+from infrastructure.factories import RepositoryFactory
+from infrastructure.markdown import MarkdownRenderer
+from infrastructure.memory_repositories import (
+    InMemoryStore,
+    InMemoryUserRepository,
+    InMemoryPostRepository,
+    InMemoryCommentRepository,
+    InMemoryTrendingRepository,
+    InMemoryFeedRepository
+)
+from infrastructure.metrics import MetricsRegistry, MetricsRepository
+from infrastructure.ratelimit import TokenBucketLimiter
+from infrastructure.query_log import QueryBudgetExceeded, assert_max_queries, capture_queries
+from infrastructure.repositories import THREAD, SQLUserRepository, SQLPostRepository, SQLCommentRepository
+from infrastructure.sharding import (
+    BUCKET_COUNT,
+    ShardedStore,
+    ShardedUserRepository,
+    ShardedPostRepository,
+    ShardedCommentRepository,
+    ShardedTrendingRepository,
+    ShardedFeedRepository,
+    user_bucket
 )
-from infrastructure.database import db, UserModel, PostModel, CommentModel
+from infrastructure.tracing import TracedProxy
+from infrastructure.trending import (
+    DEFAULT_HALF_LIFE,
+    current_score,
+    decay_rate,
+    log_weight,
+    logaddexp,
+    logsubexp
+)
+from interfaces.cli import cli
 from interfaces.web.app import create_app
+from interfaces.web.container import Container
+from interfaces.web.profiling import make_profile_token
+from interfaces.web.replica import LAST_WRITE_COOKIE
 
 
 @pytest.fixture
 def app():
     """Фикстура для создания тестового приложения."""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'SOFT_DELETE_PURGE_ENABLED': False
+    })
     with app.app_context():
         db.create_all()
     yield app
@@ -491,4 +560,2171 @@ class TestDatabase:
             
             assert PostModel.query.get(post.id) is None
             assert CommentModel.query.get(comment.id) is None
-            assert UserModel.query.get(user.id) is not None
\ No newline at end of file
+            assert UserModel.query.get(user.id) is not None
+
+
+class TestSoftDelete:
+    """Тесты мягкого удаления и фоновой очистки."""
+    
+    def _seed(self, app):
+        with app.app_context():
+            user = UserModel(username="soft", email="soft@example.com")
+            other = UserModel(username="other", email="other@example.com")
+            db.session.add_all([user, other])
+            db.session.commit()
+            post = PostModel(title="Post", content="Content", author_id=user.id)
+            db.session.add(post)
+            db.session.commit()
+            comment = CommentModel(content="Comment", post_id=post.id, author_id=other.id)
+            db.session.add(comment)
+            db.session.commit()
+            return user.id, other.id, post.id, comment.id
+    
+    def test_delete_marks_row(self, app):
+        user_id, _, post_id, _ = self._seed(app)
+        with app.app_context():
+            SQLPostRepository().delete(post_id)
+            assert db.session.get(PostModel, post_id).deleted_at is not None
+            assert db.session.get(UserModel, user_id).deleted_at is None
+    
+    def test_children_hidden_after_parent_delete(self, app):
+        user_id, other_id, post_id, comment_id = self._seed(app)
+        with app.app_context():
+            SQLUserRepository().delete(user_id)
+            assert SQLUserRepository().get_by_id(user_id) is None
+            assert SQLPostRepository().get_by_id(post_id) is None
+            assert SQLCommentRepository().get_by_id(comment_id) is None
+            assert SQLCommentRepository().get_all() == []
+            assert [u.id for u in SQLUserRepository().get_all()] == [other_id]
+    
+    def test_purger_removes_rows(self, app):
+        user_id, other_id, post_id, comment_id = self._seed(app)
+        with app.app_context():
+            SQLUserRepository().delete(user_id)
+        
+        purger = app.extensions['soft_delete_purger']
+        purger.batch_size = 1
+        assert purger.run_once() > 0
+        
+        with app.app_context():
+            assert db.session.get(UserModel, user_id) is None
+            assert db.session.get(PostModel, post_id) is None
+            assert db.session.get(CommentModel, comment_id) is None
+            assert db.session.get(UserModel, other_id) is not None
+    
+    def test_repeated_delete_returns_404(self, client):
+        user_id = client.post('/users', json={"username": "a", "email": "a@test.com"}).json['id']
+        post_id = client.post('/posts', json={"title": "T", "content": "C", "author_id": user_id}).json['id']
+        client.delete(f'/posts/{post_id}')
+        
+        response = client.delete(f'/posts/{post_id}')
+        assert response.status_code == 404
+
+
+class TestMetrics:
+    """Тесты сбора метрик."""
+    
+    def test_metrics_endpoint(self, client):
+        client.post('/users', json={"username": "m", "email": "m@test.com"})
+        client.get('/users/1')
+        
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        text = response.get_data(as_text=True)
+        assert 'blog_http_requests_total{method="POST",route="/users",status="201"}' in text
+        assert 'blog_http_request_duration_seconds_bucket{method="GET",route="/users/<int:user_id>",le="+Inf"}' in text
+        assert 'blog_http_requests_in_flight{route="/metrics"} 1.0' in text
+        assert 'blog_repository_calls_total{repository="SQLUserRepository",method="create"}' in text
+    
+    def test_registry_merges_processes(self, tmp_path):
+        first = MetricsRegistry()
+        second = MetricsRegistry()
+        for registry in (first, second):
+            registry.directory = str(tmp_path)
+            registry.describe('requests_total', 'counter', '')
+            registry.describe('latency_seconds', 'histogram', '')
+            registry.inc('requests_total', (('route', '/'),))
+            registry.observe('latency_seconds', (), 0.002)
+        second.flush()
+        # Имитируем второй процесс: снимок лежит под другим pid
+        os.replace(tmp_path / f'metrics_{os.getpid()}.json', tmp_path / 'metrics_0.json')
+        
+        text = first.render()
+        assert 'requests_total{route="/"} 2.0' in text
+        assert 'latency_seconds_count 2' in text
+        assert 'latency_seconds_bucket{le="0.0025"} 2' in text
+        assert 'latency_seconds_bucket{le="0.001"} 0' in text
+    
+    def test_registry_drops_gauges_of_dead_processes(self, tmp_path):
+        import subprocess
+        import sys
+        
+        finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+        dead_pid = int(finished.stdout)
+        registry = MetricsRegistry()
+        registry.directory = str(tmp_path)
+        registry.describe('requests_total', 'counter', '')
+        registry.describe('in_flight', 'gauge', '')
+        registry.inc('requests_total', ())
+        registry.gauge_add('in_flight', (), 1)
+        registry.flush()
+        own = tmp_path / f'metrics_{os.getpid()}.json'
+        for pid in (dead_pid, os.getppid()):
+            (tmp_path / f'metrics_{pid}.json').write_text(own.read_text())
+        
+        text = registry.render()
+        # Счётчик умершего процесса остаётся в сумме, его датчик - нет
+        assert 'requests_total 3.0' in text
+        assert 'in_flight 2.0' in text
+
+
+class TestQueryBudget:
+    """Тесты учёта SQL-запросов и бюджетов маршрутов."""
+    
+    def test_get_post_query_count(self, client):
+        user_id = client.post('/users', json={"username": "q", "email": "q@test.com"}).json['id']
+        post_id = client.post('/posts', json={"title": "T", "content": "C", "author_id": user_id}).json['id']
+        
+        with assert_max_queries(1):
+            assert client.get(f'/posts/{post_id}').status_code == 200
+    
+    def test_assert_max_queries_fails(self, app):
+        with app.app_context():
+            with pytest.raises(AssertionError):
+                with assert_max_queries(1):
+                    SQLUserRepository().get_by_id(1)
+                    SQLUserRepository().get_by_id(2)
+    
+    def test_budget_exceeded_raises(self, app, client):
+        app.config['QUERY_BUDGETS']['controllers.get_all_users'] = 0
+        with pytest.raises(QueryBudgetExceeded):
+            client.get('/users')
+
+
+class TestProfiling:
+    """Тесты выборочного профилирования."""
+    
+    def test_signed_header_profiles_request(self, app, client, tmp_path):
+        app.config['SECRET_KEY'] = 'secret'
+        app.config['PROFILING_DIR'] = str(tmp_path)
+        token = make_profile_token('secret')
+        
+        client.get('/users', headers={'X-Profile-Token': token})
+        client.get('/users', headers={'X-Profile-Token': 'forged'})
+        
+        assert len(os.listdir(tmp_path / 'controllers.get_all_users')) == 1
+    
+    def test_sampler_and_report(self, app, client, tmp_path):
+        app.config.update(
+            PROFILING_ENABLED=True,
+            PROFILING_SAMPLE_RATE=1.0,
+            PROFILING_MODE='sampler',
+            PROFILING_DIR=str(tmp_path)
+        )
+        client.get('/users')
+        app.config['PROFILING_MODE'] = 'cprofile'
+        client.get('/users')
+        
+        files = os.listdir(tmp_path / 'controllers.get_all_users')
+        assert sorted(os.path.splitext(f)[1] for f in files) == ['.folded', '.prof']
+        
+        result = CliRunner().invoke(cli, ['profile-report', str(tmp_path), '--top', '5'])
+        assert result.exit_code == 0
+        assert 'controllers.get_all_users: 1 профилей cProfile' in result.output
+
+
+class TestTracing:
+    """Тесты трассировки запросов."""
+    
+    def test_nested_spans_exported(self, app, client, tmp_path):
+        tracer = app.extensions['tracer']
+        tracer.enabled = True
+        tracer.sample_rate = 1.0
+        tracer.exporter.path = str(tmp_path / 'traces.jsonl')
+        try:
+            client.get('/users/1', headers={
+                'traceparent': '00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01'
+            })
+        finally:
+            tracer.enabled = False
+        
+        with open(tmp_path / 'traces.jsonl', encoding='utf-8') as f:
+            payload = json.loads(f.readline())
+        spans = payload['resourceSpans'][0]['scopeSpans'][0]['spans']
+        by_name = {span['name']: span for span in spans}
+        
+        root = by_name['GET /users/<int:user_id>']
+        use_case = by_name['GetUserByIdUseCase.execute']
+        repository = by_name['SQLUserRepository.get_by_id']
+        sql = by_name['SQL SELECT']
+        assert root['traceId'] == '0af7651916cd43dd8448eb211c80319c'
+        assert root['parentSpanId'] == 'b7ad6b7169203331'
+        assert use_case['parentSpanId'] == root['spanId']
+        assert repository['parentSpanId'] == use_case['spanId']
+        assert sql['parentSpanId'] == repository['spanId']
+        assert {'key': 'http.status_code', 'value': {'intValue': '404'}} in root['attributes']
+    
+    def test_unsampled_trace_not_exported(self, app, client, tmp_path):
+        tracer = app.extensions['tracer']
+        tracer.enabled = True
+        tracer.sample_rate = 0.0
+        tracer.exporter.path = str(tmp_path / 'traces.jsonl')
+        try:
+            client.get('/users')
+        finally:
+            tracer.enabled = False
+        assert not os.path.exists(tmp_path / 'traces.jsonl')
+
+
+class TestBenchmarks:
+    """Дымовые тесты набора бенчмарков на крошечном наборе данных."""
+    
+    def test_dataset_and_micro(self, tmp_path):
+        path = str(tmp_path / 'bench.db')
+        sizes = generate_dataset(path, comments=200)
+        assert sizes == {'users': 2, 'posts': 10, 'comments': 200, 'seed': 42}
+        engine = create_engine(f'sqlite:///{path}')
+        with engine.connect() as connection:
+            # Комментарии выглядят как созданные репозиторием: обсуждения и рейтинг не пусты
+            assert connection.exec_driver_sql(
+                'SELECT count(*) FROM comment_model WHERE path IS NULL OR depth IS NULL OR created_at IS NULL'
+            ).scalar() == 0
+            assert connection.exec_driver_sql('SELECT count(*) FROM post_trending').scalar() == \
+                connection.exec_driver_sql('SELECT count(DISTINCT post_id) FROM comment_model').scalar()
+        engine.dispose()
+        
+        results = run_micro(path, iterations=5, only=['get_by_id'])
+        assert set(results) == {
+            'SQLUserRepository.get_by_id',
+            'SQLPostRepository.get_by_id',
+            'SQLCommentRepository.get_by_id'
+        }
+        assert all(r['operations'] == 5 and r['errors'] == 0 for r in results.values())
+    
+    def test_load_in_process(self, tmp_path):
+        path = str(tmp_path / 'bench.db')
+        generate_dataset(path, comments=200)
+        
+        results = run_in_process(path, {'get_post': 1, 'create_comment': 1}, workers=2, requests_per_worker=10)
+        assert results['total']['operations'] == 20
+        assert results['total']['errors'] == 0
+
+
+class TestInMemoryRepositories:
+    """Тесты репозиториев в памяти."""
+    
+    @pytest.fixture
+    def memory_client(self):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'REPOSITORY_BACKEND': 'memory'
+        })
+        return app.test_client()
+    
+    def test_cascade_delete_user(self):
+        store = InMemoryStore()
+        users = InMemoryUserRepository(store)
+        posts = InMemoryPostRepository(store)
+        comments = InMemoryCommentRepository(store)
+        
+        author = users.create(User(None, "author", "author@test.com"))
+        other = users.create(User(None, "other", "other@test.com"))
+        post = posts.create(Post(None, "Title", "Content", author.id))
+        own_comment = comments.create(Comment(None, "Own", post.id, author.id))
+        foreign_comment = comments.create(Comment(None, "Foreign", post.id, other.id))
+        other_post = posts.create(Post(None, "Other", "Content", other.id))
+        author_comment = comments.create(Comment(None, "Elsewhere", other_post.id, author.id))
+        
+        users.delete(author.id)
+        
+        assert users.get_by_id(author.id) is None
+        assert posts.get_by_id(post.id) is None
+        for comment in (own_comment, foreign_comment, author_comment):
+            assert comments.get_by_id(comment.id) is None
+        assert [p.id for p in posts.get_all()] == [other_post.id]
+        assert users.get_by_id(other.id) is not None
+    
+    def test_unique_username(self):
+        users = InMemoryUserRepository(InMemoryStore())
+        users.create(User(None, "same", "a@test.com"))
+        with pytest.raises(ValueError):
+            users.create(User(None, "same", "b@test.com"))
+    
+    def test_api_flow(self, memory_client):
+        user_id = memory_client.post('/users', json={"username": "m", "email": "m@test.com"}).json['id']
+        post_id = memory_client.post('/posts', json={"title": "T", "content": "C", "author_id": user_id}).json['id']
+        comment_resp = memory_client.post('/comments', json={"content": "Hi", "post_id": post_id, "author_id": user_id})
+        assert comment_resp.status_code == 201
+        
+        assert memory_client.get(f'/posts/{post_id}').json['title'] == "T"
+        assert memory_client.delete(f'/posts/{post_id}').status_code == 204
+        assert memory_client.get('/comments').json == []
+    
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            create_app({'REPOSITORY_BACKEND': 'redis', 'SOFT_DELETE_PURGE_ENABLED': False})
+
+
+class TestContainer:
+    """Тесты контейнера зависимостей."""
+    
+    def test_decorators_order(self):
+        container = Container(RepositoryFactory('memory'), ['cache', 'metrics'], ['tracing'])
+        
+        assert isinstance(container.repositories['user'], MetricsRepository)
+        assert isinstance(container.repositories['user']._repository, CachedRepository)
+        assert isinstance(container.build_use_case('get_post'), TracedProxy)
+    
+    def test_unknown_decorator(self):
+        with pytest.raises(ValueError):
+            Container(RepositoryFactory('memory'), ['unknown'])
+    
+    def test_scope_builds_use_case_once(self):
+        scope = Container(RepositoryFactory('memory')).scope()
+        
+        assert scope.get_post is scope.get_post
+        with pytest.raises(AttributeError):
+            scope.unknown_use_case
+    
+    def test_container_in_app(self, app):
+        assert isinstance(app.extensions['container'], Container)
+    
+    def test_cache_decorator(self, app, client):
+        app.extensions['container'] = Container(RepositoryFactory(), ['cache'])
+        user_id = client.post('/users', json={"username": "cached", "email": "cached@test.com"}).json['id']
+        post_id = client.post('/posts', json={"title": "T", "content": "C", "author_id": user_id}).json['id']
+        
+        client.get(f'/posts/{post_id}')
+        with capture_queries() as stats:
+            assert client.get(f'/posts/{post_id}').status_code == 200
+        assert stats.count == 0
+        
+        # Каскадное удаление автора сбрасывает кэш публикаций
+        client.delete(f'/users/{user_id}')
+        assert client.get(f'/posts/{post_id}').status_code == 404
+    
+    def test_repository_cache_lru_and_ttl(self):
+        cache = RepositoryCache(maxsize=2, ttl=60)
+        cache.set(('a', 1), 'a1')
+        cache.set(('a', 2), 'a2')
+        cache.get(('a', 1))
+        cache.set(('a', 3), 'a3')
+        
+        assert cache.get(('a', 2)) is None
+        assert cache.get(('a', 1)) == 'a1'
+        
+        expired = RepositoryCache(ttl=-1)
+        expired.set(('a', 1), 'a1')
+        assert expired.get(('a', 1)) is None
+
+
+class TestStartup:
+    """Тесты быстрого старта приложения."""
+    
+    def test_swagger_built_on_first_hit(self, app, client):
+        docs = app.wsgi_app
+        assert docs.docs_app is None
+        
+        response = client.get('/apispec_1.json')
+        assert response.status_code == 200
+        assert '/users' in response.json['paths']
+        assert docs.docs_app is not None
+        assert client.get('/apidocs/').status_code == 200
+    
+    def test_precompiled_spec(self, tmp_path):
+        spec_path = str(tmp_path / 'spec.json')
+        result = CliRunner().invoke(cli, ['build-spec', spec_path])
+        assert result.exit_code == 0, result.output
+        
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'SWAGGER_SPEC_PATH': spec_path
+        })
+        response = app.test_client().get('/apispec_1.json')
+        with open(spec_path, encoding='utf-8') as f:
+            assert response.json['paths'] == json.load(f)['paths']
+    
+    def test_schema_version_skips_create_all(self, tmp_path):
+        config = {
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "blog.db"}',
+            'SOFT_DELETE_PURGE_ENABLED': False
+        }
+        app = create_app(config)
+        with app.app_context():
+            with db.engine.connect() as connection:
+                assert connection.exec_driver_sql('PRAGMA user_version').scalar() == SCHEMA_VERSION
+            db.engine.dispose()
+        
+        with patch.object(db.metadata, 'create_all') as create_all:
+            app = create_app(config)
+            with app.app_context():
+                db.engine.dispose()
+        create_all.assert_not_called()
+    
+    def test_startup_benchmark(self):
+        results = run_startup(runs=1)
+        
+        assert results['total']['operations'] == 1
+        assert results['total']['flasgger_imported'] is False
+
+
+class TestSharding:
+    """Тесты шардированного хранилища."""
+    
+    @pytest.fixture
+    def shards(self, tmp_path):
+        return [str(tmp_path / f'shard{i}.db') for i in range(3)]
+    
+    @pytest.fixture
+    def repos(self, shards):
+        store = ShardedStore(shards)
+        yield ShardedUserRepository(store), ShardedPostRepository(store), ShardedCommentRepository(store)
+        store.dispose()
+    
+    def test_routing_and_colocation(self, repos):
+        users, posts, comments = repos
+        author = users.create(User(None, "author", "author@test.com"))
+        post = posts.create(Post(None, "Title", "Content", author.id))
+        comment = comments.create(Comment(None, "Hi", post.id, author.id))
+        
+        # Публикация лежит в корзине автора, комментарий - в корзине публикации
+        assert post.id % BUCKET_COUNT == author.id % BUCKET_COUNT
+        assert comment.id % BUCKET_COUNT == post.id % BUCKET_COUNT
+        assert posts.get_by_id(post.id).title == "Title"
+        assert comments.get_by_id(comment.id).content == "Hi"
+    
+    def test_scatter_gather_ordering(self, repos):
+        users, posts, comments = repos
+        created = [users.create(User(None, f"user{i}", f"user{i}@test.com")) for i in range(20)]
+        
+        assert [u.id for u in users.get_all()] == sorted(u.id for u in created)
+        assert len({users.store.engine_for_id(u.id) for u in created}) > 1
+    
+    def test_unique_email_across_shards(self, repos):
+        users, _, _ = repos
+        users.create(User(None, "first", "same@test.com"))
+        with pytest.raises(ValueError):
+            users.create(User(None, "second", "same@test.com"))
+        with pytest.raises(ValueError):
+            users.create(User(None, "first", "other@test.com"))
+    
+    def test_concurrent_signups_claim_email_once(self, repos):
+        import threading
+        
+        users, _, _ = repos
+        barrier = threading.Barrier(8)
+        outcomes = []
+        
+        def signup(i):
+            barrier.wait()
+            try:
+                outcomes.append(users.create(User(None, f"racer{i}", "race@test.com")))
+            except UserAlreadyExists as e:
+                outcomes.append(e.field)
+        
+        threads = [threading.Thread(target=signup, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        created = [o for o in outcomes if isinstance(o, User)]
+        assert len(created) == 1
+        assert sorted(o for o in outcomes if not isinstance(o, User)) == ['email'] * 7
+        assert [u.email for u in users.get_all()] == ["race@test.com"]
+    
+    def test_cross_shard_comment_author_deleted(self, repos):
+        users, posts, comments = repos
+        accounts = [users.create(User(None, f"user{i}", f"user{i}@test.com")) for i in range(20)]
+        author = accounts[0]
+        commenter = next(u for u in accounts if users.store.engine_for_id(u.id) is not users.store.engine_for_id(author.id))
+        post = posts.create(Post(None, "Title", "Content", author.id))
+        comment = comments.create(Comment(None, "Hi", post.id, commenter.id))
+        
+        users.delete(commenter.id)
+        
+        assert comments.get_by_id(comment.id) is None
+        assert comments.get_all() == []
+    
+    def test_api_on_sharded_backend(self, shards):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'REPOSITORY_BACKEND': 'sharded',
+            'SHARD_DATABASE_URIS': shards
+        })
+        client = app.test_client()
+        user_id = client.post('/users', json={"username": "s", "email": "s@test.com"}).json['id']
+        post_id = client.post('/posts', json={"title": "T", "content": "C", "author_id": user_id}).json['id']
+        
+        assert client.get(f'/posts/{post_id}').json['author_id'] == user_id
+        assert client.delete(f'/users/{user_id}').status_code == 204
+        assert client.get(f'/posts/{post_id}').status_code == 404
+        app.extensions['container'].factory.sharded_store.dispose()
+    
+    def test_purge_releases_email_on_sharded_backend(self, shards):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'REPOSITORY_BACKEND': 'sharded',
+            'SHARD_DATABASE_URIS': shards
+        })
+        client = app.test_client()
+        store = app.extensions['container'].factory.sharded_store
+        author_id = client.post('/users', json={"username": "author", "email": "author@test.com"}).json['id']
+        # Удаляемый пользователь на другом шарде: его комментарий и подписка лежат не рядом с ним
+        name = next(f"reader{i}" for i in range(100) if store.engine_for_bucket(user_bucket(f"reader{i}"))
+                    is not store.engine_for_id(author_id))
+        reader_id = client.post('/users', json={"username": name, "email": "reader@test.com"}).json['id']
+        post_id = client.post('/posts', json={"title": "T", "content": "C", "author_id": author_id}).json['id']
+        client.post('/comments', json={"content": "C", "post_id": post_id, "author_id": reader_id})
+        client.post(f'/users/{reader_id}/following', json={"author_id": author_id})
+        
+        assert client.delete(f'/users/{reader_id}').status_code == 204
+        assert client.post('/users', json={"username": "again", "email": "reader@test.com"}).status_code == 409
+        assert app.extensions['soft_delete_purger'].run_once() > 0
+        
+        for engine in store.engines:
+            with engine.connect() as connection:
+                assert connection.exec_driver_sql('SELECT count(*) FROM comment_model').scalar() == 0
+                assert connection.exec_driver_sql('SELECT count(*) FROM follow').scalar() == 0
+                assert connection.exec_driver_sql(
+                    'SELECT count(*) FROM user_model WHERE id = ?', (reader_id,)
+                ).scalar() == 0
+        with store.engine_for_id(author_id).connect() as connection:
+            assert connection.exec_driver_sql(
+                'SELECT follower_count FROM user_model WHERE id = ?', (author_id,)
+            ).scalar() == 0
+        assert client.post('/users', json={"username": "again", "email": "reader@test.com"}).status_code == 201
+        store.dispose()
+    
+    def test_reshard(self, shards, tmp_path):
+        store = ShardedStore(shards[:2])
+        users, posts = ShardedUserRepository(store), ShardedPostRepository(store)
+        created = [users.create(User(None, f"user{i}", f"user{i}@test.com")) for i in range(10)]
+        for user in created:
+            posts.create(Post(None, "Title", "Content", user.id))
+        store.dispose()
+        
+        targets = [str(tmp_path / f'new{i}.db') for i in range(3)]
+        args = ['reshard', '--source', shards[0], '--source', shards[1]]
+        for target in targets:
+            args += ['--target', target]
+        result = CliRunner().invoke(cli, args)
+        assert result.exit_code == 0, result.output
+        assert 'user_model: 10' in result.output
+        
+        resharded = ShardedStore(targets)
+        users, posts = ShardedUserRepository(resharded), ShardedPostRepository(resharded)
+        assert [u.id for u in users.get_all()] == sorted(u.id for u in created)
+        assert len(posts.get_all()) == 10
+        # Последовательности перенесены: новые ID не пересекаются со старыми
+        new_post = posts.create(Post(None, "New", "Content", created[0].id))
+        assert new_post.id not in {p.id for p in posts.get_all() if p.title == "Title"}
+        # Занятые почты перенесены вместе с корзинами
+        with pytest.raises(UserAlreadyExists):
+            users.create(User(None, "newcomer", "user3@test.com"))
+        resharded.dispose()
+
+
+class TestReadReplica:
+    """Тесты маршрутизации чтений на реплику."""
+    
+    @pytest.fixture
+    def replica_app(self, tmp_path):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "blog.db"}',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'REPLICA_ENABLED': True,
+            'REPLICA_SYNC_INTERVAL': 0
+        })
+        yield app
+        app.extensions['replica'].stop()
+        with app.app_context():
+            db.engine.dispose()
+    
+    def test_reads_go_to_replica(self, replica_app):
+        writer = replica_app.test_client()
+        user_id = writer.post('/users', json={"username": "r", "email": "r@test.com"}).json['id']
+        
+        reader = replica_app.test_client()
+        assert reader.get(f'/users/{user_id}').status_code == 404
+        
+        replica_app.extensions['replica'].sync()
+        assert reader.get(f'/users/{user_id}').json['username'] == "r"
+    
+    def test_read_your_writes(self, replica_app):
+        client = replica_app.test_client()
+        user_id = client.post('/users', json={"username": "w", "email": "w@test.com"}).json['id']
+        
+        # Клиент только что писал: чтение идёт в основную базу, хотя реплика отстаёт
+        assert client.get(f'/users/{user_id}').status_code == 200
+        
+        assert 'blog_read_routing_total{target="primary"}' in client.get('/metrics').get_data(as_text=True)
+        
+        # Окно истекло: клиент снова читает с реплики
+        client.set_cookie(LAST_WRITE_COOKIE, '0')
+        assert client.get(f'/users/{user_id}').status_code == 404
+    
+    def test_disabled_for_memory_database(self, app):
+        assert 'replica' not in app.extensions
+
+
+class TestTrending:
+    """Тесты рейтинга обсуждаемых публикаций."""
+    
+    @pytest.fixture
+    def trending_client(self):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'TRENDING_REFRESH_INTERVAL': 0
+        })
+        with app.app_context():
+            yield app, app.test_client()
+            db.drop_all()
+    
+    def _seed(self, client, comments_per_post):
+        user_id = client.post('/users', json={"username": "t", "email": "t@test.com"}).json['id']
+        post_ids = []
+        for count in comments_per_post:
+            post_id = client.post('/posts', json={"title": f"P{count}", "content": "C", "author_id": user_id}).json['id']
+            post_ids.append(post_id)
+            for _ in range(count):
+                client.post('/comments', json={"content": "c", "post_id": post_id, "author_id": user_id})
+        return user_id, post_ids
+    
+    def test_log_domain_math(self):
+        rate = decay_rate(DEFAULT_HALF_LIFE)
+        now = datetime(2025, 6, 1)
+        weight = log_weight(now, rate)
+        
+        total = logaddexp(logaddexp(None, weight), weight)
+        assert current_score(total, rate, now) == pytest.approx(2.0)
+        assert current_score(total, rate, now + timedelta(seconds=DEFAULT_HALF_LIFE)) == pytest.approx(1.0)
+        assert current_score(logsubexp(total, weight), rate, now) == pytest.approx(1.0)
+        assert logsubexp(weight, weight) is None
+    
+    def test_endpoint_ranks_by_comments(self, trending_client):
+        app, client = trending_client
+        _, (quiet, busy) = self._seed(client, [1, 3])
+        
+        response = client.get('/posts/trending?limit=5')
+        assert [p['id'] for p in response.json] == [busy, quiet]
+        assert response.json[0]['score'] == pytest.approx(3.0, rel=1e-3)
+    
+    def test_old_comments_decay(self, trending_client):
+        app, client = trending_client
+        user_id, (fresh,) = self._seed(client, [1])
+        old = client.post('/posts', json={"title": "Old", "content": "C", "author_id": user_id}).json['id']
+        long_ago = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=3 * DEFAULT_HALF_LIFE)
+        with patch('infrastructure.repositories.utcnow', return_value=long_ago):
+            for _ in range(4):
+                client.post('/comments', json={"content": "c", "post_id": old, "author_id": user_id})
+        
+        # Четыре комментария трёх периодов полураспада назад весят 0.5
+        response = client.get('/posts/trending')
+        assert [p['id'] for p in response.json] == [fresh, old]
+        assert response.json[1]['score'] == pytest.approx(0.5, rel=1e-3)
+    
+    def test_delete_comment_updates_score(self, trending_client):
+        app, client = trending_client
+        user_id, (post_id,) = self._seed(client, [2])
+        comment_ids = [c['id'] for c in client.get('/comments').json]
+        
+        client.delete(f'/comments/{comment_ids[0]}')
+        client.delete(f'/comments/{comment_ids[1]}')
+        
+        board = app.extensions['trending_board']
+        board.refresh()
+        assert board.get(10) == []
+    
+    def test_board_serves_snapshot(self, trending_client):
+        app, client = trending_client
+        self._seed(client, [1])
+        client.get('/posts/trending')
+        
+        with capture_queries() as stats:
+            assert len(client.get('/posts/trending').json) == 1
+        assert stats.count == 0
+    
+    def test_memory_and_sharded_backends(self, tmp_path):
+        store = InMemoryStore()
+        users, posts, comments = (
+            InMemoryUserRepository(store), InMemoryPostRepository(store), InMemoryCommentRepository(store)
+        )
+        author = users.create(User(None, "a", "a@test.com"))
+        post = posts.create(Post(None, "T", "C", author.id))
+        comments.create(Comment(None, "c", post.id, author.id))
+        assert [p.id for p, _ in InMemoryTrendingRepository(store).top(5)] == [post.id]
+        users.delete(author.id)
+        assert InMemoryTrendingRepository(store).top(5) == []
+        
+        sharded = ShardedStore([str(tmp_path / 's0.db'), str(tmp_path / 's1.db')])
+        users, posts = ShardedUserRepository(sharded), ShardedPostRepository(sharded)
+        comments = ShardedCommentRepository(sharded)
+        post_ids = []
+        for i in range(4):
+            author = users.create(User(None, f"user{i}", f"user{i}@test.com"))
+            post_ids.append(posts.create(Post(None, "T", "C", author.id)).id)
+            for _ in range(i + 1):
+                comments.create(Comment(None, "c", post_ids[-1], author.id))
+        assert [p.id for p, _ in ShardedTrendingRepository(sharded).top(3)] == post_ids[::-1][:3]
+        sharded.dispose()
+    
+    def test_purger_removes_trending_rows(self, trending_client):
+        app, client = trending_client
+        _, (post_id,) = self._seed(client, [1])
+        client.delete(f'/posts/{post_id}')
+        
+        app.extensions['soft_delete_purger'].run_once()
+        assert db.session.get(PostTrendingModel, post_id) is None
+        assert db.session.get(PostModel, post_id) is None
+    
+    def test_upgrade_adds_created_at(self, tmp_path):
+        engine = create_engine(f'sqlite:///{tmp_path / "old.db"}')
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                'CREATE TABLE comment_model (id INTEGER PRIMARY KEY, content TEXT NOT NULL, '
+                'post_id INTEGER NOT NULL, author_id INTEGER NOT NULL, deleted_at DATETIME)'
+            )
+            upgrade_schema(connection)
+            columns = {column['name'] for column in inspect(connection).get_columns('comment_model')}
+        assert 'created_at' in columns
+        assert 'ix_post_trending_score' in {i['name'] for i in inspect(engine).get_indexes('post_trending')}
+        engine.dispose()
+
+
+class TestFeed:
+    """Тесты подписок и лент с гибридной рассылкой."""
+    
+    @pytest.fixture
+    def make_client(self):
+        apps = []
+        
+        def make(**config):
+            app = create_app({
+                'TESTING': True,
+                'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                'SOFT_DELETE_PURGE_ENABLED': False,
+                **config
+            })
+            context = app.app_context()
+            context.push()
+            apps.append(context)
+            return app, app.test_client()
+        
+        yield make
+        for context in apps:
+            db.drop_all()
+            context.pop()
+    
+    def _users(self, client, count):
+        return [
+            client.post('/users', json={"username": f"f{i}", "email": f"f{i}@test.com"}).json['id']
+            for i in range(count)
+        ]
+    
+    def _post(self, client, author_id, title="T"):
+        return client.post('/posts', json={"title": title, "content": "C", "author_id": author_id}).json['id']
+    
+    def _read_all(self, client, user_id, limit):
+        ids, cursor = [], None
+        while True:
+            query = f'/users/{user_id}/feed?limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+            page = client.get(query).json
+            ids += [p['id'] for p in page['posts']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                return ids
+    
+    def test_feed_pages_newest_first(self, make_client):
+        app, client = make_client()
+        first, second, reader = self._users(client, 3)
+        assert client.post(f'/users/{reader}/following', json={"author_id": first}).status_code == 201
+        assert client.post(f'/users/{reader}/following', json={"author_id": first}).status_code == 200
+        client.post(f'/users/{reader}/following', json={"author_id": second})
+        posts = [self._post(client, author) for author in (first, second, first, second, first)]
+        
+        assert self._read_all(client, reader, 2) == posts[::-1]
+        assert FeedEntryModel.query.filter_by(user_id=reader).count() == 5
+    
+    def test_popular_authors_are_pulled(self, make_client):
+        app, client = make_client(FEED_FANOUT_THRESHOLD=2)
+        star, reader, other = self._users(client, 3)
+        client.post(f'/users/{reader}/following', json={"author_id": star})
+        pushed = self._post(client, star)
+        client.post(f'/users/{other}/following', json={"author_id": star})
+        pulled = self._post(client, star)
+        
+        # Вторая публикация не разослана, но видна; первая не задвоилась
+        assert FeedEntryModel.query.filter_by(post_id=pulled).count() == 0
+        assert self._read_all(client, reader, 10) == [pulled, pushed]
+        assert self._read_all(client, other, 1) == [pulled, pushed]
+    
+    def test_feed_is_bounded(self, make_client):
+        app, client = make_client(FEED_MAX_ENTRIES=3)
+        author, reader = self._users(client, 2)
+        client.post(f'/users/{reader}/following', json={"author_id": author})
+        posts = [self._post(client, author) for _ in range(5)]
+        
+        assert FeedEntryModel.query.filter_by(user_id=reader).count() == 3
+        assert self._read_all(client, reader, 10) == posts[:1:-1]
+    
+    def test_unfollow_and_deleted_posts_are_hidden(self, make_client):
+        app, client = make_client()
+        first, second, reader = self._users(client, 3)
+        for author in (first, second):
+            client.post(f'/users/{reader}/following', json={"author_id": author})
+        kept = self._post(client, first)
+        deleted = self._post(client, first)
+        hidden = self._post(client, second)
+        client.delete(f'/posts/{deleted}')
+        
+        assert client.delete(f'/users/{reader}/following/{second}').status_code == 204
+        assert client.delete(f'/users/{reader}/following/{second}').status_code == 404
+        assert self._read_all(client, reader, 10) == [kept]
+        assert hidden not in self._read_all(client, reader, 10)
+    
+    def test_errors(self, make_client):
+        app, client = make_client()
+        user, = self._users(client, 1)
+        assert client.post(f'/users/{user}/following', json={"author_id": user}).status_code == 400
+        assert client.post(f'/users/{user}/following', json={"author_id": 999}).status_code == 400
+        assert client.post('/users/999/following', json={"author_id": user}).status_code == 404
+        assert client.get('/users/999/feed').status_code == 404
+        assert client.get(f'/users/{user}/feed?cursor=bad').status_code == 400
+        assert client.get(f'/users/{user}/feed').json == {'posts': [], 'next_cursor': None}
+    
+    def test_purger_removes_follows(self, make_client):
+        app, client = make_client()
+        author, reader = self._users(client, 2)
+        client.post(f'/users/{reader}/following', json={"author_id": author})
+        self._post(client, author)
+        client.delete(f'/users/{reader}')
+        
+        app.extensions['soft_delete_purger'].run_once()
+        assert FollowModel.query.count() == 0
+        assert FeedEntryModel.query.count() == 0
+        assert db.session.get(UserModel, reader) is None
+        assert db.session.get(UserModel, author).follower_count == 0
+    
+    @pytest.mark.parametrize('backend', ['memory', 'sharded'])
+    def test_other_backends(self, backend, tmp_path):
+        factory = RepositoryFactory(
+            backend, [str(tmp_path / 's0.db'), str(tmp_path / 's1.db')],
+            feed_fanout_threshold=2, feed_max_entries=3
+        )
+        users, posts, feed = (
+            factory.create_user_repository(), factory.create_post_repository(), factory.create_feed_repository()
+        )
+        assert isinstance(feed, (InMemoryFeedRepository, ShardedFeedRepository))
+        create_post = CreatePostUseCase(posts, users, feed)
+        get_feed = GetFeedUseCase(feed)
+        star, author, reader, other = (
+            users.create(User(None, f"b{i}", f"b{i}@test.com")).id for i in range(4)
+        )
+        for followed in (star, author):
+            assert feed.follow(reader, followed)
+        feed.follow(other, star)
+        
+        created = [create_post.execute("T", "C", author_id).id for author_id in (author, star) * 3]
+        assert feed.get_feed(reader, 10)[0][0].id == created[-1]
+        
+        page, cursor = get_feed.execute(reader, 2)
+        ids = [p.id for p in page]
+        while cursor:
+            page, cursor = get_feed.execute(reader, 2, cursor)
+            ids += [p.id for p in page]
+        assert ids == created[::-1]
+        
+        assert feed.unfollow(reader, star)
+        assert [p.id for p, _ in feed.get_feed(reader, 10)] == created[-2::-2]
+        if factory.sharded_store is not None:
+            factory.sharded_store.dispose()
+    
+    @pytest.mark.parametrize('backend', ['sql', 'sharded'])
+    def test_many_popular_authors(self, backend, make_client, tmp_path):
+        make_client()
+        factory = RepositoryFactory(backend, [str(tmp_path / 's0.db')], feed_fanout_threshold=1)
+        feed = factory.create_feed_repository()
+        engine = db.engine if backend == 'sql' else factory.sharded_store.engines[0]
+        # Столько популярных авторов не помещается в один составной SELECT SQLite
+        count = 600
+        reader = count + 1
+        started = datetime(2024, 1, 1)
+        with engine.begin() as connection:
+            connection.execute(UserModel.__table__.insert(), [
+                {'id': i, 'username': f"a{i}", 'email': f"a{i}@test.com", 'follower_count': 1}
+                for i in range(1, reader + 1)
+            ])
+            connection.execute(FollowModel.__table__.insert(), [
+                {'follower_id': reader, 'author_id': i} for i in range(1, reader)
+            ])
+            connection.execute(PostModel.__table__.insert(), [
+                {'id': i, 'title': "T", 'content': "C", 'author_id': i, 'created_at': started + timedelta(seconds=i)}
+                for i in range(1, reader)
+            ])
+        
+        page = feed.get_feed(reader, 3)
+        assert [post.id for post, _ in page] == [count, count - 1, count - 2]
+        assert [post.id for post, _ in feed.get_feed(reader, 3, (page[-1][1], page[-1][0].id))] == [
+            count - 3, count - 4, count - 5
+        ]
+        if factory.sharded_store is not None:
+            factory.sharded_store.dispose()
+    
+    def test_benchmark(self):
+        results = run_feed(users=300, follows_per_user=5, posts_per_user=2, posts=30, iterations=3, fanout_threshold=20)
+        assert len(results) == 5
+        assert all(r['operations'] == 3 and r['errors'] == 0 for r in results.values())
+
+
+class TestCommentThreads:
+    """Тесты обсуждений с ответами и материализованными путями."""
+    
+    def _seed(self, client):
+        user_id = client.post('/users', json={"username": "talker", "email": "talker@test.com"}).json['id']
+        post_id = client.post('/posts', json={"title": "T", "content": "C", "author_id": user_id}).json['id']
+        
+        def comment(content, parent_id=None):
+            return client.post('/comments', json={
+                "content": content, "post_id": post_id, "author_id": user_id, "parent_id": parent_id
+            }).json['id']
+        
+        # Ответы создаются вперемешку, порядок должен задаваться деревом, а не ID
+        first = comment("first")
+        second = comment("second")
+        reply = comment("reply", first)
+        second_reply = comment("second reply", second)
+        nested = comment("nested", reply)
+        third = comment("third")
+        return post_id, {
+            'first': first, 'second': second, 'reply': reply,
+            'second_reply': second_reply, 'nested': nested, 'third': third
+        }
+    
+    def test_tree_pages_by_top_level_comments(self, client):
+        post_id, ids = self._seed(client)
+        page = client.get(f'/posts/{post_id}/comments?tree=1&limit=2').json
+        first, second = page['comments']
+        assert first['id'] == ids['first']
+        assert first['replies'][0]['id'] == ids['reply']
+        assert first['replies'][0]['replies'][0] == {
+            'id': ids['nested'], 'content': 'nested', 'author_id': first['author_id'], 'depth': 2, 'replies': []
+        }
+        assert [r['id'] for r in second['replies']] == [ids['second_reply']]
+        
+        last = client.get(f'/posts/{post_id}/comments?tree=1&limit=2&cursor={page["next_cursor"]}').json
+        assert [c['id'] for c in last['comments']] == [ids['third']]
+        assert last['next_cursor'] is None
+        
+        flat = client.get(f'/posts/{post_id}/comments').json['comments']
+        assert [c['id'] for c in flat] == [
+            ids[name] for name in ('first', 'reply', 'nested', 'second', 'second_reply', 'third')
+        ]
+    
+    def test_depth_limit_and_deleted_subtrees(self, client):
+        post_id, ids = self._seed(client)
+        shallow = client.get(f'/posts/{post_id}/comments?max_depth=1').json['comments']
+        assert ids['nested'] not in [c['id'] for c in shallow]
+        assert max(c['depth'] for c in shallow) == 1
+        
+        client.delete(f'/comments/{ids["reply"]}')
+        visible = [c['id'] for c in client.get(f'/posts/{post_id}/comments').json['comments']]
+        assert ids['reply'] not in visible and ids['nested'] not in visible
+    
+    def test_reply_validation(self, client):
+        post_id, ids = self._seed(client)
+        author_id = client.get(f'/comments/{ids["first"]}').json['author_id']
+        other_post = client.post('/posts', json={"title": "O", "content": "C", "author_id": author_id}).json['id']
+        
+        response = client.post('/comments', json={
+            "content": "x", "post_id": other_post, "author_id": author_id, "parent_id": ids['first']
+        })
+        assert response.status_code == 400
+        with patch.object(CreateCommentUseCase, 'MAX_DEPTH', 2):
+            response = client.post('/comments', json={
+                "content": "x", "post_id": post_id, "author_id": author_id, "parent_id": ids['nested']
+            })
+        assert response.status_code == 400
+        assert client.get(f'/posts/{post_id}/comments?cursor=abc').status_code == 400
+        assert client.get('/posts/999/comments').status_code == 404
+    
+    def test_thread_is_one_index_range(self, client):
+        post_id, _ = self._seed(client)
+        sql = THREAD.params(post_id=post_id, start_path='', end_path='~', max_depth=10).compile(
+            db.engine, compile_kwargs={'literal_binds': True}
+        )
+        plan = ' '.join(row[-1] for row in db.session.execute(db.text(f'EXPLAIN QUERY PLAN {sql}')))
+        assert 'ix_comment_model_thread' in plan
+        assert 'TEMP B-TREE' not in plan
+        # Проверка публикации, граница страницы и сам диапазон
+        with capture_queries() as stats:
+            client.get(f'/posts/{post_id}/comments?tree=1')
+        assert stats.count == 3
+    
+    def test_upgrade_backfills_paths(self, tmp_path):
+        engine = create_engine(f'sqlite:///{tmp_path / "old.db"}')
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                'CREATE TABLE comment_model (id INTEGER PRIMARY KEY, content TEXT NOT NULL, '
+                'post_id INTEGER NOT NULL, author_id INTEGER NOT NULL, deleted_at DATETIME)'
+            )
+            connection.exec_driver_sql("INSERT INTO comment_model VALUES (7, 'old', 1, 1, NULL)")
+            upgrade_schema(connection, [CommentModel.__table__])
+            row = connection.exec_driver_sql('SELECT parent_id, path, depth FROM comment_model').one()
+        assert tuple(row) == (None, '000000000007/', 0)
+        engine.dispose()
+    
+    @pytest.mark.parametrize('backend', ['memory', 'sharded'])
+    def test_other_backends(self, backend, tmp_path):
+        factory = RepositoryFactory(backend, [str(tmp_path / 's0.db'), str(tmp_path / 's1.db')])
+        users, posts, comments = (
+            factory.create_user_repository(), factory.create_post_repository(), factory.create_comment_repository()
+        )
+        create_comment = CreateCommentUseCase(comments, posts, users)
+        author = users.create(User(None, "threads", "threads@test.com"))
+        post = posts.create(Post(None, "T", "C", author.id))
+        first = create_comment.execute("first", post.id, author.id)
+        second = create_comment.execute("second", post.id, author.id)
+        reply = create_comment.execute("reply", post.id, author.id, first.id)
+        nested = create_comment.execute("nested", post.id, author.id, reply.id)
+        assert (nested.parent_id, nested.depth) == (reply.id, 2)
+        
+        thread = GetCommentThreadUseCase(comments)
+        page, cursor = thread.execute(post.id, 1)
+        assert [c.id for c in page] == [first.id, reply.id, nested.id]
+        assert [c.id for c in thread.execute(post.id, 1, cursor)[0]] == [second.id]
+        assert [c.id for c in thread.execute(post.id, 5, max_depth=1)[0]] == [first.id, reply.id, second.id]
+        
+        comments.delete(reply.id)
+        assert [c.id for c in thread.execute(post.id, 5)[0]] == [first.id, second.id]
+        if factory.sharded_store is not None:
+            factory.sharded_store.dispose()
+
+
+class TestMarkdown:
+    """Тесты отрисовки Markdown публикаций и кэша HTML."""
+    
+    def _post(self, client, content):
+        user_id = client.post('/users', json={"username": "writer", "email": "writer@test.com"}).json['id']
+        return client.post('/posts', json={"title": "T", "content": content, "author_id": user_id}).json['id']
+    
+    def test_html_format(self, app, client):
+        post_id = self._post(client, "# Заголовок\n\n**жирный** <script>alert(1)</script>")
+        assert client.get(f'/posts/{post_id}').json['content'].startswith('# Заголовок')
+        
+        html = client.get(f'/posts/{post_id}?format=html').json['content']
+        assert html.startswith('<h1>Заголовок</h1>')
+        assert '<strong>жирный</strong>' in html
+        assert '<script>' not in html and '&lt;script&gt;' in html
+        assert client.get('/posts?format=html').json[0]['content'] == html
+    
+    def test_created_posts_are_prerendered(self, app, client):
+        post_id = self._post(client, "*текст*")
+        renderer = app.extensions['container'].renderer
+        renderer.shutdown()
+        assert renderer.cache.get(('html', post_id))[1] == '<p><em>текст</em></p>\n'
+        
+        with patch.object(renderer, '_markdown', side_effect=AssertionError("повторная отрисовка")):
+            assert client.get(f'/posts/{post_id}?format=html').json['content'] == '<p><em>текст</em></p>\n'
+        client.delete(f'/posts/{post_id}')
+        assert renderer.cache.get(('html', post_id)) is None
+    
+    def test_changed_content_is_rendered_again(self):
+        renderer = MarkdownRenderer(background=False)
+        assert renderer.render(Post(1, "T", "старый", 1)) == '<p>старый</p>\n'
+        assert renderer.render(Post(1, "T", "новый", 1)) == '<p>новый</p>\n'
+        assert len(renderer.cache) == 1
+        
+        renderer.prerender(Post(2, "T", "~~зачёркнуто~~", 1))
+        assert renderer.cache.get(('html', 2))[1] == '<p><del>зачёркнуто</del></p>\n'
+
+
+class TestRateLimit:
+    """Тесты ограничения частоты запросов корзинами токенов."""
+    
+    def test_bucket_refills(self):
+        limiter = TokenBucketLimiter(slots=16)
+        assert limiter.acquire('a', 2, 1.0, now=100.0)[0]
+        assert limiter.acquire('a', 2, 1.0, now=100.0)[0]
+        allowed, remaining, retry_after = limiter.acquire('a', 2, 1.0, now=100.0)
+        assert (allowed, remaining, retry_after) == (False, 0.0, 1.0)
+        assert limiter.acquire('b', 2, 1.0, now=100.0)[0]
+        assert limiter.acquire('a', 2, 1.0, now=101.0)[0]
+        # Время назад не возвращает токены и не ломает корзину
+        assert not limiter.acquire('a', 2, 1.0, now=50.0)[0]
+    
+    def test_full_set_evicts_oldest_bucket(self):
+        limiter = TokenBucketLimiter(slots=4)
+        for i, key in enumerate('abcd'):
+            limiter.acquire(key, 1, 0.001, now=float(i))
+        assert not limiter.acquire('b', 1, 0.001, now=10.0)[0]
+        limiter.acquire('e', 1, 0.001, now=11.0)
+        # Вытеснена самая старая корзина 'a', её клиент начинает заново
+        assert limiter.acquire('a', 1, 0.001, now=12.0)[0]
+    
+    def test_state_is_shared_between_processes(self, tmp_path):
+        import multiprocessing
+        
+        path = str(tmp_path / 'ratelimit.bin')
+        
+        def spend():
+            child = TokenBucketLimiter(path)
+            for _ in range(3):
+                child.acquire('client', 5, 0.001)
+            child.close()
+        
+        process = multiprocessing.get_context('fork').Process(target=spend)
+        process.start()
+        process.join()
+        limiter = TokenBucketLimiter(path)
+        assert limiter.acquire('client', 5, 0.001)[1] == pytest.approx(1.0, abs=0.01)
+        limiter.close()
+    
+    def test_middleware(self):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'RATELIMIT_ENABLED': True,
+            'RATELIMIT_CLIENT_HEADER': 'X-Client-Id',
+            'RATELIMIT_ROUTES': {'controllers.get_all_comments': (2, 0.1)},
+        })
+        with app.app_context():
+            db.create_all()
+            client = app.test_client()
+            first = client.get('/comments')
+            assert first.headers['RateLimit-Limit'] == '2'
+            assert first.headers['RateLimit-Remaining'] == '1'
+            assert first.headers['RateLimit-Reset'] == '10'
+            client.get('/comments')
+            limited = client.get('/comments')
+            assert limited.status_code == 429
+            assert limited.headers['Retry-After'] == '10'
+            
+            assert client.get('/comments', headers={'X-Client-Id': 'mobile'}).status_code == 200
+            assert client.get('/posts').headers['RateLimit-Limit'] == '100'
+            assert 'RateLimit-Limit' not in client.get('/metrics').headers
+            db.drop_all()
+    
+    def test_client_header_ignored_by_default(self):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'RATELIMIT_ENABLED': True,
+            'RATELIMIT_ROUTES': {'controllers.get_all_comments': (1, 0.1)},
+        })
+        with app.app_context():
+            db.create_all()
+            client = app.test_client()
+            assert client.get('/comments', headers={'X-Client-Id': 'a'}).status_code == 200
+            # Без доверенного прокси заголовок не выдаёт клиенту новую корзину
+            assert client.get('/comments', headers={'X-Client-Id': 'b'}).status_code == 429
+            db.drop_all()
+
+
+class TestIdempotency:
+    """Тесты ключей идемпотентности POST-запросов."""
+    
+    def test_replay_returns_stored_response(self, app, client):
+        headers = {'Idempotency-Key': 'user-1'}
+        first = client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}, headers=headers)
+        assert first.status_code == 201
+        with patch.object(CreateUserUseCase, 'execute') as execute:
+            replay = client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}, headers=headers)
+        execute.assert_not_called()
+        assert replay.status_code == 201
+        assert replay.headers['Idempotent-Replayed'] == 'true'
+        assert replay.get_json() == first.get_json()
+        with app.app_context():
+            assert db.session.query(UserModel).count() == 1
+    
+    def test_same_key_with_other_request_is_rejected(self, client):
+        headers = {'Idempotency-Key': 'user-1'}
+        client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}, headers=headers)
+        response = client.post('/users', json={'username': 'bob', 'email': 'bob@example.com'}, headers=headers)
+        assert response.status_code == 422
+        assert client.post('/users', json={}, headers={'Idempotency-Key': ''}).status_code == 400
+    
+    def test_server_errors_are_not_stored(self, app, client):
+        headers = {'Idempotency-Key': 'user-1'}
+        app.config['PROPAGATE_EXCEPTIONS'] = False
+        execute = CreateUserUseCase.execute
+        calls = []
+        
+        def flaky_execute(use_case, *args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise RuntimeError('сбой')
+            return execute(use_case, *args, **kwargs)
+        
+        with patch.object(CreateUserUseCase, 'execute', flaky_execute):
+            assert client.post('/users', json={'username': 'alice', 'email': 'a@example.com'},
+                               headers=headers).status_code == 500
+            retry = client.post('/users', json={'username': 'alice', 'email': 'a@example.com'}, headers=headers)
+        assert len(calls) == 2
+        assert retry.status_code == 201
+        assert 'Idempotent-Replayed' not in retry.headers
+    
+    def test_expired_key_runs_again_and_is_purged(self, app, client):
+        headers = {'Idempotency-Key': 'user-1'}
+        client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}, headers=headers)
+        with app.app_context():
+            db.session.query(IdempotencyKeyModel).update({'expires_at': datetime(2000, 1, 1)})
+            db.session.commit()
+        response = client.post('/users', json={'username': 'bob', 'email': 'bob@example.com'}, headers=headers)
+        assert response.status_code == 201
+        with app.app_context():
+            db.session.query(IdempotencyKeyModel).update({'expires_at': datetime(2000, 1, 1)})
+            db.session.commit()
+        assert app.extensions['soft_delete_purger'].run_once() == 1
+        with app.app_context():
+            assert db.session.query(IdempotencyKeyModel).count() == 0
+    
+    def test_concurrent_duplicates_execute_once(self, tmp_path):
+        import threading
+        import time
+        
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'blog.db'}",
+            'SOFT_DELETE_PURGE_ENABLED': False,
+        })
+        calls = []
+        execute = CreateUserUseCase.execute
+        
+        def slow_execute(use_case, *args, **kwargs):
+            calls.append(args)
+            time.sleep(0.2)
+            return execute(use_case, *args, **kwargs)
+        
+        responses = []
+        
+        def send():
+            responses.append(app.test_client().post(
+                '/users',
+                json={'username': 'alice', 'email': 'alice@example.com'},
+                headers={'Idempotency-Key': 'user-1'}
+            ))
+        
+        with patch.object(CreateUserUseCase, 'execute', slow_execute):
+            threads = [threading.Thread(target=send) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        assert len(calls) == 1
+        assert [response.status_code for response in responses] == [201] * 4
+        assert sum(response.headers.get('Idempotent-Replayed') == 'true' for response in responses) == 3
+        assert len({response.get_json()['id'] for response in responses}) == 1
+        with app.app_context():
+            db.engine.dispose()
+
+
+class TestConcurrencyLimit:
+    """Тесты адаптивного лимита одновременных запросов."""
+    
+    @staticmethod
+    def _load(limiter, latency, rounds=50):
+        """Держать лимит занятым и завершать запросы с заданной задержкой."""
+        for _ in range(rounds):
+            while limiter.try_acquire('critical'):
+                pass
+            for _ in range(limiter.inflight):
+                limiter.release(latency)
+    
+    def test_limit_follows_latency(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=20, min_limit=4, max_limit=100)
+        self._load(limiter, 0.01)
+        assert limiter.limit == 100
+        # Запросы ждут блокировок: задержка выросла в 10 раз
+        self._load(limiter, 0.1, rounds=5)
+        assert limiter.limit < 5
+        # Перегрузка прошла: лимит снова растёт
+        self._load(limiter, 0.01, rounds=10)
+        assert limiter.limit > 20
+    
+    def test_idle_limit_does_not_grow(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=20)
+        for _ in range(100):
+            assert limiter.try_acquire('critical')
+            limiter.release(0.01)
+        assert limiter.limit == 20
+        assert limiter.inflight == 0
+    
+    def test_lists_are_shed_before_point_reads(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=10)
+        admitted = {'list': 0, 'write': 0, 'critical': 0}
+        for priority in ('list', 'write', 'critical'):
+            while limiter.try_acquire(priority):
+                admitted[priority] += 1
+        assert admitted == {'list': 5, 'write': 3, 'critical': 2}
+    
+    def test_middleware_sheds_with_503(self):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'CONCURRENCY_LIMIT_ENABLED': True,
+            'CONCURRENCY_LIMIT_INITIAL': 10,
+        })
+        with app.app_context():
+            db.create_all()
+        client = app.test_client()
+        user_id = client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}).get_json()['id']
+        post_id = client.post('/posts', json={'title': 'T', 'content': 'C', 'author_id': user_id}).get_json()['id']
+        limiter = app.extensions['concurrency_limiter']
+        assert limiter.inflight == 0
+        # Половина лимита занята: списки уже отсекаются, точечные чтения - нет
+        limiter.inflight = 5
+        shed = client.get('/posts')
+        assert shed.status_code == 503
+        assert shed.headers['Retry-After'] == '1'
+        assert client.get(f'/posts/{post_id}').status_code == 200
+        assert client.post('/users', json={'username': 'bob', 'email': 'bob@example.com'}).status_code == 201
+        assert client.get('/metrics').status_code == 200
+        assert limiter.inflight == 5
+
+
+class TestDeadlines:
+    """Тесты сроков обработки запросов."""
+    
+    ENDLESS = 'WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT count(*) FROM n'
+    
+    def _app(self, **config):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            **config,
+        })
+        with app.app_context():
+            db.create_all()
+        return app
+    
+    def test_long_query_is_interrupted(self, app):
+        with app.app_context():
+            with pytest.raises(DeadlineExceeded):
+                with deadline(0.05):
+                    db.session.execute(db.text(self.ENDLESS))
+            db.session.rollback()
+            # Соединение осталось рабочим
+            assert db.session.execute(db.text('SELECT 1')).scalar() == 1
+    
+    def test_route_deadline_returns_504(self):
+        app = self._app(REQUEST_DEADLINE_ROUTES={'controllers.get_all_posts': 0.05})
+        client = app.test_client()
+        endless = self.ENDLESS
+        
+        def slow_get_all(repository):
+            db.session.execute(db.text(endless))
+            return []
+        
+        with patch.object(SQLPostRepository, 'get_all', slow_get_all):
+            started = datetime.now()
+            response = client.get('/posts')
+        assert response.status_code == 504
+        assert datetime.now() - started < timedelta(seconds=5)
+        text = client.get('/metrics').get_data(as_text=True)
+        assert 'blog_deadline_exceeded_total{endpoint="controllers.get_all_posts"}' in text
+        assert client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}).status_code == 201
+    
+    def test_header_only_shortens_deadline(self):
+        app = self._app(REQUEST_DEADLINE_ROUTES={'controllers.get_all_users': 0.5})
+        client = app.test_client()
+        endless = self.ENDLESS
+        
+        def slow_get_all(repository):
+            db.session.execute(db.text(endless))
+            return []
+        
+        with patch.object(SQLUserRepository, 'get_all', slow_get_all):
+            started = datetime.now()
+            assert client.get('/users', headers={'X-Request-Timeout': '0.05'}).status_code == 504
+            assert datetime.now() - started < timedelta(seconds=0.4)
+            # Заголовок не продлевает срок маршрута
+            assert client.get('/users', headers={'X-Request-Timeout': '600'}).status_code == 504
+
+
+class TestTransfer:
+    """Тесты выгрузки и загрузки NDJSON."""
+    
+    @staticmethod
+    def _make_app(path):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+        })
+        return app
+    
+    @pytest.fixture
+    def source(self, tmp_path):
+        path = str(tmp_path / 'source.db')
+        app = self._make_app(path)
+        client = app.test_client()
+        alice = client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}).get_json()['id']
+        bob = client.post('/users', json={'username': 'bob', 'email': 'bob@example.com'}).get_json()['id']
+        post_id = client.post('/posts', json={'title': 'Т', 'content': 'Текст', 'author_id': alice}).get_json()['id']
+        client.post('/posts', json={'title': 'Удаляемая', 'content': 'Текст', 'author_id': bob})
+        root = client.post('/comments', json={'content': 'Корень', 'post_id': post_id, 'author_id': bob}).get_json()
+        client.post('/comments', json={
+            'content': 'Ответ', 'post_id': post_id, 'author_id': alice, 'parent_id': root['id']
+        })
+        client.delete(f'/users/{bob}')
+        with app.app_context():
+            db.engine.dispose()
+        return path
+    
+    def test_round_trip_remaps_ids(self, source, tmp_path):
+        from infrastructure.transfer import export_ndjson, import_ndjson
+        
+        dump = str(tmp_path / 'dump.ndjson.gz')
+        assert export_ndjson(source, dump) == {'user': 1, 'post': 1, 'comment': 0}
+        
+        # Без удалённого пользователя остаются публикация alice и ни одного
+        # комментария: корень обсуждения написал bob
+        target = str(tmp_path / 'target.db')
+        app = self._make_app(target)
+        client = app.test_client()
+        client.post('/users', json={'username': 'carol', 'email': 'carol@example.com'})
+        result = import_ndjson(dump, target, workers=1)
+        assert (result['user'], result['post'], result['errors']) == (1, 1, [])
+        users = client.get('/users').get_json()
+        assert sorted(user['username'] for user in users) == ['alice', 'carol']
+        alice = next(user for user in users if user['username'] == 'alice')
+        assert alice['id'] == 2
+        assert client.get('/posts').get_json()[0]['author_id'] == 2
+        with app.app_context():
+            db.engine.dispose()
+    
+    def test_threads_and_resume(self, tmp_path):
+        from infrastructure.transfer import import_ndjson
+        
+        dump = tmp_path / 'dump.ndjson'
+        records = [
+            {'type': 'user', 'id': 1, 'username': 'alice', 'email': 'alice@example.com'},
+            {'type': 'post', 'id': 3, 'title': 'Т', 'content': 'Текст', 'author_id': 1, 'created_at': None},
+            {'type': 'comment', 'id': 5, 'content': 'Корень', 'post_id': 3, 'author_id': 1,
+             'parent_id': None, 'path': '000000000005/', 'depth': 0, 'created_at': None},
+            {'type': 'comment', 'id': 7, 'content': 'Ответ', 'post_id': 3, 'author_id': 1,
+             'parent_id': 5, 'path': '000000000005/000000000007/', 'depth': 1, 'created_at': None},
+        ]
+        bad = [
+            'не json',
+            json.dumps({'type': 'user', 'id': 2, 'username': 'bob', 'email': 'без собаки'}),
+            json.dumps({'type': 'post', 'id': 4, 'title': 'Т', 'content': 'Текст', 'author_id': 9}),
+            json.dumps({'type': 'user', 'id': 3, 'username': 'alice', 'email': 'other@example.com'}),
+        ]
+        dump.write_text('\n'.join([json.dumps(r, ensure_ascii=False) for r in records] + bad) + '\n', encoding='utf-8')
+        target = str(tmp_path / 'target.db')
+        app = self._make_app(target)
+        client = app.test_client()
+        client.post('/users', json={'username': 'carol', 'email': 'carol@example.com'})
+        
+        def crash(lines):
+            raise KeyboardInterrupt
+        
+        with pytest.raises(KeyboardInterrupt):
+            import_ndjson(str(dump), target, workers=1, batch_size=2, on_batch=crash)
+        result = import_ndjson(str(dump), target, workers=1, batch_size=2)
+        assert result['resumed'] == 2
+        assert (result['user'], result['post'], result['comment']) == (0, 0, 2)
+        assert [number for number, _ in result['errors']] == [5, 6, 7, 8]
+        
+        # Целевая база пуста, кроме пользователя: сдвигаются только ID пользователей
+        thread = client.get('/posts/3/comments?tree=1').get_json()['comments']
+        assert [(c['id'], c['author_id']) for c in thread] == [(5, 2)]
+        assert [c['id'] for c in thread[0]['replies']] == [7]
+        with app.app_context():
+            assert db.session.execute(db.text('SELECT path FROM comment_model WHERE id = 7')).scalar() == (
+                '000000000005/000000000007/'
+            )
+            assert db.session.execute(db.text('SELECT count(*) FROM import_checkpoint')).scalar() == 0
+            db.engine.dispose()
+    
+    def test_import_maintains_side_tables(self, tmp_path):
+        import sqlite3
+        from infrastructure.transfer import import_ndjson
+        
+        created_at = (datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=1)).isoformat(sep=' ')
+        dump = tmp_path / 'dump.ndjson'
+        records = [
+            {'type': 'user', 'id': 1, 'username': 'alice', 'email': 'alice@example.com'},
+            {'type': 'post', 'id': 1, 'title': 'Т', 'content': 'Текст', 'author_id': 1, 'created_at': created_at},
+            {'type': 'comment', 'id': 1, 'content': 'Первый', 'post_id': 1, 'author_id': 1,
+             'parent_id': None, 'path': '000000000001/', 'depth': 0, 'created_at': created_at},
+            {'type': 'comment', 'id': 2, 'content': 'Второй', 'post_id': 1, 'author_id': 1,
+             'parent_id': None, 'path': '000000000002/', 'depth': 0, 'created_at': created_at},
+        ]
+        dump.write_text(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records), encoding='utf-8')
+        target = str(tmp_path / 'target.db')
+        app = self._make_app(target)
+        with app.app_context():
+            db.engine.dispose()
+        connection = sqlite3.connect(target)
+        journal_mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+        connection.close()
+        
+        import_ndjson(str(dump), target, workers=1, batch_size=2)
+        
+        # Импорт виден потребителям журнала и рейтингу, как обычное создание
+        connection = sqlite3.connect(target)
+        changes = connection.execute('SELECT entity, operation, entity_id, payload FROM change_log ORDER BY id').fetchall()
+        assert [change[:3] for change in changes] == [
+            ('user', 'create', 1), ('post', 'create', 1), ('comment', 'create', 1), ('comment', 'create', 2)
+        ]
+        assert json.loads(changes[2][3]) == {
+            'id': 1, 'content': 'Первый', 'post_id': 1, 'author_id': 1, 'parent_id': None, 'depth': 0
+        }
+        (post_id, score), = connection.execute('SELECT post_id, score FROM post_trending').fetchall()
+        assert post_id == 1
+        assert current_score(score, decay_rate(DEFAULT_HALF_LIFE)) == pytest.approx(2.0, rel=0.01)
+        assert connection.execute('PRAGMA journal_mode').fetchone()[0] == journal_mode
+        connection.close()
+    
+    def test_cli(self, source, tmp_path):
+        dump = str(tmp_path / 'dump.ndjson')
+        runner = CliRunner()
+        result = runner.invoke(cli, ['export', source, dump])
+        assert result.exit_code == 0, result.output
+        assert 'user: 1' in result.output
+        result = runner.invoke(cli, ['import', dump, str(tmp_path / 'new.db'), '--workers', '1'])
+        assert result.exit_code == 0, result.output
+        assert 'post: 1' in result.output
+
+
+class TestBackup:
+    """Тесты резервного копирования."""
+    
+    @staticmethod
+    def _make_db(path, journal_mode):
+        import sqlite3
+        
+        connection = sqlite3.connect(path)
+        connection.execute(f'PRAGMA journal_mode={journal_mode}')
+        connection.execute('CREATE TABLE item (id INTEGER PRIMARY KEY, payload TEXT)')
+        connection.execute('CREATE TABLE item_copy (id INTEGER PRIMARY KEY, payload TEXT)')
+        rows = [('x' * 500,)] * 2000
+        connection.executemany('INSERT INTO item (payload) VALUES (?)', rows)
+        connection.executemany('INSERT INTO item_copy (payload) VALUES (?)', rows)
+        connection.commit()
+        connection.close()
+    
+    @pytest.mark.parametrize('journal_mode', ['app', 'delete'])
+    def test_consistent_under_writes(self, journal_mode, tmp_path):
+        import sqlite3
+        import threading
+        from infrastructure.backup import TooManyRestarts, backup_database
+        
+        path = str(tmp_path / 'blog.db')
+        if journal_mode == 'app':
+            # База приложения сама переводится в WAL, и копия не держит писателей
+            app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+                              'SOFT_DELETE_PURGE_ENABLED': False})
+            with app.app_context():
+                db.engine.dispose()
+            journal_mode = sqlite3.connect(path).execute('PRAGMA journal_mode').fetchone()[0]
+            assert journal_mode == 'wal'
+        self._make_db(path, journal_mode)
+        stop = threading.Event()
+        
+        def write():
+            # Каждая транзакция пишет в обе таблицы: в согласованной копии их поровну
+            connection = sqlite3.connect(path, timeout=30)
+            while not stop.is_set():
+                connection.execute("INSERT INTO item (payload) VALUES ('y')")
+                connection.execute("INSERT INTO item_copy (payload) VALUES ('y')")
+                connection.commit()
+            connection.close()
+        
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            if journal_mode == 'delete':
+                # Без WAL копия под постоянной записью прерывается, а не держит писателей;
+                # за паузу между шагами писатель успевает зафиксировать транзакцию
+                with pytest.raises(TooManyRestarts):
+                    backup_database(path, str(tmp_path / 'copy.db'), pages=8, pause=0.05, max_restarts=2)
+                return
+            result = backup_database(path, str(tmp_path / 'copy.db'), pages=8, pause=0.001, max_restarts=2)
+        finally:
+            stop.set()
+            writer.join()
+            assert not os.path.exists(str(tmp_path / 'copy.db.tmp'))
+        assert result['steps'] > 1
+        assert result['restarts'] == 0
+        copy = sqlite3.connect(str(tmp_path / 'copy.db'))
+        assert copy.execute('PRAGMA integrity_check').fetchone()[0] == 'ok'
+        items, copies = copy.execute('SELECT (SELECT count(*) FROM item), (SELECT count(*) FROM item_copy)').fetchone()
+        assert items == copies >= 2000
+        copy.close()
+    
+    def test_retention_and_point_in_time_restore(self, tmp_path):
+        import sqlite3
+        from infrastructure.backup import BackupScheduler, find_backup, list_backups
+        
+        path = str(tmp_path / 'blog.db')
+        self._make_db(path, 'wal')
+        directory = str(tmp_path / 'backups')
+        scheduler = BackupScheduler(path, directory, interval=0, keep=2)
+        moments = []
+        for payload in ('first', 'second', 'third'):
+            connection = sqlite3.connect(path)
+            connection.execute('UPDATE item SET payload = ? WHERE id = 1', (payload,))
+            connection.commit()
+            connection.close()
+            scheduler.run_once()
+            moments.append(list_backups(directory)[-1][0])
+        assert [moment for moment, _ in list_backups(directory)] == moments[1:]
+        assert scheduler.last_result['removed']
+        
+        assert find_backup(directory, moments[1] + timedelta(microseconds=1)) == list_backups(directory)[0][1]
+        assert find_backup(directory) == list_backups(directory)[1][1]
+        
+        runner = CliRunner()
+        restored = str(tmp_path / 'restored.db')
+        result = runner.invoke(cli, ['restore', restored, find_backup(directory, moments[1])])
+        assert result.exit_code == 0, result.output
+        connection = sqlite3.connect(restored)
+        assert connection.execute('SELECT payload FROM item WHERE id = 1').fetchone()[0] == 'second'
+        connection.close()
+        
+        result = runner.invoke(cli, ['restore', restored, directory, '--at', '2000-01-01'])
+        assert result.exit_code != 0
+        assert 'нет подходящей копии' in result.output
+    
+    def test_restore_rejects_damaged_copy(self, tmp_path):
+        import sqlite3
+        from infrastructure.backup import restore_database
+        
+        damaged = tmp_path / 'damaged.db'
+        damaged.write_bytes(b'SQLite format 3\x00' + b'\xff' * 4096)
+        target = str(tmp_path / 'blog.db')
+        self._make_db(target, 'delete')
+        with pytest.raises(ValueError):
+            restore_database(str(damaged), target)
+        connection = sqlite3.connect(target)
+        assert connection.execute('SELECT count(*) FROM item').fetchone()[0] == 2000
+        connection.close()
+    
+    def test_cli_backup_report(self, tmp_path):
+        path = str(tmp_path / 'blog.db')
+        self._make_db(path, 'wal')
+        result = CliRunner().invoke(cli, ['backup', path, str(tmp_path / 'backups'), '--keep', '1'])
+        assert result.exit_code == 0, result.output
+        assert 'МБ/с' in result.output and 'самый долгий шаг' in result.output
+        assert len(os.listdir(tmp_path / 'backups')) == 1
+
+
+class TestChangeStream:
+    """Тесты журнала изменений и потока /changes/stream."""
+    
+    @staticmethod
+    def _read_events(response, count):
+        """Прочитать count событий из потока SSE и закрыть его."""
+        events = []
+        for chunk in response.response:
+            for block in chunk.decode().split('\n\n'):
+                if block.startswith('id: '):
+                    head, data = block.split('\n')
+                    events.append((int(head[4:]), json.loads(data[6:])))
+            if len(events) >= count:
+                break
+        response.close()
+        return events
+    
+    def test_changes_recorded_with_writes(self, app, client):
+        alice = client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}).get_json()['id']
+        bob = client.post('/users', json={'username': 'bob', 'email': 'bob@example.com'}).get_json()['id']
+        post_id = client.post('/posts', json={'title': 'Т', 'content': 'Текст', 'author_id': alice}).get_json()['id']
+        comment = client.post('/comments', json={'content': 'К', 'post_id': post_id, 'author_id': bob}).get_json()
+        client.post(f'/users/{bob}/following', json={'author_id': alice})
+        client.delete(f'/comments/{comment["id"]}')
+        client.delete(f'/comments/{comment["id"]}')
+        with app.app_context():
+            # Запись журнала откатывается вместе с несостоявшимся изменением
+            with patch.object(db.session, 'commit', side_effect=RuntimeError):
+                with pytest.raises(RuntimeError):
+                    SQLUserRepository().create(User(None, 'dave', 'dave@example.com'))
+            db.session.rollback()
+            rows = db.session.query(ChangeLogModel).order_by(ChangeLogModel.id).all()
+            assert [(r.entity, r.operation, r.entity_id) for r in rows] == [
+                ('user', 'create', alice),
+                ('user', 'create', bob),
+                ('post', 'create', post_id),
+                ('comment', 'create', comment['id']),
+                ('follow', 'create', bob),
+                ('comment', 'delete', comment['id']),
+            ]
+            assert json.loads(rows[0].payload) == {'id': alice, 'username': 'alice', 'email': 'alice@example.com'}
+            assert json.loads(rows[4].payload) == {'follower_id': bob, 'author_id': alice}
+    
+    def test_stream_resumes_after_last_event_id(self, tmp_path):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'blog.db'}",
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'CHANGE_STREAM_POLL_INTERVAL': 0.01,
+            'CHANGE_STREAM_HEARTBEAT': 0.05,
+        })
+        client = app.test_client()
+        for name in ('alice', 'bob', 'carol'):
+            client.post('/users', json={'username': name, 'email': f'{name}@example.com'})
+        try:
+            response = client.get('/changes/stream?last_event_id=0', buffered=False)
+            assert response.mimetype == 'text/event-stream'
+            events = self._read_events(response, 3)
+            assert [event_id for event_id, _ in events] == [1, 2, 3]
+            assert events[1][1]['entity'] == 'user' and events[1][1]['data']['username'] == 'bob'
+            
+            # Без ID поток начинается с текущего конца журнала
+            response = client.get('/changes/stream', buffered=False)
+            chunks = iter(response.response)
+            assert next(chunks).startswith(b'retry: ')
+            client.delete('/users/1')
+            events = []
+            while not events:
+                events = [block for block in next(chunks).decode().split('\n\n') if block.startswith('id: ')]
+            response.close()
+            assert events[0].startswith('id: 4\n')
+            
+            response = client.get('/changes/stream', headers={'Last-Event-ID': '2'}, buffered=False)
+            assert [event_id for event_id, _ in self._read_events(response, 2)] == [3, 4]
+            assert client.get('/changes/stream?last_event_id=abc').status_code == 400
+        finally:
+            app.extensions['change_feed'].stop()
+            with app.app_context():
+                db.engine.dispose()
+    
+    def test_subscribers_share_one_reader(self, app, client):
+        from sqlalchemy import event
+        from infrastructure.changes import ChangeFeed
+        
+        for name in ('alice', 'bob', 'carol'):
+            client.post('/users', json={'username': name, 'email': f'{name}@example.com'})
+        with app.app_context():
+            engine = db.engine
+        feed = ChangeFeed(engine, buffer_size=2, batch_size=10)
+        reads = []
+        
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if 'FROM change_log' in statement:
+                reads.append(statement)
+        
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            assert feed.poll() == 3
+            subscribers = [feed.wait(1, timeout=0) for _ in range(5)]
+            assert len(reads) == 1
+            assert all(events == subscribers[0] for events in subscribers)
+            assert [event_id for event_id, _ in subscribers[0]] == [2, 3]
+            # События сериализуются один раз и раздаются всем подписчикам
+            assert subscribers[1][0][1] is subscribers[0][0][1]
+            assert feed.wait(3, timeout=0) == []
+            # Отставший подписчик дочитывает журнал сам
+            client.post('/users', json={'username': 'dave', 'email': 'dave@example.com'})
+            client.post('/users', json={'username': 'erin', 'email': 'erin@example.com'})
+            feed.poll()
+            assert feed.wait(0, timeout=0) is None
+            assert [event_id for event_id, _ in feed.read(0)] == [1, 2, 3, 4, 5]
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+
+
+class TestSync:
+    """Тесты синхронизации GET /sync."""
+    
+    @staticmethod
+    def _sync_all(client, since=None, limit=2):
+        """Пройти все страницы синхронизации; вернуть собранное и последний токен."""
+        collected = {'users': [], 'posts': [], 'comments': [], 'deleted': {'users': [], 'posts': [], 'comments': []}}
+        while True:
+            url = f'/sync?limit={limit}' + (f'&since={since}' if since else '')
+            response = client.get(url)
+            assert response.status_code == 200, response.get_json()
+            page = response.get_json()
+            for kind in ('users', 'posts', 'comments'):
+                collected[kind] += page[kind]
+                collected['deleted'][kind] += page['deleted'][kind]
+            since = page['token']
+            if not page['has_more']:
+                return collected, since
+    
+    def test_full_then_delta(self, client):
+        alice = client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}).get_json()['id']
+        bob = client.post('/users', json={'username': 'bob', 'email': 'bob@example.com'}).get_json()['id']
+        carol = client.post('/users', json={'username': 'carol', 'email': 'carol@example.com'}).get_json()['id']
+        post_id = client.post('/posts', json={'title': 'Т', 'content': 'Текст', 'author_id': alice}).get_json()['id']
+        comment = client.post('/comments', json={'content': 'К', 'post_id': post_id, 'author_id': bob}).get_json()
+        
+        full, token = self._sync_all(client)
+        assert [u['username'] for u in full['users']] == ['alice', 'bob', 'carol']
+        assert [p['id'] for p in full['posts']] == [post_id]
+        assert full['comments'] == [{
+            'id': comment['id'], 'content': 'К', 'post_id': post_id, 'author_id': bob, 'parent_id': None, 'depth': 0
+        }]
+        assert token.startswith('d_')
+        # Изменения, сделанные во время полной синхронизации, повторяются дельтой
+        replay, token = self._sync_all(client, token)
+        assert replay['users'] == []
+        
+        second = client.post('/posts', json={'title': 'Новая', 'content': 'Текст', 'author_id': carol}).get_json()['id']
+        client.delete(f'/comments/{comment["id"]}')
+        client.delete(f'/users/{bob}')
+        temporary = client.post('/posts', json={'title': 'Ч', 'content': 'Т', 'author_id': alice}).get_json()['id']
+        client.delete(f'/posts/{temporary}')
+        delta, token = self._sync_all(client, token)
+        assert [p['id'] for p in delta['posts']] == [second]
+        assert delta['users'] == [] and delta['comments'] == []
+        # Удаление, попавшее на две страницы, может прийти дважды
+        assert {kind: set(ids) for kind, ids in delta['deleted'].items()} == {
+            'users': {bob}, 'posts': {temporary}, 'comments': {comment['id']}
+        }
+        
+        response = client.get(f'/sync?since={token}')
+        page = response.get_json()
+        assert (page['token'], page['has_more'], page['posts']) == (token, False, [])
+    
+    def test_delta_reads_only_changes(self, client):
+        for i in range(30):
+            client.post('/users', json={'username': f'user{i}', 'email': f'user{i}@example.com'})
+        _, token = self._sync_all(client, limit=1000)
+        client.post('/users', json={'username': 'new', 'email': 'new@example.com'})
+        # Подписки в журнале не относятся к синхронизации и пропускаются
+        client.post('/users/1/following', json={'author_id': 2})
+        # Бюджет changes.sync в тестах проверяется с исключением
+        page = client.get(f'/sync?since={token}').get_json()
+        assert [u['username'] for u in page['users']] == ['new']
+        assert page['has_more'] is False
+        assert int(page['token'][2:]) == int(token[2:]) + 2
+    
+    def test_invalid_and_expired_tokens(self, app, client):
+        for name in ('alice', 'bob', 'carol'):
+            client.post('/users', json={'username': name, 'email': f'{name}@example.com'})
+        for token in ('x', 'd_-1', 'd_99', 's_1_tags_0'):
+            assert client.get(f'/sync?since={token}').status_code == 400
+        assert client.get('/sync?since=d_1').status_code == 200
+        with app.app_context():
+            db.session.execute(db.text('DELETE FROM change_log WHERE id <= 2'))
+            db.session.commit()
+        assert client.get('/sync?since=d_1').status_code == 410
+        page = client.get('/sync?since=d_2').get_json()
+        assert [u['username'] for u in page['users']] == ['carol']
+        
+        memory = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'REPOSITORY_BACKEND': 'memory'
+        })
+        assert memory.test_client().get('/sync').status_code == 501
+        assert memory.test_client().get('/changes/stream').status_code == 501
+
+
+class TestWebhooks:
+    """Тесты доставки webhook на локальный HTTP-приёмник."""
+    
+    @pytest.fixture
+    def receiver(self):
+        """HTTP-приёмник: запоминает запросы и отвечает статусами из очереди (по умолчанию 200)."""
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        state = {'requests': [], 'statuses': [], 'received': threading.Event()}
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                status, headers = state['statuses'].pop(0) if state['statuses'] else (200, {})
+                state['requests'].append((dict(self.headers), body, status))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                state['received'].set()
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+        thread.start()
+        state['url'] = f'http://127.0.0.1:{server.server_address[1]}/hook'
+        yield state
+        server.shutdown()
+        server.server_close()
+    
+    @staticmethod
+    def _make_app(tmp_path, **config):
+        return create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'blog.db'}",
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'WEBHOOK_DELIVERY_ENABLED': False,
+            'WEBHOOK_BACKOFF_BASE': 0.0,
+            **config
+        })
+    
+    @staticmethod
+    def _close(app):
+        app.extensions['webhook_dispatcher'].stop()
+        with app.app_context():
+            db.engine.dispose()
+    
+    def test_batched_signed_delivery(self, tmp_path, receiver):
+        import hashlib
+        import hmac
+        
+        app = self._make_app(tmp_path, WEBHOOK_BATCH_SIZE=3)
+        client = app.test_client()
+        try:
+            alice = client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}).get_json()['id']
+            response = client.post('/webhooks', json={'url': receiver['url'], 'secret': 'тайна'})
+            assert response.status_code == 201
+            webhook = response.get_json()
+            assert webhook['events'] == ['post.create', 'comment.create']
+            # Создание пользователя до подписки не доставляется
+            for i in range(2):
+                post_id = client.post('/posts', json={'title': f'Т{i}', 'content': 'Текст', 'author_id': alice}).get_json()['id']
+                client.post('/comments', json={'content': 'К', 'post_id': post_id, 'author_id': alice})
+            client.post('/users', json={'username': 'bob', 'email': 'bob@example.com'})
+            
+            dispatcher = app.extensions['webhook_dispatcher']
+            assert dispatcher.run_once() == 3
+            assert dispatcher.run_once() == 1
+            assert dispatcher.run_once() == 0
+            batches = [json.loads(body) for _, body, _ in receiver['requests']]
+            assert [[e['entity'] + '.' + e['operation'] for e in b['events']] for b in batches] == [
+                ['post.create', 'comment.create', 'post.create'], ['comment.create']
+            ]
+            assert batches[0]['events'][0]['data']['title'] == 'Т0'
+            headers, body, _ = receiver['requests'][0]
+            expected = 'sha256=' + hmac.new('тайна'.encode(), body, hashlib.sha256).hexdigest()
+            assert headers['X-Blog-Signature'] == expected
+            first, last = batches[0]['events'][0]['id'], batches[0]['events'][-1]['id']
+            assert headers['X-Blog-Delivery'] == f"{webhook['id']}-{first}-{last}"
+            assert client.get('/webhooks').get_json()[0]['cursor'] > last
+        finally:
+            self._close(app)
+    
+    def test_backoff_and_dead_letters(self, tmp_path, receiver):
+        app = self._make_app(tmp_path, WEBHOOK_MAX_ATTEMPTS=3)
+        client = app.test_client()
+        try:
+            alice = client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}).get_json()['id']
+            webhook_id = client.post('/webhooks', json={'url': receiver['url']}).get_json()['id']
+            client.post('/posts', json={'title': 'Т', 'content': 'Текст', 'author_id': alice})
+            dispatcher = app.extensions['webhook_dispatcher']
+            
+            # Retry-After откладывает повтор дольше экспоненциальной паузы
+            receiver['statuses'] = [(503, {'Retry-After': '120'})]
+            assert dispatcher.run_once() == 0
+            state = client.get('/webhooks').get_json()[0]
+            assert (state['attempts'], state['last_error']) == (1, 'HTTP 503')
+            assert dispatcher.due() == []
+            with app.app_context():
+                db.session.execute(db.text('UPDATE webhook SET next_attempt_at = NULL'))
+                db.session.commit()
+            
+            receiver['statuses'] = [(500, {}), (500, {})]
+            assert dispatcher.run_once() == 0
+            assert dispatcher.run_once() == 0
+            assert len(receiver['requests']) == 3
+            # Попытки кончились: пачка отложена, доставка идёт дальше
+            letters = client.get(f'/webhooks/{webhook_id}/dead-letters').get_json()
+            assert [(letter['attempts'], letter['error']) for letter in letters] == [(3, 'HTTP 500')]
+            assert client.get('/webhooks').get_json()[0]['attempts'] == 0
+            
+            client.post('/posts', json={'title': 'Новая', 'content': 'Текст', 'author_id': alice})
+            assert dispatcher.run_once() == 1
+            assert json.loads(receiver['requests'][-1][1])['events'][0]['data']['title'] == 'Новая'
+            
+            assert client.delete(f'/webhooks/{webhook_id}').status_code == 204
+            assert client.delete(f'/webhooks/{webhook_id}').status_code == 404
+            client.post('/posts', json={'title': 'После', 'content': 'Текст', 'author_id': alice})
+            assert dispatcher.due() == []
+        finally:
+            self._close(app)
+    
+    def test_retention_waits_for_webhooks(self, tmp_path, receiver):
+        app = self._make_app(tmp_path, CHANGE_LOG_RETENTION=0.0)
+        client = app.test_client()
+        try:
+            webhook_id = client.post('/webhooks', json={'url': receiver['url']}).get_json()['id']
+            alice = client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}).get_json()['id']
+            client.post('/posts', json={'title': 'Т', 'content': 'Текст', 'author_id': alice})
+            purger = app.extensions['soft_delete_purger']
+            
+            # Срок хранения истёк, но подписка ещё не получила пост
+            purger.run_once()
+            with app.app_context():
+                assert db.session.query(ChangeLogModel).count() == 2
+            
+            assert app.extensions['webhook_dispatcher'].run_once() == 1
+            purger.run_once()
+            with app.app_context():
+                assert db.session.query(ChangeLogModel).count() == 0
+            
+            # Удалённая подписка очистку не держит
+            client.post('/posts', json={'title': 'Т2', 'content': 'Текст', 'author_id': alice})
+            client.delete(f'/webhooks/{webhook_id}')
+            purger.run_once()
+            with app.app_context():
+                assert db.session.query(ChangeLogModel).count() == 0
+        finally:
+            self._close(app)
+    
+    def test_background_delivery(self, tmp_path, receiver):
+        app = self._make_app(tmp_path, WEBHOOK_DELIVERY_ENABLED=True, WEBHOOK_POLL_INTERVAL=0.02)
+        client = app.test_client()
+        try:
+            assert client.post('/webhooks', json={'url': 'ftp://example.com'}).status_code == 400
+            assert client.post('/webhooks', json={'url': receiver['url'], 'events': ['post.edit']}).status_code == 400
+            client.post('/webhooks', json={'url': receiver['url'], 'events': ['user.create']})
+            client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'})
+            assert receiver['received'].wait(5)
+            event = json.loads(receiver['requests'][0][1])['events'][0]
+            assert (event['entity'], event['operation'], event['data']['username']) == ('user', 'create', 'alice')
+        finally:
+            self._close(app)
+    
+    def test_memory_backend_unsupported(self):
+        app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'REPOSITORY_BACKEND': 'memory'
+        })
+        response = app.test_client().post('/webhooks', json={'url': 'https://example.com/hook'})
+        assert response.status_code == 501
+
+
+class TestUserUniqueness:
+    """Тесты проверки занятости имени и почты при регистрации."""
+    
+    def test_duplicates_rejected_with_409(self, app, client):
+        assert client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}).status_code == 201
+        
+        with capture_queries() as stats:
+            response = client.post('/users', json={'username': 'alice', 'email': 'other@example.com'})
+        assert response.status_code == 409
+        assert response.get_json()['field'] == 'username'
+        # Дубликат отклоняется одним SELECT, без записи
+        assert stats.count == 1
+        response = client.post('/users', json={'username': 'bob', 'email': 'alice@example.com'})
+        assert (response.status_code, response.get_json()['field']) == (409, 'email')
+        
+        # Удалённый пользователь занимает имя до очистки, как и UNIQUE
+        alice = client.get('/users').get_json()[0]['id']
+        client.delete(f'/users/{alice}')
+        assert client.post('/users', json={'username': 'alice', 'email': 'new@example.com'}).status_code == 409
+        assert client.post('/users', json={'username': 'bob', 'email': 'bob@example.com'}).status_code == 201
+    
+    def test_filter_skips_lookup_for_free_values(self, app):
+        repository = SQLUserRepository()
+        with app.app_context():
+            db.session.add(UserModel(username='existing', email='existing@example.com'))
+            db.session.commit()
+            # Пока фильтр не построен, занятость проверяется в базе
+            with capture_queries() as stats:
+                repository.create(User(None, 'first', 'first@example.com'))
+            assert stats.count == 3
+            
+            repository.warm_up()
+            with pytest.raises(UserAlreadyExists):
+                repository.create(User(None, 'existing', 'fresh@example.com'))
+            with capture_queries() as stats:
+                repository.create(User(None, 'second', 'second@example.com'))
+            assert stats.count == 2
+            
+            # Ложное срабатывание фильтра проверяется в базе и не мешает регистрации
+            with patch.object(BloomFilter, '__contains__', return_value=True):
+                with capture_queries() as stats:
+                    created = repository.create(User(None, 'third', 'third@example.com'))
+            assert created.id is not None
+            assert stats.count == 3
+    
+    def test_conflict_behind_filter(self, app):
+        repository = SQLUserRepository()
+        with app.app_context():
+            repository.warm_up()
+            # Строку вставил другой процесс: фильтр о ней не знает
+            db.session.execute(db.text(
+                "INSERT INTO user_model (username, email) VALUES ('ghost', 'ghost@example.com')"
+            ))
+            db.session.commit()
+            with pytest.raises(UserAlreadyExists) as error:
+                repository.create(User(None, 'other', 'ghost@example.com'))
+            assert error.value.field == 'email'
+            # Сессия откатана и пригодна для следующих записей, а значение запомнено фильтром
+            assert repository.create(User(None, 'second', 'second@example.com')).id is not None
+            with capture_queries() as stats:
+                with pytest.raises(UserAlreadyExists):
+                    repository.create(User(None, 'third', 'ghost@example.com'))
+            assert stats.count == 1
+    
+    def test_background_warm_up(self, tmp_path):
+        import time
+        
+        config = {
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'blog.db'}",
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'WEBHOOK_DELIVERY_ENABLED': False
+        }
+        app = create_app(config)
+        with app.app_context():
+            db.session.add(UserModel(username='existing', email='existing@example.com'))
+            db.session.commit()
+            db.engine.dispose()
+        
+        app = create_app(config)
+        repository = app.extensions['container'].repositories['user']
+        deadline_at = time.monotonic() + 5
+        while repository._taken is None and time.monotonic() < deadline_at:
+            time.sleep(0.01)
+        assert 'u:existing' in repository._taken
+        client = app.test_client()
+        with capture_queries() as stats:
+            assert client.post('/users', json={'username': 'fresh', 'email': 'fresh@example.com'}).status_code == 201
+        assert stats.count == 2
+        with app.app_context():
+            db.engine.dispose()
+    
+    def test_bloom_filter_error_rate(self):
+        bloom = BloomFilter(10000)
+        for i in range(10000):
+            bloom.add(f'user{i}')
+        assert all(f'user{i}' in bloom for i in range(10000))
+        false_positives = sum(f'other{i}' in bloom for i in range(10000))
+        assert false_positives < 200
+    
+    @pytest.mark.parametrize('backend', ['memory', 'sharded'])
+    def test_other_backends(self, tmp_path, backend):
+        config = {
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SOFT_DELETE_PURGE_ENABLED': False,
+            'REPOSITORY_BACKEND': backend
+        }
+        if backend == 'sharded':
+            config['SHARD_DATABASE_URIS'] = [str(tmp_path / f'shard{i}.db') for i in range(2)]
+            config['QUERY_BUDGETS'] = {}
+        client = create_app(config).test_client()
+        assert client.post('/users', json={'username': 'alice', 'email': 'alice@example.com'}).status_code == 201
+        response = client.post('/users', json={'username': 'alice', 'email': 'other@example.com'})
+        assert (response.status_code, response.get_json()['field']) == (409, 'username')
+        response = client.post('/users', json={'username': 'bob', 'email': 'alice@example.com'})
+        assert (response.status_code, response.get_json()['field']) == (409, 'email')